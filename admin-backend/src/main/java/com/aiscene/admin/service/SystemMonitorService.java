@@ -34,6 +34,8 @@ public class SystemMonitorService {
     private String flowerBaseUrl;
 
     private static final String CELERY_QUEUE_NAME = "ai-video:celery";
+    // Engine 将任务从 CELERY_QUEUE_NAME 转发到 I/O 队列和 CPU 队列（见 docs/ENGINE_QUEUES.md）
+    private static final List<String> CELERY_WORK_QUEUES = List.of(CELERY_QUEUE_NAME, "ai-video:io", "ai-video:cpu");
 
     /**
      * 获取系统健康状态
@@ -130,7 +132,10 @@ public class SystemMonitorService {
         // 从 Redis 获取队列长度
         Long pendingTasks = 0L;
         try {
-            pendingTasks = redisTemplate.opsForList().size(CELERY_QUEUE_NAME);
+            for (String queue : CELERY_WORK_QUEUES) {
+                Long size = redisTemplate.opsForList().size(queue);
+                pendingTasks += size != null ? size : 0L;
+            }
         } catch (Exception e) {
             log.warn("Failed to get Celery queue length", e);
         }
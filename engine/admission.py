@@ -0,0 +1,246 @@
+"""
+Render Admission Control
+
+Every running source ``VideoFileClip`` reader of a render is an ffmpeg decoder
+process plus frame buffers (up to RENDER_MAX_OPEN_READERS at a time), and the
+compositor keeps full frames on top, so two large projects on one 4 GB worker can
+run it out of memory. Before a render starts, its cost is estimated from the asset
+count, source frame sizes (probe_cache.py, falling back to 1080p) and durations,
+and a lease is taken from the budget of this node in Redis:
+
+- ``mem_mb``: interpreter + MoviePy base, the largest decoders that can run at
+  once, the voice and BGM tracks held in memory and the libx264 encoder at output
+  size.
+- ``cpu``: FFmpeg threads of the encode (RENDER_THREADS).
+
+Leases live in one Redis hash per node (``lease id -> "mem cpu expires_ms"``);
+acquire and release are atomic Lua scripts. A holder renews its lease from a
+heartbeat thread, so the lease of a killed worker expires after
+RENDER_ADMISSION_LEASE_TTL_SEC. A render is always admitted on an idle node, so a
+project larger than the budget still runs, alone. When Redis is not configured
+or unreachable renders are admitted without a lease.
+"""
+
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+
+import metrics
+import probe_cache
+from config import Config
+from redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "ai-video:admission:"
+
+# KEYS[1] = node lease hash; ARGV = lease id, mem_mb, cpu, ttl ms, mem budget, cpu budget.
+# Returns {admitted, mem in use, cpu in use, active leases} (numbers as strings: Lua floats are truncated).
+_ACQUIRE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local mem_used, cpu_used, active = 0, 0, 0
+local entries = redis.call('HGETALL', KEYS[1])
+for i = 1, #entries, 2 do
+  local mem, cpu, exp = string.match(entries[i + 1], '^(%S+) (%S+) (%d+)$')
+  if not exp or tonumber(exp) <= now then
+    redis.call('HDEL', KEYS[1], entries[i])
+  elseif entries[i] ~= ARGV[1] then
+    mem_used = mem_used + tonumber(mem)
+    cpu_used = cpu_used + tonumber(cpu)
+    active = active + 1
+  end
+end
+local mem, cpu, ttl = tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+if active > 0 and (mem_used + mem > tonumber(ARGV[5]) or cpu_used + cpu > tonumber(ARGV[6])) then
+  return {0, tostring(mem_used), tostring(cpu_used), active}
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2] .. ' ' .. ARGV[3] .. ' ' .. (now + ttl))
+if redis.call('PTTL', KEYS[1]) < ttl * 2 then redis.call('PEXPIRE', KEYS[1], ttl * 2) end
+return {1, tostring(mem_used), tostring(cpu_used), active}
+"""
+
+# KEYS[1] = node lease hash; ARGV = lease id, ttl ms. Returns 0 when the lease is gone.
+_RENEW_LUA = """
+local entry = redis.call('HGET', KEYS[1], ARGV[1])
+if not entry then return 0 end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local mem, cpu = string.match(entry, '^(%S+) (%S+) ')
+redis.call('HSET', KEYS[1], ARGV[1], mem .. ' ' .. cpu .. ' ' .. (now + tonumber(ARGV[2])))
+if redis.call('PTTL', KEYS[1]) < tonumber(ARGV[2]) * 2 then redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[2]) * 2) end
+return 1
+"""
+
+_DEFAULT_SOURCE_SIZE = (1920, 1080)
+_BASE_MB = 350.0  # Interpreter, MoviePy/numpy, fonts, intro/outro cards
+_READER_MB = 40.0  # ffmpeg decoder process per open source reader
+_READER_FRAMES = 6  # RGB frames per reader: decoder buffers, pipe, last frame, resized copy
+_AUDIO_MB_PER_SEC = 1.4  # Voice + BGM as float64 stereo 44.1 kHz, mixed copy included
+_ENCODER_MB = 80.0
+_ENCODER_FRAMES = 24  # YUV420 frames alive in libx264 (lookahead, references)
+
+_scripts = {}
+_budget = None
+
+
+def node_name() -> str:
+    return Config.RENDER_ADMISSION_NODE or socket.gethostname()
+
+
+def _memory_limit_mb() -> float:
+    """cgroup memory limit of the container, else physical memory."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = f.read().strip()
+            if raw and raw != "max" and int(raw) < (1 << 60):
+                return int(raw) / (1024 * 1024)
+        except Exception:
+            continue
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1024 * 1024)
+    except Exception:
+        return 4096.0
+
+
+def node_budget() -> dict:
+    """``{"mem_mb", "cpu"}`` shared by the renders of this node."""
+    global _budget
+    if _budget is None:
+        mem = Config.RENDER_ADMISSION_MEM_MB or _memory_limit_mb() * 0.8
+        # ffmpeg threads rarely saturate their cores while MoviePy composes frames in Python
+        cpu = Config.RENDER_ADMISSION_CPU or (os.cpu_count() or 1) * 2
+        _budget = {"mem_mb": float(mem), "cpu": float(cpu)}
+    return _budget
+
+
+def estimate_render_cost(timeline_assets: list, *, audio_sec: float | None = None) -> dict:
+    """Estimate peak memory and CPU of rendering ``timeline_assets``.
+
+    Assets may carry ``width``/``height`` (normalized parts); otherwise the probe
+    cache is consulted and unknown sources count as 1080p.
+    """
+    probes = probe_cache.lookup_many([a.get("id") for a in timeline_assets if not a.get("width")])
+    out_h = min(720, Config.MAX_VIDEO_RESOLUTION)
+    out_w = None
+    mem_mb, video_sec, readers_mb = _BASE_MB, 0.0, []
+    for asset in timeline_assets:
+        probe = probes.get(str(asset.get("id"))) or {}
+        w = int(asset.get("width") or probe.get("width") or 0)
+        h = int(asset.get("height") or probe.get("height") or 0)
+        if w <= 0 or h <= 0:
+            w, h = _DEFAULT_SOURCE_SIZE
+        if out_w is None:
+            out_w = int(w * out_h / h)
+        readers_mb.append(_READER_MB + w * h * 3 * _READER_FRAMES / (1024 * 1024))
+        video_sec += float(asset.get("duration") or probe.get("duration") or 0.0)
+    window = Config.RENDER_MAX_OPEN_READERS if Config.RENDER_MAX_OPEN_READERS > 0 else len(readers_mb)
+    mem_mb += sum(sorted(readers_mb, reverse=True)[:window])
+    out_frame_mb = (out_w or int(out_h * 16 / 9)) * out_h * 1.5 / (1024 * 1024)
+    mem_mb += _ENCODER_MB + out_frame_mb * _ENCODER_FRAMES
+    mem_mb += _AUDIO_MB_PER_SEC * float(video_sec if audio_sec is None else audio_sec)
+    cpu = float(max(1, min(Config.RENDER_THREADS, int(node_budget()["cpu"]))))
+    return {"mem_mb": round(mem_mb, 1), "cpu": cpu, "readers": min(window, len(readers_mb)), "video_sec": round(video_sec, 1)}
+
+
+def _script(client, name: str, source: str):
+    script = _scripts.get(name)
+    if script is None or script.registered_client is not client:
+        script = client.register_script(source)
+        _scripts[name] = script
+    return script
+
+
+class Lease:
+    """A granted share of the node budget; renewed in the background until ``release()``."""
+
+    def __init__(self, lease_id: str | None, cost: dict, key: str | None = None):
+        self.lease_id = lease_id
+        self.cost = cost
+        self.key = key
+        self._stop = threading.Event()
+        if key is not None:
+            threading.Thread(target=self._heartbeat, name="admission-lease", daemon=True).start()
+
+    def _heartbeat(self):
+        ttl_sec = max(10, Config.RENDER_ADMISSION_LEASE_TTL_SEC)
+        while not self._stop.wait(ttl_sec / 3):
+            try:
+                client = get_redis()
+                if client is not None:
+                    _script(client, "renew", _RENEW_LUA)(keys=[self.key], args=[self.lease_id, ttl_sec * 1000])
+            except Exception as e:
+                logger.warning("Render lease renewal failed", extra={"event": "admission.renew.error", "reason": str(e)[:256]})
+
+    def release(self) -> None:
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self.key is None:
+            return
+        try:
+            client = get_redis()
+            if client is not None:
+                client.hdel(self.key, self.lease_id)
+        except Exception as e:
+            logger.warning("Render lease release failed", extra={"event": "admission.release.error", "reason": str(e)[:256]})
+
+    def __enter__(self) -> "Lease":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.release()
+        return False
+
+
+def try_acquire(cost: dict, *, lease_id: str | None = None, project_id: str | None = None) -> Lease | None:
+    """Take ``cost`` from the node budget; None when it is exhausted (the caller defers)."""
+    if not Config.RENDER_ADMISSION_ENABLED:
+        return Lease(None, cost)
+    client = get_redis()
+    if client is None:
+        metrics.RENDER_ADMISSIONS.inc(outcome="bypass")
+        return Lease(None, cost)
+    budget = node_budget()
+    key = _KEY_PREFIX + node_name()
+    lease_id = lease_id or uuid.uuid4().hex
+    ttl_ms = max(10, Config.RENDER_ADMISSION_LEASE_TTL_SEC) * 1000
+    try:
+        admitted, mem_used, cpu_used, active = _script(client, "acquire", _ACQUIRE_LUA)(
+            keys=[key], args=[lease_id, cost["mem_mb"], cost["cpu"], ttl_ms, budget["mem_mb"], budget["cpu"]]
+        )
+    except Exception as e:
+        logger.warning(
+            "Render admission unavailable, admitting without a lease",
+            extra={"event": "admission.error", "project_id": project_id, "reason": str(e)[:256]},
+        )
+        metrics.RENDER_ADMISSIONS.inc(outcome="bypass")
+        return Lease(None, cost)
+
+    fields = {
+        "project_id": project_id,
+        "operation": node_name(),
+        "estimated_mem_mb": cost["mem_mb"],
+        "estimated_cpu": cost["cpu"],
+        "mem_in_use_mb": float(mem_used),
+        "cpu_in_use": float(cpu_used),
+        "active_leases": int(active),
+    }
+    if int(admitted) != 1:
+        metrics.RENDER_ADMISSIONS.inc(outcome="deferred")
+        logger.info("Render budget exhausted", extra={"event": "admission.deferred", **fields})
+        return None
+    metrics.RENDER_ADMISSIONS.inc(outcome="admitted")
+    logger.info("Render admitted", extra={"event": "admission.admitted", **fields})
+    return Lease(lease_id, cost, key)
+
+
+def defer_countdown(deferrals: int) -> int:
+    """Back-off before re-trying admission, with jitter so deferred renders do not return together."""
+    base = max(1, Config.RENDER_ADMISSION_RETRY_SEC)
+    delay = min(max(base, Config.RENDER_ADMISSION_RETRY_MAX_SEC), base * (2 ** min(max(0, deferrals), 4)))
+    return int(delay + random.uniform(0, base / 2))
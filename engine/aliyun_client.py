@@ -13,10 +13,12 @@ class AliyunClient:
     Client for Aliyun Wanxiang (Tongyi Wanxiang) Video Generation & Editing APIs.
     """
     
-    BASE_URL = "https://dashscope.aliyuncs.com/api/v1/services/aigc/video-generation/video-synthesis"
+    API_BASE = "https://dashscope.aliyuncs.com/api/v1"
     
     def __init__(self):
         self.api_key = Config.DASHSCOPE_API_KEY
+        self.api_base = Config.DASHSCOPE_HTTP_BASE_URL or self.API_BASE
+        self.synthesis_url = f"{self.api_base}/services/aigc/video-generation/video-synthesis"
         if not self.api_key:
             logger.warning("DASHSCOPE_API_KEY is not set. AliyunClient will not function.")
             
@@ -60,7 +62,7 @@ class AliyunClient:
         }
 
         logger.info(f"Submitting Aliyun task with model={model}")
-        data = self._request_json(self.BASE_URL, method="POST", headers=self._get_headers(), body=payload, timeout=30)
+        data = self._request_json(self.synthesis_url, method="POST", headers=self._get_headers(), body=payload, timeout=30)
         task_id = (data.get("output") or {}).get("task_id")
         if not task_id:
             raise ValueError("No task_id in response")
@@ -71,7 +73,7 @@ class AliyunClient:
         """
         Check the status of a submitted task.
         """
-        url = f"https://dashscope.aliyuncs.com/api/v1/tasks/{task_id}"
+        url = f"{self.api_base}/tasks/{task_id}"
         headers = {"Authorization": f"Bearer {self.api_key}"}
         return self._request_json(url, method="GET", headers=headers, body=None, timeout=10)
 
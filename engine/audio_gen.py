@@ -1,7 +1,14 @@
 import dashscope
 from dashscope.audio.tts import SpeechSynthesizer
 from config import Config
-from html import escape as _xml_escape
+import metrics
+import pcm_audio
+from rate_limit import TokenBucket
+from spans import span
+from tts_cache import tts_audio_cache, tts_cache_key
+from tts_duration import duration_predictor, pause_seconds
+from tts_resilience import hedged_call, tts_breaker, tts_latency
+from html import escape as _xml_escape, unescape as _xml_unescape
 from http import HTTPStatus
 import re
 import base64
@@ -12,21 +19,50 @@ import tempfile
 import urllib.request
 import math
 import logging
+import numpy as np
 from urllib.parse import urlparse
 from urllib.error import HTTPError, URLError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextvars
+import threading
 import time
+import uuid
+import wave
 
 logger = logging.getLogger(__name__)
 
 try:
     from dashscope.audio.tts_v2 import SpeechSynthesizer as SpeechSynthesizerV2
-    from dashscope.audio.tts_v2.speech_synthesizer import AudioFormat
+    from dashscope.audio.tts_v2.speech_synthesizer import AudioFormat, ResultCallback
     TTS_V2_AVAILABLE = True
 except Exception:
     SpeechSynthesizerV2 = None
     AudioFormat = None
+    ResultCallback = object
     TTS_V2_AVAILABLE = False
 
+# Shared across worker processes via Redis so the account-level DashScope QPS quota holds.
+_tts_rate_limiter = TokenBucket("dashscope-tts", Config.TTS_QPS, Config.TTS_QPS_BURST)
+
+# Set per aligned segment; flipped when any of its audio came from the fallback engine so
+# the result is neither cached nor fed to the duration predictor under the primary voice.
+_tts_fallback_marker: contextvars.ContextVar = contextvars.ContextVar("tts_fallback_marker", default=None)
+
+
+def _mark_fallback_used():
+    marker = _tts_fallback_marker.get()
+    if marker is not None:
+        marker["used"] = True
+
+
+def _fallback_used() -> bool:
+    marker = _tts_fallback_marker.get()
+    return bool(marker and marker.get("used"))
+
+
+def _ssml_to_plain_text(payload: str) -> str:
+    return _xml_unescape(re.sub(r"<[^>]+>", "", payload or "")).strip()
+
 def _format_tts_error(result) -> str:
     parts = []
     for key in ("request_id", "status_code", "code", "message"):
@@ -322,7 +358,61 @@ def _ffmpeg_concat_mp3(parts: list[str], output_path: str):
             except Exception:
                 pass
 
+_RUBBERBAND_AVAILABLE = None
+
+
+def _ffmpeg_has_rubberband() -> bool:
+    global _RUBBERBAND_AVAILABLE
+    if _RUBBERBAND_AVAILABLE is None:
+        try:
+            proc = subprocess.run(["ffmpeg", "-hide_banner", "-filters"], capture_output=True, text=True, timeout=10)
+            _RUBBERBAND_AVAILABLE = " rubberband " in (proc.stdout or "")
+        except Exception:
+            _RUBBERBAND_AVAILABLE = False
+    return _RUBBERBAND_AVAILABLE
+
+
+def _time_stretch_audio(input_path: str, output_path: str, tempo: float) -> str:
+    """Pitch-preserving tempo change (tempo > 1 shortens). Returns the filter used."""
+    if _ffmpeg_has_rubberband():
+        engine = "rubberband"
+        audio_filter = f"rubberband=tempo={tempo:.5f}:pitchq=quality"
+    else:
+        engine = "atempo"
+        audio_filter = f"atempo={tempo:.5f}"
+    if pcm_audio.is_wav(output_path):
+        samples = pcm_audio.time_stretch(pcm_audio.read_pcm(input_path), tempo, audio_filter)
+        pcm_audio.write_wav(output_path, samples)
+        return engine
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-i",
+        input_path,
+        "-filter:a",
+        audio_filter,
+        "-ac",
+        "1",
+        "-ar",
+        "48000",
+        "-c:a",
+        "libmp3lame",
+        "-q:a",
+        "2",
+        output_path,
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError((proc.stderr or proc.stdout or "").strip()[-800:] or "ffmpeg time-stretch failed")
+    _assert_valid_mp3_file(output_path)
+    return engine
+
 def _get_audio_duration_sec(file_path: str) -> float:
+    if pcm_audio.is_wav(file_path):
+        try:
+            return pcm_audio.wav_duration_sec(file_path)
+        except Exception:
+            return 0.0
     try:
         cmd = [
             "ffprobe", 
@@ -379,6 +469,15 @@ def _is_valid_mp3_file(file_path: str) -> bool:
         return False
     return duration > 0.01
 
+def _is_valid_audio_file(file_path: str) -> bool:
+    """WAV segments are checked from the header; anything else is probed with ffprobe."""
+    if pcm_audio.is_wav(file_path):
+        try:
+            return pcm_audio.wav_duration_sec(file_path) > 0.01
+        except Exception:
+            return False
+    return _is_valid_mp3_file(file_path)
+
 def _assert_valid_mp3_file(file_path: str):
     try:
         size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
@@ -403,11 +502,12 @@ def _call_tts_v2_once(
     payload: str,
     enable_ssml: bool,
     speech_rate: float = 1.0,
+    pcm: bool = False,
 ):
     kwargs = dict(
         model=model,
         voice=voice,
-        format=AudioFormat.MP3_48000HZ_MONO_256KBPS,
+        format=AudioFormat.PCM_48000HZ_MONO_16BIT if pcm else AudioFormat.MP3_48000HZ_MONO_256KBPS,
         volume=Config.TTS_VOLUME,
         speech_rate=speech_rate,
         pitch_rate=Config.TTS_PITCH_RATE,
@@ -425,12 +525,22 @@ def _call_tts_v2_once(
             else:
                 raise
 
+        _tts_rate_limiter.acquire()
         audio = synthesizer.call(payload)
         request_id = None
         try:
             request_id = synthesizer.get_last_request_id()
         except Exception:
             pass
+        if audio is None:
+            # The SDK swallows task-failed in blocking calls and returns None; surface it
+            # so retries, the circuit breaker and the SSML fallback see the service error.
+            header = ((getattr(synthesizer, "last_response", None) or {}).get("header") or {})
+            if header.get("event") == "task-failed":
+                raise Exception(
+                    f"TTS task failed: request_id={request_id}; "
+                    f"code={header.get('error_code')}; message={header.get('error_message')}"
+                )
         return audio, request_id
     finally:
         if synthesizer is not None:
@@ -439,6 +549,134 @@ def _call_tts_v2_once(
             except Exception:
                 pass
 
+class _StreamingAudioSink(ResultCallback):
+    """Writes audio chunks to disk as they arrive, so memory stays flat for any text length."""
+
+    def __init__(self, output_path: str, *, pcm: bool):
+        self.output_path = output_path
+        self.pcm = pcm
+        self.tmp_path = f"{output_path}.{uuid.uuid4().hex}.part"
+        self.started = time.monotonic()
+        self.first_audio_ms = None
+        self.bytes = 0
+        self.error = None
+        self.completed = False
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = b""
+        if pcm:
+            self._file = wave.open(self.tmp_path, "wb")
+            self._file.setnchannels(pcm_audio.CHANNELS)
+            self._file.setsampwidth(pcm_audio.SAMPLE_WIDTH)
+            self._file.setframerate(pcm_audio.SAMPLE_RATE)
+        else:
+            self._file = open(self.tmp_path, "wb")
+
+    def on_data(self, data: bytes) -> None:
+        with self._lock:
+            if self.first_audio_ms is None:
+                self.first_audio_ms = int((time.monotonic() - self.started) * 1000)
+            self.bytes += len(data)
+            if self.pcm:
+                # Keep sample alignment across websocket frames.
+                data = self._pending + bytes(data)
+                usable = len(data) - (len(data) % pcm_audio.SAMPLE_WIDTH)
+                self._pending = data[usable:]
+                self._file.writeframes(data[:usable])
+            else:
+                self._file.write(data)
+
+    def on_complete(self) -> None:
+        self.completed = True
+        self.done.set()
+
+    def on_error(self, message) -> None:
+        self.error = message
+        self.done.set()
+
+    def on_close(self) -> None:
+        self.done.set()
+
+    def finish(self) -> None:
+        with self._lock:
+            self._file.close()
+        os.replace(self.tmp_path, self.output_path)
+
+    def discard(self) -> None:
+        with self._lock:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+        if os.path.exists(self.tmp_path):
+            try:
+                os.remove(self.tmp_path)
+            except Exception:
+                pass
+
+
+def _call_tts_v2_streaming(
+    *,
+    SpeechSynthesizerV2,
+    AudioFormat,
+    model: str,
+    voice: str,
+    payload: str,
+    enable_ssml: bool,
+    output_path: str,
+    speech_rate: float = 1.0,
+    pcm: bool = False,
+) -> tuple[str | None, _StreamingAudioSink]:
+    """Callback-mode synthesis straight into ``output_path``; returns (request_id, sink)."""
+    sink = _StreamingAudioSink(output_path, pcm=pcm)
+    kwargs = dict(
+        model=model,
+        voice=voice,
+        format=AudioFormat.PCM_48000HZ_MONO_16BIT if pcm else AudioFormat.MP3_48000HZ_MONO_256KBPS,
+        volume=Config.TTS_VOLUME,
+        speech_rate=speech_rate,
+        pitch_rate=Config.TTS_PITCH_RATE,
+        callback=sink,
+    )
+    if enable_ssml:
+        kwargs["enable_ssml"] = True
+    synthesizer = None
+    try:
+        try:
+            synthesizer = SpeechSynthesizerV2(**kwargs)
+        except TypeError:
+            if "enable_ssml" in kwargs:
+                kwargs.pop("enable_ssml", None)
+                synthesizer = SpeechSynthesizerV2(**kwargs)
+            else:
+                raise
+
+        _tts_rate_limiter.acquire()
+        sink.started = time.monotonic()
+        synthesizer.call(payload)
+        if not sink.done.wait(timeout=Config.TTS_STREAM_TIMEOUT_SEC):
+            raise TimeoutError(f"TTS stream timed out after {Config.TTS_STREAM_TIMEOUT_SEC}s")
+        request_id = None
+        try:
+            request_id = synthesizer.get_last_request_id()
+        except Exception:
+            pass
+        if sink.error is not None:
+            raise Exception(f"TTS failed: request_id={request_id}, message={sink.error}")
+        if not sink.completed:
+            raise Exception(f"TTS stream closed before completion: request_id={request_id}")
+        sink.finish()
+        return request_id, sink
+    except Exception:
+        sink.discard()
+        raise
+    finally:
+        if synthesizer is not None:
+            try:
+                synthesizer.close()
+            except Exception:
+                pass
+
 def _as_jsonable(obj):
     if obj is None:
         return None
@@ -640,11 +878,16 @@ def _text_to_emotional_ssml(text: str) -> str:
     # 11. Wrap in <speak> tag (without rate control by default)
     return f"<speak>{escaped}</speak>"
 
+def _mark_tts_retried(err: Exception) -> Exception:
+    """Flag an error that ``_run_tts_v2`` already retried, so the per-segment retry does not repeat the calls."""
+    err.tts_retried = True
+    return err
+
 def _is_invalid_parameter_error(err: Exception) -> bool:
     s = (str(err) or "").lower()
     return ("invalidparameter" in s) or ("engine return error code: 411" in s) or ("error code: 411" in s)
 
-def _synthesize_text_to_mp3(
+def _synthesize_text_to_audio(
     self,
     SpeechSynthesizerV2,
     AudioFormat,
@@ -693,23 +936,39 @@ def _synthesize_text_to_mp3(
         )
         return False
 
-    part_files: list[str] = []
+    ext = "wav" if pcm_audio.is_wav(output_path) else "mp3"
+    concat_key = tts_cache_key(
+        kind="tts_v2_concat",
+        model=model,
+        voice=voice,
+        chunks=chunks,
+        speech_rate=float(speech_rate),
+        volume=Config.TTS_VOLUME,
+        pitch=float(Config.TTS_PITCH_RATE),
+        format=ext,
+    )
+    if tts_audio_cache.get(concat_key, output_path, ext=ext, operation="tts_v2_concat") and _is_valid_audio_file(output_path):
+        return False
+
+    part_files = [f"{output_path}.part{idx}.{ext}" for idx in range(len(chunks))]
     try:
-        for idx, chunk in enumerate(chunks):
-            part_path = f"{output_path}.part{idx}.mp3"
-            self._run_tts_v2(
-                SpeechSynthesizerV2,
-                AudioFormat,
-                model,
-                voice,
-                chunk,
-                part_path,
-                enable_ssml=False,
-                speech_rate=speech_rate,
-                asset_id=asset_id,
-            )
-            part_files.append(part_path)
-        _ffmpeg_concat_mp3(part_files, output_path)
+        self._synthesize_chunks(
+            SpeechSynthesizerV2,
+            AudioFormat,
+            model=model,
+            voice=voice,
+            payloads=chunks,
+            part_paths=part_files,
+            enable_ssml=False,
+            speech_rate=speech_rate,
+            asset_id=asset_id,
+        )
+        if ext == "wav":
+            pcm_audio.concat_to_wav(part_files, output_path)
+        else:
+            _ffmpeg_concat_mp3(part_files, output_path)
+        if not _fallback_used():
+            tts_audio_cache.put(concat_key, output_path, ext=ext, operation="tts_v2_concat")
         return False
     finally:
         for p in part_files:
@@ -806,23 +1065,31 @@ class AudioGenerator:
             raise ValueError("DASHSCOPE_API_KEY is not set")
         dashscope.api_key = Config.DASHSCOPE_API_KEY
         
+    @span("tts.generate")
     def generate_audio(self, text: str, output_path: str):
         """
         Legacy single-file generation (still used for test or simple cases)
         """
         return self._generate_internal(text, output_path)
 
+    @span("tts")
     def generate_aligned_audio_segments(self, segments: list, output_dir: str) -> dict:
         """
         Generate audio segments aligned with video duration.
         
         Strategy for duration matching (prioritize natural speech):
-        1. If audio is close to video duration (±0.5s): use as-is
-        2. If audio > video: speed up (max 1.25x to avoid unnatural fast speech)
-        3. If audio < video: slow down (min 0.85x for natural pace), then pad with silence
+        1. Predict the duration at 1.0x and pick the speech rate before the first call
+           (0.85x-1.25x; see tts_duration.DurationPredictor)
+        2. If the result is within ±0.5s: use as-is
+        3. Otherwise time-stretch locally to the corrected rate (re-synthesize only if the
+           stretch is out of bounds); pad any remaining gap with silence
         
+        Segments are synthesized concurrently (TTS_CONCURRENCY workers, calls throttled to
+        TTS_QPS); a segment is retried up to TTS_SEGMENT_RETRIES times unless its TTS calls
+        already used their own attempts.
+
         segments: list of dict, each containing 'text', 'duration', 'asset_id'
-        Returns: dict mapping asset_id to audio_file_path
+        Returns: dict mapping asset_id to audio_file_path (48 kHz mono WAV on the V2 path), in segment order
         """
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
@@ -849,251 +1116,360 @@ class AudioGenerator:
         
         model, voice = _normalize_tts_model_and_voice(model=Config.TTS_MODEL, voice=Config.TTS_VOICE)
         
+        # Later segments with the same asset_id win, as with sequential synthesis.
+        jobs = {}
         for seg in segments:
-            text = seg.get('text', '').strip()
-            video_duration = float(seg.get('duration', 5.0))
             asset_id = seg.get('asset_id')
-            if not asset_id: 
+            if not asset_id:
                 continue
-                
-            final_path = os.path.join(output_dir, f"{asset_id}.mp3")
-            
-            if not text:
-                # Generate silence
-                self._generate_silence(video_duration, final_path)
-                result_map[asset_id] = final_path
-                continue
-                
-            temp_base = os.path.join(output_dir, f"{asset_id}_base.mp3")
-            used_ssml = False
+            jobs.pop(asset_id, None)
+            jobs[asset_id] = dict(
+                text=seg.get('text', '').strip(),
+                video_duration=float(seg.get('duration', 5.0)),
+                asset_id=asset_id,
+                output_dir=output_dir,
+                model=model,
+                voice=voice,
+                min_rate=MIN_SPEECH_RATE,
+                max_rate=MAX_SPEECH_RATE,
+            )
 
+        order = [seg.get('asset_id') for seg in segments if seg.get('asset_id')]
+        order = list(dict.fromkeys(order))
+        paths = {}
+        started = time.monotonic()
+        workers = max(1, min(int(Config.TTS_CONCURRENCY), len(jobs) or 1))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts") as pool:
+            futures = {
+                pool.submit(contextvars.copy_context().run, self._synthesize_segment_with_retry, job): aid
+                for aid, job in jobs.items()
+            }
             try:
-                # Step 1: Generate audio at normal speed first
-                try:
-                    used_ssml = _synthesize_text_to_mp3(
-                        self,
-                        SpeechSynthesizerV2,
-                        AudioFormat,
-                        model=model,
-                        voice=voice,
-                        text=text,
-                        output_path=temp_base,
-                        prefer_ssml=bool(Config.TTS_ENABLE_SSML),
-                        speech_rate=1.0,
-                        asset_id=asset_id,
-                    )
-                except Exception as e:
-                    err_struct = _classify_tts_exception(e)
-                    logger.warning(
-                        "tts.ssml.fallback",
-                        extra={
-                            "event": "tts.ssml.fallback",
-                            "asset_id": asset_id,
-                            "tts_engine": Config.TTS_ENGINE,
-                            "tts_model": model,
-                            "voice": voice,
-                            "tts_enable_ssml": True,
-                            "reason": _format_exception_reason(e, limit=256),
-                            **err_struct,
-                            **_parse_kv_from_reason(_format_exception_reason(e, limit=512)),
-                        },
-                    )
-                    used_ssml = False
-                    _synthesize_text_to_mp3(
-                        self,
-                        SpeechSynthesizerV2,
-                        AudioFormat,
-                        model=model,
-                        voice=voice,
-                        text=text,
-                        output_path=temp_base,
-                        prefer_ssml=False,
-                        speech_rate=1.0,
-                        asset_id=asset_id,
-                    )
+                for fut in as_completed(futures):
+                    paths[futures[fut]] = fut.result()
+            except Exception:
+                for fut in futures:
+                    fut.cancel()
+                raise
 
-                audio_len = _get_audio_duration_sec(temp_base)
-                diff = video_duration - audio_len
+        # Build in segment order so callers see a stable mapping regardless of completion order.
+        for aid in order:
+            result_map[aid] = paths[aid]
 
-                # Step 2: Determine optimal speech rate adjustment
-                if abs(diff) < 0.5:
-                    # Close enough, use as-is
-                    os.replace(temp_base, final_path)
-                    logger.debug(
-                        f"Audio duration matched for {asset_id}",
-                        extra={
-                            "event": "tts.duration.matched",
-                            "asset_id": asset_id,
-                            "audio_duration": audio_len,
-                            "video_duration": video_duration,
-                            "diff": diff
-                        }
-                    )
-                elif diff > 0:
-                    # Audio is SHORTER than video - try slowing down first
-                    target_rate = audio_len / video_duration  # e.g., 4s audio / 5s video = 0.8
-                    
-                    if target_rate >= MIN_SPEECH_RATE:
-                        # Can achieve with slower speech (more natural, warm tone)
+        logger.info(
+            "tts.segments.finish",
+            extra={
+                "event": "tts.segments.finish",
+                "segments_count": len(jobs),
+                "tts_workers": workers,
+                "tts_qps": Config.TTS_QPS,
+                "duration_ms": int((time.monotonic() - started) * 1000),
+            },
+        )
+        logger.info(
+            "tts.duration.stats",
+            extra={"event": "tts.duration.stats", "tts_model": model, "voice": voice, **duration_predictor.stats()},
+        )
+        return result_map
+
+    @span("tts.segment")
+    def _synthesize_segment_with_retry(self, job: dict) -> str:
+        """Run ``_synthesize_aligned_segment`` with up to TTS_SEGMENT_RETRIES extra attempts.
+
+        TTS calls that ``_run_tts_v2`` already retried are not repeated here; the segment is
+        retried for the other failures (fallback engine, stretch/concat, file checks).
+        """
+        retries = max(0, int(Config.TTS_SEGMENT_RETRIES))
+        for attempt in range(retries + 1):
+            try:
+                return self._synthesize_aligned_segment(**job)
+            except Exception as e:
+                if attempt >= retries or getattr(e, "tts_retried", False):
+                    raise
+                logger.warning(
+                    "tts.segment.retry",
+                    extra={
+                        "event": "tts.segment.retry",
+                        "asset_id": job.get("asset_id"),
+                        "attempt": attempt + 1,
+                        "reason": (str(e) or e.__class__.__name__)[:256],
+                    },
+                )
+                time.sleep(min(8.0, 1.0 * (2 ** attempt)))
+
+    def _synthesize_with_ssml_fallback(self, *, model: str, voice: str, text: str, output_path: str, prefer_ssml: bool, speech_rate: float, asset_id: str) -> bool:
+        """Synthesize, retrying as plain text if the SSML request fails. Returns whether SSML was used."""
+        try:
+            return _synthesize_text_to_audio(
+                self,
+                SpeechSynthesizerV2,
+                AudioFormat,
+                model=model,
+                voice=voice,
+                text=text,
+                output_path=output_path,
+                prefer_ssml=prefer_ssml,
+                speech_rate=speech_rate,
+                asset_id=asset_id,
+            )
+        except Exception as e:
+            if not prefer_ssml:
+                raise
+            err_struct = _classify_tts_exception(e)
+            logger.warning(
+                "tts.ssml.fallback",
+                extra={
+                    "event": "tts.ssml.fallback",
+                    "asset_id": asset_id,
+                    "tts_engine": Config.TTS_ENGINE,
+                    "tts_model": model,
+                    "voice": voice,
+                    "tts_enable_ssml": True,
+                    "reason": _format_exception_reason(e, limit=256),
+                    **err_struct,
+                    **_parse_kv_from_reason(_format_exception_reason(e, limit=512)),
+                },
+            )
+            _synthesize_text_to_audio(
+                self,
+                SpeechSynthesizerV2,
+                AudioFormat,
+                model=model,
+                voice=voice,
+                text=text,
+                output_path=output_path,
+                prefer_ssml=False,
+                speech_rate=speech_rate,
+                asset_id=asset_id,
+            )
+            return False
+
+    def _synthesize_aligned_segment(
+        self,
+        *,
+        text: str,
+        video_duration: float,
+        asset_id: str,
+        output_dir: str,
+        model: str,
+        voice: str,
+        min_rate: float,
+        max_rate: float,
+    ) -> str:
+        """
+        Synthesize one segment close to ``video_duration``.
+
+        The speech rate is chosen up front from the duration predictor, so one synthesis
+        usually lands within tolerance. Otherwise the audio is time-stretched locally to the
+        corrected rate (scaled by the observed error, within [min_rate, max_rate]); a remote
+        re-synthesis is only made when that stretch falls outside TTS_STRETCH_MIN/MAX_RATIO
+        or fails. Remaining shortfall is padded with silence. Audio still too long at
+        max_rate is kept as-is.
+        """
+        # Segments stay 48 kHz mono PCM until the preview / final mux encode (see pcm_audio).
+        final_path = os.path.join(output_dir, f"{asset_id}.wav")
+        if not text:
+            # Generate silence
+            self._generate_silence(video_duration, final_path)
+            return final_path
+
+        tolerance = Config.TTS_DURATION_TOLERANCE_SEC
+        prefer_ssml = bool(Config.TTS_ENABLE_SSML)
+        # The chosen rate depends on the learned predictor, so cache the aligned result as a
+        # whole: an unchanged script re-renders identically even after the predictor moved.
+        segment_key = tts_cache_key(
+            kind="aligned_segment",
+            model=model,
+            voice=voice,
+            text=text,
+            ssml=prefer_ssml,
+            video_duration=float(video_duration),
+            tolerance=float(tolerance),
+            min_rate=float(min_rate),
+            max_rate=float(max_rate),
+            time_stretch=bool(Config.TTS_TIME_STRETCH_ENABLED),
+            volume=Config.TTS_VOLUME,
+            pitch=float(Config.TTS_PITCH_RATE),
+            format="wav",
+        )
+        if tts_audio_cache.get(segment_key, final_path, ext="wav", operation="aligned_segment") and _is_valid_audio_file(final_path):
+            return final_path
+
+        # Runs inside the per-segment copied context (see generate_aligned_audio_segments).
+        fallback_marker = {"used": False}
+        _tts_fallback_marker.set(fallback_marker)
+
+        ssml_payload = _text_to_emotional_ssml(text) if prefer_ssml else ""
+        expect_ssml = prefer_ssml and _cosyvoice_char_len(ssml_payload) <= 2000
+        units = _cosyvoice_char_len(text)
+        pause = pause_seconds(ssml_payload if expect_ssml else text, ssml=expect_ssml)
+
+        rate = 1.0
+        predicted = 0.0
+        if Config.TTS_DURATION_PREDICTOR_ENABLED:
+            predicted_at_1 = duration_predictor.predict(units=units, pause_sec=pause, model=model, voice=voice, ssml=expect_ssml)
+            rate = duration_predictor.choose_rate(predicted_at_1, video_duration, min_rate, max_rate, tolerance)
+            predicted = predicted_at_1 / rate
+
+        temp_base = os.path.join(output_dir, f"{asset_id}_base.wav")
+        retry_path = os.path.join(output_dir, f"{asset_id}_retry.wav")
+        syntheses = 0
+        try:
+            used_ssml = self._synthesize_with_ssml_fallback(
+                model=model,
+                voice=voice,
+                text=text,
+                output_path=temp_base,
+                prefer_ssml=prefer_ssml,
+                speech_rate=rate,
+                asset_id=asset_id,
+            )
+            syntheses += 1
+            if used_ssml != expect_ssml:
+                pause = pause_seconds(text, ssml=False)
+            audio_len = _get_audio_duration_sec(temp_base)
+            if not fallback_marker["used"]:
+                duration_predictor.observe(units=units, pause_sec=pause, model=model, voice=voice, ssml=used_ssml, rate=rate, actual_sec=audio_len)
+            first_len = audio_len
+            diff = video_duration - audio_len
+
+            # A first synthesis is a hit when no re-synthesis can improve it.
+            hit = (
+                abs(diff) < tolerance
+                or (diff > 0 and rate <= min_rate + 1e-6)
+                or (diff < 0 and rate >= max_rate - 1e-6)
+            )
+            if not hit:
+                corrected = max(min_rate, min(max_rate, rate * audio_len / max(video_duration, 0.1)))
+                tempo = corrected / rate
+                stretched = False
+                if (
+                    Config.TTS_TIME_STRETCH_ENABLED
+                    and abs(corrected - rate) >= 0.02
+                    and Config.TTS_STRETCH_MIN_RATIO <= tempo <= Config.TTS_STRETCH_MAX_RATIO
+                ):
+                    try:
+                        engine = _time_stretch_audio(temp_base, retry_path, tempo)
+                        stretched_len = _get_audio_duration_sec(retry_path)
+                        os.replace(retry_path, temp_base)
                         logger.info(
-                            f"Slowing speech for {asset_id}: rate={target_rate:.2f}",
+                            f"Time-stretched {asset_id}: tempo={tempo:.3f}",
                             extra={
-                                "event": "tts.speech_rate.slow",
+                                "event": "tts.time_stretch",
                                 "asset_id": asset_id,
-                                "target_rate": target_rate,
-                                "audio_duration": audio_len,
-                                "video_duration": video_duration
-                            }
+                                "strategy": engine,
+                                "tempo": round(tempo, 4),
+                                "audio_duration": round(stretched_len, 3),
+                                "video_duration": video_duration,
+                            },
                         )
-                        try:
-                            _synthesize_text_to_mp3(
-                                self,
-                                SpeechSynthesizerV2,
-                                AudioFormat,
-                                model=model,
-                                voice=voice,
-                                text=text,
-                                output_path=final_path,
-                                prefer_ssml=bool(Config.TTS_ENABLE_SSML) and used_ssml,
-                                speech_rate=target_rate,
-                                asset_id=asset_id,
-                            )
-                            if os.path.exists(temp_base):
-                                os.remove(temp_base)
-                        except Exception:
-                            # Fallback: use original + silence padding
-                            self._pad_with_silence(temp_base, final_path, diff, output_dir, asset_id)
-                    else:
-                        # Need more than slowest rate allows - slow to min then pad
-                        logger.info(
-                            f"Slowing to min rate + padding for {asset_id}",
+                        audio_len = stretched_len
+                        rate = corrected
+                        diff = video_duration - audio_len
+                        stretched = True
+                    except Exception as e:
+                        if os.path.exists(retry_path):
+                            os.remove(retry_path)
+                        logger.warning(
+                            "tts.time_stretch.failed",
                             extra={
-                                "event": "tts.speech_rate.slow_and_pad",
+                                "event": "tts.time_stretch.failed",
                                 "asset_id": asset_id,
-                                "min_rate": MIN_SPEECH_RATE,
-                                "audio_duration": audio_len,
-                                "video_duration": video_duration
-                            }
+                                "reason": (str(e) or e.__class__.__name__)[:256],
+                            },
                         )
-                        # Calculate expected duration at min rate
-                        expected_slow_duration = audio_len / MIN_SPEECH_RATE
-                        remaining_gap = video_duration - expected_slow_duration
-                        
-                        if remaining_gap > 0.3:
-                            # Regenerate at slower rate, then pad
-                            try:
-                                slow_path = os.path.join(output_dir, f"{asset_id}_slow.mp3")
-                                _synthesize_text_to_mp3(
-                                    self,
-                                    SpeechSynthesizerV2,
-                                    AudioFormat,
-                                    model=model,
-                                    voice=voice,
-                                    text=text,
-                                    output_path=slow_path,
-                                    prefer_ssml=bool(Config.TTS_ENABLE_SSML) and used_ssml,
-                                    speech_rate=MIN_SPEECH_RATE,
-                                    asset_id=asset_id,
-                                )
-                                actual_slow_len = _get_audio_duration_sec(slow_path)
-                                actual_gap = video_duration - actual_slow_len
-                                if actual_gap > 0.1:
-                                    self._pad_with_silence(slow_path, final_path, actual_gap, output_dir, asset_id)
-                                else:
-                                    os.replace(slow_path, final_path)
-                                if os.path.exists(temp_base):
-                                    os.remove(temp_base)
-                            except Exception:
-                                # Fallback to original + full padding
-                                self._pad_with_silence(temp_base, final_path, diff, output_dir, asset_id)
-                        else:
-                            # Gap too small to bother with re-generation
-                            self._pad_with_silence(temp_base, final_path, diff, output_dir, asset_id)
-                else:
-                    # Audio is LONGER than video - speed up (existing logic)
-                    safe_video_duration = max(video_duration, 0.1)
-                    ratio = audio_len / safe_video_duration
-                    target_rate = min(ratio, MAX_SPEECH_RATE)
-                    
+                if not stretched and abs(corrected - rate) >= 0.02:
                     logger.info(
-                        f"Speeding up speech for {asset_id}: rate={target_rate:.2f}",
+                        f"Correcting speech rate for {asset_id}: rate={corrected:.2f}",
                         extra={
-                            "event": "tts.speech_rate.fast",
+                            "event": "tts.speech_rate.correct",
                             "asset_id": asset_id,
-                            "target_rate": target_rate,
+                            "target_rate": corrected,
                             "audio_duration": audio_len,
-                            "video_duration": video_duration
-                        }
+                            "video_duration": video_duration,
+                        },
                     )
                     try:
-                        _synthesize_text_to_mp3(
-                            self,
-                            SpeechSynthesizerV2,
-                            AudioFormat,
+                        self._synthesize_with_ssml_fallback(
                             model=model,
                             voice=voice,
                             text=text,
-                            output_path=final_path,
-                            prefer_ssml=bool(Config.TTS_ENABLE_SSML) and used_ssml,
-                            speech_rate=target_rate,
+                            output_path=retry_path,
+                            prefer_ssml=prefer_ssml and used_ssml,
+                            speech_rate=corrected,
                             asset_id=asset_id,
                         )
-                    except Exception as e:
-                        err_struct = _classify_tts_exception(e)
+                        syntheses += 1
+                        audio_len = _get_audio_duration_sec(retry_path)
+                        if not fallback_marker["used"]:
+                            duration_predictor.observe(units=units, pause_sec=pause, model=model, voice=voice, ssml=used_ssml, rate=corrected, actual_sec=audio_len)
+                        os.replace(retry_path, temp_base)
+                        rate = corrected
+                        diff = video_duration - audio_len
+                    except Exception:
+                        # Keep the first synthesis; padding below covers any shortfall.
                         logger.warning(
-                            "tts.ssml.fallback",
-                            extra={
-                                "event": "tts.ssml.fallback",
-                                "asset_id": asset_id,
-                                "tts_engine": Config.TTS_ENGINE,
-                                "tts_model": model,
-                                "voice": voice,
-                                "tts_enable_ssml": True,
-                                "reason": _format_exception_reason(e, limit=256),
-                                **err_struct,
-                                **_parse_kv_from_reason(_format_exception_reason(e, limit=512)),
-                            },
+                            "tts.speech_rate.correct_failed",
+                            extra={"event": "tts.speech_rate.correct_failed", "asset_id": asset_id},
                         )
-                        _synthesize_text_to_mp3(
-                            self,
-                            SpeechSynthesizerV2,
-                            AudioFormat,
-                            model=model,
-                            voice=voice,
-                            text=text,
-                            output_path=final_path,
-                            prefer_ssml=False,
-                            speech_rate=target_rate,
-                            asset_id=asset_id,
-                        )
-                    if os.path.exists(temp_base):
-                        os.remove(temp_base)
-            except Exception as e:
-                if os.path.exists(temp_base):
+
+            if diff >= tolerance or (diff > 0.1 and rate <= min_rate + 1e-6):
+                self._pad_with_silence(temp_base, final_path, diff, output_dir, asset_id)
+            else:
+                os.replace(temp_base, final_path)
+
+            if not fallback_marker["used"]:
+                tts_audio_cache.put(segment_key, final_path, ext="wav", operation="aligned_segment")
+                duration_predictor.record(hit=hit, syntheses=syntheses)
+                metrics.TTS_PREDICTOR_SEGMENTS.inc(outcome="hit" if hit else "miss")
+            logger.info(
+                "tts.duration.predict",
+                extra={
+                    "event": "tts.duration.predict",
+                    "asset_id": asset_id,
+                    "tts_model": model,
+                    "voice": voice,
+                    "speech_rate": rate,
+                    "predicted_duration": round(predicted, 3),
+                    "audio_duration": round(first_len, 3),
+                    "video_duration": video_duration,
+                    "hit": hit,
+                    "syntheses": syntheses,
+                },
+            )
+        except Exception as e:
+            for p in (temp_base, retry_path):
+                if os.path.exists(p):
                     try:
-                        os.remove(temp_base)
+                        os.remove(p)
                     except Exception:
                         pass
-                logger.exception(
-                    "tts.segment.failed",
-                    extra={
-                        "event": "tts.segment.failed",
-                        "asset_id": asset_id,
-                        "tts_engine": Config.TTS_ENGINE,
-                        "tts_model": model,
-                        "voice": voice,
-                        "tts_enable_ssml": True,
-                        "reason": (str(e) or e.__class__.__name__)[:256],
-                    },
-                )
-                raise
-            
-            result_map[asset_id] = final_path
-            
-        return result_map
+            logger.exception(
+                "tts.segment.failed",
+                extra={
+                    "event": "tts.segment.failed",
+                    "asset_id": asset_id,
+                    "tts_engine": Config.TTS_ENGINE,
+                    "tts_model": model,
+                    "voice": voice,
+                    "tts_enable_ssml": True,
+                    "reason": (str(e) or e.__class__.__name__)[:256],
+                },
+            )
+            raise
+        return final_path
 
     def _pad_with_silence(self, audio_path: str, output_path: str, silence_duration: float, output_dir: str, asset_id: str):
         """Helper to pad audio with silence at the end."""
+        if pcm_audio.is_wav(output_path):
+            samples = pcm_audio.read_pcm(audio_path)
+            pcm_audio.write_wav(output_path, np.concatenate([samples, pcm_audio.silence(silence_duration)]))
+            if os.path.exists(audio_path) and audio_path != output_path:
+                try:
+                    os.remove(audio_path)
+                except Exception:
+                    pass
+            return
         silence_path = os.path.join(output_dir, f"{asset_id}_pad.mp3")
         try:
             self._generate_silence(silence_duration, silence_path)
@@ -1111,6 +1487,9 @@ class AudioGenerator:
                     pass
 
     def _generate_silence(self, duration: float, output_path: str):
+        if pcm_audio.is_wav(output_path):
+            pcm_audio.write_wav(output_path, pcm_audio.silence(duration))
+            return
         cmd = [
             "ffmpeg", "-y", "-f", "lavfi", "-i", f"anullsrc=r=48000:cl=mono", 
             "-t", str(duration), "-q:a", "9", "-acodec", "libmp3lame", output_path
@@ -1119,29 +1498,262 @@ class AudioGenerator:
         if proc.returncode != 0 or not _is_valid_mp3_file(output_path):
             raise RuntimeError(f"failed to generate silence mp3: path={output_path}")
 
+    def _synthesize_chunks(
+        self,
+        SpeechSynthesizerV2,
+        AudioFormat,
+        *,
+        model: str,
+        voice: str,
+        payloads: list[str],
+        part_paths: list[str],
+        enable_ssml: bool,
+        speech_rate: float = 1.0,
+        asset_id: str | None = None,
+    ):
+        """Synthesize chunk payloads into ``part_paths`` with up to TTS_CHUNK_PIPELINE_DEPTH requests in flight."""
+        depth = max(1, min(int(Config.TTS_CHUNK_PIPELINE_DEPTH), len(payloads)))
+        if depth == 1:
+            for payload, path in zip(payloads, part_paths):
+                self._run_tts_v2(SpeechSynthesizerV2, AudioFormat, model, voice, payload, path, enable_ssml=enable_ssml, speech_rate=speech_rate, asset_id=asset_id)
+            return
+        with ThreadPoolExecutor(max_workers=depth, thread_name_prefix="tts-chunk") as pool:
+            futures = [
+                pool.submit(
+                    contextvars.copy_context().run,
+                    self._run_tts_v2,
+                    SpeechSynthesizerV2,
+                    AudioFormat,
+                    model,
+                    voice,
+                    payload,
+                    path,
+                    enable_ssml=enable_ssml,
+                    speech_rate=speech_rate,
+                    asset_id=asset_id,
+                )
+                for payload, path in zip(payloads, part_paths)
+            ]
+            try:
+                for fut in futures:
+                    fut.result()
+            except Exception:
+                for fut in futures:
+                    fut.cancel()
+                raise
+
+    def _call_tts_v2_resilient(
+        self,
+        SpeechSynthesizerV2,
+        AudioFormat,
+        *,
+        model: str,
+        voice: str,
+        payload: str,
+        enable_ssml: bool,
+        output_path: str,
+        speech_rate: float,
+        pcm: bool,
+    ):
+        """
+        One primary TTS call with latency tracking, p95 hedging and circuit-breaker accounting.
+
+        Returns (audio, request_id, sink). In streaming mode audio is None and the result has
+        already been written to output_path; a hedged duplicate streams into its own file.
+        """
+        key = f"{model}:{voice}"
+        hedge_after = None
+        if Config.TTS_HEDGE_ENABLED:
+            p = tts_latency.percentile(key, Config.TTS_HEDGE_PERCENTILE, Config.TTS_HEDGE_MIN_SAMPLES)
+            if p is not None:
+                hedge_after = max(Config.TTS_HEDGE_MIN_DELAY_SEC, p)
+        settled = threading.Event()
+
+        def attempt(idx: int):
+            started = time.monotonic()
+            target = output_path if hedge_after is None else f"{output_path}.h{idx}.part"
+            try:
+                if Config.TTS_STREAMING_ENABLED:
+                    request_id, sink = _call_tts_v2_streaming(
+                        SpeechSynthesizerV2=SpeechSynthesizerV2,
+                        AudioFormat=AudioFormat,
+                        model=model,
+                        voice=voice,
+                        payload=payload,
+                        enable_ssml=enable_ssml,
+                        output_path=target,
+                        speech_rate=speech_rate,
+                        pcm=pcm,
+                    )
+                    result = (None, request_id, sink, target)
+                else:
+                    audio, request_id = _call_tts_v2_once(
+                        SpeechSynthesizerV2=SpeechSynthesizerV2,
+                        AudioFormat=AudioFormat,
+                        model=model,
+                        voice=voice,
+                        payload=payload,
+                        enable_ssml=enable_ssml,
+                        speech_rate=speech_rate,
+                        pcm=pcm,
+                    )
+                    result = (audio, request_id, None, None)
+            except Exception as e:
+                metrics.TTS_REQUEST_DURATION.observe(time.monotonic() - started, model=model, outcome="error")
+                # A parameter rejection means the service answered; only outages count.
+                if _is_invalid_parameter_error(e):
+                    tts_breaker.record_success()
+                else:
+                    tts_breaker.record_failure()
+                raise
+            tts_latency.observe(key, time.monotonic() - started)
+            metrics.TTS_REQUEST_DURATION.observe(time.monotonic() - started, model=model, outcome="ok")
+            tts_breaker.record_success()
+            if settled.is_set() and target and target != output_path and os.path.exists(target):
+                os.remove(target)
+            return result
+
+        (audio, request_id, sink, target), winner = hedged_call(attempt, hedge_after)
+        settled.set()
+        if target and target != output_path:
+            os.replace(target, output_path)
+            for idx in (0, 1):
+                loser = f"{output_path}.h{idx}.part"
+                if idx != winner and os.path.exists(loser):
+                    try:
+                        os.remove(loser)
+                    except Exception:
+                        pass
+        if winner:
+            logger.info(
+                "tts.hedge.win",
+                extra={"event": "tts.hedge.win", "tts_model": model, "voice": voice, "hedge_delay_sec": round(hedge_after, 3)},
+            )
+        return audio, request_id, sink
+
+    def _run_fallback_tts(self, payload: str, output_path: str, *, enable_ssml: bool, speech_rate: float, asset_id: str | None):
+        """Synthesize with the fallback engine (sambert v1) while the primary circuit is open."""
+        text = _ssml_to_plain_text(payload) if enable_ssml else (payload or "")
+        pcm = pcm_audio.is_wav(output_path)
+        _tts_rate_limiter.acquire()
+        with metrics.TTS_REQUEST_DURATION.time(model=Config.TTS_FALLBACK_MODEL) as timer:
+            result = SpeechSynthesizer.call(
+                model=Config.TTS_FALLBACK_MODEL,
+                text=text,
+                sample_rate=pcm_audio.SAMPLE_RATE,
+                format="pcm" if pcm else "mp3",
+                rate=speech_rate,
+            )
+            data = result.get_audio_data()
+            timer.labels["outcome"] = "ok" if data is not None else "error"
+        if data is None:
+            raise Exception(f"Fallback TTS failed: {_format_tts_error(result)}")
+        if pcm:
+            pcm_audio.write_pcm_bytes_as_wav(output_path, data)
+        else:
+            with open(output_path, "wb") as f:
+                f.write(data)
+        if not _is_valid_audio_file(output_path):
+            raise Exception(f"Fallback TTS returned invalid audio: model={Config.TTS_FALLBACK_MODEL}; asset_id={asset_id}")
+        _mark_fallback_used()
+        logger.warning(
+            "tts.fallback",
+            extra={
+                "event": "tts.fallback",
+                "asset_id": asset_id,
+                "tts_model": Config.TTS_FALLBACK_MODEL,
+                "breaker": tts_breaker.name,
+                "breaker_state": tts_breaker.state,
+            },
+        )
+
     def _run_tts_v2(self, SpeechSynthesizerV2, AudioFormat, model, voice, payload, output_path, enable_ssml=False, speech_rate=1.0, asset_id: str | None = None):
+        pcm = pcm_audio.is_wav(output_path)
+        cache_key = tts_cache_key(
+            kind="tts_v2",
+            model=model,
+            voice=voice,
+            payload=payload,
+            ssml=bool(enable_ssml),
+            speech_rate=float(speech_rate),
+            volume=Config.TTS_VOLUME,
+            pitch=float(Config.TTS_PITCH_RATE),
+            format="pcm_48000_mono_s16" if pcm else "mp3_48000_mono_256k",
+        )
+        ext = "wav" if pcm else "mp3"
+        if tts_audio_cache.get(cache_key, output_path, ext=ext, operation="tts_v2") and _is_valid_audio_file(output_path):
+            return
+        if enable_ssml and isinstance(payload, str) and _cosyvoice_char_len(payload) > 2000:
+            raise Exception("ssml_payload_too_long")
         last_audio = None
         last_request_id = None
         for attempt in range(1, 4):
+            if Config.TTS_FALLBACK_MODEL and not tts_breaker.allow():
+                self._run_fallback_tts(payload, output_path, enable_ssml=enable_ssml, speech_rate=speech_rate, asset_id=asset_id)
+                return
             try:
-                if enable_ssml and isinstance(payload, str) and _cosyvoice_char_len(payload) > 2000:
-                    raise Exception("ssml_payload_too_long")
-                audio, request_id = _call_tts_v2_once(
-                    SpeechSynthesizerV2=SpeechSynthesizerV2,
-                    AudioFormat=AudioFormat,
+                audio, request_id, sink = self._call_tts_v2_resilient(
+                    SpeechSynthesizerV2,
+                    AudioFormat,
                     model=model,
                     voice=voice,
                     payload=payload,
                     enable_ssml=enable_ssml,
+                    output_path=output_path,
                     speech_rate=speech_rate,
+                    pcm=pcm,
                 )
             except Exception as e:
                 if enable_ssml and _is_invalid_parameter_error(e):
                     raise
                 if attempt >= 3:
-                    raise
+                    if Config.TTS_FALLBACK_MODEL and tts_breaker.state != "closed":
+                        self._run_fallback_tts(payload, output_path, enable_ssml=enable_ssml, speech_rate=speech_rate, asset_id=asset_id)
+                        return
+                    raise _mark_tts_retried(e)
                 time.sleep(0.4 * attempt)
                 continue
+
+            if Config.TTS_STREAMING_ENABLED:
+                last_request_id = request_id
+                if _is_valid_audio_file(output_path):
+                    logger.info(
+                        "tts.stream.finish",
+                        extra={
+                            "event": "tts.stream.finish",
+                            "attempt": int(attempt),
+                            "request_id": request_id,
+                            "asset_id": asset_id,
+                            "tts_model": model,
+                            "voice": voice,
+                            "ttfa_ms": sink.first_audio_ms,
+                            "bytes": sink.bytes,
+                            "duration_ms": int((time.monotonic() - sink.started) * 1000),
+                        },
+                    )
+                    tts_audio_cache.put(cache_key, output_path, ext=ext, operation="tts_v2")
+                    return
+                try:
+                    os.remove(output_path)
+                except Exception:
+                    pass
+                logger.warning(
+                    "tts.empty_audio",
+                    extra={
+                        "event": "tts.empty_audio",
+                        "attempt": int(attempt),
+                        "request_id": request_id,
+                        "asset_id": asset_id,
+                        "output_path": output_path,
+                        "bytes": sink.bytes,
+                        "tts_engine": Config.TTS_ENGINE,
+                        "tts_model": model,
+                        "voice": voice,
+                        "tts_enable_ssml": bool(enable_ssml),
+                    },
+                )
+                continue
+
             last_audio = audio
             last_request_id = request_id
 
@@ -1162,9 +1774,13 @@ class AudioGenerator:
                 audio_bytes = _maybe_decode_base64(audio)
 
             if audio_bytes:
-                with open(output_path, "wb") as f:
-                    f.write(audio_bytes)
-                if _is_valid_mp3_file(output_path):
+                if pcm:
+                    pcm_audio.write_pcm_bytes_as_wav(output_path, audio_bytes)
+                else:
+                    with open(output_path, "wb") as f:
+                        f.write(audio_bytes)
+                if _is_valid_audio_file(output_path):
+                    tts_audio_cache.put(cache_key, output_path, ext=ext, operation="tts_v2")
                     return
                 try:
                     os.remove(output_path)
@@ -1202,13 +1818,13 @@ class AudioGenerator:
                     "tts_enable_ssml": bool(enable_ssml),
                 },
             )
-        raise Exception(
+        raise _mark_tts_retried(Exception(
             "TTS returned empty audio: "
             f"asset_id={asset_id}; "
             f"output_path={output_path}; "
             f"request_id={last_request_id}; "
             f"result={json.dumps(_as_jsonable(last_audio), ensure_ascii=False)}"
-        )
+        ))
 
     def _generate_internal(self, text, output_path):
         # Legacy support logic...
@@ -1218,17 +1834,18 @@ class AudioGenerator:
             model, voice = _normalize_tts_model_and_voice(model=Config.TTS_MODEL, voice=Config.TTS_VOICE)
             
             chunks = _split_text_by_limit(text or "", 2000)
-            part_files = []
+            part_files = [f"{output_path}.part{idx}.mp3" for idx in range(len(chunks))]
             try:
-                for idx, chunk in enumerate(chunks):
-                    p_path = f"{output_path}.part{idx}.mp3"
-                    ssml = _text_to_emotional_ssml(chunk) if Config.TTS_ENABLE_SSML else chunk
-                    self._run_tts_v2(
-                        SpeechSynthesizerV2, AudioFormat, model, voice, 
-                        ssml, p_path, enable_ssml=Config.TTS_ENABLE_SSML
-                    )
-                    part_files.append(p_path)
-                
+                self._synthesize_chunks(
+                    SpeechSynthesizerV2,
+                    AudioFormat,
+                    model=model,
+                    voice=voice,
+                    payloads=[_text_to_emotional_ssml(chunk) if Config.TTS_ENABLE_SSML else chunk for chunk in chunks],
+                    part_paths=part_files,
+                    enable_ssml=Config.TTS_ENABLE_SSML,
+                )
+
                 if len(part_files) == 1:
                     os.rename(part_files[0], output_path)
                 else:
@@ -1239,15 +1856,22 @@ class AudioGenerator:
                     if os.path.exists(p): os.remove(p)
                         
         # Fallback to V1
-        result = SpeechSynthesizer.call(
-            model="sambert-zh-CN-v1",
-            text=(text or ""),
-            sample_rate=48000,
-            format="mp3",
-        )
+        cache_key = tts_cache_key(kind="sambert", model="sambert-zh-CN-v1", text=(text or ""), format="mp3_48000")
+        if tts_audio_cache.get(cache_key, output_path, operation="sambert"):
+            return output_path
+        _tts_rate_limiter.acquire()
+        with metrics.TTS_REQUEST_DURATION.time(model="sambert-zh-CN-v1") as timer:
+            result = SpeechSynthesizer.call(
+                model="sambert-zh-CN-v1",
+                text=(text or ""),
+                sample_rate=48000,
+                format="mp3",
+            )
+            timer.labels["outcome"] = "ok" if result.get_audio_data() is not None else "error"
         if result.get_audio_data() is not None:
             with open(output_path, 'wb') as f:
                 f.write(result.get_audio_data())
+            tts_audio_cache.put(cache_key, output_path, operation="sambert")
             return output_path
         else:
             raise Exception(f"TTS failed: {_format_tts_error(result)}")
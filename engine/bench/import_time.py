@@ -0,0 +1,94 @@
+"""
+Import-time check for the worker entry modules.
+
+Usage (from the engine directory):
+    python bench/import_time.py                       # report only
+    python bench/import_time.py --budget-ms 1500      # fail above the budget (CI)
+
+Imports each module in a fresh interpreter with ``python -X importtime`` (best of
+``--runs``) and prints one JSON report: total import time per module, the slowest
+imported packages, and any heavy library that got imported eagerly. Heavy
+libraries (moviepy, cv2, scenedetect, dashscope, litellm, boto3) must load on
+first use (resources.py, s3_client.py), so their presence fails the check.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ("moviepy", "cv2", "scenedetect", "dashscope", "litellm", "boto3", "botocore")
+
+
+def _measure(module: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=ENGINE_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=ENGINE_DIR,
+        env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {proc.stderr.strip()[-500:]}")
+
+    # Lines look like: "import time:   self [us] |  cumulative | imported package"
+    cumulative, total_us = {}, 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        cum = int(parts[1])
+        if depth == 0 and name == module:
+            total_us = cum  # interpreter startup (site, .pth files) is not counted
+        top = name.split(".")[0]
+        cumulative[top] = max(cumulative.get(top, 0), cum)
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "top_level": cumulative,
+        "heavy": sorted(m for m in cumulative if m in HEAVY),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=["tasks"], help="Modules to import (default: tasks)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per module; the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="Slowest packages to list")
+    parser.add_argument("--budget-ms", type=float, default=0.0, help="Fail when an import takes longer; 0 = no budget")
+    parser.add_argument("--allow-heavy", action="store_true", help="Report eagerly imported heavy libraries without failing")
+    args = parser.parse_args()
+
+    report, failed = {"python": sys.version.split()[0], "modules": {}}, False
+    for module in args.modules:
+        runs = [_measure(module) for _ in range(max(1, args.runs))]
+        best = min(runs, key=lambda r: r["total_ms"])
+        slowest = sorted(best["top_level"].items(), key=lambda kv: kv[1], reverse=True)[: args.top]
+        entry = {
+            "total_ms": best["total_ms"],
+            "runs_ms": [r["total_ms"] for r in runs],
+            "slowest": [{"package": name, "ms": round(us / 1000, 1)} for name, us in slowest],
+            "heavy_imported": best["heavy"],
+            "errors": [],
+        }
+        if best["heavy"] and not args.allow_heavy:
+            entry["errors"].append(f"heavy libraries imported eagerly: {', '.join(best['heavy'])}")
+        if args.budget_ms > 0 and best["total_ms"] > args.budget_ms:
+            entry["errors"].append(f"import took {best['total_ms']} ms (budget {args.budget_ms} ms)")
+        failed = failed or bool(entry["errors"])
+        report["modules"][module] = entry
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
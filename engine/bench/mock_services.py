@@ -0,0 +1,861 @@
+"""
+Offline stand-in for the DashScope / OpenAI-compatible APIs the engine calls.
+
+Usage (from the engine directory):
+    python bench/mock_services.py --port 8765
+    python bench/mock_services.py --latency tts=600,vl=1500,llm=800 --error-rate tts=0.05 --max-concurrency tts=3
+
+Then point the engine at it:
+    export DASHSCOPE_HTTP_BASE_URL=http://127.0.0.1:8765/api/v1
+    export DASHSCOPE_WEBSOCKET_BASE_URL=ws://127.0.0.1:8765/api-ws/v1/inference
+    export LLM_API_BASE=http://127.0.0.1:8765/v1
+    export DASHSCOPE_API_KEY=mock GROK_API_KEY=mock VOLCENGINE_API_KEY=mock
+    export S3_STORAGE_ENDPOINT=http://127.0.0.1:8765 S3_STORAGE_ACCESS_KEY=mock S3_STORAGE_SECRET_KEY=mock
+    export S3_STORAGE_PUBLIC_URL=http://127.0.0.1:8765/ai-scene-assets
+
+Served (path prefixes are ignored, only the suffix is matched):
+    POST */services/aigc/multimodal-generation/generation   MultiModalConversation (Qwen-VL)          [vl]
+    POST */services/aigc/text-generation/generation         Generation (qwen-plus)                     [llm]
+    POST */chat/completions                                  LiteLLM via api_base (dashscope/volcengine/xai) [llm]
+    POST */services/aigc/video-generation/video-synthesis   AliyunClient.submit_task                   [task]
+    GET  */tasks/{task_id}                                   task status, SUCCEEDED after --task-sec    [task]
+    WS   any path                                            tts_v2 SpeechSynthesizer and sambert v1    [tts]
+    PUT/GET/HEAD /{bucket}/{key}, multipart upload           S3 (path-style; use an IP endpoint) [s3]
+    GET  /mock/stats                                         request / error / throttle counters
+
+Replies are deterministic for a given request: vision prompts get JSON built from
+the shot labels, script prompts get one segment per asset sized to its duration
+budget, and TTS returns a tone whose length follows the text (speech rate and SSML
+<break> tags honoured, plus a small per-text deviation so rate correction is
+exercised). Latency, jitter, failures and a per-service concurrency quota (429 /
+Throttling) are configurable per service; ``--fail-models`` makes every TTS request
+of the given models fail (e.g. the primary CosyVoice model, to exercise the
+circuit breaker and the sambert failover).
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import re
+import struct
+import subprocess
+import sys
+import threading
+import time
+import tempfile
+import uuid
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from tts_duration import pause_seconds  # noqa: E402
+
+SERVICES = ("tts", "vl", "llm", "task", "s3")
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_SCENES = ["小区门头", "小区环境", "客厅", "餐厅", "厨房", "卧室", "卫生间", "阳台", "走廊"]
+_FEATURES = [
+    "南向采光充足，浅色木地板，空间开阔",
+    "现代简约装修，整体整洁，收纳充足",
+    "落地窗视野通透，阳光洒满室内",
+    "动线合理，墙面干净，细节做工扎实",
+]
+_PHRASES = [
+    "走进来第一眼就被这份通透感打动了，",
+    "阳光洒满整个空间，治愈感拉满，",
+    "细节做得很用心，住进来就是舒服，",
+    "这个尺度在同价位里真的少见，",
+    "收纳和动线都替你想好了，",
+]
+_SHOT_LABEL_RE = re.compile(r"镜头时间[:：]\s*([\d.]+)s\s*-\s*([\d.]+)s")
+_SCRIPT_ID_RE = re.compile(r"\[ID:\s*([^\]]+)\][^\n]*?时长:\s*([\d.]+)秒")
+_JSON_ASSET_RE = re.compile(r'"asset_id":\s*"([^"]+)"(?:(?!"asset_id").)*?"duration":\s*([\d.]+)', re.S)
+_TAG_RE = re.compile(r"<[^>]+>")
+_S3_NS = "http://s3.amazonaws.com/doc/2006-03-01/"
+
+
+def _parse_service_map(value: str, default: float) -> dict:
+    """``"300"`` sets every service, ``"tts=600,vl=1500"`` sets some (rest keep ``default``)."""
+    out = {name: float(default) for name in SERVICES}
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "=" in part:
+            name, v = part.split("=", 1)
+            if name.strip() not in out:
+                raise ValueError(f"unknown service '{name}' (expected one of {', '.join(SERVICES)})")
+            out[name.strip()] = float(v)
+        else:
+            out = {name: float(part) for name in SERVICES}
+    return out
+
+
+def _digest(*parts) -> int:
+    h = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).digest()
+    return int.from_bytes(h[:8], "big")
+
+
+class MockState:
+    def __init__(self, args):
+        self.latency_ms = _parse_service_map(args.latency, 0)
+        self.error_rate = _parse_service_map(args.error_rate, 0)
+        self.max_concurrency = _parse_service_map(args.max_concurrency, 0)
+        self.jitter = max(0.0, float(args.jitter))
+        self.error_status = int(args.error_status)
+        self.fail_models = {m.strip() for m in (args.fail_models or "").split(",") if m.strip()}
+        self.task_sec = float(args.task_sec)
+        self.video_sec = float(args.video_sec)
+        self.units_per_sec = float(args.tts_units_per_sec)
+        self.tts_deviation = max(0.0, float(args.tts_deviation))
+        self.tts_rtf = max(0.0, float(args.tts_rtf))
+        self.s3_dir = args.s3_dir or tempfile.mkdtemp(prefix="mock_s3_")
+        self._rng = random.Random(args.seed)
+        self._lock = threading.Lock()
+        self._in_flight = {name: 0 for name in SERVICES}
+        self._tasks: dict[str, dict] = {}
+        self.stats = {name: {"requests": 0, "errors": 0, "throttled": 0, "max_in_flight": 0} for name in SERVICES}
+
+    def sleep_latency(self, service: str, scale: float = 1.0) -> None:
+        base = self.latency_ms[service] / 1000.0 * scale
+        if base <= 0:
+            return
+        with self._lock:
+            factor = 1.0 + self._rng.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, base * factor))
+
+    def begin(self, service: str, fail: bool = False) -> str | None:
+        """Count a request; returns None to serve it, "throttled" or "error" to fail it."""
+        with self._lock:
+            stats = self.stats[service]
+            stats["requests"] += 1
+            if fail:
+                stats["errors"] += 1
+                return "error"
+            limit = int(self.max_concurrency[service])
+            if limit > 0 and self._in_flight[service] >= limit:
+                stats["throttled"] += 1
+                return "throttled"
+            if self.error_rate[service] > 0 and self._rng.random() < self.error_rate[service]:
+                stats["errors"] += 1
+                return "error"
+            self._in_flight[service] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], self._in_flight[service])
+            return None
+
+    def end(self, service: str) -> None:
+        with self._lock:
+            self._in_flight[service] = max(0, self._in_flight[service] - 1)
+
+    def add_task(self, task_id: str, payload: dict) -> None:
+        with self._lock:
+            self._tasks[task_id] = {"created": time.monotonic(), "payload": payload}
+
+    def get_task(self, task_id: str) -> dict | None:
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def speech_seconds(self, text: str, rate: float) -> float:
+        """Same model as the engine's duration predictor, with a stable per-text deviation."""
+        ssml = text.lstrip().startswith("<speak")
+        plain = _TAG_RE.sub("", text) if ssml else text
+        units = sum(2 if "\u4e00" <= ch <= "\u9fff" else 1 for ch in plain if not ch.isspace())
+        seconds = units / max(0.5, self.units_per_sec) + pause_seconds(text, ssml=ssml)
+        if self.tts_deviation > 0:
+            unit = (_digest("tts", text) % 20001) / 10000.0 - 1.0
+            seconds *= 1.0 + self.tts_deviation * unit
+        return max(0.3, seconds) / max(0.1, float(rate or 1.0))
+
+
+# ---------------------------------------------------------------------------
+# Canned model replies
+# ---------------------------------------------------------------------------
+
+
+def _vision_reply(state: MockState, texts: list[str], seed_material: str) -> str:
+    joined = "\n".join(texts)
+    labels = [(float(a), float(b)) for a, b in _SHOT_LABEL_RE.findall(joined)]
+    if labels or ('"segments"' in joined and "start_sec" in joined):
+        if not labels:
+            # Whole-video analysis (video URL input): fixed-length segments over --video-sec.
+            step = 5.0
+            n = max(1, int(math.ceil(state.video_sec / step)))
+            labels = [(i * step, min(state.video_sec, (i + 1) * step)) for i in range(n)]
+        segments = []
+        for i, (start, end) in enumerate(labels):
+            h = _digest(seed_material, i)
+            segments.append({
+                "start_sec": round(start, 2),
+                "end_sec": round(end, 2),
+                "scene": _SCENES[(i + h) % len(_SCENES)],
+                "features": _FEATURES[h % len(_FEATURES)],
+                "shock_score": 5 + h % 5,
+                "emotion": "惊艳" if h % 3 == 0 else "温馨",
+                "highlight_tags": ["采光"] if h % 2 else [],
+                "suggested_pace": "慢镜" if h % 3 == 0 else "快切",
+                "potential_hook": h % 4 == 0,
+                "score": 0.9,
+                "annotations": [],
+            })
+        return json.dumps({
+            "segments": segments,
+            "overall_quality": 8.0,
+            "top_3_highlights": ["南向采光", "开阔客厅", "整洁厨房"],
+        }, ensure_ascii=False)
+    h = _digest(seed_material)
+    return json.dumps({
+        "scene": _SCENES[h % len(_SCENES)],
+        "features": _FEATURES[h % len(_FEATURES)],
+        "score": 0.9,
+    }, ensure_ascii=False)
+
+
+def _segment_text(asset_id: str, duration: float) -> str:
+    budget = max(6, int(math.floor(float(duration) * 3.5)))
+    h = _digest(asset_id)
+    text = ""
+    i = 0
+    while len(text) < budget:
+        text += _PHRASES[(h + i) % len(_PHRASES)]
+        i += 1
+    return text[: budget - 1].rstrip("，") + "。"
+
+
+def _chat_reply(messages: list) -> str:
+    system = ""
+    user_parts = []
+    for m in messages or []:
+        content = m.get("content")
+        if isinstance(content, list):
+            content = "\n".join(str(c.get("text", "")) if isinstance(c, dict) else str(c) for c in content)
+        if m.get("role") == "system":
+            system += str(content or "")
+        else:
+            user_parts.append(str(content or ""))
+    prompt = "\n".join(user_parts)
+
+    if "开场白" in system and "segments" not in prompt:
+        return "大家好，今天带大家看一套采光特别好的三居室，空间开阔，一起进去感受一下！"
+    if "导演" in system:
+        return "1. 开场钩子再具体一些，用价格或面积开头；2. 每段解说词控制在时长预算内；3. 多用生活化表达。"
+
+    assets = [(a.strip(), float(d)) for a, d in _SCRIPT_ID_RE.findall(prompt)]
+    if not assets:
+        seen = set()
+        for a, d in _JSON_ASSET_RE.findall(prompt):
+            if a not in seen:
+                seen.add(a)
+                assets.append((a, float(d)))
+    if assets or "segments" in prompt:
+        return json.dumps({
+            "intro_text": "大家好，今天带大家看一套采光特别好的三居室，一起进去看看！",
+            "intro_card": {"headline": "滨江·精选小区", "specs": "89㎡ | 三室两厅", "highlights": ["南向采光", "开阔客厅", "精装修"]},
+            "segments": [
+                {
+                    "asset_id": a,
+                    "text": _segment_text(a, d),
+                    "emotion": "温馨",
+                    "duration": d,
+                    "visual_prompt": "bright warm interior",
+                    "audio_cue": "",
+                }
+                for a, d in assets
+            ],
+        }, ensure_ascii=False)
+    return "好的。"
+
+
+def _usage(prompt_chars: int, output: str) -> dict:
+    return {"input_tokens": max(1, prompt_chars // 2), "output_tokens": max(1, len(output) // 2)}
+
+
+# ---------------------------------------------------------------------------
+# Synthetic audio
+# ---------------------------------------------------------------------------
+
+
+def _tone(text: str, seconds: float, sample_rate: int) -> np.ndarray:
+    n = int(round(seconds * sample_rate))
+    t = np.arange(n, dtype=np.float32) / float(sample_rate)
+    freq = 160.0 + _digest("pitch", text) % 120
+    envelope = 0.55 + 0.45 * np.sin(2 * np.pi * 4.0 * t)
+    return (np.sin(2 * np.pi * freq * t) * envelope * 6000.0).astype("<i2")
+
+
+def _encode_audio(samples: np.ndarray, fmt: str, sample_rate: int) -> bytes:
+    pcm = samples.tobytes()
+    if fmt == "pcm":
+        return pcm
+    if fmt == "wav":
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(sample_rate)
+            wf.writeframes(pcm)
+        return buf.getvalue()
+    cmd = [
+        "ffmpeg", "-v", "error", "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-i", "pipe:0",
+        "-c:a", "libmp3lame", "-b:a", "128k", "-f", "mp3", "pipe:1",
+    ]
+    proc = subprocess.run(cmd, input=pcm, capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError((proc.stderr or b"").decode("utf-8", "replace")[-400:] or "ffmpeg mp3 encode failed")
+    return proc.stdout
+
+
+# ---------------------------------------------------------------------------
+# WebSocket framing (RFC 6455, server side)
+# ---------------------------------------------------------------------------
+
+
+def _ws_read_frame(rfile):
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None
+    b1, b2 = head
+    fin, opcode = bool(b1 & 0x80), b1 & 0x0F
+    length = b2 & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", rfile.read(8))[0]
+    mask = rfile.read(4) if b2 & 0x80 else None
+    data = rfile.read(length)
+    if mask:
+        arr = np.frombuffer(data, dtype=np.uint8)
+        key = np.resize(np.frombuffer(mask, dtype=np.uint8), len(arr))
+        data = (arr ^ key).tobytes()
+    return fin, opcode, data
+
+
+def _ws_read_message(rfile):
+    """Reassemble fragmented messages; returns (opcode, data) or None at EOF."""
+    first = _ws_read_frame(rfile)
+    if first is None:
+        return None
+    fin, opcode, data = first
+    chunks = [data]
+    while not fin:
+        nxt = _ws_read_frame(rfile)
+        if nxt is None:
+            return None
+        fin, _, more = nxt
+        chunks.append(more)
+    return opcode, b"".join(chunks)
+
+
+def _ws_frame(opcode: int, data: bytes) -> bytes:
+    n = len(data)
+    if n < 126:
+        head = struct.pack(">BB", 0x80 | opcode, n)
+    elif n < 65536:
+        head = struct.pack(">BBH", 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack(">BBQ", 0x80 | opcode, 127, n)
+    return head + data
+
+
+# ---------------------------------------------------------------------------
+# HTTP / WebSocket handler
+# ---------------------------------------------------------------------------
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ai-video-mock/1.0"
+    state: MockState = None
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            sys.stderr.write("%s - %s\n" % (self.address_string(), fmt % args))
+
+    # -- plumbing -----------------------------------------------------------
+
+    def _send_json(self, status: int, body: dict) -> None:
+        raw = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length > 0 else b""
+        try:
+            return json.loads(raw.decode("utf-8")) if raw else {}
+        except Exception:
+            return {}
+
+    def _send_failure(self, outcome: str, openai_style: bool = False) -> None:
+        if outcome == "throttled":
+            status, code, message = 429, "Throttling.RateQuota", "Requests rate limit exceeded (mock quota)"
+        else:
+            status, code, message = self.state.error_status, "InternalError", "Mock injected failure"
+        if openai_style:
+            self._send_json(status, {"error": {"message": message, "type": code, "code": code}})
+        else:
+            self._send_json(status, {"code": code, "message": message, "request_id": uuid.uuid4().hex})
+
+    # -- routing ------------------------------------------------------------
+
+    def do_GET(self):
+        if (self.headers.get("Upgrade") or "").lower() == "websocket":
+            self._serve_websocket()
+            return
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/mock/stats":
+            self._send_json(200, self.state.stats)
+            return
+        match = re.search(r"/tasks/([^/]+)$", path)
+        if match:
+            self._serve_task_status(match.group(1))
+            return
+        self._serve_s3_object(head=False)
+
+    def do_HEAD(self):
+        self._serve_s3_object(head=True)
+
+    def do_PUT(self):
+        self._serve_s3_put()
+
+    def do_POST(self):
+        path, _, query = self.path.partition("?")
+        path = path.rstrip("/")
+        if "uploads" in parse_qs(query, keep_blank_values=True) or "uploadId" in parse_qs(query):
+            self._serve_s3_multipart(query)
+            return
+        body = self._read_json()
+        if path.endswith("/services/aigc/multimodal-generation/generation"):
+            self._serve_dashscope_generation("vl", body)
+        elif path.endswith("/services/aigc/text-generation/generation"):
+            self._serve_dashscope_generation("llm", body)
+        elif path.endswith("/chat/completions"):
+            self._serve_chat_completions(body)
+        elif path.endswith("/services/aigc/video-generation/video-synthesis"):
+            self._serve_task_submit(body)
+        else:
+            self._send_json(404, {"code": "NotFound", "message": f"mock has no route for POST {path}"})
+
+    # -- DashScope HTTP -----------------------------------------------------
+
+    def _serve_dashscope_generation(self, service: str, body: dict) -> None:
+        outcome = self.state.begin(service)
+        if outcome:
+            self.state.sleep_latency(service, 0.2)
+            self._send_failure(outcome)
+            return
+        try:
+            self.state.sleep_latency(service)
+            messages = ((body.get("input") or {}).get("messages")) or []
+            params = body.get("parameters") or {}
+            if service == "vl":
+                texts, material = [], []
+                for m in messages:
+                    content = m.get("content")
+                    for item in content if isinstance(content, list) else [{"text": content}]:
+                        if isinstance(item, dict):
+                            if "text" in item:
+                                texts.append(str(item["text"]))
+                            material.append(json.dumps(item, sort_keys=True)[:4096])
+                text = _vision_reply(self.state, texts, "".join(material))
+                message = {"role": "assistant", "content": [{"text": text}]}
+            else:
+                text = _chat_reply(messages)
+                message = {"role": "assistant", "content": text}
+            prompt_chars = len(json.dumps(messages, ensure_ascii=False))
+            if service == "llm" and params.get("result_format") != "message":
+                output = {"text": text, "finish_reason": "stop"}
+            else:
+                output = {"choices": [{"finish_reason": "stop", "message": message}]}
+            self._send_json(200, {"output": output, "usage": _usage(prompt_chars, text), "request_id": uuid.uuid4().hex})
+        finally:
+            self.state.end(service)
+
+    def _serve_chat_completions(self, body: dict) -> None:
+        outcome = self.state.begin("llm")
+        if outcome:
+            self.state.sleep_latency("llm", 0.2)
+            self._send_failure(outcome, openai_style=True)
+            return
+        try:
+            self.state.sleep_latency("llm")
+            messages = body.get("messages") or []
+            text = _chat_reply(messages)
+            usage = _usage(len(json.dumps(messages, ensure_ascii=False)), text)
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model") or "mock",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+                "usage": {
+                    "prompt_tokens": usage["input_tokens"],
+                    "completion_tokens": usage["output_tokens"],
+                    "total_tokens": usage["input_tokens"] + usage["output_tokens"],
+                },
+            })
+        finally:
+            self.state.end("llm")
+
+    # -- Aliyun async tasks -------------------------------------------------
+
+    def _serve_task_submit(self, body: dict) -> None:
+        outcome = self.state.begin("task")
+        if outcome:
+            self._send_failure(outcome)
+            return
+        try:
+            self.state.sleep_latency("task")
+            task_id = uuid.uuid4().hex
+            self.state.add_task(task_id, body)
+            self._send_json(200, {"output": {"task_id": task_id, "task_status": "PENDING"}, "request_id": uuid.uuid4().hex})
+        finally:
+            self.state.end("task")
+
+    def _serve_task_status(self, task_id: str) -> None:
+        task = self.state.get_task(task_id)
+        if task is None:
+            self._send_json(404, {"code": "InvalidParameter", "message": f"task {task_id} not found"})
+            return
+        elapsed = time.monotonic() - task["created"]
+        output = {"task_id": task_id, "task_status": "RUNNING"}
+        if elapsed >= self.state.task_sec:
+            # Repainting is an identity transform here: hand back the input video.
+            source = ((task["payload"].get("input") or {}).get("video_url")) or ""
+            output = {"task_id": task_id, "task_status": "SUCCEEDED", "video_url": source}
+        self._send_json(200, {"output": output, "request_id": uuid.uuid4().hex})
+
+    # -- S3 (path-style) ----------------------------------------------------
+
+    def _s3_target(self) -> tuple[str, str, str] | None:
+        """(bucket, key, local path) for ``/{bucket}/{key}``; None when the path does not name an object."""
+        path = unquote(self.path.split("?", 1)[0]).lstrip("/")
+        bucket, _, key = path.partition("/")
+        if not bucket or not key:
+            return None
+        root = os.path.realpath(os.path.join(self.state.s3_dir, bucket))
+        local = os.path.realpath(os.path.join(root, key))
+        if not local.startswith(root + os.sep):
+            return None
+        return bucket, key, local
+
+    def _send_s3_error(self, status: int, code: str, message: str) -> None:
+        raw = (
+            f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code>'
+            f"<Message>{escape(message)}</Message><RequestId>{uuid.uuid4().hex}</RequestId></Error>"
+        ).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(raw)
+
+    def _send_s3_xml(self, body: str) -> None:
+        raw = f'<?xml version="1.0" encoding="UTF-8"?>{body}'.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _read_body_to(self, dest: str) -> str:
+        """Stream the request body into ``dest``; returns its MD5 hex digest (the S3 ETag)."""
+        remaining = int(self.headers.get("Content-Length") or 0)
+        md5 = hashlib.md5()
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            while remaining > 0:
+                block = self.rfile.read(min(remaining, 1 << 20))
+                if not block:
+                    break
+                f.write(block)
+                md5.update(block)
+                remaining -= len(block)
+        os.replace(tmp, dest)
+        return md5.hexdigest()
+
+    def _s3_begin(self) -> bool:
+        outcome = self.state.begin("s3")
+        if outcome:
+            # Drain the body so the connection stays usable for the client's retry.
+            remaining = int(self.headers.get("Content-Length") or 0)
+            while remaining > 0:
+                block = self.rfile.read(min(remaining, 1 << 20))
+                if not block:
+                    break
+                remaining -= len(block)
+            if outcome == "throttled":
+                self._send_s3_error(503, "SlowDown", "Please reduce your request rate (mock quota)")
+            else:
+                self._send_s3_error(self.state.error_status, "InternalError", "Mock injected failure")
+            return False
+        self.state.sleep_latency("s3")
+        return True
+
+    def _serve_s3_put(self) -> None:
+        target = self._s3_target()
+        if target is None:
+            self._send_s3_error(400, "InvalidRequest", "expected /{bucket}/{key}")
+            return
+        _, _, local = target
+        if not self._s3_begin():
+            return
+        try:
+            query = parse_qs(self.path.partition("?")[2])
+            if "uploadId" in query and "partNumber" in query:
+                part = int(query["partNumber"][0])
+                local = os.path.join(self.state.s3_dir, ".multipart", query["uploadId"][0], f"{part:05d}")
+            etag = self._read_body_to(local)
+            self.send_response(200)
+            self.send_header("ETag", f'"{etag}"')
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        finally:
+            self.state.end("s3")
+
+    def _serve_s3_multipart(self, query: str) -> None:
+        target = self._s3_target()
+        if target is None:
+            self._send_s3_error(400, "InvalidRequest", "expected /{bucket}/{key}")
+            return
+        bucket, key, local = target
+        params = parse_qs(query, keep_blank_values=True)
+        if not self._s3_begin():
+            return
+        try:
+            if "uploads" in params:
+                upload_id = uuid.uuid4().hex
+                os.makedirs(os.path.join(self.state.s3_dir, ".multipart", upload_id), exist_ok=True)
+                self._send_s3_xml(
+                    f'<InitiateMultipartUploadResult xmlns="{_S3_NS}"><Bucket>{escape(bucket)}</Bucket>'
+                    f"<Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+                )
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)  # part list; parts are joined in part-number order
+            parts_dir = os.path.join(self.state.s3_dir, ".multipart", os.path.basename(params["uploadId"][0]))
+            if not os.path.isdir(parts_dir):
+                self._send_s3_error(404, "NoSuchUpload", "unknown upload id")
+                return
+            os.makedirs(os.path.dirname(local), exist_ok=True)
+            md5 = hashlib.md5()
+            tmp = f"{local}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "wb") as out:
+                for name in sorted(os.listdir(parts_dir)):
+                    with open(os.path.join(parts_dir, name), "rb") as part:
+                        while True:
+                            block = part.read(1 << 20)
+                            if not block:
+                                break
+                            out.write(block)
+                            md5.update(block)
+                    os.remove(os.path.join(parts_dir, name))
+            os.replace(tmp, local)
+            os.rmdir(parts_dir)
+            self._send_s3_xml(
+                f'<CompleteMultipartUploadResult xmlns="{_S3_NS}"><Bucket>{escape(bucket)}</Bucket>'
+                f'<Key>{escape(key)}</Key><ETag>"{md5.hexdigest()}-1"</ETag></CompleteMultipartUploadResult>'
+            )
+        finally:
+            self.state.end("s3")
+
+    def _serve_s3_object(self, head: bool) -> None:
+        target = self._s3_target()
+        if target is None or not os.path.isfile(target[2]):
+            self._send_s3_error(404, "NoSuchKey", "The specified key does not exist.")
+            return
+        local = target[2]
+        if not self._s3_begin():
+            return
+        try:
+            size = os.path.getsize(local)
+            start, end = 0, size - 1
+            match = re.match(r"bytes=(\d*)-(\d*)$", self.headers.get("Range") or "")
+            if match and size > 0:
+                if match.group(1):
+                    start = int(match.group(1))
+                    end = min(size - 1, int(match.group(2))) if match.group(2) else size - 1
+                else:
+                    start = max(0, size - int(match.group(2) or 0))
+            self.send_response(206 if match else 200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(max(0, end - start + 1)))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Last-Modified", self.date_time_string(os.path.getmtime(local)))
+            if match:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.end_headers()
+            if head:
+                return
+            with open(local, "rb") as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    block = f.read(min(remaining, 1 << 20))
+                    if not block:
+                        break
+                    self.wfile.write(block)
+                    remaining -= len(block)
+        finally:
+            self.state.end("s3")
+
+    # -- TTS over WebSocket -------------------------------------------------
+
+    def _serve_websocket(self) -> None:
+        key = self.headers.get("Sec-WebSocket-Key") or ""
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode("ascii")).digest()).decode("ascii")
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        tasks: dict[str, dict] = {}
+        while True:
+            msg = _ws_read_message(self.rfile)
+            if msg is None:
+                return
+            opcode, data = msg
+            if opcode == 0x8:
+                self._ws_send(0x8, data[:2])
+                return
+            if opcode == 0x9:
+                self._ws_send(0xA, data)
+                continue
+            if opcode != 0x1:
+                continue
+            try:
+                message = json.loads(data.decode("utf-8"))
+            except Exception:
+                continue
+            header = message.get("header") or {}
+            payload = message.get("payload") or {}
+            task_id = header.get("task_id") or uuid.uuid4().hex
+            action = header.get("action")
+            text = str((payload.get("input") or {}).get("text") or "")
+            if action == "run-task":
+                task = {
+                    "model": payload.get("model"),
+                    "parameters": payload.get("parameters") or {},
+                    "texts": [text] if text else [],
+                }
+                self._ws_event(task_id, "task-started")
+                if header.get("streaming") in ("out", "none"):
+                    # sambert v1: the whole text comes with run-task.
+                    self._synthesize_task(task_id, task)
+                else:
+                    tasks[task_id] = task
+            elif action == "continue-task" and task_id in tasks:
+                if text:
+                    tasks[task_id]["texts"].append(text)
+            elif action == "finish-task" and task_id in tasks:
+                self._synthesize_task(task_id, tasks.pop(task_id))
+
+    def _ws_send(self, opcode: int, data: bytes) -> None:
+        self.wfile.write(_ws_frame(opcode, data))
+        self.wfile.flush()
+
+    def _ws_event(self, task_id: str, event: str, payload: dict | None = None, **extra) -> None:
+        header = {"task_id": task_id, "event": event, "attributes": {}, **extra}
+        self._ws_send(0x1, json.dumps({"header": header, "payload": payload or {}}, ensure_ascii=False).encode("utf-8"))
+
+    def _synthesize_task(self, task_id: str, task: dict) -> None:
+        outcome = self.state.begin("tts", fail=task.get("model") in self.state.fail_models)
+        if outcome:
+            self.state.sleep_latency("tts", 0.2)
+            code = "Throttling.RateQuota" if outcome == "throttled" else "InternalError"
+            self._ws_event(task_id, "task-failed", error_code=code, error_message="Mock injected failure")
+            return
+        try:
+            params = task["parameters"]
+            text = "".join(task["texts"])
+            fmt = str(params.get("format") or "mp3").lower()
+            sample_rate = int(params.get("sample_rate") or 48000)
+            seconds = self.state.speech_seconds(text, float(params.get("rate") or 1.0))
+            audio = _encode_audio(_tone(text, seconds, sample_rate), fmt, sample_rate)
+
+            self.state.sleep_latency("tts")
+            chunk = max(2, int(sample_rate * 2 * 0.1))  # ~100 ms of PCM per frame
+            chunk -= chunk % 2
+            pace = 0.1 * self.state.tts_rtf
+            for offset in range(0, len(audio), chunk):
+                self._ws_send(0x2, audio[offset: offset + chunk])
+                if pace > 0:
+                    time.sleep(pace)
+            self._ws_event(task_id, "task-finished", {"output": None, "usage": {"characters": len(text)}})
+        finally:
+            self.state.end("tts")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("MOCK_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("MOCK_PORT", "8765")))
+    parser.add_argument("--latency", default=os.getenv("MOCK_LATENCY_MS", "tts=400,vl=1200,llm=800,task=50"),
+                        help="ms before the reply (TTS: before first audio); '300' or 'tts=600,vl=1500'")
+    parser.add_argument("--jitter", type=float, default=float(os.getenv("MOCK_JITTER", "0.2")),
+                        help="uniform latency jitter as a fraction of the latency")
+    parser.add_argument("--error-rate", default=os.getenv("MOCK_ERROR_RATE", "0"),
+                        help="probability a request fails; '0.05' or 'tts=0.1'")
+    parser.add_argument("--error-status", type=int, default=int(os.getenv("MOCK_ERROR_STATUS", "500")),
+                        help="HTTP status of injected failures")
+    parser.add_argument("--fail-models", default=os.getenv("MOCK_FAIL_MODELS", ""),
+                        help="comma-separated TTS models whose requests always fail")
+    parser.add_argument("--max-concurrency", default=os.getenv("MOCK_MAX_CONCURRENCY", "0"),
+                        help="in-flight quota per service, excess gets 429 / Throttling (0 = unlimited)")
+    parser.add_argument("--task-sec", type=float, default=float(os.getenv("MOCK_TASK_SEC", "5")),
+                        help="seconds an async video task stays RUNNING")
+    parser.add_argument("--video-sec", type=float, default=float(os.getenv("MOCK_VIDEO_SEC", "30")),
+                        help="assumed clip length for whole-video analysis")
+    parser.add_argument("--tts-units-per-sec", type=float, default=Config.TTS_PREDICTOR_DEFAULT_UNITS_PER_SEC,
+                        help="speaking speed (Han characters count 2 units)")
+    parser.add_argument("--tts-deviation", type=float, default=0.08,
+                        help="max relative deviation of audio length from the model (stable per text)")
+    parser.add_argument("--tts-rtf", type=float, default=0.1,
+                        help="real-time factor of audio streaming after the first frame (0 = send at once)")
+    parser.add_argument("--s3-dir", default=os.getenv("MOCK_S3_DIR", ""),
+                        help="where uploaded objects are kept (default: a new temp dir)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    MockHandler.state = MockState(args)
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    server.daemon_threads = True
+    server.verbose = args.verbose
+    print(json.dumps({
+        "listening": f"http://{args.host}:{args.port}",
+        "DASHSCOPE_HTTP_BASE_URL": f"http://{args.host}:{args.port}/api/v1",
+        "DASHSCOPE_WEBSOCKET_BASE_URL": f"ws://{args.host}:{args.port}/api-ws/v1/inference",
+        "LLM_API_BASE": f"http://{args.host}:{args.port}/v1",
+        "S3_STORAGE_ENDPOINT": f"http://{args.host}:{args.port}",
+        "s3_dir": MockHandler.state.s3_dir,
+    }), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
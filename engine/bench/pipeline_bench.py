@@ -0,0 +1,584 @@
+"""
+End-to-end pipeline benchmark on synthetic listings.
+
+Usage (from the engine directory):
+    python bench/pipeline_bench.py --out bench-results.json
+    python bench/pipeline_bench.py --case 1920x1080:60:12:audio --repeat 3 --stages shots,split,tts
+    python bench/pipeline_bench.py --baseline main.json --out branch.json --fail-on-regression
+
+Each case is ``WIDTHxHEIGHT:DURATION_SEC:SHOTS:audio|silent``. The suite renders a
+synthetic walkthrough with ffmpeg test sources (known cuts, optional room tone),
+a synthetic BGM and a script sized to each shot, then times every stage in
+isolation, each in its own forked process:
+
+    shots   SceneDetector.detect_video_shots
+    split   tasks._split_and_upload (probe, parallel encode, upload)
+    tts     AudioGenerator.generate_aligned_audio_segments
+    render  VideoRenderer.render_video (downloads the split clips)
+    mix     VideoRenderer._mix_audio_tracks + AAC encode of the mixed track
+    upload  tasks.upload_to_s3 of the rendered mp4
+
+Unless ``--no-mock`` is given, bench/mock_services.py is started on a free port
+and DashScope, LLM and S3 endpoints are pointed at it (pass its flags through
+``--mock-args``). Per stage the report holds wall time, CPU time (the process and
+its ffmpeg children), peak RSS (the Python process, and sampled over the whole
+process tree) and output size as JSON; ``--baseline`` adds the ratios against an
+earlier report so regressions can be diffed between commits.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shlex
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import urllib.request
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENGINE_DIR)
+
+from shot_detect_bench import _SOURCES  # noqa: E402
+
+STAGES = ("shots", "split", "tts", "render", "mix", "upload")
+DEFAULT_CASES = ("1280x720:30:6:audio", "1920x1080:60:12:audio", "1080x1920:45:8:silent")
+
+_PHRASES = [
+    "阳光洒满整个客厅，",
+    "这个尺度在同价位里真的少见，",
+    "收纳和动线都替你想好了，",
+    "窗外就是小区中庭的绿化，",
+    "厨房台面够长，做饭很从容，",
+    "主卧带独立卫浴，私密性很好，",
+]
+_SCENES = ["小区门头", "客厅", "餐厅", "厨房", "卧室", "卫生间", "阳台", "走廊"]
+
+
+# ---------------------------------------------------------------------------
+# Synthetic inputs
+# ---------------------------------------------------------------------------
+
+
+def parse_case(spec: str) -> dict:
+    size, duration, shots, audio = spec.split(":")
+    width, height = (int(v) for v in size.lower().split("x"))
+    if audio not in {"audio", "silent"}:
+        raise ValueError(f"case '{spec}': last field must be 'audio' or 'silent'")
+    return {
+        "name": spec.replace(":", "_"),
+        "width": width,
+        "height": height,
+        "duration": float(duration),
+        "shots": max(1, int(shots)),
+        "audio": audio == "audio",
+    }
+
+
+def make_listing_video(path: str, case: dict, seed: int, fps: int = 30) -> list[tuple[float, float]]:
+    """Render ``case`` as back-to-back test-source shots; returns the true shot spans."""
+    rng = random.Random(seed)
+    weights = [rng.uniform(0.6, 1.4) for _ in range(case["shots"])]
+    lengths = [round(case["duration"] * w / sum(weights), 2) for w in weights]
+    size = f"{case['width']}x{case['height']}"
+    inputs: list[str] = []
+    labels = []
+    for i, length in enumerate(lengths):
+        src = _SOURCES[(i + seed) % len(_SOURCES)].format(size=size, fps=fps)
+        inputs += ["-f", "lavfi", "-t", str(length), "-i", src]
+        labels.append(f"[{i}:v]setsar=1,format=yuv420p[v{i}]")
+    concat = "".join(f"[v{i}]" for i in range(len(lengths))) + f"concat=n={len(lengths)}:v=1:a=0[out]"
+    cmd = ["ffmpeg", "-y", "-v", "error", *inputs]
+    maps = ["-map", "[out]"]
+    if case["audio"]:
+        cmd += ["-f", "lavfi", "-t", str(sum(lengths)), "-i", "anoisesrc=color=pink:amplitude=0.02:sample_rate=48000"]
+        maps += ["-map", f"{len(lengths)}:a", "-c:a", "aac"]
+    cmd += ["-filter_complex", ";".join(labels + [concat]), *maps,
+            "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", path]
+    subprocess.run(cmd, check=True)
+    spans, t = [], 0.0
+    for length in lengths:
+        spans.append((round(t, 3), round(t + length, 3)))
+        t += length
+    return spans
+
+
+def make_bgm(path: str, duration: float) -> str:
+    cmd = ["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-t", f"{duration:.2f}",
+           "-i", "sine=frequency=220:sample_rate=44100", "-filter:a", "volume=0.3",
+           "-c:a", "libmp3lame", "-q:a", "4", path]
+    subprocess.run(cmd, check=True)
+    return path
+
+
+def make_script(spans: list[tuple[float, float]], seed: int) -> tuple[dict, list[dict]]:
+    """House info plus one voice-over segment per shot, ~3.5 characters per second."""
+    rng = random.Random(seed)
+    segments = []
+    for i, (start, end) in enumerate(spans):
+        budget = max(6, int((end - start) * 3.5))
+        text = ""
+        while len(text) < budget:
+            text += rng.choice(_PHRASES)
+        segments.append({
+            "asset_id": f"bench-asset-{i}",
+            "text": text[: budget - 1].rstrip("，") + "。",
+            "duration": round(end - start, 3),
+            "emotion": "温馨",
+        })
+    house_info = {"title": "滨江精选三居室", "description": "南北通透，精装修", "layout": "3室2厅", "area": 89}
+    return house_info, segments
+
+
+# ---------------------------------------------------------------------------
+# Stage isolation and measurement
+# ---------------------------------------------------------------------------
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _cpu_sec(usage) -> float:
+    return usage.ru_utime + usage.ru_stime
+
+
+def _tree_rss_mb(root_pid: int) -> float:
+    """Resident memory of ``root_pid`` and all its descendants (the ffmpeg processes)."""
+    parents, rss_pages = {}, {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            parents[int(name)] = int(fields[1])
+            rss_pages[int(name)] = int(fields[21])
+        except (OSError, IndexError, ValueError):
+            continue
+    total, frontier = rss_pages.get(root_pid, 0), [root_pid]
+    while frontier:
+        pid = frontier.pop()
+        for child, parent in parents.items():
+            if parent == pid:
+                total += rss_pages.get(child, 0)
+                frontier.append(child)
+    return total * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class _TreeRssSampler(threading.Thread):
+    """Peak of ``_tree_rss_mb`` sampled every ``interval`` seconds (ru_maxrss of children is
+    inflated by the pre-exec copy of the forking process, so it cannot be used)."""
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        pid = os.getpid()
+        while not self._stop_event.is_set():
+            try:
+                self.peak_mb = max(self.peak_mb, _tree_rss_mb(pid))
+            except OSError:
+                pass
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> float:
+        self._stop_event.set()
+        self.join()
+        return self.peak_mb
+
+
+def _stage_child(conn, fn, args) -> None:
+    try:
+        rss_start = _rss_mb()
+        sampler = _TreeRssSampler()
+        sampler.start()
+        self0 = resource.getrusage(resource.RUSAGE_SELF)
+        children0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+        started = time.perf_counter()
+        try:
+            value, output_bytes, detail = fn(*args)
+        finally:
+            wall = time.perf_counter() - started
+            tree_peak = sampler.stop()
+        self1 = resource.getrusage(resource.RUSAGE_SELF)
+        children1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+        conn.send({
+            "ok": True,
+            "value": value,
+            "metrics": {
+                "wall_sec": round(wall, 3),
+                "cpu_sec": round(_cpu_sec(self1) - _cpu_sec(self0) + _cpu_sec(children1) - _cpu_sec(children0), 3),
+                "rss_start_mb": round(rss_start, 1),
+                # ru_maxrss is in KiB on Linux.
+                "peak_rss_mb": round(self1.ru_maxrss / 1024.0, 1),
+                "peak_tree_rss_mb": round(max(tree_peak, self1.ru_maxrss / 1024.0), 1),
+                "output_bytes": int(output_bytes or 0),
+                **(detail or {}),
+            },
+        })
+    except BaseException as e:
+        conn.send({"ok": False, "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()[-4000:]})
+    finally:
+        conn.close()
+        os._exit(0)
+
+
+def run_isolated(fn, *args):
+    """Run ``fn(*args) -> (value, output_bytes, detail)`` in a forked child and measure it."""
+    ctx = multiprocessing.get_context("fork")
+    recv_end, send_end = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_stage_child, args=(send_end, fn, args))
+    proc.start()
+    send_end.close()
+    try:
+        message = recv_end.recv()
+    except EOFError:
+        message = {"ok": False, "error": f"stage process died (exit code {proc.exitcode})"}
+    proc.join()
+    return message
+
+
+def run_stage(name: str, repeat: int, fn, *args) -> tuple[dict, object]:
+    runs = []
+    value = None
+    for _ in range(max(1, repeat)):
+        message = run_isolated(fn, *args)
+        if not message["ok"]:
+            return {"error": message["error"], "traceback": message.get("traceback")}, None
+        if value is None:
+            value = message["value"]
+        runs.append(message["metrics"])
+    walls = [r["wall_sec"] for r in runs]
+    report = dict(runs[0])
+    report.update({
+        "runs": len(runs),
+        "wall_sec": round(statistics.median(walls), 3),
+        "cpu_sec": round(statistics.median(r["cpu_sec"] for r in runs), 3),
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+        "peak_tree_rss_mb": max(r["peak_tree_rss_mb"] for r in runs),
+        "wall_samples": walls,
+    })
+    print(f"  {name:<7} wall={report['wall_sec']:.2f}s cpu={report['cpu_sec']:.2f}s "
+          f"rss={report['peak_rss_mb']:.0f}MB", file=sys.stderr)
+    return report, value
+
+
+# ---------------------------------------------------------------------------
+# Stages (executed in the forked child)
+# ---------------------------------------------------------------------------
+
+
+def _file_size(path: str | None) -> int:
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+def _remote_size(url: str) -> int:
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method="HEAD"), timeout=10) as resp:
+            return int(resp.headers.get("Content-Length") or 0)
+    except Exception:
+        return 0
+
+
+def stage_shots(engine, video_path):
+    shots = engine["resources"].scene_detector().detect_video_shots(video_path)
+    return [list(s) for s in shots], 0, {"shots": len(shots)}
+
+
+def stage_split(engine, project_id, video_path, shots):
+    tasks = engine["tasks"]
+    source = tasks._probe_split_source(video_path)
+    segments = [
+        {"start_sec": float(start), "end_sec": float(end), "scene": _SCENES[i % len(_SCENES)], "score": 0.9}
+        for i, (start, end) in enumerate(shots)
+    ]
+    segments = tasks._complete_segments_to_full_duration(segments, float(source["duration"]))
+    urls = tasks._split_and_upload(project_id, f"{project_id}-source", video_path, segments, source)
+    clips = [
+        {"url": url, "duration": float(seg["end_sec"] - seg["start_sec"]), "scene": seg["scene"]}
+        for url, seg in zip(urls, segments)
+    ]
+    return clips, sum(_remote_size(u) for u in urls), {"segments": len(segments)}
+
+
+def stage_tts(engine, script_segments, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    audio_map = engine["resources"].audio_generator().generate_aligned_audio_segments(script_segments, out_dir)
+    audio_map = {k: v for k, v in (audio_map or {}).items() if v}
+    return audio_map, sum(_file_size(p) for p in audio_map.values()), {"segments": len(audio_map)}
+
+
+def stage_render(engine, clips, script_segments, audio_map, bgm_path, house_info, output_path):
+    resources = engine["resources"]
+    timeline = []
+    for seg, clip in zip(script_segments, clips):
+        timeline.append({
+            "id": seg["asset_id"],
+            "oss_url": clip["url"],
+            "duration": clip["duration"],
+            "scene_label": clip["scene"],
+            "emotion": seg.get("emotion"),
+        })
+    resources.video_renderer().render_video(
+        timeline,
+        audio_map,
+        output_path,
+        bgm_path=bgm_path,
+        script_segments=script_segments,
+        house_info=house_info,
+        audio_gen=resources.audio_generator(),
+    )
+    return output_path, _file_size(output_path), {"clips": len(timeline)}
+
+
+def stage_mix(engine, script_segments, audio_map, bgm_path, output_path):
+    from moviepy.editor import ColorClip, concatenate_audioclips
+
+    renderer = engine["resources"].video_renderer()
+    voices = [renderer._open_voice_clip(audio_map[s["asset_id"]]) for s in script_segments if audio_map.get(s["asset_id"])]
+    voice = concatenate_audioclips(voices)
+    base = ColorClip((16, 16), color=(0, 0, 0), duration=voice.duration).set_audio(voice)
+    mixed = renderer._mix_audio_tracks(base, script_segments, bgm_path, None)
+    mixed.audio.write_audiofile(output_path, fps=48000, codec="aac", logger=None)
+    return output_path, _file_size(output_path), {"audio_sec": round(float(voice.duration), 2)}
+
+
+def stage_upload(engine, project_id, path):
+    url = engine["tasks"].upload_to_s3(path, f"bench/{project_id}/{os.path.basename(path)}")
+    return url, _file_size(path), {}
+
+
+# ---------------------------------------------------------------------------
+# Orchestration
+# ---------------------------------------------------------------------------
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock(workdir: str, extra_args: str):
+    port = _free_port()
+    cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_services.py"),
+           "--port", str(port), "--s3-dir", os.path.join(workdir, "s3"), *shlex.split(extra_args or "")]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line:
+        raise RuntimeError("mock_services.py did not start")
+    info = json.loads(line)
+    base = f"http://127.0.0.1:{port}"
+    os.environ.update({
+        "DASHSCOPE_HTTP_BASE_URL": info["DASHSCOPE_HTTP_BASE_URL"],
+        "DASHSCOPE_WEBSOCKET_BASE_URL": info["DASHSCOPE_WEBSOCKET_BASE_URL"],
+        "LLM_API_BASE": info["LLM_API_BASE"],
+        "S3_STORAGE_ENDPOINT": base,
+        "S3_STORAGE_ACCESS_KEY": "mock",
+        "S3_STORAGE_SECRET_KEY": "mock",
+        "S3_STORAGE_PUBLIC_URL": f"{base}/{os.getenv('S3_STORAGE_BUCKET', 'ai-scene-assets')}",
+    })
+    for key in ("DASHSCOPE_API_KEY", "GROK_API_KEY", "VOLCENGINE_API_KEY"):
+        os.environ.setdefault(key, "mock")
+    return proc
+
+
+def load_engine() -> dict:
+    """Import the engine after the environment is final (Config reads it at import time)."""
+    import resources
+    import tasks
+    from config import Config
+
+    return {"tasks": tasks, "resources": resources, "config": Config}
+
+
+def environment(config) -> dict:
+    def _run(cmd):
+        try:
+            return subprocess.run(cmd, capture_output=True, text=True, cwd=ENGINE_DIR).stdout.strip()
+        except Exception:
+            return ""
+
+    keys = [
+        "SHOT_DETECTOR", "SPLIT_ENCODE_WORKERS", "SPLIT_UPLOAD_WORKERS", "SPLIT_MEMORY_BUDGET_MB",
+        "TTS_CONCURRENCY", "TTS_STREAMING_ENABLED", "TTS_TIME_STRETCH_ENABLED", "TTS_CACHE_ENABLED",
+        "RENDER_THREADS", "MAX_VIDEO_RESOLUTION", "SUBTITLE_ENABLED", "SFX_ENABLED", "AUTO_DUCKING_ENABLED",
+    ]
+    return {
+        "commit": _run(["git", "rev-parse", "--short", "HEAD"]),
+        "dirty": bool(_run(["git", "status", "--porcelain", "--untracked-files=no"])),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": (_run(["ffmpeg", "-version"]).splitlines() or [""])[0],
+        "config": {k: getattr(config, k) for k in keys if hasattr(config, k)},
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> dict:
+    """Ratios new/old per case and stage; ``regressions`` lists those above 1 + threshold."""
+    old_cases = {c["case"]["name"]: c for c in baseline.get("cases", [])}
+    ratios, regressions = {}, []
+    for case in report["cases"]:
+        old = old_cases.get(case["case"]["name"])
+        if not old:
+            continue
+        for stage, new_metrics in case["stages"].items():
+            old_metrics = (old.get("stages") or {}).get(stage) or {}
+            if "error" in new_metrics or "error" in old_metrics or not old_metrics:
+                continue
+            entry = {}
+            for metric in ("wall_sec", "cpu_sec", "peak_rss_mb", "peak_tree_rss_mb", "output_bytes"):
+                before, after = old_metrics.get(metric), new_metrics.get(metric)
+                if before:
+                    entry[metric] = round(after / before, 3)
+                    if metric != "output_bytes" and entry[metric] > 1.0 + threshold:
+                        regressions.append({"case": case["case"]["name"], "stage": stage, "metric": metric,
+                                            "before": before, "after": after, "ratio": entry[metric]})
+            ratios.setdefault(case["case"]["name"], {})[stage] = entry
+    return {"baseline_commit": (baseline.get("environment") or {}).get("commit"), "ratios": ratios,
+            "threshold": threshold, "regressions": regressions}
+
+
+def bench_case(engine, case: dict, stages: set, repeat: int, workdir: str, seed: int) -> dict:
+    case_dir = os.path.join(workdir, case["name"])
+    os.makedirs(case_dir, exist_ok=True)
+    project_id = f"bench-{case['name']}"
+    video_path = os.path.join(case_dir, "listing.mp4")
+    truth = make_listing_video(video_path, case, seed)
+    bgm_path = make_bgm(os.path.join(case_dir, "bgm.mp3"), case["duration"])
+    house_info, script_segments = make_script(truth, seed)
+    print(f"case {case['name']}", file=sys.stderr)
+
+    results: dict = {}
+    skipped = {"error": "skipped: an upstream stage failed or was not selected"}
+
+    def wanted(name: str, *needs) -> bool:
+        if name not in stages:
+            return False
+        if any(n is None for n in needs):
+            results[name] = skipped
+            return False
+        return True
+
+    # Stages feed each other: split and tts also run when a later stage needs their output,
+    # and without the shots stage the split uses the ground-truth shots.
+    shots = [list(s) for s in truth]
+    if wanted("shots"):
+        results["shots"], detected = run_stage("shots", repeat, stage_shots, engine, video_path)
+        shots = detected or shots
+
+    clips = None
+    if "split" in stages or "render" in stages:
+        results["split"], clips = run_stage("split", repeat, stage_split, engine, project_id, video_path, shots)
+        if clips and len(clips) != len(script_segments):
+            # The split follows the detected shots: one voice-over segment per clip.
+            spans, t = [], 0.0
+            for clip in clips:
+                spans.append((t, t + clip["duration"]))
+                t += clip["duration"]
+            house_info, script_segments = make_script(spans, seed)
+
+    audio_map = None
+    if "tts" in stages or "render" in stages or "mix" in stages:
+        results["tts"], audio_map = run_stage("tts", repeat, stage_tts, engine, script_segments,
+                                              os.path.join(case_dir, "tts"))
+
+    rendered = None
+    if wanted("render", clips, audio_map):
+        output = os.path.join(case_dir, "render.mp4")
+        results["render"], rendered = run_stage("render", repeat, stage_render, engine, clips, script_segments,
+                                                audio_map, bgm_path, house_info, output)
+
+    if wanted("mix", audio_map):
+        results["mix"], _ = run_stage("mix", repeat, stage_mix, engine, script_segments, audio_map, bgm_path,
+                                      os.path.join(case_dir, "mix.m4a"))
+
+    upload_source = rendered if "render" in stages else video_path
+    if wanted("upload", upload_source):
+        results["upload"], _ = run_stage("upload", repeat, stage_upload, engine, project_id, upload_source)
+
+    ordered = {name: results[name] for name in STAGES if name in results}
+    return {"case": {**case, "true_shots": len(truth)}, "stages": ordered}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--case", action="append", dest="cases", help="WxH:DURATION:SHOTS:audio|silent (repeatable)")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage; the median is reported")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--workdir", help="keep intermediates here instead of a temp dir")
+    parser.add_argument("--no-mock", action="store_true", help="use the endpoints from the environment")
+    parser.add_argument("--mock-args", default="--latency tts=300,vl=800,llm=500,task=50",
+                        help="flags passed to mock_services.py")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--regression-threshold", type=float, default=0.10)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    stages = {s.strip() for s in args.stages.split(",") if s.strip()}
+    unknown = stages - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    cases = [parse_case(spec) for spec in (args.cases or DEFAULT_CASES)]
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="pipelinebench_")
+    os.makedirs(workdir, exist_ok=True)
+    # Measure synthesis, not cache hits.
+    os.environ.setdefault("TTS_CACHE_ENABLED", "false")
+    mock = None if args.no_mock else start_mock(workdir, args.mock_args)
+    try:
+        engine = load_engine()
+        report = {
+            "environment": environment(engine["config"]),
+            "stages": sorted(stages, key=STAGES.index),
+            "repeat": args.repeat,
+            "cases": [bench_case(engine, case, stages, args.repeat, workdir, args.seed + i) for i, case in enumerate(cases)],
+        }
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as f:
+                report["comparison"] = compare(report, json.load(f), args.regression_threshold)
+    finally:
+        if mock is not None:
+            mock.terminate()
+            mock.wait(timeout=10)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    regressions = (report.get("comparison") or {}).get("regressions") or []
+    for r in regressions:
+        print(f"REGRESSION {r['case']}/{r['stage']} {r['metric']}: {r['before']} -> {r['after']} (x{r['ratio']})",
+              file=sys.stderr)
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Shot detector benchmark: PySceneDetect ContentDetector vs. the fast downscaled detector.
+
+Usage (from the engine directory):
+    python bench/shot_detect_bench.py clip1.mp4 clip2.mp4 ...
+    python bench/shot_detect_bench.py --synthetic 3 --size 1920x1080
+
+For real clips PySceneDetect is the reference; synthetic clips are assembled from
+ffmpeg test sources with known cut times and are scored against that ground truth.
+Prints one JSON report with wall time per detector and cut agreement (precision,
+recall, F1 within a tolerance window).
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from shot_detect import FastShotDetector  # noqa: E402
+
+try:
+    from scenedetect import SceneManager, open_video, ContentDetector
+except ImportError:
+    SceneManager = None
+
+_SOURCES = [
+    "testsrc2=size={size}:rate={fps}",
+    "mandelbrot=size={size}:rate={fps}",
+    "smptehdbars=size={size}:rate={fps}",
+    "cellauto=size={size}:rate={fps}:rule=110",
+    "life=size={size}:rate={fps}:mold=10:ratio=0.2",
+    "rgbtestsrc=size={size}:rate={fps}",
+]
+
+
+def make_synthetic_clip(path: str, size: str, fps: int, shots: int, seed: int) -> list[float]:
+    """Render a clip of ``shots`` test-source shots and return the true cut times."""
+    rng = random.Random(seed)
+    lengths = [round(rng.uniform(1.5, 5.0), 2) for _ in range(shots)]
+    inputs: list[str] = []
+    labels = []
+    for i, length in enumerate(lengths):
+        src = _SOURCES[(i + seed) % len(_SOURCES)].format(size=size, fps=fps)
+        inputs += ["-f", "lavfi", "-t", str(length), "-i", src]
+        labels.append(f"[{i}:v]setsar=1,format=yuv420p[v{i}]")
+    concat = "".join(f"[v{i}]" for i in range(shots)) + f"concat=n={shots}:v=1:a=0[out]"
+    cmd = ["ffmpeg", "-y", "-v", "error", *inputs, "-filter_complex", ";".join(labels + [concat]),
+           "-map", "[out]", "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", path]
+    subprocess.run(cmd, check=True)
+    cuts, t = [], 0.0
+    for length in lengths[:-1]:
+        t += length
+        cuts.append(round(t, 3))
+    return cuts
+
+
+def pyscenedetect_shots(path: str, threshold: float) -> list[tuple[float, float]]:
+    video = open_video(path)
+    manager = SceneManager()
+    manager.add_detector(ContentDetector(threshold=threshold))
+    manager.detect_scenes(video)
+    return [(s.get_seconds(), e.get_seconds()) for s, e in manager.get_scene_list()]
+
+
+def cut_times(shots: list[tuple[float, float]]) -> list[float]:
+    return [float(start) for start, _ in shots[1:]]
+
+
+def agreement(reference: list[float], candidate: list[float], tolerance: float) -> dict:
+    """Greedy one-to-one matching of cut times within ``tolerance`` seconds."""
+    unmatched = sorted(candidate)
+    hits = 0
+    for ref in sorted(reference):
+        best = None
+        for i, cand in enumerate(unmatched):
+            if abs(cand - ref) <= tolerance and (best is None or abs(cand - ref) < abs(unmatched[best] - ref)):
+                best = i
+        if best is not None:
+            unmatched.pop(best)
+            hits += 1
+    precision = hits / len(candidate) if candidate else (1.0 if not reference else 0.0)
+    recall = hits / len(reference) if reference else (1.0 if not candidate else 0.0)
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 3), "recall": round(recall, 3), "f1": round(f1, 3)}
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    result = fn(*args, **kwargs)
+    return result, round(time.perf_counter() - started, 3), round(time.process_time() - cpu_started, 3)
+
+
+def bench_clip(path: str, truth: list[float] | None, tolerance: float) -> dict:
+    report: dict = {"clip": os.path.basename(path)}
+    fast_shots, fast_wall, fast_cpu = timed(FastShotDetector().detect, path)
+    fast_cuts = cut_times(fast_shots)
+    report["fast"] = {"wall_sec": fast_wall, "cpu_sec": fast_cpu, "cuts": len(fast_cuts)}
+
+    reference = truth
+    if SceneManager is not None:
+        psd_shots, psd_wall, psd_cpu = timed(pyscenedetect_shots, path, Config.SCENE_DETECT_THRESHOLD)
+        psd_cuts = cut_times(psd_shots)
+        report["pyscenedetect"] = {"wall_sec": psd_wall, "cpu_sec": psd_cpu, "cuts": len(psd_cuts)}
+        report["speedup"] = round(psd_wall / fast_wall, 2) if fast_wall > 0 else None
+        report["agreement_fast_vs_pyscenedetect"] = agreement(psd_cuts, fast_cuts, tolerance)
+        if truth is not None:
+            report["pyscenedetect"]["vs_truth"] = agreement(truth, psd_cuts, tolerance)
+    if reference is not None:
+        report["fast"]["vs_truth"] = agreement(reference, fast_cuts, tolerance)
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clips", nargs="*", help="Sample clips to benchmark")
+    parser.add_argument("--synthetic", type=int, default=0, help="Number of synthetic clips to generate")
+    parser.add_argument("--size", default="1280x720", help="Synthetic clip size, e.g. 3840x2160")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--shots", type=int, default=8, help="Shots per synthetic clip")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Cut match tolerance in seconds")
+    args = parser.parse_args()
+
+    reports = []
+    for path in args.clips:
+        reports.append(bench_clip(path, None, args.tolerance))
+
+    with tempfile.TemporaryDirectory(prefix="shotbench_") as tmp:
+        for i in range(args.synthetic):
+            path = os.path.join(tmp, f"synthetic_{i}.mp4")
+            truth = make_synthetic_clip(path, args.size, args.fps, args.shots, seed=i)
+            reports.append(bench_clip(path, truth, args.tolerance))
+
+    if not reports:
+        parser.error("pass clips and/or --synthetic N")
+    print(json.dumps({"clips": reports}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,12 +10,29 @@ class Config:
     REDIS_URL = os.getenv("REDIS_URL")
 
     CELERY_QUEUE_NAME = os.getenv("CELERY_QUEUE_NAME", "ai-video:celery")
+    # Workload routing (see routing.py): backend messages arrive on CELERY_QUEUE_NAME and
+    # are relayed to an I/O queue (threads pool) or a CPU queue (prefork pool)
+    CELERY_ROUTING_ENABLED = os.getenv("CELERY_ROUTING_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+    CELERY_IO_QUEUE_NAME = os.getenv("CELERY_IO_QUEUE_NAME", "ai-video:io")
+    CELERY_CPU_QUEUE_NAME = os.getenv("CELERY_CPU_QUEUE_NAME", "ai-video:cpu")
+    CELERY_TASK_ROUTES = os.getenv(
+        "CELERY_TASK_ROUTES",
+        "analyze_video_task=cpu,render_video_task=cpu,render_pipeline_task=cpu,"
+        "render_segment_task=cpu,render_finalize_task=cpu,"
+        "generate_script_task=io,generate_audio_task=io,enhance_video_task=io",
+    )  # task=io|cpu|<queue name>
+    CELERY_DEFAULT_ROUTE = os.getenv("CELERY_DEFAULT_ROUTE", "io")  # Tasks not listed in CELERY_TASK_ROUTES
+    CELERY_RELAY_POLL_SEC = float(os.getenv("CELERY_RELAY_POLL_SEC", "0.2"))  # Idle poll interval of the ingress relay
+    CELERY_RELAY_BATCH = int(os.getenv("CELERY_RELAY_BATCH", "50"))
 
     # DashScope (Aliyun Qwen-VL)
     DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY")
     QWEN_IMAGE_MODEL = os.getenv("QWEN_IMAGE_MODEL", "qwen-vl-plus")
     QWEN_VIDEO_MODEL = os.getenv("QWEN_VIDEO_MODEL", "qwen-vl-max")
     QWEN_VIDEO_FPS = float(os.getenv("QWEN_VIDEO_FPS", "1.0"))
+    # Endpoint overrides (empty = SDK default); point both at bench/mock_services.py for offline runs
+    DASHSCOPE_HTTP_BASE_URL = os.getenv("DASHSCOPE_HTTP_BASE_URL", "").strip().rstrip("/")
+    DASHSCOPE_WEBSOCKET_BASE_URL = os.getenv("DASHSCOPE_WEBSOCKET_BASE_URL", "").strip()
 
     # DB (Self-hosted Postgres)
     DB_DSN = os.getenv("DB_DSN")
@@ -34,6 +51,35 @@ class Config:
     SMART_SPLIT_STRATEGY = os.getenv("SMART_SPLIT_STRATEGY", "hybrid")
     SMART_SPLIT_MIN_DURATION_SEC = float(os.getenv("SMART_SPLIT_MIN_DURATION_SEC", "30"))
     SCENE_DETECT_THRESHOLD = float(os.getenv("SCENE_DETECT_THRESHOLD", "27.0"))
+    SHOT_DETECTOR = os.getenv("SHOT_DETECTOR", "pyscenedetect").lower()  # "pyscenedetect" or "fast" (single-pass analysis, opt-in)
+    SHOT_DETECT_WIDTH = int(os.getenv("SHOT_DETECT_WIDTH", "160"))  # Fast detector decode width (px)
+    SHOT_DETECT_FRAME_STEP = int(os.getenv("SHOT_DETECT_FRAME_STEP", "2"))  # Analyze every Nth frame
+    SHOT_DETECT_SENSITIVITY = float(os.getenv("SHOT_DETECT_SENSITIVITY", "3.0"))  # Cut at mean + k * std
+    SHOT_DETECT_MIN_SCORE = float(os.getenv("SHOT_DETECT_MIN_SCORE", "0.25"))  # Absolute delta floor (0-1)
+    SHOT_DETECT_MIN_SHOT_SEC = float(os.getenv("SHOT_DETECT_MIN_SHOT_SEC", "0.6"))
+    SHOT_KEYFRAME_CANDIDATE_FPS = float(os.getenv("SHOT_KEYFRAME_CANDIDATE_FPS", "2.0"))  # Keyframe sampling rate
+    SHOT_KEYFRAME_MAX_CANDIDATES = int(os.getenv("SHOT_KEYFRAME_MAX_CANDIDATES", "240"))  # Buffered JPEGs cap
+    SHOT_DEDUP_ENABLED = os.getenv("SHOT_DEDUP_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+    SHOT_DEDUP_MAX_DISTANCE = int(os.getenv("SHOT_DEDUP_MAX_DISTANCE", "10"))  # dHash Hamming distance (of 64 bits)
+
+    # Vision request payloads (Qwen-VL keyframes are sent as in-memory data URLs)
+    VISION_FRAME_FORMAT = os.getenv("VISION_FRAME_FORMAT", "jpeg").lower()  # "jpeg" or "webp"
+    VISION_FRAME_QUALITY = int(os.getenv("VISION_FRAME_QUALITY", "85"))
+    VISION_FRAME_MIN_QUALITY = int(os.getenv("VISION_FRAME_MIN_QUALITY", "55"))
+    VISION_FRAME_MAX_DIM = int(os.getenv("VISION_FRAME_MAX_DIM", "1024"))  # Long side for <= 4 frames
+    VISION_FRAME_MIN_DIM = int(os.getenv("VISION_FRAME_MIN_DIM", "384"))  # Floor when many shots share a request
+    VISION_REQUEST_BUDGET_KB = int(os.getenv("VISION_REQUEST_BUDGET_KB", "6144"))  # Total image bytes per request
+    VISION_CACHE_ENABLED = os.getenv("VISION_CACHE_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+    VISION_CACHE_BACKEND = os.getenv("VISION_CACHE_BACKEND", "").lower()  # "redis", "sqlite" or empty (auto)
+    VISION_CACHE_TTL_SEC = int(os.getenv("VISION_CACHE_TTL_SEC", str(30 * 24 * 3600)))
+    VISION_CACHE_SQLITE_PATH = os.getenv("VISION_CACHE_SQLITE_PATH", "/tmp/ai-scene-cache/vision_cache.sqlite3")
+    SHOT_GROUPING_CHUNKED = os.getenv("SHOT_GROUPING_CHUNKED", "true").lower() in {"1", "true", "yes", "y"}
+    SHOT_GROUPING_WINDOW = int(os.getenv("SHOT_GROUPING_WINDOW", "16"))  # Shots per vision request in chunked mode
+    SHOT_GROUPING_OVERLAP = int(os.getenv("SHOT_GROUPING_OVERLAP", "3"))  # Shots shared by adjacent windows
+    SHOT_GROUPING_CONCURRENCY = int(os.getenv("SHOT_GROUPING_CONCURRENCY", "3"))  # Parallel window requests
+    SPLIT_ENCODE_WORKERS = int(os.getenv("SPLIT_ENCODE_WORKERS", "2"))  # Parallel ffmpeg segment encoders
+    SPLIT_UPLOAD_WORKERS = int(os.getenv("SPLIT_UPLOAD_WORKERS", "2"))  # Parallel segment uploads
+    SPLIT_MEMORY_BUDGET_MB = int(os.getenv("SPLIT_MEMORY_BUDGET_MB", "1024"))  # Cap for concurrent encoders
 
     TTS_ENGINE = os.getenv("TTS_ENGINE", "cosyvoice").lower()
     _DEFAULT_TTS_MODEL = "cosyvoice-v3-flash" if TTS_ENGINE in {"cosyvoice", "tts_v2"} else "sambert-zhigui-v1"
@@ -44,6 +90,32 @@ class Config:
     TTS_VOLUME = int(os.getenv("TTS_VOLUME", "50"))
     TTS_SPEECH_RATE = float(os.getenv("TTS_SPEECH_RATE", "1.0"))
     TTS_PITCH_RATE = float(os.getenv("TTS_PITCH_RATE", "1.0"))
+    TTS_DURATION_TOLERANCE_SEC = float(os.getenv("TTS_DURATION_TOLERANCE_SEC", "0.5"))  # Accept audio within ±N sec
+    TTS_DURATION_PREDICTOR_ENABLED = os.getenv("TTS_DURATION_PREDICTOR_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+    TTS_PREDICTOR_ALPHA = float(os.getenv("TTS_PREDICTOR_ALPHA", "0.2"))  # EWMA weight of each new observation
+    TTS_PREDICTOR_DEFAULT_UNITS_PER_SEC = float(os.getenv("TTS_PREDICTOR_DEFAULT_UNITS_PER_SEC", "9.0"))  # Han chars count 2
+    TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))  # Segments synthesized in parallel per task
+    TTS_QPS = float(os.getenv("TTS_QPS", "3"))  # DashScope TTS quota, shared across workers via Redis
+    TTS_QPS_BURST = float(os.getenv("TTS_QPS_BURST", "3"))
+    TTS_SEGMENT_RETRIES = int(os.getenv("TTS_SEGMENT_RETRIES", "2"))  # Extra attempts per segment (TTS calls are retried by _run_tts_v2 only)
+    TTS_TIME_STRETCH_ENABLED = os.getenv("TTS_TIME_STRETCH_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+    TTS_STRETCH_MIN_RATIO = float(os.getenv("TTS_STRETCH_MIN_RATIO", "0.85"))  # Local stretch bounds; beyond them re-synthesize
+    TTS_STRETCH_MAX_RATIO = float(os.getenv("TTS_STRETCH_MAX_RATIO", "1.25"))
+    TTS_STREAMING_ENABLED = os.getenv("TTS_STREAMING_ENABLED", "false").lower() in {"1", "true", "yes", "y"}
+    TTS_STREAM_TIMEOUT_SEC = float(os.getenv("TTS_STREAM_TIMEOUT_SEC", "120"))
+    TTS_CHUNK_PIPELINE_DEPTH = int(os.getenv("TTS_CHUNK_PIPELINE_DEPTH", "2"))  # Chunk requests in flight for long texts
+    TTS_HEDGE_ENABLED = os.getenv("TTS_HEDGE_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+    TTS_HEDGE_PERCENTILE = float(os.getenv("TTS_HEDGE_PERCENTILE", "0.95"))  # Hedge once a call runs past this latency
+    TTS_HEDGE_MIN_SAMPLES = int(os.getenv("TTS_HEDGE_MIN_SAMPLES", "20"))
+    TTS_HEDGE_MIN_DELAY_SEC = float(os.getenv("TTS_HEDGE_MIN_DELAY_SEC", "1.0"))
+    TTS_BREAKER_FAILURE_THRESHOLD = int(os.getenv("TTS_BREAKER_FAILURE_THRESHOLD", "5"))
+    TTS_BREAKER_WINDOW_SEC = float(os.getenv("TTS_BREAKER_WINDOW_SEC", "60"))
+    TTS_BREAKER_RESET_SEC = float(os.getenv("TTS_BREAKER_RESET_SEC", "30"))  # Open -> half-open probe after N sec
+    TTS_FALLBACK_MODEL = os.getenv("TTS_FALLBACK_MODEL", "sambert-zhigui-v1")  # Empty disables fallback routing
+    TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+    TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "/tmp/ai-video-tts-cache")
+    TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "1024"))  # Local LRU size limit
+    TTS_CACHE_S3_PREFIX = os.getenv("TTS_CACHE_S3_PREFIX", "")  # e.g. "tts-cache"; empty = local only
 
     # Subtitle Configuration (P0 Feature)
     SUBTITLE_ENABLED = os.getenv("SUBTITLE_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
@@ -97,6 +169,48 @@ class Config:
     RENDER_THREADS = int(os.getenv("RENDER_THREADS", "4"))  # FFmpeg rendering threads
     ENABLE_CLIP_CACHE = os.getenv("ENABLE_CLIP_CACHE", "false").lower() in {"1", "true", "yes", "y"}
     MAX_VIDEO_RESOLUTION = int(os.getenv("MAX_VIDEO_RESOLUTION", "1080"))  # Max height in pixels
+    RENDER_MAX_OPEN_READERS = int(os.getenv("RENDER_MAX_OPEN_READERS", "4"))  # Live source ffmpeg readers per render; 0 = all
+    # Distributed render: one render_segment_task per asset, joined by render_finalize_task (chord)
+    RENDER_DAG_ENABLED = os.getenv("RENDER_DAG_ENABLED", "false").lower() in {"1", "true", "yes", "y"}
+    RENDER_DAG_MIN_SEGMENTS = int(os.getenv("RENDER_DAG_MIN_SEGMENTS", "3"))  # Smaller timelines render in one task
+    RENDER_DAG_S3_PREFIX = os.getenv("RENDER_DAG_S3_PREFIX", "render-parts")  # Intermediate parts, deleted after finalize
+    RENDER_DAG_PART_CRF = int(os.getenv("RENDER_DAG_PART_CRF", "18"))  # Near-lossless parts; re-encoded by finalize
+    # Render admission: per-node memory/CPU budget in Redis (see admission.py)
+    RENDER_ADMISSION_ENABLED = os.getenv("RENDER_ADMISSION_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+    RENDER_ADMISSION_NODE = os.getenv("RENDER_ADMISSION_NODE", "")  # Budget scope; empty = hostname (one per container)
+    RENDER_ADMISSION_MEM_MB = float(os.getenv("RENDER_ADMISSION_MEM_MB", "0"))  # 0 = 80% of the container memory limit
+    RENDER_ADMISSION_CPU = float(os.getenv("RENDER_ADMISSION_CPU", "0"))  # FFmpeg threads in flight; 0 = 2 x cores
+    RENDER_ADMISSION_LEASE_TTL_SEC = int(os.getenv("RENDER_ADMISSION_LEASE_TTL_SEC", "120"))  # Renewed while rendering
+    RENDER_ADMISSION_RETRY_SEC = int(os.getenv("RENDER_ADMISSION_RETRY_SEC", "10"))  # First deferral countdown
+    RENDER_ADMISSION_RETRY_MAX_SEC = int(os.getenv("RENDER_ADMISSION_RETRY_MAX_SEC", "120"))
+    RENDER_ADMISSION_MAX_DEFERRALS = int(os.getenv("RENDER_ADMISSION_MAX_DEFERRALS", "60"))  # Then the render fails
+    # Single-flight for render tasks: duplicates share one execution, newer scripts supersede (see singleflight.py)
+    SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+    SINGLEFLIGHT_TTL_SEC = int(os.getenv("SINGLEFLIGHT_TTL_SEC", "60"))  # In-flight marker; renewed by a heartbeat while a task runs
+    SINGLEFLIGHT_RESULT_TTL_SEC = int(os.getenv("SINGLEFLIGHT_RESULT_TTL_SEC", "600"))  # Result returned to duplicates
+    SINGLEFLIGHT_WAIT_SEC = int(os.getenv("SINGLEFLIGHT_WAIT_SEC", "15"))  # Countdown while an identical render runs
+    SINGLEFLIGHT_MAX_WAITS = int(os.getenv("SINGLEFLIGHT_MAX_WAITS", "40"))  # Then the duplicate takes the flight over and renders
+    PROBE_CACHE_TTL_SEC = int(os.getenv("PROBE_CACHE_TTL_SEC", str(30 * 24 * 3600)))  # Asset frame size/duration
+
+    # Observability: per-stage task spans (see spans.py)
+    SPANS_ENABLED = os.getenv("SPANS_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+    SPANS_OTLP_FILE = os.getenv("SPANS_OTLP_FILE", "")  # OTLP/JSON lines, e.g. /tmp/ai-scene-spans/spans.jsonl; empty = off
+
+    # Observability: Prometheus metrics (see metrics.py)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+    METRICS_DIR = os.getenv("METRICS_DIR", "/tmp/ai-scene-metrics")  # Per-process textfiles (multiprocess-safe)
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Merged /metrics endpoint in the main worker process; 0 = off
+    METRICS_FLUSH_INTERVAL_SEC = float(os.getenv("METRICS_FLUSH_INTERVAL_SEC", "5"))
+    METRICS_QUEUE_POLL_SEC = float(os.getenv("METRICS_QUEUE_POLL_SEC", "15"))  # Broker queue depth gauge; 0 = off
+
+    # Logging pipeline (see log_pipeline.py)
+    LOG_ASYNC_ENABLED = os.getenv("LOG_ASYNC_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+    LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.1"))  # Requests whose LLM params/content are logged
+    LOG_FIELD_MAX_CHARS = int(os.getenv("LOG_FIELD_MAX_CHARS", "2000"))  # Truncate long JSON log fields; 0 = no limit
+    LOG_DEBUG_CAPTURE_DIR = os.getenv("LOG_DEBUG_CAPTURE_DIR", "")  # Full prompts/responses of sampled requests; empty = off
+
+    # Worker startup: version/font diagnostics (fc-list) run once from worker_ready
+    STARTUP_DIAGNOSTICS_ENABLED = os.getenv("STARTUP_DIAGNOSTICS_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
 
     # ============ Phase 2-1: 动态节奏控制 ============
     DYNAMIC_SPEED_ENABLED = os.getenv("DYNAMIC_SPEED_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
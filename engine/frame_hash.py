@@ -0,0 +1,78 @@
+"""
+Perceptual Frame Hashing
+
+dHash fingerprints for shot keyframes, used to collapse runs of near-identical
+consecutive shots (pausing in a room, panning back) before they are sent to the
+vision model.
+"""
+
+import logging
+
+import cv2
+import numpy as np
+
+from config import Config
+from frame_payload import to_frame
+
+logger = logging.getLogger(__name__)
+
+
+def dhash(image, hash_size: int = 8) -> int:
+    """Difference hash: compare horizontally adjacent pixels of a tiny grayscale frame."""
+    frame = to_frame(image)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def merge_duplicate_shots(shot_frames: list[dict], max_distance: int | None = None) -> list[dict]:
+    """Merge consecutive shots whose keyframes are within ``max_distance`` bits.
+
+    Each item is ``{"start", "end", "image"}``. A merged shot keeps the first
+    shot's keyframe, spans from the first start to the last end (so segments the
+    model returns still cover the original timeline) and lists the original spans
+    under ``"spans"``. Each shot is compared with the previous kept keyframe, so a
+    slow pan that drifts gradually still opens a new shot once it has drifted far
+    enough.
+    """
+    threshold = int(Config.SHOT_DEDUP_MAX_DISTANCE if max_distance is None else max_distance)
+    if len(shot_frames) < 2:
+        return list(shot_frames)
+
+    merged: list[dict] = []
+    last_hash = None
+    for shot in shot_frames:
+        try:
+            h = dhash(shot["image"])
+        except Exception:
+            h = None
+        if merged and h is not None and last_hash is not None and hamming(h, last_hash) <= threshold:
+            current = merged[-1]
+            current["end"] = max(float(current["end"]), float(shot["end"]))
+            current["spans"].append((float(shot["start"]), float(shot["end"])))
+            continue
+        merged.append(
+            {
+                **shot,
+                "start": float(shot["start"]),
+                "end": float(shot["end"]),
+                "spans": [(float(shot["start"]), float(shot["end"]))],
+            }
+        )
+        last_hash = h
+
+    logger.info(
+        "Near-duplicate shots merged",
+        extra={
+            "event": "shot_dedup.finish",
+            "shots": len(shot_frames),
+            "shots_after": len(merged),
+            "shots_removed": len(shot_frames) - len(merged),
+        },
+    )
+    return merged
@@ -0,0 +1,129 @@
+"""
+Frame Payload Builder
+
+Encodes keyframes for Qwen-VL requests in memory (JPEG or WebP data URLs) instead of
+writing temp files that the DashScope SDK would read and upload again. Resolution
+adapts to the number of frames in the request, and per-frame quality/size is
+stepped down until the whole request fits a byte budget.
+"""
+
+import base64
+import logging
+import math
+
+import cv2
+import numpy as np
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_MIME = {"jpeg": "image/jpeg", "webp": "image/webp"}
+_QUALITY_FLAG = {"jpeg": cv2.IMWRITE_JPEG_QUALITY, "webp": cv2.IMWRITE_WEBP_QUALITY}
+
+
+def to_frame(image) -> np.ndarray:
+    """Accept a BGR ndarray, encoded image bytes or a local file path."""
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        frame = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+    else:
+        path = str(image)
+        if path.startswith("file://"):
+            path = path[len("file://"):]
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Could not decode frame for vision payload")
+    return frame
+
+
+def _resize_max_dim(frame: np.ndarray, max_dim: int) -> np.ndarray:
+    h, w = frame.shape[:2]
+    if max(h, w) <= max_dim:
+        return frame
+    scale = max_dim / float(max(h, w))
+    return cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+class FramePayloadBuilder:
+    """Build size-bounded data URLs for a batch of frames."""
+
+    def __init__(
+        self,
+        image_format: str | None = None,
+        quality: int | None = None,
+        min_quality: int | None = None,
+        max_dim: int | None = None,
+        min_dim: int | None = None,
+        request_budget_bytes: int | None = None,
+    ):
+        fmt = (image_format or Config.VISION_FRAME_FORMAT).lower()
+        self.image_format = "jpeg" if fmt in {"jpg", "jpeg"} else fmt
+        if self.image_format not in _MIME:
+            raise ValueError(f"Unsupported vision frame format: {fmt}")
+        self.quality = int(quality or Config.VISION_FRAME_QUALITY)
+        self.min_quality = int(min_quality or Config.VISION_FRAME_MIN_QUALITY)
+        self.max_dim = int(max_dim or Config.VISION_FRAME_MAX_DIM)
+        self.min_dim = int(min_dim or Config.VISION_FRAME_MIN_DIM)
+        self.request_budget_bytes = int(request_budget_bytes or Config.VISION_REQUEST_BUDGET_KB * 1024)
+
+    def dim_for_count(self, count: int) -> int:
+        """Shrink the long side as frames are added: up to 4 frames keep ``max_dim``."""
+        if count <= 4:
+            return self.max_dim
+        return max(self.min_dim, min(self.max_dim, int(self.max_dim * math.sqrt(4.0 / count))))
+
+    def _encode(self, frame: np.ndarray, quality: int) -> bytes:
+        ok, encoded = cv2.imencode(f".{'jpg' if self.image_format == 'jpeg' else 'webp'}", frame,
+                                   [int(_QUALITY_FLAG[self.image_format]), int(quality)])
+        if not ok:
+            raise ValueError("Frame encoding failed")
+        return encoded.tobytes()
+
+    def encode_frame(self, image, dim: int, target_bytes: int) -> bytes:
+        """Encode one frame at ``dim``, lowering quality then resolution until it fits."""
+        frame = _resize_max_dim(to_frame(image), dim)
+        quality = self.quality
+        while True:
+            data = self._encode(frame, quality)
+            if len(data) <= target_bytes:
+                return data
+            if quality > self.min_quality:
+                quality = max(self.min_quality, quality - 10)
+                continue
+            h, w = frame.shape[:2]
+            if max(h, w) <= self.min_dim:
+                return data
+            frame = _resize_max_dim(frame, max(self.min_dim, int(max(h, w) * 0.8)))
+            quality = self.quality
+
+    def build(self, images: list) -> tuple[list[str], dict]:
+        """Return data URLs for ``images`` and stats (frames, dim, bytes) for logging."""
+        count = len(images)
+        if count == 0:
+            return [], {"frames": 0, "frame_dim": 0, "payload_bytes": 0}
+        dim = self.dim_for_count(count)
+        # Base64 inflates every frame by 4/3; keep the encoded total inside the budget.
+        target_bytes = max(8 * 1024, int(self.request_budget_bytes * 3 / 4 / count))
+        prefix = f"data:{_MIME[self.image_format]};base64,"
+        urls = []
+        payload_bytes = 0
+        for image in images:
+            data = self.encode_frame(image, dim, target_bytes)
+            url = prefix + base64.b64encode(data).decode("ascii")
+            payload_bytes += len(url)
+            urls.append(url)
+        stats = {
+            "frames": count,
+            "frame_dim": dim,
+            "frame_format": self.image_format,
+            "payload_bytes": payload_bytes,
+            "payload_budget_bytes": self.request_budget_bytes,
+        }
+        if payload_bytes > self.request_budget_bytes:
+            logger.warning(
+                "Vision payload exceeds budget at minimum quality/size",
+                extra={"event": "vision.payload.over_budget", **stats},
+            )
+        return urls, stats
@@ -26,9 +26,12 @@ except ImportError:
     LITELLM_AVAILABLE = False
     logging.warning("litellm not installed, unified LLM client will not be available")
 
+import log_pipeline
+import metrics
 from llm_config import (
     AGENT_MODEL_MAPPING,
     COST_AWARE_ROUTING,
+    LLM_API_BASE,
     RETRY_CONFIG,
     ModelConfig,
     get_full_model_name,
@@ -171,26 +174,29 @@ class UnifiedLLMClient:
         api_key = os.getenv(self.config.api_key_env)
         if api_key:
             call_params["api_key"] = api_key
+        if LLM_API_BASE:
+            call_params["api_base"] = LLM_API_BASE
             
         call_params.update(kwargs)
         
-        # 打印请求入参
-        logger.info(
-            "LLM request",
-            extra={
-                "event": "llm.request",
-                "agent": self.agent_name,
-                "params": json.dumps(_safe_log_params(call_params), ensure_ascii=False, default=str),
-            }
-        )
+        # 打印请求入参（按请求采样，未采样的请求不序列化参数）
+        if log_pipeline.payload_sampled():
+            logger.info(
+                "LLM request",
+                extra={
+                    "event": "llm.request",
+                    "agent": self.agent_name,
+                    "params": json.dumps(_safe_log_params(call_params), ensure_ascii=False, default=str),
+                }
+            )
         
         try:
-            response = litellm.completion(**call_params)
+            response = self._completion(call_params)
             
             # 获取返回内容
             content = response.choices[0].message.content
             
-            # 成功日志（完整输出返回内容）
+            # 成功日志
             logger.info(
                 f"LLM call success",
                 extra={
@@ -203,17 +209,18 @@ class UnifiedLLMClient:
                 }
             )
             
-            # 单独打印完整的返回内容（不截断）
-            logger.info(
-                "LLM response content",
-                extra={
-                    "event": "llm.response.content",
-                    "agent": self.agent_name,
-                    "model": model,
-                    "content": content,
-                    "content_length": len(content) if content else 0,
-                }
-            )
+            # 按请求采样记录返回长度（日志不含模型原文），采样请求的完整内容另写入 debug capture
+            if log_pipeline.payload_sampled():
+                logger.info(
+                    "LLM response content",
+                    extra={
+                        "event": "llm.response.content",
+                        "agent": self.agent_name,
+                        "model": model,
+                        "content_length": len(content) if content else 0,
+                    }
+                )
+            log_pipeline.capture("llm.chat", agent=self.agent_name, model=model, request=call_params, response=content)
             
             return content
         
@@ -277,21 +284,24 @@ class UnifiedLLMClient:
         api_key = os.getenv(self.config.api_key_env)
         if api_key:
             call_params["api_key"] = api_key
+        if LLM_API_BASE:
+            call_params["api_base"] = LLM_API_BASE
             
         call_params.update(kwargs)
         
-        # 打印请求入参
-        logger.info(
-            "LLM multimodal request",
-            extra={
-                "event": "llm.multimodal.request",
-                "agent": self.agent_name,
-                "params": json.dumps(_safe_log_params(call_params), ensure_ascii=False, default=str),
-            }
-        )
+        # 打印请求入参（按请求采样）
+        if log_pipeline.payload_sampled():
+            logger.info(
+                "LLM multimodal request",
+                extra={
+                    "event": "llm.multimodal.request",
+                    "agent": self.agent_name,
+                    "params": json.dumps(_safe_log_params(call_params), ensure_ascii=False, default=str),
+                }
+            )
         
         try:
-            response = litellm.completion(**call_params)
+            response = self._completion(call_params)
             
             # 获取返回内容
             content = response.choices[0].message.content
@@ -307,17 +317,18 @@ class UnifiedLLMClient:
                 }
             )
             
-            # 单独打印完整的返回内容
-            logger.info(
-                "Multimodal response content",
-                extra={
-                    "event": "llm.multimodal.content",
-                    "agent": self.agent_name,
-                    "model": model,
-                    "content": content,
-                    "content_length": len(content) if content else 0,
-                }
-            )
+            # 按请求采样记录返回长度（日志不含模型原文），采样请求的完整内容另写入 debug capture
+            if log_pipeline.payload_sampled():
+                logger.info(
+                    "Multimodal response content",
+                    extra={
+                        "event": "llm.multimodal.content",
+                        "agent": self.agent_name,
+                        "model": model,
+                        "content_length": len(content) if content else 0,
+                    }
+                )
+            log_pipeline.capture("llm.multimodal", agent=self.agent_name, model=model, request=call_params, response=content)
             
             return content
         
@@ -338,6 +349,19 @@ class UnifiedLLMClient:
             
             raise
     
+    def _completion(self, params: Dict[str, Any]):
+        """
+        调用 litellm.completion 并记录延迟与 token 指标
+        """
+        model = params.get("model")
+        with metrics.LLM_REQUEST_DURATION.time(agent=self.agent_name, model=model):
+            response = litellm.completion(**params)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            metrics.LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, agent=self.agent_name, model=model, kind="prompt")
+            metrics.LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, agent=self.agent_name, model=model, kind="completion")
+        return response
+
     def _select_model(self) -> str:
         """
         智能模型选择（支持成本控制）
@@ -419,20 +443,23 @@ class UnifiedLLMClient:
         api_key = os.getenv("DASHSCOPE_API_KEY")
         if api_key:
             fallback_params["api_key"] = api_key
+        if LLM_API_BASE:
+            fallback_params["api_base"] = LLM_API_BASE
             
         fallback_params.update(kwargs)
         
-        logger.info(
-            "LLM fallback request",
-            extra={
-                "event": "llm.fallback.request",
-                "agent": self.agent_name,
-                "params": json.dumps(_safe_log_params(fallback_params), ensure_ascii=False, default=str),
-            }
-        )
+        if log_pipeline.payload_sampled():
+            logger.info(
+                "LLM fallback request",
+                extra={
+                    "event": "llm.fallback.request",
+                    "agent": self.agent_name,
+                    "params": json.dumps(_safe_log_params(fallback_params), ensure_ascii=False, default=str),
+                }
+            )
         
         try:
-            response = litellm.completion(**fallback_params)
+            response = self._completion(fallback_params)
             
             # 获取返回内容
             content = response.choices[0].message.content
@@ -448,17 +475,18 @@ class UnifiedLLMClient:
                 }
             )
             
-            # 单独打印完整的返回内容
-            logger.info(
-                "Fallback response content",
-                extra={
-                    "event": "llm.fallback.content",
-                    "agent": self.agent_name,
-                    "model": fallback_model,
-                    "content": content,
-                    "content_length": len(content) if content else 0,
-                }
-            )
+            # 按请求采样记录返回长度（日志不含模型原文），采样请求的完整内容另写入 debug capture
+            if log_pipeline.payload_sampled():
+                logger.info(
+                    "Fallback response content",
+                    extra={
+                        "event": "llm.fallback.content",
+                        "agent": self.agent_name,
+                        "model": fallback_model,
+                        "content_length": len(content) if content else 0,
+                    }
+                )
+            log_pipeline.capture("llm.fallback", agent=self.agent_name, model=fallback_model, request=fallback_params, response=content)
             
             return content
         
@@ -134,6 +134,14 @@ RETRY_CONFIG = {
 }
 
 
+# ============================================
+# 端点覆盖（离线压测：指向 bench/mock_services.py）
+# ============================================
+
+# 非空时所有 LiteLLM 调用（含 fallback）都发往该 OpenAI 兼容地址
+LLM_API_BASE = os.getenv("LLM_API_BASE", "").strip().rstrip("/")
+
+
 # ============================================
 # LiteLLM模型前缀映射
 # ============================================
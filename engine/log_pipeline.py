@@ -0,0 +1,171 @@
+"""
+Log Pipeline
+
+Keeps log formatting and I/O off the task threads:
+
+- ``install(logger)`` replaces the logger's handlers with one ``QueueHandler``;
+  a ``QueueListener`` thread formats records (JSON via orjson when installed)
+  and writes them to the original handlers. Context filters (request/task id)
+  move to the queue handler so they still run in the calling thread. Forked
+  pool children get a fresh queue and listener (``os.register_at_fork``).
+- ``payload_sampled()`` decides, once per request id, whether large payloads
+  (LLM request params, response content) are logged at all
+  (LOG_PAYLOAD_SAMPLE_RATE); ``truncate()`` bounds the ones that are.
+- ``capture()`` writes full prompts and responses of sampled requests to a
+  per-process JSON-lines side file under LOG_DEBUG_CAPTURE_DIR.
+"""
+
+import atexit
+import copy
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from config import Config
+from request_context import request_id_var, task_id_var
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_pipelines: list[dict] = []
+_capture_lock = threading.Lock()
+_capture_logger = None
+_capture_pid = None
+
+
+def dumps(obj) -> str:
+    """JSON-encode a log payload (non-ASCII kept as is)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str).decode("utf-8")
+        except TypeError:
+            # orjson rejects e.g. non-str dict keys and >64-bit ints
+            pass
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+def truncate(value, limit: int | None = None):
+    limit = Config.LOG_FIELD_MAX_CHARS if limit is None else int(limit)
+    if isinstance(value, str) and limit > 0 and len(value) > limit:
+        return value[:limit] + f"... (truncated, total {len(value)} chars)"
+    return value
+
+
+def payload_sampled() -> bool:
+    """Deterministic per request id, so all payload logs of one request are kept or dropped together."""
+    rate = Config.LOG_PAYLOAD_SAMPLE_RATE
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    key = request_id_var.get()
+    if key == "-":
+        key = task_id_var.get()
+    if key == "-":
+        return random.random() < rate
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF < rate
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Formatting happens on the listener thread; only resolve the message here.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def install(logger: logging.Logger, filters: tuple = ()) -> None:
+    """Route ``logger``'s handlers through a background listener thread."""
+    targets = [h for h in logger.handlers if not isinstance(h, QueueHandler)]
+    if not targets:
+        return
+    handler = _NonBlockingQueueHandler(queue.SimpleQueue())
+    for f in filters:
+        handler.addFilter(f)
+        for target in targets:
+            target.removeFilter(f)
+    listener = QueueListener(handler.queue, *targets, respect_handler_level=True)
+    listener.start()
+    logger.handlers = [h for h in logger.handlers if h not in targets] + [handler]
+    _pipelines.append({"handler": handler, "targets": targets, "listener": listener})
+
+
+def stop() -> None:
+    """Drain the queues and stop the listener threads (process exit)."""
+    for p in _pipelines:
+        try:
+            p["listener"].stop()
+        except Exception:
+            pass
+
+
+def _after_fork_in_child() -> None:
+    # The listener thread did not survive the fork, and records still queued belong
+    # to the parent (which writes them), so each child starts with an empty queue.
+    for p in _pipelines:
+        q = queue.SimpleQueue()
+        p["handler"].queue = q
+        p["listener"] = QueueListener(q, *p["targets"], respect_handler_level=True)
+        p["listener"].start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(stop)
+
+
+def _elide_data_urls(obj):
+    if isinstance(obj, str):
+        if obj.startswith("data:") and len(obj) > 256:
+            return f"{obj[:40]}... ({len(obj)} chars)"
+        return obj
+    if isinstance(obj, dict):
+        return {k: _elide_data_urls(v) for k, v in obj.items() if k != "api_key"}
+    if isinstance(obj, (list, tuple)):
+        return [_elide_data_urls(v) for v in obj]
+    return obj
+
+
+def _get_capture_logger():
+    global _capture_logger, _capture_pid
+    with _capture_lock:
+        if _capture_logger is None or _capture_pid != os.getpid():
+            os.makedirs(Config.LOG_DEBUG_CAPTURE_DIR, exist_ok=True)
+            path = os.path.join(Config.LOG_DEBUG_CAPTURE_DIR, f"capture_{os.getpid()}.jsonl")
+            target = logging.FileHandler(path, encoding="utf-8", delay=True)
+            target.setFormatter(logging.Formatter("%(message)s"))
+            cap = logging.getLogger(f"debug_capture.{os.getpid()}")
+            cap.propagate = False
+            cap.setLevel(logging.INFO)
+            cap.handlers = [target]
+            install(cap)
+            _capture_logger, _capture_pid = cap, os.getpid()
+        return _capture_logger
+
+
+def capture(kind: str, **fields) -> None:
+    """Write full request/response payloads for sampled requests (LOG_DEBUG_CAPTURE_DIR)."""
+    if not Config.LOG_DEBUG_CAPTURE_DIR or not payload_sampled():
+        return
+    try:
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "kind": kind,
+            "trace_id": request_id_var.get(),
+            "task_id": task_id_var.get(),
+            **_elide_data_urls(fields),
+        }
+        _get_capture_logger().info(dumps(record))
+    except Exception as e:
+        logging.getLogger(__name__).warning(
+            "Debug capture failed", extra={"event": "log.capture.error", "reason": str(e)[:256]}
+        )
@@ -0,0 +1,52 @@
+"""
+Media Probing
+
+Thin ffprobe wrappers shared by the renderer and the split tasks. Kept free of
+MoviePy so that tasks which only need stream facts do not import the render stack.
+"""
+
+import json
+import subprocess
+
+
+def stream_info(file_path: str) -> dict | None:
+    """ffprobe JSON of the first video stream (``width``, ``height``, ``duration``); None on failure."""
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "stream=width,height,duration",
+        "-of",
+        "json",
+        file_path,
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    try:
+        return json.loads(proc.stdout or "{}")
+    except Exception:
+        return None
+
+
+def has_audio_stream(file_path: str) -> bool:
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "a",
+        "-show_entries",
+        "stream=codec_type",
+        "-of",
+        "csv=p=0",
+        file_path,
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return False
+    out = (proc.stdout or "").strip()
+    return bool(out)
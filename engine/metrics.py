@@ -0,0 +1,427 @@
+"""
+Engine Metrics
+
+Prometheus-style counters, gauges and histograms for the Celery worker, without a
+client library dependency. Celery prefork runs every task in a separate child
+process, so each process keeps its own series in memory and periodically writes
+them to ``METRICS_DIR/metrics_<pid>.prom`` (Prometheus text format, atomic
+replace). The main worker process serves the sum over all files on
+METRICS_PORT (``/metrics``):
+
+- counters and histogram buckets/sums/counts are summed across files, including
+  files of children that have exited (their totals still happened);
+- gauges are summed across live processes only, so an in-flight gauge left by a
+  killed child does not stick.
+
+The catalog of engine metrics lives at the bottom of this module so names,
+labels and buckets are defined in one place.
+"""
+
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_registry: dict[str, "_Metric"] = {}
+_last_flush = 0.0
+_server = None
+_queue_monitor_started = False
+_task_starts: dict[str, tuple[str, float]] = {}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_series(name: str, labels: tuple) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        with _lock:
+            _registry[name] = self
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple((k, "" if labels.get(k) is None else str(labels.get(k))) for k in self.labelnames)
+
+    def _reset(self) -> None:
+        self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if not Config.METRICS_ENABLED or amount is None:
+            return
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + float(amount)
+        _maybe_flush()
+
+    def _lines(self) -> list[str]:
+        return [f"{_format_series(self.name, k)} {v:.6g}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        if not Config.METRICS_ENABLED:
+            return
+        with _lock:
+            self._values[self._key(labels)] = float(value)
+        _maybe_flush()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if not Config.METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + float(amount)
+        _maybe_flush()
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def _lines(self) -> list[str]:
+        return [f"{_format_series(self.name, k)} {v:.6g}" for k, v in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = ()):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        if not Config.METRICS_ENABLED or value is None:
+            return
+        value = float(value)
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+        _maybe_flush()
+
+    def time(self, **labels) -> "_Timer":
+        """``with HIST.time(model=m) as t: ...``; set ``t.labels["outcome"]`` before leaving."""
+        return _Timer(self, labels)
+
+    def _lines(self) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            for bound, n in zip(self.buckets, counts):
+                lines.append(f"{_format_series(self.name + '_bucket', key + (('le', f'{bound:g}'),))} {n}")
+            lines.append(f"{_format_series(self.name + '_bucket', key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{_format_series(self.name + '_sum', key)} {total:.6g}")
+            lines.append(f"{_format_series(self.name + '_count', key)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = dict(labels)
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if "outcome" in self.histogram.labelnames and "outcome" not in self.labels:
+            self.labels["outcome"] = "error" if exc is not None else "ok"
+        self.histogram.observe(time.perf_counter() - self._started, **self.labels)
+        return False
+
+
+def render() -> str:
+    """This process's series in the Prometheus text format."""
+    out = []
+    with _lock:
+        for name in sorted(_registry):
+            metric = _registry[name]
+            if not metric._values:
+                continue
+            out.append(f"# HELP {name} {metric.help}")
+            out.append(f"# TYPE {name} {metric.kind}")
+            out.extend(metric._lines())
+    return "\n".join(out) + "\n"
+
+
+def flush(force: bool = True) -> None:
+    """Write this process's textfile (at most once per METRICS_FLUSH_INTERVAL_SEC unless forced)."""
+    global _last_flush
+    if not Config.METRICS_ENABLED or not Config.METRICS_DIR:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < Config.METRICS_FLUSH_INTERVAL_SEC:
+        return
+    _last_flush = now
+    try:
+        os.makedirs(Config.METRICS_DIR, exist_ok=True)
+        path = os.path.join(Config.METRICS_DIR, f"metrics_{os.getpid()}.prom")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(render())
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.warning("Metrics flush failed", extra={"event": "metrics.flush.error", "reason": str(e)[:256]})
+
+
+def _maybe_flush() -> None:
+    if time.monotonic() - _last_flush >= Config.METRICS_FLUSH_INTERVAL_SEC:
+        flush(force=False)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge_textfiles(path: str | None = None) -> str:
+    """Sum the per-process textfiles into one exposition (see module docstring)."""
+    path = path or Config.METRICS_DIR
+    meta: dict[str, list[str]] = {}
+    kinds: dict[str, str] = {}
+    totals: dict[str, dict[str, float]] = {}
+    try:
+        names = sorted(n for n in os.listdir(path) if n.startswith("metrics_") and n.endswith(".prom"))
+    except OSError:
+        names = []
+    for fname in names:
+        try:
+            pid = int(fname[len("metrics_"):-len(".prom")])
+        except ValueError:
+            pid = 0
+        alive = pid == os.getpid() or (pid > 0 and _pid_alive(pid))
+        try:
+            with open(os.path.join(path, fname), encoding="utf-8") as f:
+                content = f.read()
+        except OSError:
+            continue
+        family = None
+        for raw in content.splitlines():
+            line = raw.strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                parts = line.split(" ", 3)
+                if len(parts) >= 4:
+                    family = parts[2]
+                    meta.setdefault(family, [])
+                    if parts[1] == "HELP" and not any(m.startswith("# HELP") for m in meta[family]):
+                        meta[family].insert(0, line)
+                    elif parts[1] == "TYPE" and family not in kinds:
+                        kinds[family] = parts[3]
+                        meta[family].append(line)
+                continue
+            if family is None:
+                continue
+            if kinds.get(family) == "gauge" and not alive:
+                continue
+            series, _, value = line.rpartition(" ")
+            try:
+                bucket = totals.setdefault(family, {})
+                bucket[series] = bucket.get(series, 0.0) + float(value)
+            except ValueError:
+                continue
+    out = []
+    for family in sorted(totals):
+        out.extend(meta.get(family, []))
+        for series in totals[family]:
+            out.append(f"{series} {totals[family][series]:.6g}")
+    return "\n".join(out) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in {"/metrics", "/"}:
+            self.send_error(404)
+            return
+        flush()
+        body = merge_textfiles().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def reset_textfile_dir() -> None:
+    """Drop textfiles left by a previous worker run (main process, before forking the pool).
+
+    Files of live processes are kept: the io and cpu workers (routing.py) can share
+    one METRICS_DIR and start at different times.
+    """
+    if not Config.METRICS_DIR:
+        return
+    try:
+        for name in os.listdir(Config.METRICS_DIR):
+            if not (name.endswith(".prom") or name.endswith(".tmp")):
+                continue
+            try:
+                pid = int(name[len("metrics_"):].split(".", 1)[0])
+            except ValueError:
+                pid = 0
+            if pid > 0 and pid != os.getpid() and _pid_alive(pid):
+                continue
+            os.remove(os.path.join(Config.METRICS_DIR, name))
+    except OSError:
+        pass
+
+
+def serve(port: int | None = None) -> None:
+    """Serve the merged textfiles on ``port`` from a daemon thread (main worker process)."""
+    global _server
+    port = int(Config.METRICS_PORT if port is None else port)
+    if port <= 0 or _server is not None or not Config.METRICS_ENABLED or not Config.METRICS_DIR:
+        return
+    _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Metrics endpoint started", extra={"event": "metrics.listen", "operation": f":{port}"})
+
+
+def reset_after_fork() -> None:
+    """Pool children: start from empty series and drop the inherited listening socket."""
+    global _server, _last_flush
+    with _lock:
+        for metric in _registry.values():
+            metric._reset()
+    _task_starts.clear()
+    _last_flush = 0.0
+    if _server is not None:
+        try:
+            _server.socket.close()
+        except Exception:
+            pass
+        _server = None
+
+
+def task_started(task_id: str | None, task_name: str) -> None:
+    if not task_id:
+        return
+    _task_starts[task_id] = (task_name, time.monotonic())
+    TASKS_IN_PROGRESS.inc(task=task_name)
+
+
+def task_finished(task_id: str | None, state: str | None) -> None:
+    entry = _task_starts.pop(task_id, None) if task_id else None
+    if entry is None:
+        return
+    task_name, started = entry
+    outcome = {"SUCCESS": "success", "RETRY": "retry"}.get(state or "", "failure")
+    TASK_DURATION.observe(time.monotonic() - started, task=task_name, outcome=outcome)
+    TASKS_IN_PROGRESS.dec(task=task_name)
+    flush()
+
+
+def _queue_depth(client, queue: str) -> int:
+    # The Redis transport keeps one list per priority step: "queue", "queue\x06\x163", ...
+    names = [queue] + [f"{queue}\x06\x16{p}" for p in (3, 6, 9)]
+    pipe = client.pipeline()
+    for name in names:
+        pipe.llen(name)
+    return int(sum(int(n or 0) for n in pipe.execute()))
+
+
+def start_queue_depth_monitor(queues: list[str] | None = None) -> None:
+    """Poll broker queue lengths from a daemon thread (main worker process)."""
+    global _queue_monitor_started
+    if _queue_monitor_started or not Config.METRICS_ENABLED or Config.METRICS_QUEUE_POLL_SEC <= 0:
+        return
+    from redis_client import get_redis
+
+    queues = list(queues or [Config.CELERY_QUEUE_NAME])
+    _queue_monitor_started = True
+
+    def _loop():
+        while True:
+            try:
+                client = get_redis()
+                if client is not None:
+                    for queue in queues:
+                        QUEUE_DEPTH.set(_queue_depth(client, queue), queue=queue)
+                    flush()
+            except Exception as e:
+                logger.warning("Queue depth poll failed", extra={"event": "metrics.queue.error", "reason": str(e)[:256]})
+            time.sleep(Config.METRICS_QUEUE_POLL_SEC)
+
+    threading.Thread(target=_loop, name="metrics-queue", daemon=True).start()
+
+
+_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+TASK_DURATION = Histogram(
+    "engine_task_duration_seconds",
+    "Celery task run time",
+    ("task", "outcome"),
+    (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600),
+)
+TASKS_IN_PROGRESS = Gauge("engine_tasks_in_progress", "Tasks currently executing", ("task",))
+QUEUE_DEPTH = Gauge("engine_queue_depth", "Messages waiting in the broker queue", ("queue",))
+TTS_REQUEST_DURATION = Histogram(
+    "engine_tts_request_duration_seconds", "DashScope TTS call latency", ("model", "outcome"), _LATENCY_BUCKETS
+)
+LLM_REQUEST_DURATION = Histogram(
+    "engine_llm_request_duration_seconds", "LLM completion latency", ("agent", "model", "outcome"), _LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter("engine_llm_tokens_total", "LLM tokens by direction", ("agent", "model", "kind"))
+VISION_REQUEST_DURATION = Histogram(
+    "engine_vision_request_duration_seconds", "Qwen-VL call latency", ("operation", "model", "outcome"), _LATENCY_BUCKETS
+)
+CACHE_LOOKUPS = Counter("engine_cache_lookups_total", "Cache lookups by cache and outcome", ("cache", "outcome"))
+TTS_PREDICTOR_SEGMENTS = Counter(
+    "engine_tts_predictor_segments_total",
+    "Aligned segments by whether the first synthesis landed within tolerance",
+    ("outcome",),
+)
+TRANSFER_BYTES = Counter("engine_transfer_bytes_total", "Bytes moved to/from storage", ("direction", "target"))
+RENDER_ADMISSIONS = Counter(
+    "engine_render_admissions_total", "Render admission decisions (admitted, deferred, bypass)", ("outcome",)
+)
+SINGLEFLIGHT = Counter(
+    "engine_singleflight_total",
+    "Render submissions by single-flight outcome (leader, duplicate, cached, superseded, bypass)",
+    ("task", "outcome"),
+)
+WASTED_RENDER_SECONDS = Counter(
+    "engine_wasted_render_seconds_total", "Task time spent on renders that were later discarded", ("task", "reason")
+)
+RENDERED_VIDEO_SECONDS = Counter("engine_rendered_video_seconds_total", "Seconds of final video encoded")
+SPAN_DURATION = Histogram(
+    "engine_span_duration_seconds", "Task stage wall time (spans.py)", ("span", "status"), _LATENCY_BUCKETS + (300, 600)
+)
+SPAN_CPU_SECONDS = Counter("engine_span_cpu_seconds_total", "CPU time (process + waited subprocesses) in spans", ("span",))
+SPAN_BYTES = Counter("engine_span_bytes_total", "Bytes read/written inside spans", ("span", "direction"))
@@ -0,0 +1,172 @@
+"""
+PCM Audio Helpers
+
+The voice-over pipeline keeps segments as 48 kHz mono 16-bit PCM (WAV files on
+disk, int16 numpy arrays in memory). Silence and padding are zero arrays and
+concatenation is ``np.concatenate``; audio is compressed exactly once, for the
+MP3 preview (``encode_mp3``) and for the AAC track of the final mux (by MoviePy).
+"""
+
+import os
+import subprocess
+import uuid
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 48000
+CHANNELS = 1
+SAMPLE_WIDTH = 2
+
+
+def is_wav(path: str) -> bool:
+    return str(path).lower().endswith(".wav")
+
+
+def silence(duration_sec: float) -> np.ndarray:
+    return np.zeros(max(0, int(round(float(duration_sec) * SAMPLE_RATE))), dtype=np.int16)
+
+
+def duration_sec(samples: np.ndarray) -> float:
+    return len(samples) / float(SAMPLE_RATE)
+
+
+def wav_duration_sec(path: str) -> float:
+    with wave.open(path, "rb") as wf:
+        return wf.getnframes() / float(wf.getframerate() or SAMPLE_RATE)
+
+
+def write_wav(path: str, samples: np.ndarray) -> str:
+    """Write int16 mono samples atomically (readers never see a partial file)."""
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with wave.open(tmp, "wb") as wf:
+            wf.setnchannels(CHANNELS)
+            wf.setsampwidth(SAMPLE_WIDTH)
+            wf.setframerate(SAMPLE_RATE)
+            wf.writeframes(np.ascontiguousarray(samples, dtype="<i2").tobytes())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def write_pcm_bytes_as_wav(path: str, pcm: bytes) -> str:
+    """Wrap raw s16le mono PCM (as returned by the TTS API) in a WAV container."""
+    usable = len(pcm) - (len(pcm) % SAMPLE_WIDTH)
+    return write_wav(path, np.frombuffer(pcm[:usable], dtype="<i2"))
+
+
+def decode_with_ffmpeg(path: str) -> np.ndarray:
+    """Decode any container/codec ffmpeg understands into the pipeline's PCM format."""
+    cmd = [
+        "ffmpeg",
+        "-v",
+        "error",
+        "-i",
+        path,
+        "-f",
+        "s16le",
+        "-acodec",
+        "pcm_s16le",
+        "-ac",
+        str(CHANNELS),
+        "-ar",
+        str(SAMPLE_RATE),
+        "pipe:1",
+    ]
+    proc = subprocess.run(cmd, capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError((proc.stderr or b"").decode("utf-8", "replace").strip()[-800:] or "ffmpeg decode failed")
+    return np.frombuffer(proc.stdout, dtype="<i2")
+
+
+def read_pcm(path: str) -> np.ndarray:
+    """Read a pipeline WAV directly; anything else (MP3 from the legacy engine) via ffmpeg."""
+    if is_wav(path):
+        with wave.open(path, "rb") as wf:
+            if (wf.getnchannels(), wf.getsampwidth(), wf.getframerate()) == (CHANNELS, SAMPLE_WIDTH, SAMPLE_RATE):
+                return np.frombuffer(wf.readframes(wf.getnframes()), dtype="<i2")
+    return decode_with_ffmpeg(path)
+
+
+def concat_files(paths: list[str]) -> np.ndarray:
+    parts = [read_pcm(p) for p in paths]
+    if not parts:
+        return np.zeros(0, dtype=np.int16)
+    return np.concatenate(parts)
+
+
+def concat_to_wav(paths: list[str], output_path: str, block_frames: int = SAMPLE_RATE) -> str:
+    """Stream-concatenate pipeline WAVs block by block (memory does not grow with length)."""
+    tmp = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with wave.open(tmp, "wb") as out:
+            out.setnchannels(CHANNELS)
+            out.setsampwidth(SAMPLE_WIDTH)
+            out.setframerate(SAMPLE_RATE)
+            for path in paths:
+                with wave.open(path, "rb") as src:
+                    if (src.getnchannels(), src.getsampwidth(), src.getframerate()) != (CHANNELS, SAMPLE_WIDTH, SAMPLE_RATE):
+                        out.writeframes(np.ascontiguousarray(decode_with_ffmpeg(path), dtype="<i2").tobytes())
+                        continue
+                    while True:
+                        block = src.readframes(block_frames)
+                        if not block:
+                            break
+                        out.writeframes(block)
+        os.replace(tmp, output_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return output_path
+
+
+def to_stereo_float(samples: np.ndarray) -> np.ndarray:
+    """(N, 2) float32 in [-1, 1] for MoviePy's AudioArrayClip; both channels share memory."""
+    mono = samples.astype(np.float32) / 32768.0
+    return np.broadcast_to(mono[:, None], (len(mono), 2))
+
+
+def time_stretch(samples: np.ndarray, tempo: float, audio_filter: str | None = None) -> np.ndarray:
+    """Pitch-preserving tempo change through an ffmpeg filter, PCM in and PCM out (lossless)."""
+    audio_filter = audio_filter or f"atempo={tempo:.5f}"
+    fmt = ["-f", "s16le", "-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE)]
+    cmd = ["ffmpeg", "-v", "error", *fmt, "-i", "pipe:0", "-filter:a", audio_filter, *fmt, "-acodec", "pcm_s16le", "pipe:1"]
+    proc = subprocess.run(cmd, input=np.ascontiguousarray(samples, dtype="<i2").tobytes(), capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError((proc.stderr or b"").decode("utf-8", "replace").strip()[-800:] or "ffmpeg time-stretch failed")
+    return np.frombuffer(proc.stdout, dtype="<i2")
+
+
+def encode_mp3(samples: np.ndarray, output_path: str, quality: int = 2) -> str:
+    """The single lossy encode of the preview track."""
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-v",
+        "error",
+        "-f",
+        "s16le",
+        "-ac",
+        str(CHANNELS),
+        "-ar",
+        str(SAMPLE_RATE),
+        "-i",
+        "pipe:0",
+        "-c:a",
+        "libmp3lame",
+        "-q:a",
+        str(int(quality)),
+        output_path,
+    ]
+    proc = subprocess.run(cmd, input=np.ascontiguousarray(samples, dtype="<i2").tobytes(), capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError((proc.stderr or b"").decode("utf-8", "replace").strip()[-800:] or "ffmpeg mp3 encode failed")
+    return output_path
+
+
+def encode_files_to_mp3(paths: list[str], output_path: str) -> str:
+    """Concatenate segment files in memory and encode them once."""
+    return encode_mp3(concat_files(paths), output_path)
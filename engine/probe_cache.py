@@ -0,0 +1,55 @@
+"""
+Asset Probe Cache
+
+Remembers ffprobe facts (frame size, duration) per asset id so that later tasks
+can plan without downloading the source again. analyze_video_task and the smart
+split record what they probe; render admission (admission.py) reads it to
+estimate the cost of a render. Backed by Redis; without Redis every lookup is a
+miss and callers fall back to conservative defaults.
+"""
+
+import json
+import logging
+
+import metrics
+from config import Config
+from redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "ai-video:probe:"
+
+
+def remember(asset_id: str, *, width: int, height: int, duration: float) -> None:
+    client = get_redis()
+    if client is None or not asset_id or width <= 0 or height <= 0:
+        return
+    value = json.dumps({"width": int(width), "height": int(height), "duration": round(float(duration or 0.0), 3)})
+    try:
+        client.set(_KEY_PREFIX + str(asset_id), value, ex=max(60, Config.PROBE_CACHE_TTL_SEC))
+    except Exception as e:
+        logger.warning("Probe cache write failed", extra={"event": "probe_cache.error", "reason": str(e)[:256]})
+
+
+def lookup_many(asset_ids: list[str]) -> dict[str, dict]:
+    """``{asset_id: {"width", "height", "duration"}}`` for the ids that are cached."""
+    ids = [str(a) for a in asset_ids if a]
+    client = get_redis()
+    if client is None or not ids:
+        return {}
+    try:
+        values = client.mget([_KEY_PREFIX + a for a in ids])
+    except Exception as e:
+        logger.warning("Probe cache read failed", extra={"event": "probe_cache.error", "reason": str(e)[:256]})
+        return {}
+    found = {}
+    for asset_id, raw in zip(ids, values):
+        if raw is None:
+            metrics.CACHE_LOOKUPS.inc(cache="probe", outcome="miss")
+            continue
+        try:
+            found[asset_id] = json.loads(raw)
+            metrics.CACHE_LOOKUPS.inc(cache="probe", outcome="hit")
+        except Exception:
+            metrics.CACHE_LOOKUPS.inc(cache="probe", outcome="miss")
+    return found
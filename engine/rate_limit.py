@@ -0,0 +1,84 @@
+"""
+Token-Bucket Rate Limiter
+
+Keeps outbound API calls (e.g. DashScope TTS) within a provider QPS quota. With
+Redis configured the bucket is shared by every worker process through an atomic
+Lua script using the Redis server clock; otherwise it falls back to an in-process
+bucket.
+"""
+
+import logging
+import threading
+import time
+
+from redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "ai-video:ratelimit:"
+
+# Returns the seconds to wait (0 when a token was taken).
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+if tokens >= 1 then
+  redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'ts', now)
+  redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+  return '0'
+end
+return tostring((1 - tokens) / rate)
+"""
+
+
+class TokenBucket:
+    """``acquire()`` blocks until a token is available; ``rate`` tokens/sec, up to ``burst``."""
+
+    def __init__(self, name: str, rate: float, burst: float | None = None):
+        self.name = name
+        self.rate = max(0.01, float(rate))
+        self.burst = max(1.0, float(burst if burst is not None else rate))
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._ts = time.monotonic()
+        self._script = None
+
+    def _take_local(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._ts) * self.rate)
+            self._ts = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def _take_redis(self, client) -> float:
+        if self._script is None:
+            self._script = client.register_script(_TAKE_SCRIPT)
+        return float(self._script(keys=[_KEY_PREFIX + self.name], args=[self.rate, self.burst]))
+
+    def acquire(self, timeout: float | None = None) -> float:
+        """Wait for a token; returns seconds waited. Raises TimeoutError past ``timeout``."""
+        started = time.monotonic()
+        while True:
+            wait = None
+            client = get_redis()
+            if client is not None:
+                try:
+                    wait = self._take_redis(client)
+                except Exception:
+                    self._script = None
+                    wait = None
+            if wait is None:
+                wait = self._take_local()
+            if wait <= 0:
+                return time.monotonic() - started
+            if timeout is not None and time.monotonic() - started + wait > timeout:
+                raise TimeoutError(f"rate limiter '{self.name}' wait exceeded {timeout}s")
+            time.sleep(min(wait, 1.0))
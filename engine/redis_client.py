@@ -0,0 +1,42 @@
+"""
+Shared Redis Client
+
+Lazily creates one Redis connection pool per process for engine-side caches and
+coordination (separate from the Celery broker connection). Celery prefork children
+inherit module state from the parent, so the client is keyed by pid and rebuilt
+after a fork instead of sharing the parent's sockets.
+"""
+
+import logging
+import os
+import threading
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+
+
+def get_redis():
+    """Return a process-local ``redis.Redis`` client, or None when REDIS_URL is unset."""
+    global _client, _client_pid
+    if not Config.REDIS_URL:
+        return None
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _lock:
+        if _client is None or _client_pid != pid:
+            import redis
+
+            _client = redis.Redis.from_url(
+                Config.REDIS_URL,
+                socket_timeout=5,
+                socket_connect_timeout=5,
+                health_check_interval=30,
+            )
+            _client_pid = pid
+    return _client
@@ -0,0 +1,13 @@
+"""
+Request Context
+
+Context variables identifying the task being executed. ``worker.py`` sets them
+in ``task_prerun`` from the Celery request headers; logging, spans and sampling
+read them without importing the Celery app.
+"""
+
+import contextvars
+
+request_id_var = contextvars.ContextVar("request_id", default="-")
+user_id_var = contextvars.ContextVar("user_id", default="-")
+task_id_var = contextvars.ContextVar("task_id", default="-")
@@ -0,0 +1,152 @@
+"""
+Worker Resources
+
+Lazy, per-process accessors for the heavy objects the tasks share (scene detector,
+script generator, TTS generator, Aliyun client, SFX library, video renderer).
+Nothing is imported or constructed until a task first asks for it, so importing
+``tasks.py`` stays cheap (no moviepy, cv2, scenedetect, DashScope, litellm or
+boto3), and each Celery prefork child builds only what the tasks it runs use.
+
+Instances are keyed by pid like ``redis_client.get_redis``: a child never reuses
+an object (sockets, thread pools) built in its parent.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_instances: dict = {}
+_dashscope_pid = None
+
+
+def _reset_lock_in_child() -> None:
+    global _lock
+    _lock = threading.RLock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_lock_in_child)
+
+
+def _get(name: str, factory):
+    pid = os.getpid()
+    entry = _instances.get(name)
+    if entry is not None and entry[0] == pid:
+        return entry[1]
+    with _lock:
+        entry = _instances.get(name)
+        if entry is None or entry[0] != pid:
+            started = time.perf_counter()
+            entry = (pid, factory())
+            _instances[name] = entry
+            logger.info(
+                "Resource initialized",
+                extra={
+                    "event": "resource.init",
+                    "step": name,
+                    "duration_ms": int((time.perf_counter() - started) * 1000),
+                },
+            )
+    return entry[1]
+
+
+def configure_dashscope() -> None:
+    """Import the DashScope SDK and apply endpoint overrides once per process."""
+    global _dashscope_pid
+    if _dashscope_pid == os.getpid():
+        return
+    import dashscope
+
+    if Config.DASHSCOPE_HTTP_BASE_URL:
+        dashscope.base_http_api_url = Config.DASHSCOPE_HTTP_BASE_URL
+    if Config.DASHSCOPE_WEBSOCKET_BASE_URL:
+        dashscope.base_websocket_api_url = Config.DASHSCOPE_WEBSOCKET_BASE_URL
+    _dashscope_pid = os.getpid()
+
+
+def _configure_imagemagick() -> None:
+    # MoviePy renders TextClip subtitles through ImageMagick
+    from moviepy.config import change_settings
+
+    binary = shutil.which("magick") or shutil.which("convert")
+    if binary:
+        change_settings({"IMAGEMAGICK_BINARY": binary})
+        logger.info(f"MoviePy ImageMagick configured: {binary}")
+    else:
+        logger.warning("ImageMagick not found - subtitle rendering may fail")
+
+
+def _build_scene_detector():
+    configure_dashscope()
+    from vision import SceneDetector
+
+    return SceneDetector()
+
+
+def _build_script_generator():
+    configure_dashscope()
+    from script_gen import ScriptGenerator
+
+    return ScriptGenerator()
+
+
+def _build_audio_generator():
+    configure_dashscope()
+    from audio_gen import AudioGenerator
+
+    return AudioGenerator()
+
+
+def _build_aliyun_client():
+    from aliyun_client import AliyunClient
+
+    return AliyunClient()
+
+
+def _build_sfx_library():
+    from sfx_library import SFXLibrary
+
+    return SFXLibrary()
+
+
+def _build_video_renderer():
+    configure_dashscope()
+    try:
+        _configure_imagemagick()
+    except Exception as e:
+        logger.warning(f"Failed to configure MoviePy ImageMagick: {e}")
+    from video_render import VideoRenderer
+
+    # Inject dependencies
+    return VideoRenderer(aliyun_client=aliyun_client(), sfx_library=sfx_library())
+
+
+def scene_detector():
+    return _get("scene_detector", _build_scene_detector)
+
+
+def script_generator():
+    return _get("script_generator", _build_script_generator)
+
+
+def audio_generator():
+    return _get("audio_generator", _build_audio_generator)
+
+
+def aliyun_client():
+    return _get("aliyun_client", _build_aliyun_client)
+
+
+def sfx_library():
+    return _get("sfx_library", _build_sfx_library)
+
+
+def video_renderer():
+    return _get("video_renderer", _build_video_renderer)
@@ -0,0 +1,169 @@
+"""
+Task Routing
+
+Splits engine tasks by workload class so I/O-bound and CPU-bound work stop
+competing for the same pool slots:
+
+- ``io``  (CELERY_IO_QUEUE_NAME): LLM script generation, TTS, Aliyun enhancement.
+  Served by a threads pool with high concurrency; tasks mostly wait on HTTP.
+- ``cpu`` (CELERY_CPU_QUEUE_NAME): analysis (frame decode, shot detection, split
+  encodes) and rendering. Served by a prefork pool sized to the cores.
+
+The class of each task comes from CELERY_TASK_ROUTES
+(``analyze_video_task=cpu,generate_script_task=io,...``); tasks not listed use
+CELERY_DEFAULT_ROUTE. Values are ``io``, ``cpu`` or a literal queue name.
+
+Tasks published from Python (retries, sub-tasks) are routed by Celery's
+``task_routes``. The Java backend pushes raw messages onto the single
+CELERY_QUEUE_NAME list, so ``start_relay()`` runs a thread in the main process of
+the worker that serves the io queue and moves those messages, unchanged, onto the
+queue of their task with one atomic Lua script per batch. Several relays may run
+at once; a message is moved exactly once.
+"""
+
+import json
+import logging
+import threading
+import time
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+TASK_MODULE = "tasks"
+
+# KEYS[1] = ingress list; ARGV[1] = JSON {task name: queue}; ARGV[2] = default queue; ARGV[3] = batch size.
+# Kombu consumes with BRPOP and producers LPUSH, so RPOP + LPUSH keeps FIFO order.
+_RELAY_LUA = """
+local routes = cjson.decode(ARGV[1])
+local moved = 0
+for i = 1, tonumber(ARGV[3]) do
+  local msg = redis.call('RPOP', KEYS[1])
+  if not msg then break end
+  local target = ARGV[2]
+  local ok, decoded = pcall(cjson.decode, msg)
+  if ok and type(decoded) == 'table' and type(decoded['headers']) == 'table' then
+    local name = decoded['headers']['task']
+    if type(name) == 'string' and routes[name] then target = routes[name] end
+  end
+  redis.call('LPUSH', target, msg)
+  moved = moved + 1
+end
+return moved
+"""
+
+_relay_started = False
+
+
+def _queue_for_class(value: str) -> str:
+    value = (value or "").strip()
+    if value == "io":
+        return Config.CELERY_IO_QUEUE_NAME
+    if value == "cpu":
+        return Config.CELERY_CPU_QUEUE_NAME
+    return value
+
+
+def _qualified(task: str) -> str:
+    task = task.strip()
+    return task if "." in task else f"{TASK_MODULE}.{task}"
+
+
+def route_map() -> dict:
+    """``{"tasks.<name>": queue}`` parsed from CELERY_TASK_ROUTES."""
+    routes = {}
+    for item in (Config.CELERY_TASK_ROUTES or "").split(","):
+        if "=" not in item:
+            continue
+        task, cls = item.split("=", 1)
+        queue = _queue_for_class(cls)
+        if task.strip() and queue:
+            routes[_qualified(task)] = queue
+    return routes
+
+
+def default_queue() -> str:
+    return _queue_for_class(Config.CELERY_DEFAULT_ROUTE) or Config.CELERY_IO_QUEUE_NAME
+
+
+def queue_for(task_name: str) -> str:
+    if not Config.CELERY_ROUTING_ENABLED:
+        return Config.CELERY_QUEUE_NAME
+    return route_map().get(_qualified(task_name), default_queue())
+
+
+def queue_names() -> list[str]:
+    """Queues a worker started without ``-Q`` consumes (ingress first)."""
+    names = [Config.CELERY_QUEUE_NAME]
+    if Config.CELERY_ROUTING_ENABLED:
+        for q in [Config.CELERY_IO_QUEUE_NAME, Config.CELERY_CPU_QUEUE_NAME, *route_map().values()]:
+            if q and q not in names:
+                names.append(q)
+    return names
+
+
+def celery_task_routes() -> dict:
+    if not Config.CELERY_ROUTING_ENABLED:
+        return {}
+    return {task: {"queue": queue} for task, queue in route_map().items()}
+
+
+def consumed_queues(app) -> list[str]:
+    """Queues this worker consumes (``-Q``), or all configured queues."""
+    try:
+        selected = list(app.amqp.queues.consume_from or {})
+    except Exception:
+        selected = []
+    return selected or queue_names()
+
+
+def is_front_worker(app) -> bool:
+    """The worker that serves the io queue relays ingress messages and owns the shared monitors."""
+    if not Config.CELERY_ROUTING_ENABLED:
+        return True
+    queues = consumed_queues(app)
+    return Config.CELERY_IO_QUEUE_NAME in queues or Config.CELERY_QUEUE_NAME in queues
+
+
+def start_relay() -> None:
+    """Move ingress messages to their workload queue from a daemon thread (main worker process)."""
+    global _relay_started
+    if _relay_started or not Config.CELERY_ROUTING_ENABLED:
+        return
+    from redis_client import get_redis
+
+    routes = json.dumps(route_map())
+    fallback = default_queue()
+    ingress = Config.CELERY_QUEUE_NAME
+    if fallback == ingress or ingress in route_map().values():
+        logger.warning(
+            "Task relay disabled: ingress queue is also a route target",
+            extra={"event": "routing.relay.disabled", "reason": ingress},
+        )
+        return
+    _relay_started = True
+
+    def _loop():
+        script = None
+        while True:
+            try:
+                client = get_redis()
+                if client is None:
+                    time.sleep(5)
+                    continue
+                if script is None:
+                    script = client.register_script(_RELAY_LUA)
+                moved = int(script(keys=[ingress], args=[routes, fallback, Config.CELERY_RELAY_BATCH]) or 0)
+                if moved:
+                    logger.debug("Relayed tasks", extra={"event": "routing.relay", "hits": moved})
+                    continue
+            except Exception as e:
+                logger.warning("Task relay failed", extra={"event": "routing.relay.error", "reason": str(e)[:256]})
+                time.sleep(1)
+            time.sleep(Config.CELERY_RELAY_POLL_SEC)
+
+    threading.Thread(target=_loop, name="task-relay", daemon=True).start()
+    logger.info(
+        "Task relay started",
+        extra={"event": "routing.relay.start", "operation": f"{ingress} -> {sorted(set(route_map().values()) | {fallback})}"},
+    )
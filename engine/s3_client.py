@@ -0,0 +1,38 @@
+"""
+Shared S3 Client
+
+Lazily creates one boto3 S3 client per process for uploads, downloads and the
+TTS cache. boto3 is imported on first use, so importing the task modules stays
+cheap; the client is keyed by pid because Celery prefork children must not share
+the parent's connection pool.
+"""
+
+import os
+import threading
+
+from config import Config
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+
+
+def get_s3():
+    """Return a process-local boto3 S3 client for the configured storage endpoint."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _lock:
+        if _client is None or _client_pid != pid:
+            import boto3
+
+            _client = boto3.client(
+                "s3",
+                endpoint_url=Config.S3_STORAGE_ENDPOINT,
+                aws_access_key_id=Config.S3_STORAGE_ACCESS_KEY,
+                aws_secret_access_key=Config.S3_STORAGE_SECRET_KEY,
+                region_name=Config.S3_STORAGE_REGION,
+            )
+            _client_pid = pid
+    return _client
@@ -0,0 +1,533 @@
+"""
+Fast Shot Detection Module
+
+Detects hard cuts on a downscaled, frame-decimated ffmpeg decode stream instead of
+decoding every frame at native resolution. Frames are piped as raw BGR24 into numpy
+buffers, scored in batches with vectorized HSV histogram and luma deltas, and cut
+with an adaptive (rolling mean + k * std) threshold.
+
+Returns the same ``[(start_sec, end_sec), ...]`` shape as
+``SceneDetector.detect_video_shots`` so callers can switch detectors freely.
+``FastShotDetector.analyze`` extends the same decode into a single analysis pass
+that also yields the representative keyframe per shot.
+"""
+
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_H_BINS = 16
+_S_BINS = 16
+_V_BINS = 16
+
+
+def _parse_rate(value) -> float:
+    try:
+        text = str(value or "")
+        if "/" in text:
+            num, den = text.split("/", 1)
+            den_f = float(den)
+            return float(num) / den_f if den_f else 0.0
+        return float(text)
+    except Exception:
+        return 0.0
+
+
+def probe_video(video_path: str) -> dict:
+    """Probe frame rate, duration and display size of the first video stream."""
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "stream=width,height,duration,avg_frame_rate,r_frame_rate:stream_tags=rotate"
+        ":stream_side_data=rotation:format=duration",
+        "-of",
+        "json",
+        video_path,
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {(proc.stderr or '').strip()[-300:]}")
+    info = json.loads(proc.stdout or "{}")
+    streams = info.get("streams") or []
+    if not streams:
+        raise RuntimeError("No video stream found")
+    s0 = streams[0] or {}
+
+    fps = _parse_rate(s0.get("avg_frame_rate")) or _parse_rate(s0.get("r_frame_rate"))
+    try:
+        duration = float(s0.get("duration") or 0.0)
+    except Exception:
+        duration = 0.0
+    if duration <= 0:
+        try:
+            duration = float((info.get("format") or {}).get("duration") or 0.0)
+        except Exception:
+            duration = 0.0
+
+    width = int(s0.get("width") or 0)
+    height = int(s0.get("height") or 0)
+    rotation = 0
+    try:
+        rotation = int(float((s0.get("tags") or {}).get("rotate") or 0))
+    except Exception:
+        rotation = 0
+    for side in s0.get("side_data_list") or []:
+        if "rotation" in side:
+            try:
+                rotation = int(float(side["rotation"]))
+            except Exception:
+                pass
+    if abs(rotation) % 180 == 90:
+        # ffmpeg autorotates on decode, so the display size is swapped.
+        width, height = height, width
+
+    return {
+        "fps": float(fps),
+        "duration": float(duration),
+        "width": width,
+        "height": height,
+    }
+
+
+def _fit_within(width: int, height: int, max_dim: int) -> tuple[int, int]:
+    if width <= 0 or height <= 0:
+        width, height = 1280, 720
+    scale = min(1.0, float(max_dim) / float(max(width, height)))
+    w = max(2, int(round(width * scale)))
+    h = max(2, int(round(height * scale)))
+    return w - w % 2, h - h % 2
+
+
+class KeyframeBuffer:
+    """Bounded in-memory buffer of JPEG-encoded candidate keyframes.
+
+    When the buffer is full every other candidate is dropped and the sampling
+    stride doubles, so memory stays bounded on long videos while candidates remain
+    evenly spread over the whole timeline.
+    """
+
+    def __init__(self, max_frames: int, jpeg_quality: int = 92):
+        self.max_frames = max(8, int(max_frames))
+        self.jpeg_quality = int(jpeg_quality)
+        self.stride = 1
+        self.entries: list[tuple[float, bytes]] = []
+        self._offered = 0
+
+    def offer(self, t: float, frame: np.ndarray) -> None:
+        index = self._offered
+        self._offered += 1
+        if index % self.stride:
+            return
+        ok, encoded = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        if not ok:
+            return
+        self.entries.append((float(t), encoded.tobytes()))
+        if len(self.entries) > self.max_frames:
+            self.entries = self.entries[::2]
+            self.stride *= 2
+
+    def nearest(self, t: float, lo: float | None = None, hi: float | None = None) -> tuple[float, bytes] | None:
+        """Candidate closest to ``t``, preferring candidates inside ``[lo, hi)``."""
+        if not self.entries:
+            return None
+        pool = self.entries
+        if lo is not None and hi is not None:
+            inside = [e for e in self.entries if lo <= e[0] < hi]
+            if inside:
+                pool = inside
+        return min(pool, key=lambda e: abs(e[0] - t))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(e[1]) for e in self.entries)
+
+
+class FastShotDetector:
+    """Histogram-delta shot detector over a low-resolution ffmpeg frame stream."""
+
+    def __init__(
+        self,
+        width: int | None = None,
+        frame_step: int | None = None,
+        sensitivity: float | None = None,
+        min_score: float | None = None,
+        min_shot_sec: float | None = None,
+        window_sec: float = 2.0,
+        batch_frames: int = 64,
+    ):
+        self.width = int(width or Config.SHOT_DETECT_WIDTH)
+        self.frame_step = max(1, int(frame_step or Config.SHOT_DETECT_FRAME_STEP))
+        self.sensitivity = float(Config.SHOT_DETECT_SENSITIVITY if sensitivity is None else sensitivity)
+        self.min_score = float(Config.SHOT_DETECT_MIN_SCORE if min_score is None else min_score)
+        self.min_shot_sec = float(Config.SHOT_DETECT_MIN_SHOT_SEC if min_shot_sec is None else min_shot_sec)
+        self.window_sec = float(window_sec)
+        self.batch_frames = max(2, int(batch_frames))
+
+    def _scaled_size(self, src_w: int, src_h: int) -> tuple[int, int]:
+        w = max(16, self.width - self.width % 2)
+        if src_w > 0 and src_h > 0:
+            h = int(round(w * src_h / src_w))
+        else:
+            h = int(round(w * 9 / 16))
+        h = max(16, h - h % 2)
+        return w, h
+
+    def iter_frames(self, video_path: str, probe: dict):
+        """Yield ``(first_index, frames, analysis_fps)`` batches of BGR frames.
+
+        Frames are decoded at ``fps / frame_step`` via the ffmpeg ``fps`` filter, so
+        frame ``i`` of the stream sits at ``i / analysis_fps`` seconds even for
+        variable-frame-rate phone footage.
+        """
+        w, h = self._scaled_size(probe["width"], probe["height"])
+        src_fps = probe["fps"] if probe["fps"] > 0 else 30.0
+        out_fps = src_fps / self.frame_step
+        frame_bytes = w * h * 3
+        cmd = [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-nostdin",
+            # Deblocking and bit-exact decoding do not matter at 160px histogram scale.
+            "-skip_loop_filter",
+            "all",
+            "-flags2",
+            "fast",
+            "-i",
+            video_path,
+            "-an",
+            "-sn",
+            "-vf",
+            f"fps={out_fps:.6f},scale={w}:{h}:flags=area",
+            "-pix_fmt",
+            "bgr24",
+            "-f",
+            "rawvideo",
+            "pipe:1",
+        ]
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=frame_bytes * self.batch_frames,
+        )
+        index = 0
+        try:
+            while True:
+                buf = proc.stdout.read(frame_bytes * self.batch_frames)
+                usable = len(buf) - len(buf) % frame_bytes
+                if usable <= 0:
+                    break
+                frames = np.frombuffer(buf[:usable], dtype=np.uint8).reshape(-1, h, w, 3)
+                yield index, frames, out_fps
+                index += frames.shape[0]
+                if usable < len(buf) or len(buf) < frame_bytes * self.batch_frames:
+                    break
+        finally:
+            try:
+                proc.stdout.close()
+            except Exception:
+                pass
+            stderr = b""
+            try:
+                stderr = proc.stderr.read() or b""
+                proc.stderr.close()
+            except Exception:
+                pass
+            if proc.poll() is None:
+                proc.kill()
+            returncode = proc.wait()
+            if returncode not in (0, None) and index == 0:
+                raise RuntimeError(
+                    f"ffmpeg decode failed: {stderr.decode('utf-8', 'ignore').strip()[-300:]}"
+                )
+
+    @staticmethod
+    def frame_features(frames: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return normalized HSV histograms ``(N, bins)`` and brightness (V) planes ``(N, h, w)``.
+
+        The whole batch is converted to HSV in one cv2 call by stacking frames
+        vertically, and per-frame histograms come from a single ``np.bincount`` over
+        frame-offset bin indices.
+        """
+        n, h, w, _ = frames.shape
+        hsv = cv2.cvtColor(frames.reshape(n * h, w, 3), cv2.COLOR_BGR2HSV).reshape(n, h * w, 3)
+        hue = (hsv[:, :, 0].astype(np.int32) * _H_BINS) // 180
+        sat = (hsv[:, :, 1].astype(np.int32) * _S_BINS) // 256
+        val = (hsv[:, :, 2].astype(np.int32) * _V_BINS) // 256
+        bins = _H_BINS + _S_BINS + _V_BINS
+        offsets = (np.arange(n, dtype=np.int32) * bins)[:, None]
+        idx = np.concatenate(
+            [hue + offsets, sat + _H_BINS + offsets, val + _H_BINS + _S_BINS + offsets],
+            axis=1,
+        )
+        hist = np.bincount(idx.ravel(), minlength=n * bins).reshape(n, bins).astype(np.float32)
+        hist /= float(h * w)
+        luma = hsv[:, :, 2].astype(np.float32).reshape(n, h, w)
+        return hist, luma
+
+    @staticmethod
+    def delta_scores(
+        hist: np.ndarray,
+        luma: np.ndarray,
+        prev_hist: np.ndarray | None,
+        prev_luma: np.ndarray | None,
+    ) -> np.ndarray:
+        """Score each frame against its predecessor; values are in ``[0, 1]``."""
+        if prev_hist is not None:
+            hist = np.concatenate([prev_hist[None, :], hist], axis=0)
+            luma = np.concatenate([prev_luma[None, :, :], luma], axis=0)
+        if hist.shape[0] < 2:
+            return np.zeros((0,), dtype=np.float32)
+        # Half L1 distance per channel group is the share of pixels that changed bins.
+        hist_delta = np.abs(np.diff(hist, axis=0)).sum(axis=1) / 6.0
+        luma_delta = np.abs(np.diff(luma, axis=0)).mean(axis=(1, 2)) / 255.0
+        return (0.6 * hist_delta + 0.4 * luma_delta).astype(np.float32)
+
+    def detect_cuts(self, scores: np.ndarray, fps: float) -> list[int]:
+        """Pick cut frame indices from per-frame delta scores (score ``i`` is frame ``i + 1``)."""
+        window = max(4, int(round(self.window_sec * fps)))
+        min_gap = max(1, int(round(self.min_shot_sec * fps)))
+        history: deque[float] = deque(maxlen=window)
+        cuts: list[int] = []
+        last_cut = 0
+        for i, score in enumerate(scores.tolist()):
+            frame_idx = i + 1
+            if len(history) >= 2:
+                arr = np.fromiter(history, dtype=np.float32)
+                threshold = max(self.min_score, float(arr.mean() + self.sensitivity * arr.std()))
+            else:
+                threshold = max(self.min_score, 2.0 * self.min_score)
+            is_peak = score >= threshold and (
+                i + 1 >= len(scores) or score >= float(scores[i + 1])
+            )
+            if is_peak and frame_idx - last_cut >= min_gap:
+                cuts.append(frame_idx)
+                last_cut = frame_idx
+                # A cut starts a new shot: do not let its spike inflate the next baseline.
+                history.clear()
+                continue
+            history.append(float(score))
+        return cuts
+
+    def shots_from_scores(self, scores: np.ndarray, fps: float, duration: float) -> list[tuple[float, float]]:
+        cuts = self.detect_cuts(scores, fps) if fps > 0 else []
+        shots: list[tuple[float, float]] = []
+        if cuts:
+            bounds = [0.0] + [min(duration, c / fps) for c in cuts] + [duration]
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                if end > start:
+                    shots.append((float(start), float(end)))
+        return shots
+
+    def detect(self, video_path: str, probe: dict | None = None) -> list[tuple[float, float]]:
+        """Detect shots; returns ``[]`` when no cut is found, like PySceneDetect."""
+        started = time.monotonic()
+        probe = probe or probe_video(video_path)
+        prev_hist = None
+        prev_luma = None
+        score_batches = []
+        total_frames = 0
+        out_fps = 0.0
+        for _, frames, out_fps in self.iter_frames(video_path, probe):
+            hist, luma = self.frame_features(frames)
+            score_batches.append(self.delta_scores(hist, luma, prev_hist, prev_luma))
+            prev_hist, prev_luma = hist[-1], luma[-1]
+            total_frames += frames.shape[0]
+
+        scores = np.concatenate(score_batches) if score_batches else np.zeros((0,), dtype=np.float32)
+        duration = probe["duration"] if probe["duration"] > 0 else (total_frames / out_fps if out_fps else 0.0)
+        shots = self.shots_from_scores(scores, out_fps, duration)
+
+        logger.info(
+            "Fast shot detection finished",
+            extra={
+                "event": "shot_detect.fast.finish",
+                "frames": int(total_frames),
+                "shots": len(shots),
+                "duration_ms": int((time.monotonic() - started) * 1000),
+            },
+        )
+        return shots
+
+    def analyze(
+        self,
+        video_path: str,
+        *,
+        num_key_frames: int = 5,
+        keyframe_max_dim: int = 1024,
+        candidate_fps: float | None = None,
+        max_candidates: int | None = None,
+        probe: dict | None = None,
+    ) -> dict:
+        """Single sequential decode producing duration, shots and keyframes.
+
+        One ffmpeg process decodes the video once and splits it into two raw
+        outputs: the low-resolution detection stream on stdout and a sparse
+        keyframe-candidate stream (``candidate_fps``, capped at ``keyframe_max_dim``)
+        on an extra pipe, buffered as JPEG bytes in a ``KeyframeBuffer``.
+
+        Returns a dict with ``duration``, ``shots`` (``[]`` when no cut is found),
+        ``shot_frames`` (one ``{"start", "end", "jpeg"}`` per shot, covering the
+        whole video as a single shot when there are no cuts) and ``key_frames``
+        (``num_key_frames`` evenly spaced JPEG frames for single-scene analysis).
+        ``probe`` is the ``probe_video`` result when the caller already has it.
+        """
+        started = time.monotonic()
+        probe = probe or probe_video(video_path)
+        w, h = self._scaled_size(probe["width"], probe["height"])
+        kw, kh = _fit_within(probe["width"], probe["height"], int(keyframe_max_dim))
+        src_fps = probe["fps"] if probe["fps"] > 0 else 30.0
+        out_fps = src_fps / self.frame_step
+        cand_fps = min(float(candidate_fps or Config.SHOT_KEYFRAME_CANDIDATE_FPS), out_fps)
+        buffer = KeyframeBuffer(int(max_candidates or Config.SHOT_KEYFRAME_MAX_CANDIDATES))
+        det_bytes = w * h * 3
+        key_bytes = kw * kh * 3
+
+        read_fd, write_fd = os.pipe()
+        filter_graph = (
+            f"[0:v]split=2[d][k];"
+            f"[d]fps={out_fps:.6f},scale={w}:{h}:flags=area[det];"
+            f"[k]fps={cand_fps:.6f},scale={kw}:{kh}:flags=area[key]"
+        )
+        cmd = [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-nostdin",
+            "-i",
+            video_path,
+            "-filter_complex",
+            filter_graph,
+            "-map",
+            "[det]",
+            "-pix_fmt",
+            "bgr24",
+            "-f",
+            "rawvideo",
+            "pipe:1",
+            "-map",
+            "[key]",
+            "-pix_fmt",
+            "bgr24",
+            "-f",
+            "rawvideo",
+            f"pipe:{write_fd}",
+        ]
+        stderr_file = tempfile.TemporaryFile()
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=stderr_file,
+                pass_fds=(write_fd,),
+                bufsize=det_bytes * self.batch_frames,
+            )
+        except Exception:
+            os.close(read_fd)
+            os.close(write_fd)
+            stderr_file.close()
+            raise
+        os.close(write_fd)
+
+        def _read_candidates():
+            # Runs concurrently with the detection reader so neither ffmpeg output blocks.
+            with os.fdopen(read_fd, "rb", buffering=key_bytes) as stream:
+                index = 0
+                while True:
+                    buf = stream.read(key_bytes)
+                    if len(buf) < key_bytes:
+                        break
+                    buffer.offer(index / cand_fps, np.frombuffer(buf, dtype=np.uint8).reshape(kh, kw, 3))
+                    index += 1
+
+        reader = threading.Thread(target=_read_candidates, name="keyframe-reader", daemon=True)
+        reader.start()
+
+        prev_hist = None
+        prev_luma = None
+        score_batches = []
+        total_frames = 0
+        try:
+            while True:
+                buf = proc.stdout.read(det_bytes * self.batch_frames)
+                usable = len(buf) - len(buf) % det_bytes
+                if usable <= 0:
+                    break
+                frames = np.frombuffer(buf[:usable], dtype=np.uint8).reshape(-1, h, w, 3)
+                hist, luma = self.frame_features(frames)
+                score_batches.append(self.delta_scores(hist, luma, prev_hist, prev_luma))
+                prev_hist, prev_luma = hist[-1], luma[-1]
+                total_frames += frames.shape[0]
+                if len(buf) < det_bytes * self.batch_frames:
+                    break
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            try:
+                proc.stdout.close()
+            except Exception:
+                pass
+            returncode = proc.wait()
+            reader.join()
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode("utf-8", "ignore").strip()
+            stderr_file.close()
+        if returncode != 0 and total_frames == 0:
+            raise RuntimeError(f"ffmpeg analysis decode failed: {stderr[-300:]}")
+
+        duration = probe["duration"] if probe["duration"] > 0 else (total_frames / out_fps if out_fps else 0.0)
+        scores = np.concatenate(score_batches) if score_batches else np.zeros((0,), dtype=np.float32)
+        shots = self.shots_from_scores(scores, out_fps, duration)
+
+        shot_frames = []
+        for start, end in shots or [(0.0, duration)]:
+            picked = buffer.nearest((start + end) / 2, start, end)
+            if picked is not None:
+                shot_frames.append({"start": float(start), "end": float(end), "jpeg": picked[1]})
+
+        key_frames: list[bytes] = []
+        n = max(1, int(num_key_frames))
+        targets = [duration / 2] if n == 1 else np.linspace(duration * 0.1, duration * 0.9, n).tolist()
+        seen = set()
+        for t in targets:
+            picked = buffer.nearest(float(t))
+            if picked is not None and picked[0] not in seen:
+                seen.add(picked[0])
+                key_frames.append(picked[1])
+
+        logger.info(
+            "Single-pass video analysis finished",
+            extra={
+                "event": "shot_detect.analyze.finish",
+                "frames": int(total_frames),
+                "shots": len(shots),
+                "keyframe_candidates": len(buffer.entries),
+                "keyframe_buffer_bytes": int(buffer.nbytes),
+                "video_duration_sec": float(duration),
+                "duration_ms": int((time.monotonic() - started) * 1000),
+            },
+        )
+        return {
+            "duration": float(duration),
+            "shots": shots,
+            "shot_frames": shot_frames,
+            "key_frames": key_frames,
+        }
@@ -0,0 +1,138 @@
+"""
+Chunked Shot Grouping
+
+Helpers for the map-reduce mode of ``SceneDetector.analyze_shot_grouping``: shots
+are split into overlapping windows that are grouped by the vision model
+independently, then the per-window segment lists are merged deterministically.
+
+Each window owns the time range between the midpoints of its overlaps with its
+neighbours. Its segments are clipped to that range, and segments with the same
+scene label that touch across a window boundary are merged into one.
+"""
+
+import json
+
+
+def make_windows(count: int, size: int, overlap: int) -> list[tuple[int, int]]:
+    """Return ``[(start_idx, end_idx), ...]`` windows covering ``count`` shots."""
+    size = max(2, int(size))
+    overlap = max(0, min(int(overlap), size - 1))
+    if count <= size:
+        return [(0, count)]
+    step = size - overlap
+    windows = []
+    start = 0
+    while True:
+        end = min(count, start + size)
+        windows.append((start, end))
+        if end >= count:
+            break
+        start += step
+    # Avoid a tiny trailing window: let the last window end at the final shot.
+    if len(windows) >= 2 and windows[-1][1] - windows[-1][0] <= overlap:
+        windows.pop()
+        windows[-1] = (windows[-1][0], count)
+    return windows
+
+
+def ownership_ranges(shots: list[dict], windows: list[tuple[int, int]]) -> list[tuple[float, float]]:
+    """Split the timeline at the middle of each overlap; window i owns ``[lo, hi)``."""
+    ranges = []
+    for i, (start, end) in enumerate(windows):
+        if i == 0:
+            lo = float(shots[start]["start"])
+        else:
+            prev_end = windows[i - 1][1]
+            mid = (start + prev_end) // 2
+            lo = float(shots[mid]["start"])
+        if i == len(windows) - 1:
+            hi = float(shots[end - 1]["end"])
+        else:
+            next_start = windows[i + 1][0]
+            mid = (next_start + end) // 2
+            hi = float(shots[mid]["start"])
+        ranges.append((lo, hi))
+    return ranges
+
+
+def _parse(text: str) -> dict:
+    clean = (text or "").replace("```json", "").replace("```", "").strip()
+    data = json.loads(clean)
+    return data if isinstance(data, dict) else {}
+
+
+def _merge_pair(a: dict, b: dict) -> dict:
+    dur_a = float(a["end_sec"]) - float(a["start_sec"])
+    dur_b = float(b["end_sec"]) - float(b["start_sec"])
+    longer = a if dur_a >= dur_b else b
+    merged = dict(longer)
+    merged["start_sec"] = min(float(a["start_sec"]), float(b["start_sec"]))
+    merged["end_sec"] = max(float(a["end_sec"]), float(b["end_sec"]))
+    total = max(dur_a + dur_b, 1e-6)
+    try:
+        merged["score"] = round((float(a.get("score") or 0) * dur_a + float(b.get("score") or 0) * dur_b) / total, 3)
+    except Exception:
+        pass
+    try:
+        merged["shock_score"] = max(float(a.get("shock_score") or 0), float(b.get("shock_score") or 0))
+    except Exception:
+        pass
+    tags = []
+    for tag in list(a.get("highlight_tags") or []) + list(b.get("highlight_tags") or []):
+        if tag not in tags:
+            tags.append(tag)
+    merged["highlight_tags"] = tags[:3]
+    merged["potential_hook"] = bool(a.get("potential_hook")) or bool(b.get("potential_hook"))
+    return merged
+
+
+def merge_window_results(
+    texts: list[str],
+    ranges: list[tuple[float, float]],
+    max_hooks: int = 2,
+) -> dict:
+    """Merge per-window model outputs (in window order) into one grouping result."""
+    segments: list[dict] = []
+    quality_weighted = 0.0
+    quality_weight = 0.0
+    highlights: list[str] = []
+    for text, (lo, hi) in zip(texts, ranges):
+        data = _parse(text)
+        window_segments = []
+        for seg in data.get("segments") or []:
+            if not isinstance(seg, dict):
+                continue
+            try:
+                start = max(float(seg.get("start_sec")), lo)
+                end = min(float(seg.get("end_sec")), hi)
+            except Exception:
+                continue
+            if end <= start:
+                continue
+            window_segments.append({**seg, "start_sec": start, "end_sec": end})
+        window_segments.sort(key=lambda s: s["start_sec"])
+        for seg in window_segments:
+            if segments and segments[-1].get("scene") == seg.get("scene") and seg["start_sec"] - segments[-1]["end_sec"] <= 0.05:
+                segments[-1] = _merge_pair(segments[-1], seg)
+            else:
+                segments.append(seg)
+        try:
+            quality_weighted += float(data.get("overall_quality")) * (hi - lo)
+            quality_weight += hi - lo
+        except Exception:
+            pass
+        for item in data.get("top_3_highlights") or []:
+            if item not in highlights:
+                highlights.append(item)
+
+    hooks = sorted(
+        (i for i, s in enumerate(segments) if s.get("potential_hook")),
+        key=lambda i: (-float(segments[i].get("shock_score") or 0), i),
+    )
+    for i in hooks[max_hooks:]:
+        segments[i]["potential_hook"] = False
+
+    result = {"segments": segments, "top_3_highlights": highlights[:3]}
+    if quality_weight > 0:
+        result["overall_quality"] = round(quality_weighted / quality_weight, 2)
+    return result
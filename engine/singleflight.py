@@ -0,0 +1,261 @@
+"""
+Single-Flight Guard for Project Tasks
+
+A double click or a repeated backend request enqueues the same render twice; both
+used to run in full and race on ``final_video_url``. Each execution now joins the
+flight of ``(task name, project_id)`` with a hash of its inputs (script, timeline,
+BGM) through one atomic Lua script:
+
+- ``leader``: nothing in flight; this execution runs.
+- ``duplicate``: the same inputs are in flight; the caller waits (re-queues) and
+  returns the leader's result once it is stored. After SINGLEFLIGHT_MAX_WAITS it
+  takes the flight over (``takeover``) and renders itself.
+- ``cached``: the same inputs finished within SINGLEFLIGHT_RESULT_TTL_SEC; the
+  stored result is returned without rendering.
+- ``superseded``: different inputs (a newer script version) were in flight; this
+  execution takes over and the older one stops at its next stage boundary
+  (``ensure_current()`` raises ``Superseded``).
+
+The in-flight marker lives SINGLEFLIGHT_TTL_SEC and is renewed by a heartbeat
+thread while a task of the flight runs (``hold()``), so the flight of a killed
+worker expires quickly. A per-project ``latest`` marker records the newest
+submission; a holder whose marker expired between tasks (queue wait of the
+distributed render) re-claims it only while it is still the latest.
+
+Without Redis every execution leads (``bypass``), as before.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import metrics
+from config import Config
+from redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "ai-video:flight:"
+_RESULT_PREFIX = "ai-video:flight-result:"
+_LATEST_PREFIX = "ai-video:flight-latest:"
+_LATEST_TTL_SEC = 24 * 3600
+
+# KEYS[1] = flight key, KEYS[2] = result key of the input hash, KEYS[3] = latest key;
+# ARGV = input hash, owner task id, ttl ms, started (unix sec), takeover ('1'/'0'), latest ttl sec.
+# Returns {outcome, detail}.
+_ACQUIRE_LUA = """
+local cur = redis.call('GET', KEYS[1])
+local entry = ARGV[1] .. ' ' .. ARGV[2] .. ' ' .. ARGV[4]
+local function lead(outcome, detail)
+  redis.call('SET', KEYS[1], entry, 'PX', ARGV[3])
+  redis.call('SET', KEYS[3], ARGV[1] .. ' ' .. ARGV[2], 'EX', ARGV[6])
+  return {outcome, detail}
+end
+if cur then
+  local h, owner = string.match(cur, '^(%S+) (%S+) ')
+  if h == ARGV[1] then
+    if owner == ARGV[2] then return lead('leader', '') end
+    if ARGV[5] == '1' then return lead('takeover', owner or '') end
+    return {'duplicate', owner or ''}
+  end
+  return lead('superseded', owner or '')
+end
+local result = redis.call('GET', KEYS[2])
+if result then return {'cached', result} end
+return lead('leader', '')
+"""
+
+# KEYS[1] = flight key, KEYS[2] = latest key; ARGV = input hash, owner, ttl ms, started.
+# 1 = still current (TTL refreshed; an expired marker is re-claimed while this is the latest submission).
+_CHECK_LUA = """
+local cur = redis.call('GET', KEYS[1])
+if not cur then
+  if redis.call('GET', KEYS[2]) ~= ARGV[1] .. ' ' .. ARGV[2] then return 0 end
+  redis.call('SET', KEYS[1], ARGV[1] .. ' ' .. ARGV[2] .. ' ' .. ARGV[4], 'PX', ARGV[3])
+  return 1
+end
+local h, owner = string.match(cur, '^(%S+) (%S+) ')
+if h ~= ARGV[1] or owner ~= ARGV[2] then return 0 end
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# KEYS[1] = flight key, KEYS[2] = result key, KEYS[3] = latest key;
+# ARGV = input hash, owner, result JSON ('' = none), result ttl sec.
+_RELEASE_LUA = """
+if ARGV[3] ~= '' then redis.call('SET', KEYS[2], ARGV[3], 'EX', ARGV[4]) end
+if redis.call('GET', KEYS[3]) == ARGV[1] .. ' ' .. ARGV[2] then redis.call('DEL', KEYS[3]) end
+local cur = redis.call('GET', KEYS[1])
+if not cur then return 0 end
+local h, owner = string.match(cur, '^(%S+) (%S+) ')
+if h ~= ARGV[1] or owner ~= ARGV[2] then return 0 end
+redis.call('DEL', KEYS[1])
+return 1
+"""
+
+_scripts = {}
+
+
+class Superseded(Exception):
+    """A newer submission for the same project took over this flight."""
+
+
+def input_hash(**parts) -> str:
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+
+
+def _script(client, name: str, source: str):
+    script = _scripts.get(name)
+    if script is None or script.registered_client is not client:
+        script = client.register_script(source)
+        _scripts[name] = script
+    return script
+
+
+def _text(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value or "")
+
+
+def _ttl_ms() -> int:
+    return max(15, Config.SINGLEFLIGHT_TTL_SEC) * 1000
+
+
+class Flight:
+    def __init__(self, task_name: str, project_id: str, input_hash: str, owner: str | None):
+        self.task_name = task_name
+        self.project_id = project_id
+        self.input_hash = input_hash
+        self.owner = owner or "-"
+        self.started = time.monotonic()
+        self._stop = None
+
+    @property
+    def key(self) -> str:
+        return f"{_KEY_PREFIX}{self.task_name}:{self.project_id}"
+
+    @property
+    def result_key(self) -> str:
+        return f"{_RESULT_PREFIX}{self.task_name}:{self.project_id}:{self.input_hash}"
+
+    @property
+    def latest_key(self) -> str:
+        return f"{_LATEST_PREFIX}{self.task_name}:{self.project_id}"
+
+    def _client(self):
+        return get_redis() if Config.SINGLEFLIGHT_ENABLED else None
+
+    def acquire(self, takeover: bool = False) -> tuple[str, object]:
+        """``(outcome, detail)``: the previous task id for ``duplicate``/``superseded``/``takeover``,
+        the result dict for ``cached``. A leading flight is held (heartbeat) until complete/abandon/stop.
+        """
+        client = self._client()
+        outcome, detail = "bypass", None
+        if client is not None:
+            try:
+                raw_outcome, raw_detail = _script(client, "acquire", _ACQUIRE_LUA)(
+                    keys=[self.key, self.result_key, self.latest_key],
+                    args=[
+                        self.input_hash, self.owner, _ttl_ms(), int(time.time()), "1" if takeover else "0", _LATEST_TTL_SEC,
+                    ],
+                )
+                outcome, detail = _text(raw_outcome), _text(raw_detail)
+                if outcome == "cached":
+                    detail = json.loads(detail)
+            except Exception as e:
+                logger.warning(
+                    "Single-flight unavailable, running without it",
+                    extra={"event": "singleflight.error", "project_id": self.project_id, "reason": str(e)[:256]},
+                )
+                outcome, detail = "bypass", None
+        if outcome in ("leader", "superseded", "takeover"):
+            self.hold()
+        metrics.SINGLEFLIGHT.inc(task=self.task_name, outcome=outcome)
+        if outcome != "leader":
+            logger.info(
+                f"Single-flight {outcome}",
+                extra={
+                    "event": f"singleflight.{outcome}",
+                    "task_name": self.task_name,
+                    "project_id": self.project_id,
+                    "operation": detail if isinstance(detail, str) else None,
+                },
+            )
+        return outcome, detail
+
+    def is_current(self) -> bool:
+        """False once a newer submission took over; Redis errors count as current."""
+        client = self._client()
+        if client is None:
+            return True
+        try:
+            return int(
+                _script(client, "check", _CHECK_LUA)(
+                    keys=[self.key, self.latest_key], args=[self.input_hash, self.owner, _ttl_ms(), int(time.time())]
+                )
+            ) == 1
+        except Exception:
+            return True
+
+    def hold(self) -> None:
+        """Renew the in-flight marker from a heartbeat thread while this task runs."""
+        if self._stop is not None or self._client() is None:
+            return
+        self._stop = stop = threading.Event()
+
+        def _heartbeat():
+            while not stop.wait(_ttl_ms() / 3000):
+                if not self.is_current():
+                    return
+
+        threading.Thread(target=_heartbeat, name="singleflight", daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop renewing (the task ends); the marker stays until it expires or the flight ends."""
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+
+    def ensure_current(self, task_name: str | None = None) -> None:
+        """Stage boundary: raise Superseded (and count the time spent) when this execution is stale."""
+        if self.is_current():
+            return
+        self.stop()
+        wasted = time.monotonic() - self.started
+        metrics.WASTED_RENDER_SECONDS.inc(wasted, task=task_name or self.task_name, reason="superseded")
+        logger.info(
+            "Superseded by a newer submission",
+            extra={
+                "event": "singleflight.cancelled",
+                "task_name": task_name or self.task_name,
+                "project_id": self.project_id,
+                "duration_ms": int(wasted * 1000),
+            },
+        )
+        raise Superseded(f"{self.task_name} for project {self.project_id} superseded")
+
+    def _release(self, result: dict | None) -> None:
+        self.stop()
+        client = self._client()
+        if client is None:
+            return
+        try:
+            payload = json.dumps(result, ensure_ascii=False, default=str) if result is not None else ""
+            _script(client, "release", _RELEASE_LUA)(
+                keys=[self.key, self.result_key, self.latest_key],
+                args=[self.input_hash, self.owner, payload, max(1, Config.SINGLEFLIGHT_RESULT_TTL_SEC)],
+            )
+        except Exception as e:
+            logger.warning(
+                "Single-flight release failed",
+                extra={"event": "singleflight.error", "project_id": self.project_id, "reason": str(e)[:256]},
+            )
+
+    def complete(self, result: dict) -> None:
+        """Store the result for duplicates and end the flight."""
+        self._release(result)
+
+    def abandon(self) -> None:
+        """End the flight without a result (final failure); a waiting duplicate then runs itself."""
+        self._release(None)
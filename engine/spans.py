@@ -0,0 +1,251 @@
+"""
+Task Spans
+
+Per-stage timing and resource accounting for engine tasks. ``span(name, **attrs)``
+works as a context manager and as a decorator and records, for the wrapped stage:
+
+- wall time,
+- CPU time of this process plus the subprocesses it waited for (ffmpeg),
+- RSS delta,
+- bytes in / bytes out (``add_bytes_in`` / ``add_bytes_out`` or the attrs of
+  the same name).
+
+Spans nest through a context variable (thread pools that use
+``contextvars.copy_context().run`` keep the parent) and carry the
+``task_id``/``request_id`` that ``worker.py`` sets in ``task_prerun``; the trace id
+is derived from the request id so every task of one request shares a trace.
+
+Finished spans are exported three ways:
+
+- one ``span.finish`` log record,
+- one OTLP/JSON ``ExportTraceServiceRequest`` line per span in SPANS_OTLP_FILE
+  (the OpenTelemetry file-exporter format, loadable by the collector's
+  ``otlpjsonfile`` receiver),
+- ``engine_span_*`` series in ``metrics.py`` (duration histogram, CPU seconds,
+  bytes), exposed with the other worker metrics.
+"""
+
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+import metrics
+from config import Config
+from request_context import request_id_var, task_id_var
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "ai-scene-engine"
+SCOPE_NAME = "engine.spans"
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_task_spans: dict = {}
+
+_export_lock = threading.Lock()
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except Exception:
+        return 0
+
+
+def _cpu_seconds() -> float:
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _trace_id_for(request_id: str, task_id: str) -> str:
+    seed = request_id if request_id and request_id != "-" else task_id
+    if not seed or seed == "-":
+        return uuid.uuid4().hex
+    compact = seed.replace("-", "").lower()
+    if re.fullmatch(r"[0-9a-f]{32}", compact):
+        return compact
+    return hashlib.sha256(seed.encode("utf-8")).hexdigest()[:32]
+
+
+class Span:
+    def __init__(self, name: str, attrs: dict | None = None):
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.bytes_in = int(self.attrs.pop("bytes_in", 0) or 0)
+        self.bytes_out = int(self.attrs.pop("bytes_out", 0) or 0)
+        self.status = "ok"
+        self.error = None
+        self._token = None
+
+    def set(self, **attrs) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    def add_bytes_in(self, n: int | None) -> None:
+        self.bytes_in += int(n or 0)
+
+    def add_bytes_out(self, n: int | None) -> None:
+        self.bytes_out += int(n or 0)
+
+    def __call__(self, fn):
+        name, attrs = self.name, self.attrs
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(name, attrs):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        self.task_id, self.request_id = task_id_var.get(), request_id_var.get()
+        self.trace_id = parent.trace_id if parent is not None else _trace_id_for(self.request_id, self.task_id)
+        self.parent_span_id = parent.span_id if parent is not None else ""
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start_unix_ns = time.time_ns()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = _cpu_seconds()
+        self._rss0 = _rss_bytes()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.wall_sec = time.perf_counter() - self._wall0
+        self.cpu_sec = max(0.0, _cpu_seconds() - self._cpu0)
+        self.rss_delta = _rss_bytes() - self._rss0
+        self.end_unix_ns = time.time_ns()
+        if exc is not None and self.status == "ok":
+            self.status = "error"
+            self.error = f"{exc_type.__name__}: {str(exc)[:200]}"
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Ended in a different context (task spans closed from task_postrun).
+            _current_span.set(None)
+        if Config.SPANS_ENABLED:
+            try:
+                _export(self)
+            except Exception as e:
+                logger.warning("Span export failed", extra={"event": "span.export.error", "reason": str(e)[:256]})
+        return False
+
+
+def span(name: str, **attrs) -> Span:
+    """``with span("render.encode") as s: ...`` or ``@span("db.fetch_asset_source")``."""
+    return Span(name, attrs)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def start_task_span(task_id: str, task_name: str) -> None:
+    """Open the root span of a Celery task (called from ``task_prerun``)."""
+    if not task_id:
+        return
+    s = Span(f"task.{task_name}", {"task_name": task_name})
+    s.__enter__()
+    _task_spans[task_id] = s
+
+
+def finish_task_span(task_id: str, state: str | None = None) -> None:
+    """Close the root span opened by ``start_task_span`` (called from ``task_postrun``)."""
+    s = _task_spans.pop(task_id, None)
+    if s is None:
+        return
+    if state and state not in {"SUCCESS"}:
+        s.status = "retry" if state == "RETRY" else "error"
+    s.__exit__(None, None, None)
+
+
+def _otlp_value(v) -> dict:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _otlp_record(s: Span) -> dict:
+    attrs = {
+        **{k: v for k, v in s.attrs.items() if v is not None},
+        "task_id": s.task_id,
+        "request_id": s.request_id,
+        "process.pid": os.getpid(),
+        "wall_ms": int(s.wall_sec * 1000),
+        "cpu_ms": int(s.cpu_sec * 1000),
+        "rss_delta_bytes": int(s.rss_delta),
+        "bytes_in": int(s.bytes_in),
+        "bytes_out": int(s.bytes_out),
+    }
+    record = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 1,
+        "startTimeUnixNano": str(s.start_unix_ns),
+        "endTimeUnixNano": str(s.end_unix_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attrs.items()],
+        "status": {"code": 1} if s.status == "ok" else {"code": 2, "message": s.error or s.status},
+    }
+    if s.parent_span_id:
+        record["parentSpanId"] = s.parent_span_id
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": [record]}],
+            }
+        ]
+    }
+
+
+def _export(s: Span) -> None:
+    logger.info(
+        "span.finish",
+        extra={
+            "event": "span.finish",
+            "step": s.name,
+            "status": s.status,
+            "duration_ms": int(s.wall_sec * 1000),
+            "cpu_ms": int(s.cpu_sec * 1000),
+            "rss_delta_mb": round(s.rss_delta / (1024 * 1024), 1),
+            "bytes_in": s.bytes_in,
+            "bytes_out": s.bytes_out,
+        },
+    )
+    if Config.SPANS_OTLP_FILE:
+        line = json.dumps(_otlp_record(s), ensure_ascii=False, separators=(",", ":")) + "\n"
+        with _export_lock:
+            d = os.path.dirname(Config.SPANS_OTLP_FILE)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            # O_APPEND with one write per line keeps lines from concurrent processes intact.
+            fd = os.open(Config.SPANS_OTLP_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+    metrics.SPAN_DURATION.observe(s.wall_sec, span=s.name, status=s.status)
+    metrics.SPAN_CPU_SECONDS.inc(s.cpu_sec, span=s.name)
+    if s.bytes_in:
+        metrics.SPAN_BYTES.inc(s.bytes_in, span=s.name, direction="in")
+    if s.bytes_out:
+        metrics.SPAN_BYTES.inc(s.bytes_out, span=s.name, direction="out")
+
+
+def reset_after_fork() -> None:
+    """Pool children: forget root spans inherited from the parent."""
+    _task_spans.clear()
@@ -0,0 +1,60 @@
+#!/usr/bin/env bash
+# Start the engine Celery workers (see routing.py and docs/ENGINE_QUEUES.md).
+#
+# ENGINE_WORKER_ROLE:
+#   all (default)  io + cpu workers in this container
+#   io             threads pool on CELERY_IO_QUEUE_NAME; also relays backend messages
+#   cpu            prefork pool on CELERY_CPU_QUEUE_NAME
+# With CELERY_ROUTING_ENABLED=false a single prefork worker consumes CELERY_QUEUE_NAME
+# (the previous layout, CELERY_WORKER_CONCURRENCY slots).
+set -euo pipefail
+
+ROLE="${ENGINE_WORKER_ROLE:-all}"
+IO_QUEUE="${CELERY_IO_QUEUE_NAME:-ai-video:io}"
+CPU_QUEUE="${CELERY_CPU_QUEUE_NAME:-ai-video:cpu}"
+IO_POOL="${CELERY_IO_POOL:-threads}"
+IO_CONCURRENCY="${CELERY_IO_CONCURRENCY:-16}"
+# One render per two cores: each render runs ffmpeg with RENDER_THREADS threads
+CPU_CONCURRENCY="${CELERY_CPU_CONCURRENCY:-$(( $(nproc) / 2 > 0 ? $(nproc) / 2 : 1 ))}"
+LOGLEVEL="${CELERY_LOGLEVEL:-info}"
+
+case "$(echo "${CELERY_ROUTING_ENABLED:-true}" | tr '[:upper:]' '[:lower:]')" in
+    1|true|yes|y) ;;
+    *)
+        exec celery -A worker.celery_app worker --loglevel="$LOGLEVEL" \
+            --concurrency="${CELERY_WORKER_CONCURRENCY:-2}"
+        ;;
+esac
+
+io_worker() {
+    celery -A worker.celery_app worker --loglevel="$LOGLEVEL" -n "io@%h" \
+        -Q "$IO_QUEUE" -P "$IO_POOL" --concurrency="$IO_CONCURRENCY"
+}
+
+cpu_worker() {
+    # Long tasks: take one message per slot so a busy child does not hold a second one
+    celery -A worker.celery_app worker --loglevel="$LOGLEVEL" -n "cpu@%h" \
+        -Q "$CPU_QUEUE" -P prefork --concurrency="$CPU_CONCURRENCY" \
+        --prefetch-multiplier=1 -O fair
+}
+
+case "$ROLE" in
+    io) io_worker; exit $? ;;
+    cpu) cpu_worker; exit $? ;;
+    all) ;;
+    *) echo "Unknown ENGINE_WORKER_ROLE: $ROLE" >&2; exit 2 ;;
+esac
+
+io_worker &
+IO_PID=$!
+cpu_worker &
+CPU_PID=$!
+
+# Forward stop signals (warm shutdown) and exit when either worker exits
+trap 'kill -TERM "$IO_PID" "$CPU_PID" 2>/dev/null || true' TERM INT
+set +e
+wait -n "$IO_PID" "$CPU_PID"
+STATUS=$?
+kill -TERM "$IO_PID" "$CPU_PID" 2>/dev/null
+wait
+exit "$STATUS"
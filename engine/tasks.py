@@ -1,22 +1,23 @@
 from worker import celery_app
-from vision import SceneDetector
-from script_gen import ScriptGenerator
-from audio_gen import AudioGenerator, _ffmpeg_concat_mp3
-from video_render import VideoRenderer
-from aliyun_client import AliyunClient
-from sfx_library import SFXLibrary
+from pcm_audio import encode_files_to_mp3
 from bgm_selector import BGMSelector
-from agent_workflow import MultiAgentScriptGenerator
 from config import Config
+from s3_client import get_s3
+from spans import current_span, span
+import metrics
+# Heavy dependencies (moviepy, cv2, scenedetect, DashScope, litellm, boto3) are
+# imported on first use; see resources.py.
+import resources
+import admission
+import media_probe
+import probe_cache
+import singleflight
 import json
 import logging
 import psycopg2
 import re
 import tempfile
 import os
-import boto3
-import cv2
-from moviepy.editor import VideoFileClip
 import uuid
 import urllib.request
 import time
@@ -24,6 +25,9 @@ import math
 from urllib.parse import urlparse
 from celery.exceptions import Retry
 import traceback
+import subprocess
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 
 # Configure logging
@@ -48,12 +52,107 @@ def _get_task_headers(request) -> dict:
 def _retry_with_headers(task, *, exc: Exception, countdown: int):
     headers = _get_task_headers(getattr(task, "request", None))
     safe_headers = {}
-    for k in ("request_id", "user_id"):
+    for k in ("request_id", "user_id", "deferrals", "flight_waits"):
         v = headers.get(k)
         if v is None:
             continue
         safe_headers[k] = str(v)
-    return task.retry(exc=exc, countdown=countdown, headers=safe_headers)
+    # Deferrals and single-flight waits raised request.retries too; only failed attempts count against the limit
+    max_retries = getattr(task, "max_retries", None)
+    if max_retries is not None:
+        max_retries = int(max_retries) + _task_deferrals(task) + _task_deferrals(task, "flight_waits")
+    return task.retry(exc=exc, countdown=countdown, headers=safe_headers, max_retries=max_retries)
+
+def _task_deferrals(task, counter: str = "deferrals") -> int:
+    try:
+        return int(_get_task_headers(getattr(task, "request", None)).get(counter) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def _task_retries(task) -> int:
+    """Failed attempts so far; admission deferrals and single-flight waits go through retry() too but do not count."""
+    retries = int(getattr(task.request, "retries", 0) or 0)
+    return max(0, retries - _task_deferrals(task) - _task_deferrals(task, "flight_waits"))
+
+def _admit_render(task, project_id: str, timeline_assets: list, **estimate) -> "admission.Lease":
+    """Take a render lease from the node budget, or re-queue the task with a countdown until one is free."""
+    cost = admission.estimate_render_cost(timeline_assets, **estimate)
+    lease = admission.try_acquire(cost, lease_id=getattr(task.request, "id", None), project_id=project_id)
+    if lease is not None:
+        return lease
+    deferrals = _task_deferrals(task)
+    if deferrals >= Config.RENDER_ADMISSION_MAX_DEFERRALS:
+        raise RuntimeError(
+            f"render admission: node budget still exhausted after {deferrals} deferrals "
+            f"(needs {cost['mem_mb']} MB / {cost['cpu']} cpu)"
+        )
+    raise _defer_task(task, project_id, countdown=admission.defer_countdown(deferrals), reason="admission")
+
+def _defer_task(task, project_id: str, *, countdown: int, reason: str, counter: str = "deferrals"):
+    """Re-queue the task after ``countdown`` seconds without using up its retry budget.
+
+    ``counter`` is the header counting these re-queues (``deferrals`` for admission, ``flight_waits``
+    for single-flight duplicates); each has its own limit.
+    """
+    deferrals = _task_deferrals(task, counter)
+    headers = _get_task_headers(getattr(task, "request", None))
+    safe_headers = {
+        k: str(headers[k]) for k in ("request_id", "user_id", "deferrals", "flight_waits") if headers.get(k) is not None
+    }
+    safe_headers[counter] = str(deferrals + 1)
+    _log_info("render.deferred", project_id=project_id, attempt=deferrals + 1, countdown_sec=countdown, reason=reason)
+    # max_retries: a deferral never exhausts the retry budget of the task
+    return task.retry(
+        countdown=countdown,
+        headers=safe_headers,
+        max_retries=int(getattr(task.request, "retries", 0) or 0) + 1,
+    )
+
+def _render_input_hash(script_content: str, timeline_assets: list, bgm_url: str | None) -> str:
+    return singleflight.input_hash(
+        script=script_content or "",
+        timeline=[
+            [a.get("id"), a.get("oss_url") or a.get("storage_key") or a.get("local_path"), round(float(a.get("duration") or 0.0), 3)]
+            for a in timeline_assets
+        ],
+        bgm=bgm_url or "",
+    )
+
+def _join_render_flight(task, task_name: str, project_id: str, input_hash: str):
+    """Returns ``(flight, cached_result)``; re-queues the task while the same inputs render elsewhere."""
+    flight = singleflight.Flight(task_name, project_id, input_hash, getattr(task.request, "id", None))
+    outcome, detail = flight.acquire()
+    if outcome == "duplicate":
+        if _task_deferrals(task, "flight_waits") < Config.SINGLEFLIGHT_MAX_WAITS:
+            raise _defer_task(
+                task, project_id, countdown=max(1, Config.SINGLEFLIGHT_WAIT_SEC), reason="duplicate", counter="flight_waits"
+            )
+        # The leader keeps its flight alive but has not finished in time: render here, the leader stops as superseded
+        outcome, detail = flight.acquire(takeover=True)
+    if outcome == "cached":
+        _publish_cached_result(project_id, detail)
+        return flight, {**detail, "deduplicated": True}
+    return flight, None
+
+def _publish_cached_result(project_id: str, result: dict):
+    """A duplicate returned the result of an identical render: make sure the project shows it."""
+    with span("db.update_final_video"):
+        conn = psycopg2.connect(Config.DB_DSN)
+        try:
+            with conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        UPDATE projects
+                        SET final_video_url = %s,
+                            audio_url = COALESCE(%s, audio_url),
+                            status = 'COMPLETED'
+                        WHERE id = %s
+                        """,
+                        (result.get("video_url"), result.get("audio_url"), project_id),
+                    )
+        finally:
+            conn.close()
 
 def _url_host(url: str) -> str:
     try:
@@ -71,15 +170,7 @@ def _log_warning(event: str, **fields):
 def _log_exception(event: str, **fields):
     logger.exception(event, extra={"event": event, **fields})
 
-# S3 Client Initialization
-s3_client = boto3.client(
-    's3',
-    endpoint_url=Config.S3_STORAGE_ENDPOINT,
-    aws_access_key_id=Config.S3_STORAGE_ACCESS_KEY,
-    aws_secret_access_key=Config.S3_STORAGE_SECRET_KEY,
-    region_name=Config.S3_STORAGE_REGION
-)
-
+@span("s3.upload")
 def upload_to_s3(file_path: str, object_name: str, content_type: str = "video/mp4") -> str:
     """Upload a file to S3 bucket and return public URL"""
     started = time.monotonic()
@@ -89,6 +180,8 @@ def upload_to_s3(file_path: str, object_name: str, content_type: str = "video/mp
             size_bytes = os.path.getsize(file_path)
         except Exception:
             pass
+        current_span().add_bytes_out(size_bytes)
+        metrics.TRANSFER_BYTES.inc(size_bytes, direction="upload", target="s3")
         _log_info(
             "s3.upload.start",
             bucket=Config.S3_STORAGE_BUCKET,
@@ -96,7 +189,7 @@ def upload_to_s3(file_path: str, object_name: str, content_type: str = "video/mp
             content_type=content_type,
             **({"bytes": size_bytes} if size_bytes is not None else {}),
         )
-        s3_client.upload_file(
+        get_s3().upload_file(
             file_path,
             Config.S3_STORAGE_BUCKET,
             object_name,
@@ -161,6 +254,7 @@ def _infer_suffix_from_url(url: str, default_suffix: str) -> str:
         pass
     return default_suffix
 
+@span("download")
 def _download_to_temp(video_url: str, *, suffix: str = ".mp4") -> str:
     started = time.monotonic()
     # Support local file protocol for optimization
@@ -187,6 +281,8 @@ def _download_to_temp(video_url: str, *, suffix: str = ".mp4") -> str:
         size_bytes = os.path.getsize(temp_video.name)
     except Exception:
         pass
+    current_span().add_bytes_in(size_bytes)
+    metrics.TRANSFER_BYTES.inc(size_bytes, direction="download", target="http")
     _log_info(
         "download.finish",
         url_host=_url_host(video_url),
@@ -195,6 +291,7 @@ def _download_to_temp(video_url: str, *, suffix: str = ".mp4") -> str:
     )
     return temp_video.name
 
+@span("db.fetch_asset_source")
 def _fetch_asset_source(asset_id: str) -> dict | None:
     conn = psycopg2.connect(Config.DB_DSN)
     try:
@@ -222,6 +319,8 @@ def _fetch_asset_source(asset_id: str) -> dict | None:
         conn.close()
 
 def _get_video_duration_sec(video_url: str) -> float:
+    import cv2
+
     cap = cv2.VideoCapture(video_url)
     if not cap.isOpened():
         cap.release()
@@ -339,6 +438,7 @@ def _complete_segments_to_full_duration(segments: list[dict], total_duration_sec
     out[-1]["end_sec"] = total
     return out
 
+@span("db.advance_project_status")
 def _advance_project_status(project_id: str):
     started = time.monotonic()
     conn = psycopg2.connect(Config.DB_DSN)
@@ -385,6 +485,7 @@ def _advance_project_status(project_id: str):
     finally:
         conn.close()
 
+@span("db.set_project_status")
 def _set_project_status(project_id: str, status: str, *, skip_if_status_in: tuple[str, ...] | None = None):
     started = time.monotonic()
     conn = psycopg2.connect(Config.DB_DSN)
@@ -420,6 +521,7 @@ def _set_project_status(project_id: str, status: str, *, skip_if_status_in: tupl
     finally:
         conn.close()
 
+@span("db.set_project_failed")
 def _set_project_failed(
     project_id: str,
     *,
@@ -466,6 +568,7 @@ def _set_project_failed(
     finally:
         conn.close()
 
+@span("db.get_project_status")
 def _get_project_status(project_id: str) -> str | None:
     conn = psycopg2.connect(Config.DB_DSN)
     try:
@@ -479,6 +582,171 @@ def _get_project_status(project_id: str) -> str | None:
     finally:
         conn.close()
 
+@span("probe")
+def _probe_split_source(local_video: str) -> dict:
+    """Probe duration, frame size and audio presence of a split source via ffprobe."""
+    info = media_probe.stream_info(local_video) or {}
+    streams = info.get("streams") or []
+    s0 = (streams[0] or {}) if streams else {}
+    try:
+        width = int(s0.get("width") or 0)
+        height = int(s0.get("height") or 0)
+    except Exception:
+        width, height = 0, 0
+    try:
+        duration = float(s0.get("duration") or 0.0)
+    except Exception:
+        duration = 0.0
+    if duration <= 0:
+        duration = _get_video_duration_sec(local_video)
+    return {
+        "duration": float(duration),
+        "width": width,
+        "height": height,
+        "has_audio": media_probe.has_audio_stream(local_video),
+    }
+
+def _split_encode_workers(width: int, height: int) -> int:
+    """Size the encode pool so concurrent ffmpeg encoders stay within SPLIT_MEMORY_BUDGET_MB.
+
+    Each libx264 encoder keeps roughly two dozen YUV420 frames alive (decode
+    buffers, lookahead, reference frames) on top of a fixed process overhead.
+    """
+    frame_mb = max(1, width) * max(1, height) * 1.5 / (1024 * 1024)
+    per_worker_mb = 80.0 + frame_mb * 24
+    by_budget = int(max(0, Config.SPLIT_MEMORY_BUDGET_MB) // per_worker_mb)
+    return max(1, min(max(1, Config.SPLIT_ENCODE_WORKERS), by_budget))
+
+@span("split.encode")
+def _encode_split_segment(local_video: str, start_sec: float, end_sec: float, has_audio: bool) -> str:
+    temp_clip = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
+    temp_clip.close()
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-v",
+        "error",
+        "-ss",
+        f"{float(start_sec):.3f}",
+        "-i",
+        local_video,
+        "-t",
+        f"{float(end_sec - start_sec):.3f}",
+        "-map",
+        "0:v:0",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "veryfast",
+        "-pix_fmt",
+        "yuv420p",
+        "-threads",
+        "2",
+    ]
+    if has_audio:
+        cmd += ["-map", "0:a:0", "-c:a", "aac"]
+    else:
+        cmd += ["-an"]
+    cmd += ["-movflags", "+faststart", temp_clip.name]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0 or not os.path.exists(temp_clip.name) or os.path.getsize(temp_clip.name) <= 0:
+        try:
+            os.remove(temp_clip.name)
+        except Exception:
+            pass
+        raise RuntimeError(f"ffmpeg segment encode failed: {(proc.stderr or '').strip()[-500:]}")
+    current_span().add_bytes_out(os.path.getsize(temp_clip.name))
+    return temp_clip.name
+
+def _upload_split_segment(temp_path: str, object_key: str) -> str:
+    try:
+        return upload_to_s3(temp_path, object_key)
+    finally:
+        try:
+            os.remove(temp_path)
+        except Exception:
+            pass
+
+def _delete_split_clips(project_id: str, object_keys: list[str]):
+    """Best-effort removal of clips uploaded by a split that failed before it was recorded."""
+    if not object_keys:
+        return
+    try:
+        get_s3().delete_objects(
+            Bucket=Config.S3_STORAGE_BUCKET, Delete={"Objects": [{"Key": k} for k in object_keys], "Quiet": True}
+        )
+    except Exception as e:
+        _log_warning("split.cleanup_failed", project_id=project_id, object_key=object_keys[0], reason=str(e)[:256])
+
+def _split_and_upload(project_id: str, asset_id: str, local_video: str, segments: list, source: dict) -> list[str]:
+    """Encode ``segments`` of ``local_video`` and upload them; returns the clip URLs in segment order."""
+    # Encode segments as parallel ffmpeg processes and pipeline uploads, so the
+    # encode of segment N+1 overlaps the upload of segment N.
+    encode_workers = _split_encode_workers(source["width"], source["height"])
+    upload_workers = max(1, Config.SPLIT_UPLOAD_WORKERS)
+    _log_info(
+        "split.pool",
+        project_id=project_id,
+        asset_id=asset_id,
+        encode_workers=encode_workers,
+        upload_workers=upload_workers,
+        width=source["width"],
+        height=source["height"],
+        has_audio=bool(source["has_audio"]),
+    )
+    clip_urls: list[str | None] = [None] * len(segments)
+    object_keys = [f"clips/{project_id}/{uuid.uuid4()}.mp4" for _ in segments]
+    upload_futures = {}
+    try:
+        with ThreadPoolExecutor(max_workers=encode_workers, thread_name_prefix="split-encode") as encode_pool, \
+                ThreadPoolExecutor(max_workers=upload_workers, thread_name_prefix="split-upload") as upload_pool:
+            encode_futures = {
+                encode_pool.submit(
+                    contextvars.copy_context().run,
+                    _encode_split_segment,
+                    local_video,
+                    float(seg["start_sec"]),
+                    float(seg["end_sec"]),
+                    bool(source["has_audio"]),
+                ): idx
+                for idx, seg in enumerate(segments)
+            }
+            try:
+                for fut in as_completed(encode_futures):
+                    idx = encode_futures[fut]
+                    temp_path = fut.result()
+                    upload_futures[
+                        upload_pool.submit(
+                            contextvars.copy_context().run,
+                            _upload_split_segment,
+                            temp_path,
+                            object_keys[idx],
+                        )
+                    ] = idx
+                for fut in as_completed(upload_futures):
+                    clip_urls[upload_futures[fut]] = fut.result()
+            except Exception:
+                for pending in list(encode_futures) + list(upload_futures):
+                    pending.cancel()
+                # Encodes that finished but never reached the upload pool still own a temp file.
+                handed_off = set(upload_futures.values())
+                for fut, idx in encode_futures.items():
+                    if idx in handed_off or fut.cancelled():
+                        continue
+                    try:
+                        os.remove(fut.result())
+                    except Exception:
+                        pass
+                raise
+    except Exception:
+        # The pools are shut down here, so no upload is still running: remove the clips that made it
+        # before the task retries with new keys.
+        _delete_split_clips(project_id, [
+            object_keys[idx] for fut, idx in upload_futures.items() if not fut.cancelled() and fut.exception() is None
+        ])
+        raise
+    return clip_urls
+
 def _process_split_logic(project_id: str, asset_id: str, video_url: str, segments: list, local_video_path: str = None):
     started = time.monotonic()
     if len(segments) >= 2:
@@ -489,30 +757,31 @@ def _process_split_logic(project_id: str, asset_id: str, video_url: str, segment
             
         inserted_assets = []
         try:
-            video = VideoFileClip(local_video)
+            source = _probe_split_source(local_video)
+            video_duration = source["duration"]
             _log_info(
                 "split.start",
                 project_id=project_id,
                 asset_id=asset_id,
                 segments_count=len(segments),
-                video_duration_sec=float(video.duration or 0.0),
+                video_duration_sec=float(video_duration or 0.0),
             )
             segments = [
                 s
                 for s in segments
-                if s["start_sec"] < video.duration and s["end_sec"] > 0
+                if s["start_sec"] < video_duration and s["end_sec"] > 0
             ]
             segments = [
                 {
                     **s,
-                    "start_sec": max(0.0, min(s["start_sec"], video.duration)),
-                    "end_sec": max(0.0, min(s["end_sec"], video.duration)),
+                    "start_sec": max(0.0, min(s["start_sec"], video_duration)),
+                    "end_sec": max(0.0, min(s["end_sec"], video_duration)),
                 }
                 for s in segments
             ]
             segments = [s for s in segments if s["end_sec"] > s["start_sec"]]
             before_total = sum(float(s["end_sec"]) - float(s["start_sec"]) for s in segments) if segments else 0.0
-            segments = _complete_segments_to_full_duration(segments, float(video.duration or 0.0))
+            segments = _complete_segments_to_full_duration(segments, float(video_duration or 0.0))
             after_total = sum(float(s["end_sec"]) - float(s["start_sec"]) for s in segments) if segments else 0.0
             _log_info(
                 "split.segments.normalized",
@@ -521,110 +790,63 @@ def _process_split_logic(project_id: str, asset_id: str, video_url: str, segment
                 segments_count=int(len(segments)),
                 sum_duration_before_sec=float(before_total),
                 sum_duration_after_sec=float(after_total),
-                video_duration_sec=float(video.duration or 0.0),
+                video_duration_sec=float(video_duration or 0.0),
             )
 
-            conn = psycopg2.connect(Config.DB_DSN)
-            try:
-                with conn:
-                    with conn.cursor() as cursor:
-                        cursor.execute(
-                            """
-                            UPDATE assets
-                            SET is_deleted = TRUE,
-                            duration = %s
-                            WHERE id = %s
-                            """,
-                            (float(video.duration), asset_id),
-                        )
+            clip_urls = _split_and_upload(project_id, asset_id, local_video, segments, source)
 
-                        for idx, seg in enumerate(segments):
-                            clip = video.subclip(seg["start_sec"], seg["end_sec"])
-                            temp_clip = tempfile.NamedTemporaryFile(
-                                suffix=".mp4", delete=False
-                            )
-                            temp_clip.close()
-                            try:
-                                try:
-                                    clip.write_videofile(
-                                        temp_clip.name,
-                                        codec="libx264",
-                                        audio_codec="aac",
-                                        preset="veryfast",
-                                        threads=2,
-                                        logger=None,
-                                    )
-                                except Exception as e:
-                                    if (
-                                        isinstance(e, AttributeError)
-                                        and "stdout" in str(e)
-                                        and "NoneType" in str(e)
-                                    ):
-                                        _log_info(
-                                            "split.segment.fallback_no_audio",
-                                            project_id=project_id,
-                                            asset_id=asset_id,
-                                            start_sec=float(seg["start_sec"]),
-                                            end_sec=float(seg["end_sec"]),
-                                        )
-                                        try:
-                                            if os.path.exists(temp_clip.name):
-                                                os.remove(temp_clip.name)
-                                        except Exception:
-                                            pass
-                                        clip.write_videofile(
-                                            temp_clip.name,
-                                            codec="libx264",
-                                            audio=False,
-                                            preset="veryfast",
-                                            threads=2,
-                                            logger=None,
-                                        )
-                                    else:
-                                        raise
-                                object_key = (
-                                    f"clips/{project_id}/{uuid.uuid4()}.mp4"
-                                )
-                                clip_url = upload_to_s3(temp_clip.name, object_key)
-                            finally:
-                                try:
-                                    os.remove(temp_clip.name)
-                                except Exception:
-                                    pass
-
-                            new_id = str(uuid.uuid4())
+            with span("db.insert_split_assets"):
+                conn = psycopg2.connect(Config.DB_DSN)
+                try:
+                    with conn:
+                        with conn.cursor() as cursor:
                             cursor.execute(
                                 """
-                                INSERT INTO assets
-                                    (id, project_id, oss_url, duration, scene_label, scene_score, user_label, sort_order, is_deleted)
-                                VALUES
-                                    (%s, %s, %s, %s, %s, %s, NULL, %s, FALSE)
+                                UPDATE assets
+                                SET is_deleted = TRUE,
+                                duration = %s
+                                WHERE id = %s
                                 """,
-                                (
-                                    new_id,
-                                    project_id,
-                                    clip_url,
-                                    float(seg["end_sec"] - seg["start_sec"]),
-                                    seg["scene"],
-                                    float(seg["score"] or 0.0),
-                                    idx,
-                                ),
-                            )
-                            inserted_assets.append(
-                                {
-                                    "id": new_id,
-                                    "oss_url": clip_url,
-                                    "duration": float(seg["end_sec"] - seg["start_sec"]),
-                                    "scene": seg["scene"],
-                                    "score": float(seg["score"] or 0.0),
-                                }
+                                (float(video_duration), asset_id),
                             )
-            finally:
-                conn.close()
-            try:
-                video.close()
-            except Exception:
-                pass
+
+                            for idx, seg in enumerate(segments):
+                                clip_url = clip_urls[idx]
+                                new_id = str(uuid.uuid4())
+                                cursor.execute(
+                                    """
+                                    INSERT INTO assets
+                                        (id, project_id, oss_url, duration, scene_label, scene_score, user_label, sort_order, is_deleted)
+                                    VALUES
+                                        (%s, %s, %s, %s, %s, %s, NULL, %s, FALSE)
+                                    """,
+                                    (
+                                        new_id,
+                                        project_id,
+                                        clip_url,
+                                        float(seg["end_sec"] - seg["start_sec"]),
+                                        seg["scene"],
+                                        float(seg["score"] or 0.0),
+                                        idx,
+                                    ),
+                                )
+                                probe_cache.remember(
+                                    new_id,
+                                    width=source.get("width") or 0,
+                                    height=source.get("height") or 0,
+                                    duration=float(seg["end_sec"] - seg["start_sec"]),
+                                )
+                                inserted_assets.append(
+                                    {
+                                        "id": new_id,
+                                        "oss_url": clip_url,
+                                        "duration": float(seg["end_sec"] - seg["start_sec"]),
+                                        "scene": seg["scene"],
+                                        "score": float(seg["score"] or 0.0),
+                                    }
+                                )
+                finally:
+                    conn.close()
             _log_info(
                 "split.finish",
                 project_id=project_id,
@@ -640,18 +862,15 @@ def _process_split_logic(project_id: str, asset_id: str, video_url: str, segment
                     except Exception:
                         pass
 
-detector = SceneDetector()
-script_gen = ScriptGenerator()
-audio_gen = AudioGenerator()
-aliyun_client = AliyunClient()
-sfx_library = SFXLibrary()  # Initialize SFX library
-video_render = VideoRenderer(aliyun_client=aliyun_client, sfx_library=sfx_library)  # Inject dependencies
-
 @celery_app.task(bind=True, max_retries=3)
 def analyze_video_task(self, project_id: str, asset_id: str, video_url: str):
     """
     Background task to analyze a video asset.
     """
+    import cv2
+    from frame_hash import merge_duplicate_shots
+    from shot_detect import probe_video
+
     # (Original content of analyze_video_task)
     started = time.monotonic()
     attempt = int(getattr(self.request, "retries", 0) or 0) + 1
@@ -670,9 +889,19 @@ def analyze_video_task(self, project_id: str, asset_id: str, video_url: str):
     try:
         _advance_project_status(project_id)
         _log_info("step.start", step="download", project_id=project_id, asset_id=asset_id, url_host=_url_host(asset_source.get("oss_url") or video_url))
-        local_video = video_render._download_temp(asset_source)
+        local_video = resources.video_renderer()._download_temp(asset_source)
         cleanup_local_video = (asset_source.get("storage_type") or "").upper() != "LOCAL_FILE"
-        duration_sec = _get_video_duration_sec(local_video)
+        probe = None
+        try:
+            with span("probe"):
+                probe = probe_video(local_video)
+            duration_sec = probe["duration"]
+            probe_cache.remember(asset_id, width=probe.get("width") or 0, height=probe.get("height") or 0, duration=duration_sec)
+        except Exception:
+            probe = None
+            duration_sec = _get_video_duration_sec(local_video)
+        # With the fast detector, shots and keyframes come from one sequential decode.
+        analysis = None
         _log_info(
             "step.finish",
             step="download",
@@ -690,7 +919,8 @@ def analyze_video_task(self, project_id: str, asset_id: str, video_url: str):
             # ... Split Logic ...
             
             if Config.SMART_SPLIT_STRATEGY == "qwen_video" and _is_http_url(asset_source.get("oss_url") or ""):
-                 segments_text = detector.analyze_video_segments(asset_source.get("oss_url"))
+                 with span("vision.video_segments"):
+                     segments_text = resources.scene_detector().analyze_video_segments(asset_source.get("oss_url"))
                  segments_raw = _parse_model_json(segments_text)
                  segments = _coerce_segments(segments_raw)
                  _process_split_logic(
@@ -706,34 +936,39 @@ def analyze_video_task(self, project_id: str, asset_id: str, video_url: str):
 
             elif Config.SMART_SPLIT_STRATEGY == "hybrid":
                  # ... Hybrid Logic ...
-                 shots = detector.detect_video_shots(local_video, threshold=Config.SCENE_DETECT_THRESHOLD)
-                 if not shots: shots = [(0.0, duration_sec)]
-                 
                  shot_frames = []
-                 cap = cv2.VideoCapture(local_video)
-                 try:
-                     for start, end in shots:
-                         mid_sec = (start + end) / 2
-                         cap.set(cv2.CAP_PROP_POS_MSEC, mid_sec * 1000)
-                         ret, frame = cap.read()
-                         if ret:
-                             temp_img = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
-                             h, w = frame.shape[:2]
-                             scale = 1024 / max(w, h) if max(w, h) > 1024 else 1.0
-                             if scale != 1.0: frame = cv2.resize(frame, None, fx=scale, fy=scale)
-                             cv2.imwrite(temp_img.name, frame)
-                             shot_frames.append({"start": start, "end": end, "image": temp_img.name})
-                             temp_img.close()
-                 finally:
-                     cap.release()
+                 if Config.SHOT_DETECTOR == "fast":
+                     with span("shots", detector="fast"):
+                         analysis = resources.scene_detector().analyze_video_pass(local_video, num_frames=5, probe=probe)
+                     for sf in analysis["shot_frames"]:
+                         shot_frames.append({"start": sf["start"], "end": sf["end"], "image": sf["jpeg"]})
+                 else:
+                     with span("shots", detector="pyscenedetect"):
+                         shots = resources.scene_detector().detect_video_shots(local_video, threshold=Config.SCENE_DETECT_THRESHOLD)
+                     if not shots: shots = [(0.0, duration_sec)]
+
+                     cap = cv2.VideoCapture(local_video)
+                     try:
+                         for start, end in shots:
+                             mid_sec = (start + end) / 2
+                             cap.set(cv2.CAP_PROP_POS_MSEC, mid_sec * 1000)
+                             ret, frame = cap.read()
+                             if ret:
+                                 h, w = frame.shape[:2]
+                                 scale = 1024 / max(w, h) if max(w, h) > 1024 else 1.0
+                                 if scale != 1.0: frame = cv2.resize(frame, None, fx=scale, fy=scale)
+                                 shot_frames.append({"start": start, "end": end, "image": frame})
+                     finally:
+                         cap.release()
+
+                 if shot_frames and Config.SHOT_DEDUP_ENABLED:
+                     shot_frames = merge_duplicate_shots(shot_frames)
 
                  if shot_frames:
-                     segments_text = detector.analyze_shot_grouping(shot_frames)
+                     with span("vision.shot_grouping", shots=len(shot_frames)):
+                         segments_text = resources.scene_detector().analyze_shot_grouping(shot_frames)
                      segments_raw = _parse_model_json(segments_text)
                      segments = _coerce_segments(segments_raw)
-                     
-                     for sf in shot_frames:
-                         if os.path.exists(sf["image"]): os.remove(sf["image"])
 
                      _process_split_logic(
                          project_id,
@@ -749,26 +984,34 @@ def analyze_video_task(self, project_id: str, asset_id: str, video_url: str):
                  if cleanup_local_video and os.path.exists(local_video): os.remove(local_video)
 
         # Fallback single frame analysis
-        frame_paths = detector.extract_key_frames(local_video, num_frames=5)
-        result_json_str = detector.analyze_scene_from_frames(frame_paths)
+        if analysis is None and Config.SHOT_DETECTOR == "fast" and os.path.exists(local_video):
+            with span("shots", detector="fast"):
+                analysis = resources.scene_detector().analyze_video_pass(local_video, num_frames=5, probe=probe)
+        if analysis is not None and analysis["key_frames"]:
+            key_frames = analysis["key_frames"]
+        else:
+            key_frames = resources.scene_detector().extract_key_frames(local_video, num_frames=5)
+        with span("vision.scene", frames=len(key_frames)):
+            result_json_str = resources.scene_detector().analyze_scene_from_frames(key_frames)
         result_data = _parse_model_json(result_json_str)
         
-        conn = psycopg2.connect(Config.DB_DSN)
-        try:
-            with conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        UPDATE assets
-                        SET scene_label = %s,
-                        scene_score = %s,
-                        duration = %s
-                        WHERE id = %s
-                        """,
-                        (result_data.get("scene", "unknown"), float(result_data.get("score", 0.0) or 0.0), float(duration_sec or 0.0), asset_id),
-                    )
-        finally:
-            conn.close()
+        with span("db.update_asset_scene"):
+            conn = psycopg2.connect(Config.DB_DSN)
+            try:
+                with conn:
+                    with conn.cursor() as cursor:
+                        cursor.execute(
+                            """
+                            UPDATE assets
+                            SET scene_label = %s,
+                            scene_score = %s,
+                            duration = %s
+                            WHERE id = %s
+                            """,
+                            (result_data.get("scene", "unknown"), float(result_data.get("score", 0.0) or 0.0), float(duration_sec or 0.0), asset_id),
+                        )
+            finally:
+                conn.close()
 
         _advance_project_status(project_id)
         if cleanup_local_video and os.path.exists(local_video): os.remove(local_video)
@@ -810,6 +1053,8 @@ def generate_script_task(self, project_id: str, house_info: dict, timeline_data:
                 )
                 
                 # Initialize multi-agent generator
+                from agent_workflow import MultiAgentScriptGenerator
+
                 multi_agent_gen = MultiAgentScriptGenerator(llm_client=None)  # Will use litellm internally
                 
                 # Generate script with multi-agent workflow
@@ -837,10 +1082,10 @@ def generate_script_task(self, project_id: str, house_info: dict, timeline_data:
                     extra={"event": "script.multi_agent.fallback", "project_id": project_id}
                 )
                 # Fallback to standard generation
-                script_content = script_gen.generate_script(house_info, timeline_data)
+                script_content = resources.script_generator().generate_script(house_info, timeline_data)
         else:
             # Standard script generation
-            script_content = script_gen.generate_script(house_info, timeline_data)
+            script_content = resources.script_generator().generate_script(house_info, timeline_data)
 
         # 2. Quality Gate: Validate Opening Hook Strength
         validation_result = _validate_opening_hook(script_content, house_info)
@@ -880,19 +1125,20 @@ def generate_script_task(self, project_id: str, house_info: dict, timeline_data:
             )
 
         # 3. Update Database
-        conn = psycopg2.connect(Config.DB_DSN)
-        try:
-            with conn:
-                with conn.cursor() as cursor:
-                    update_query = """
-                        UPDATE projects 
-                        SET script_content = %s::jsonb,
-                            status = 'SCRIPT_GENERATED'
-                        WHERE id = %s
-                    """
-                    cursor.execute(update_query, (script_content, project_id))
-        finally:
-            conn.close()
+        with span("db.update_script"):
+            conn = psycopg2.connect(Config.DB_DSN)
+            try:
+                with conn:
+                    with conn.cursor() as cursor:
+                        update_query = """
+                            UPDATE projects 
+                            SET script_content = %s::jsonb,
+                                status = 'SCRIPT_GENERATED'
+                            WHERE id = %s
+                        """
+                        cursor.execute(update_query, (script_content, project_id))
+            finally:
+                conn.close()
 
         return {"project_id": project_id, "script": script_content}
     except Exception as e:
@@ -1037,14 +1283,9 @@ def _calculate_emotion_distribution(timeline_assets: list) -> dict:
         distribution[emotion] = distribution.get(emotion, 0) + 1
     return distribution
 
-def _parse_and_align_segments(project_id: str, script_content: str):
-    """
-    Fetch assets, parse script (JSON/Text), and prepare for audio generation.
-    """
-    if isinstance(script_content, (dict, list)):
-        script_content = json.dumps(script_content)
-    
-    # Fetch assets to get durations
+@span("db.fetch_timeline")
+def _fetch_timeline_assets(project_id: str) -> list:
+    """Timeline assets of the project in sort order, with durations (5s when unknown)."""
     conn = psycopg2.connect(Config.DB_DSN)
     timeline_assets = []
     try:
@@ -1073,6 +1314,18 @@ def _parse_and_align_segments(project_id: str, script_content: str):
                     })
     finally:
         conn.close()
+    return timeline_assets
+
+def _parse_and_align_segments(project_id: str, script_content: str, timeline_assets: list = None):
+    """
+    Fetch assets (unless ``timeline_assets`` is given), parse script (JSON/Text), and prepare for audio generation.
+    """
+    if isinstance(script_content, (dict, list)):
+        script_content = json.dumps(script_content)
+    
+    # Fetch assets to get durations
+    if timeline_assets is None:
+        timeline_assets = _fetch_timeline_assets(project_id)
         
     segments = []
     intro_text = ""  # 片头开场白
@@ -1162,7 +1415,7 @@ def generate_audio_task(self, project_id: str, script_content: str):
         # Temp dir for segments
         with tempfile.TemporaryDirectory() as temp_dir:
             # Generate aligned segments
-            audio_map = audio_gen.generate_aligned_audio_segments(segments, temp_dir)
+            audio_map = resources.audio_generator().generate_aligned_audio_segments(segments, temp_dir)
             
             # Concat for preview
             preview_path = f"/tmp/{project_id}_preview.mp3"
@@ -1173,7 +1426,9 @@ def generate_audio_task(self, project_id: str, script_content: str):
                     sorted_files.append(audio_map[aid])
             
             if sorted_files:
-                _ffmpeg_concat_mp3(sorted_files, preview_path)
+                with span("audio.encode_preview") as s:
+                    encode_files_to_mp3(sorted_files, preview_path)
+                    s.add_bytes_out(os.path.getsize(preview_path))
             else:
                 # Should not happen
                 pass
@@ -1183,19 +1438,20 @@ def generate_audio_task(self, project_id: str, script_content: str):
             audio_url = upload_to_s3(preview_path, file_name, content_type="audio/mpeg")
             
             # Update DB
-            conn = psycopg2.connect(Config.DB_DSN)
-            try:
-                with conn:
-                    with conn.cursor() as cursor:
-                        update_query = """
-                            UPDATE projects 
-                            SET audio_url = %s,
-                                status = 'AUDIO_GENERATED'
-                            WHERE id = %s
-                        """
-                        cursor.execute(update_query, (audio_url, project_id))
-            finally:
-                conn.close()
+            with span("db.update_audio_url"):
+                conn = psycopg2.connect(Config.DB_DSN)
+                try:
+                    with conn:
+                        with conn.cursor() as cursor:
+                            update_query = """
+                                UPDATE projects 
+                                SET audio_url = %s,
+                                    status = 'AUDIO_GENERATED'
+                                WHERE id = %s
+                            """
+                            cursor.execute(update_query, (audio_url, project_id))
+                finally:
+                    conn.close()
             
             if os.path.exists(preview_path): os.remove(preview_path)
 
@@ -1224,26 +1480,40 @@ def render_video_task(self, project_id: str, _timeline_assets: list, _audio_path
     Background task to render final video.
     """
     started = time.monotonic()
+    lease = None
+    flight = None
     try:
-        _set_project_status(project_id, "RENDERING", skip_if_status_in=("COMPLETED",))
-
         # 1. Fetch Script
-        conn = psycopg2.connect(Config.DB_DSN)
-        script_content = ""
-        house_info = {}
-        try:
-            with conn:
-                with conn.cursor() as cursor:
-                    cursor.execute("SELECT script_content::text, title, description FROM projects WHERE id = %s", (project_id,))
-                    row = cursor.fetchone()
-                    if row:
-                        script_content = row[0]
-                        house_info = {'title': row[1] or '', 'description': row[2] or ''}
-        finally:
-            conn.close()
+        with span("db.fetch_project"):
+            conn = psycopg2.connect(Config.DB_DSN)
+            script_content = ""
+            house_info = {}
+            try:
+                with conn:
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT script_content::text, title, description FROM projects WHERE id = %s", (project_id,))
+                        row = cursor.fetchone()
+                        if row:
+                            script_content = row[0]
+                            house_info = {'title': row[1] or '', 'description': row[2] or ''}
+            finally:
+                conn.close()
+
+        # Duplicates wait before touching the project status
+        timeline_assets_db = _fetch_timeline_assets(project_id)
+        flight, cached = _join_render_flight(
+            self, "render_video_task", project_id, _render_input_hash(script_content, timeline_assets_db, bgm_url)
+        )
+        if cached is not None:
+            return cached
+        # Deferred until the node has budget, before any work that a deferral would repeat
+        lease = _admit_render(self, project_id, timeline_assets_db)
+        _set_project_status(project_id, "RENDERING", skip_if_status_in=("COMPLETED",))
 
         # 2. Re-generate aligned audio segments locally
-        segments, timeline_assets_db, intro_text, intro_card = _parse_and_align_segments(project_id, script_content)
+        segments, timeline_assets_db, intro_text, intro_card = _parse_and_align_segments(
+            project_id, script_content, timeline_assets_db
+        )
         
         # Download BGM if provided
         bgm_path = None
@@ -1256,53 +1526,59 @@ def render_video_task(self, project_id: str, _timeline_assets: list, _audio_path
 
         with tempfile.TemporaryDirectory() as temp_dir:
             # Generate aligned segments
-            audio_map = audio_gen.generate_aligned_audio_segments(segments, temp_dir)
+            audio_map = resources.audio_generator().generate_aligned_audio_segments(segments, temp_dir)
             
             # 3. Render Video
             temp_video = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
             temp_video.close()
             
             # Pass script_segments for subtitle rendering (P0 Feature)
-            output_path = video_render.render_video(
+            output_path = resources.video_renderer().render_video(
                 timeline_assets_db, 
                 audio_map, 
                 temp_video.name, 
                 bgm_path=bgm_path,
                 script_segments=segments,  # Enable subtitle generation
                 house_info=house_info,  # Enable intelligent AI enhancement
-                audio_gen=audio_gen,  # Enable intro voice generation
+                audio_gen=resources.audio_generator(),  # Enable intro voice generation
                 intro_text=intro_text,  # Use user-edited intro text
                 intro_card=intro_card  # Pass structured intro card data
             )
 
             # 4. Upload
+            flight.ensure_current()
             file_name = f"rendered_{project_id}.mp4"
             final_video_url = upload_to_s3(output_path, file_name)
             
             # 5. Update DB
-            conn = psycopg2.connect(Config.DB_DSN)
-            try:
-                with conn:
-                    with conn.cursor() as cursor:
-                        update_query = """
-                            UPDATE projects 
-                            SET final_video_url = %s,
-                                status = 'COMPLETED'
-                            WHERE id = %s
-                        """
-                        cursor.execute(update_query, (final_video_url, project_id))
-            finally:
-                conn.close()
+            with span("db.update_final_video"):
+                conn = psycopg2.connect(Config.DB_DSN)
+                try:
+                    with conn:
+                        with conn.cursor() as cursor:
+                            update_query = """
+                                UPDATE projects 
+                                SET final_video_url = %s,
+                                    status = 'COMPLETED'
+                                WHERE id = %s
+                            """
+                            cursor.execute(update_query, (final_video_url, project_id))
+                finally:
+                    conn.close()
 
             if os.path.exists(output_path): os.remove(output_path)
             if bgm_path and os.path.exists(bgm_path) and not (bgm_url or "").startswith("file://"):
                 os.remove(bgm_path)
             
-        return {"project_id": project_id, "video_url": final_video_url}
+        result = {"project_id": project_id, "video_url": final_video_url}
+        flight.complete(result)
+        return result
 
     except Exception as e:
         if isinstance(e, Retry): raise
-        retries = int(getattr(self.request, "retries", 0) or 0)
+        if isinstance(e, singleflight.Superseded):
+            return {"project_id": project_id, "status": "superseded"}
+        retries = _task_retries(self)
         max_retries = int(getattr(self, "max_retries", 0) or 0)
         if retries >= max_retries:
             headers = getattr(self.request, "headers", {}) or {}
@@ -1314,186 +1590,484 @@ def render_video_task(self, project_id: str, _timeline_assets: list, _audio_path
                 request_id=headers.get("request_id"),
                 exc=e,
             )
+            if flight is not None:
+                flight.abandon()
             raise
         raise _retry_with_headers(self, exc=e, countdown=2 ** retries)
+    finally:
+        if lease is not None:
+            lease.release()
+        if flight is not None:
+            flight.stop()
 
-@celery_app.task(bind=True, max_retries=3)
-def render_pipeline_task(self, project_id: str, script_content: str, _timeline_assets: list, bgm_url: str = None):
-    started = time.monotonic()
+@span("db.fetch_project")
+def _fetch_house_info(project_id: str) -> dict:
+    conn = psycopg2.connect(Config.DB_DSN)
+    house_info = {}
     try:
-        _set_project_status(project_id, "AUDIO_GENERATING", skip_if_status_in=("COMPLETED",))
-        
-        segments, timeline_assets_db, intro_text, intro_card = _parse_and_align_segments(project_id, script_content)
-        
-        # Fetch house info for intelligent AI enhancement
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT title, description FROM projects WHERE id = %s", (project_id,))
+                row = cursor.fetchone()
+                if row:
+                    house_info = {'title': row[0] or '', 'description': row[1] or ''}
+    finally:
+        conn.close()
+    return house_info
+
+def _select_bgm(project_id: str, script_content: str, timeline_assets_db: list, bgm_url: str = None):
+    """Phase 2-2: pick a BGM when none was given. Returns (bgm_url, bgm_metadata)."""
+    if not Config.BGM_AUTO_SELECT_ENABLED or bgm_url:
+        return bgm_url, None
+    try:
+        logger.info(
+            "Using BGM intelligent selection",
+            extra={"event": "bgm.auto_select.enabled", "project_id": project_id}
+        )
+
+        # Detect video style and emotion distribution
+        video_style = _detect_video_style(script_content, timeline_assets_db)
+        script_keywords = _extract_keywords_from_script(script_content)
+        emotion_distribution = _calculate_emotion_distribution(timeline_assets_db)
+
+        # Select BGM
+        selector = BGMSelector()
+        bgm_metadata = selector.select_bgm(
+            video_style=video_style,
+            script_keywords=script_keywords,
+            emotion_distribution=emotion_distribution
+        )
+        if bgm_metadata and bgm_metadata.get('url'):
+            bgm_metadata = {**bgm_metadata, 'video_style': video_style}
+            return bgm_metadata.get('url'), bgm_metadata
+        logger.info("No suitable BGM found, continuing without BGM")
+    except Exception as e:
+        logger.warning(
+            f"BGM auto-selection failed: {e}",
+            extra={"event": "bgm.auto_select.failed", "project_id": project_id}
+        )
+    return None, None
+
+def _fetch_bgm(project_id: str, bgm_url: str = None, bgm_metadata: dict = None):
+    """Download the BGM. Returns (bgm_path, bgm_metadata); metadata is dropped when the download fails."""
+    if not bgm_url:
+        return None, None
+    try:
+        bgm_suffix = _infer_suffix_from_url(bgm_url, ".mp3")
+        bgm_path = _download_to_temp(bgm_url, suffix=bgm_suffix)
+    except Exception as e:
+        if bgm_metadata:
+            logger.warning(f"Failed to download auto-selected BGM: {e}")
+        else:
+            logger.warning(f"Failed to download BGM: {e}")
+        return None, None
+    if bgm_metadata:
+        logger.info(
+            f"BGM auto-selected: {bgm_metadata.get('id')}",
+            extra={
+                "event": "bgm.auto_select.success",
+                "project_id": project_id,
+                "bgm_id": bgm_metadata.get('id'),
+                "video_style": bgm_metadata.get('video_style')
+            }
+        )
+    return bgm_path, bgm_metadata
+
+def _remove_bgm(bgm_path: str | None, bgm_url: str | None):
+    if bgm_path and os.path.exists(bgm_path) and not (bgm_url or "").startswith("file://"):
+        os.remove(bgm_path)
+
+def _render_and_publish(project_id: str, segments: list, timeline_assets: list, audio_map: dict, *, bgm_path: str = None,
+                        bgm_metadata: dict = None, house_info: dict = None, intro_text: str = None, intro_card: dict = None,
+                        flight: "singleflight.Flight" = None, task_name: str = None):
+    """Upload the voice-over preview, render, upload the video and update the project. Returns (audio_url, video_url).
+
+    With ``flight``, every stage that writes shared state first checks that no newer
+    submission took over (raises singleflight.Superseded).
+    """
+    def ensure_current():
+        if flight is not None:
+            flight.ensure_current(task_name)
+
+    ensure_current()
+    # Concat preview
+    preview_path = f"/tmp/{project_id}_preview.mp3"
+    sorted_files = []
+    for seg in segments:
+        aid = seg.get('asset_id')
+        if aid in audio_map:
+            sorted_files.append(audio_map[aid])
+
+    if sorted_files:
+        with span("audio.encode_preview") as s:
+            encode_files_to_mp3(sorted_files, preview_path)
+            s.add_bytes_out(os.path.getsize(preview_path))
+
+    ensure_current()
+    audio_url = upload_to_s3(preview_path, f"{project_id}.mp3", content_type="audio/mpeg")
+
+     # Update DB with audio_url
+    with span("db.update_audio_url"):
+        conn = psycopg2.connect(Config.DB_DSN)
+        try:
+            with conn:
+                with conn.cursor() as cursor:
+                    update_query = """
+                        UPDATE projects 
+                        SET audio_url = %s,
+                            status = 'AUDIO_GENERATED'
+                        WHERE id = %s
+                    """
+                    cursor.execute(update_query, (audio_url, project_id))
+        finally:
+            conn.close()
+
+    # Render
+    _set_project_status(project_id, "RENDERING", skip_if_status_in=("COMPLETED",))
+
+    temp_video = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+    temp_video.close()
+
+    # Pass script_segments for subtitle rendering (P0 Feature)
+    output_path = resources.video_renderer().render_video(
+        timeline_assets, 
+        audio_map, 
+        temp_video.name, 
+        bgm_path=bgm_path,
+        script_segments=segments,  # Enable subtitle generation
+        house_info=house_info,  # Enable intelligent AI enhancement
+        audio_gen=resources.audio_generator(),  # Enable intro voice generation
+        intro_text=intro_text,  # Use user-edited intro text
+        intro_card=intro_card,  # Pass structured intro card data
+        bgm_metadata=bgm_metadata  # Phase 2-2: Pass BGM metadata for dynamic volume curve
+    )
+
+    ensure_current()
+    final_video_url = upload_to_s3(output_path, f"rendered_{project_id}.mp4")
+
+    # Update DB
+    with span("db.update_final_video"):
         conn = psycopg2.connect(Config.DB_DSN)
-        house_info = {}
         try:
             with conn:
                 with conn.cursor() as cursor:
-                    cursor.execute("SELECT title, description FROM projects WHERE id = %s", (project_id,))
-                    row = cursor.fetchone()
-                    if row:
-                        house_info = {'title': row[0] or '', 'description': row[1] or ''}
+                    update_query = """
+                        UPDATE projects 
+                        SET final_video_url = %s,
+                            status = 'COMPLETED'
+                        WHERE id = %s
+                    """
+                    cursor.execute(update_query, (final_video_url, project_id))
         finally:
             conn.close()
+
+    if os.path.exists(preview_path): os.remove(preview_path)
+    if os.path.exists(output_path): os.remove(output_path)
+    return audio_url, final_video_url
+
+def _fail_or_retry(task, e: Exception, *, project_id: str, task_name: str, step: str, on_final=None):
+    if isinstance(e, Retry): raise e
+    if isinstance(e, singleflight.Superseded):
+        if on_final is not None:
+            on_final()
+        return {"project_id": project_id, "status": "superseded"}
+    retries = _task_retries(task)
+    max_retries = int(getattr(task, "max_retries", 0) or 0)
+    if retries >= max_retries:
+        headers = getattr(task.request, "headers", {}) or {}
+        _set_project_failed(
+            project_id,
+            task_name=task_name,
+            step=step,
+            task_id=getattr(task.request, "id", None),
+            request_id=headers.get("request_id"),
+            exc=e,
+        )
+        if on_final is not None:
+            on_final()
+        raise e
+    raise _retry_with_headers(task, exc=e, countdown=2 ** retries)
+
+@celery_app.task(bind=True, max_retries=3)
+def render_pipeline_task(self, project_id: str, script_content: str, _timeline_assets: list, bgm_url: str = None):
+    lease = None
+    flight = None
+    try:
+        # Duplicates wait before touching the project status
+        timeline_assets_db = _fetch_timeline_assets(project_id)
+        flight, cached = _join_render_flight(
+            self, "render_pipeline_task", project_id, _render_input_hash(script_content, timeline_assets_db, bgm_url)
+        )
+        if cached is not None:
+            return cached
+        use_dag = Config.RENDER_DAG_ENABLED and len(timeline_assets_db) >= max(1, Config.RENDER_DAG_MIN_SEGMENTS)
+        if not use_dag:
+            # Deferred until the node has budget, before any work that a deferral would repeat
+            lease = _admit_render(self, project_id, timeline_assets_db)
+        _set_project_status(project_id, "AUDIO_GENERATING", skip_if_status_in=("COMPLETED",))
         
-        # Phase 2-2: BGM Intelligent Selection (if enabled)
-        bgm_metadata = None
-        bgm_path = None  # Initialize bgm_path to avoid UnboundLocalError
+        segments, timeline_assets_db, intro_text, intro_card = _parse_and_align_segments(
+            project_id, script_content, timeline_assets_db
+        )
         
-        if Config.BGM_AUTO_SELECT_ENABLED and not bgm_url:
-            try:
-                logger.info(
-                    "Using BGM intelligent selection",
-                    extra={"event": "bgm.auto_select.enabled", "project_id": project_id}
-                )
-                
-                # Detect video style and emotion distribution
-                video_style = _detect_video_style(script_content, timeline_assets_db)
-                script_keywords = _extract_keywords_from_script(script_content)
-                emotion_distribution = _calculate_emotion_distribution(timeline_assets_db)
-                
-                # Select BGM
-                selector = BGMSelector()
-                bgm_metadata = selector.select_bgm(
-                    video_style=video_style,
-                    script_keywords=script_keywords,
-                    emotion_distribution=emotion_distribution
-                )
-                
-                if bgm_metadata:
-                    bgm_url_selected = bgm_metadata.get('url')
-                    if bgm_url_selected:
-                        try:
-                            bgm_suffix = _infer_suffix_from_url(bgm_url_selected, ".mp3")
-                            bgm_path = _download_to_temp(bgm_url_selected, suffix=bgm_suffix)
-                            
-                            logger.info(
-                                f"BGM auto-selected: {bgm_metadata.get('id')}",
-                                extra={
-                                    "event": "bgm.auto_select.success",
-                                    "project_id": project_id,
-                                    "bgm_id": bgm_metadata.get('id'),
-                                    "video_style": video_style
-                                }
-                            )
-                        except Exception as e:
-                            logger.warning(f"Failed to download auto-selected BGM: {e}")
-                            bgm_metadata = None
-                else:
-                    logger.info("No suitable BGM found, continuing without BGM")
-                    
-            except Exception as e:
-                logger.warning(
-                    f"BGM auto-selection failed: {e}",
-                    extra={"event": "bgm.auto_select.failed", "project_id": project_id}
-                )
+        # Fetch house info for intelligent AI enhancement
+        house_info = _fetch_house_info(project_id)
         
-        # Download BGM if manually specified
-        if not bgm_path and bgm_url:
-            try:
-                bgm_suffix = _infer_suffix_from_url(bgm_url, ".mp3")
-                bgm_path = _download_to_temp(bgm_url, suffix=bgm_suffix)
-            except Exception as e:
-                logger.warning(f"Failed to download BGM: {e}")
+        # Phase 2-2: BGM Intelligent Selection (if enabled)
+        bgm_url, bgm_metadata = _select_bgm(project_id, script_content, timeline_assets_db, bgm_url)
+
+        if use_dag:
+            return _dispatch_render_dag(
+                self, project_id, segments, timeline_assets_db,
+                house_info=house_info, intro_text=intro_text, intro_card=intro_card,
+                bgm_url=bgm_url, bgm_metadata=bgm_metadata, flight=flight,
+            )
+
+        bgm_path, bgm_metadata = _fetch_bgm(project_id, bgm_url, bgm_metadata)
 
         with tempfile.TemporaryDirectory() as temp_dir:
             # Audio
-            audio_map = audio_gen.generate_aligned_audio_segments(segments, temp_dir)
-            
-            # Concat preview
-            preview_path = f"/tmp/{project_id}_preview.mp3"
-            sorted_files = []
-            for seg in segments:
-                aid = seg.get('asset_id')
-                if aid in audio_map:
-                    sorted_files.append(audio_map[aid])
-            
-            if sorted_files:
-                _ffmpeg_concat_mp3(sorted_files, preview_path)
-                
-            audio_url = upload_to_s3(preview_path, f"{project_id}.mp3", content_type="audio/mpeg")
-            
-             # Update DB with audio_url
-            conn = psycopg2.connect(Config.DB_DSN)
-            try:
-                with conn:
-                    with conn.cursor() as cursor:
-                        update_query = """
-                            UPDATE projects 
-                            SET audio_url = %s,
-                                status = 'AUDIO_GENERATED'
-                            WHERE id = %s
-                        """
-                        cursor.execute(update_query, (audio_url, project_id))
-            finally:
-                conn.close()
-
-            # Render
-            _set_project_status(project_id, "RENDERING", skip_if_status_in=("COMPLETED",))
-            
-            temp_video = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
-            temp_video.close()
-            
-            # Pass script_segments for subtitle rendering (P0 Feature)
-            output_path = video_render.render_video(
-                timeline_assets_db, 
-                audio_map, 
-                temp_video.name, 
-                bgm_path=bgm_path,
-                script_segments=segments,  # Enable subtitle generation
-                house_info=house_info,  # Enable intelligent AI enhancement
-                audio_gen=audio_gen,  # Enable intro voice generation
-                intro_text=intro_text,  # Use user-edited intro text
-                intro_card=intro_card,  # Pass structured intro card data
-                bgm_metadata=bgm_metadata  # Phase 2-2: Pass BGM metadata for dynamic volume curve
+            audio_map = resources.audio_generator().generate_aligned_audio_segments(segments, temp_dir)
+            audio_url, final_video_url = _render_and_publish(
+                project_id, segments, timeline_assets_db, audio_map,
+                bgm_path=bgm_path, bgm_metadata=bgm_metadata, house_info=house_info,
+                intro_text=intro_text, intro_card=intro_card, flight=flight,
             )
+            _remove_bgm(bgm_path, bgm_url)
             
-            final_video_url = upload_to_s3(output_path, f"rendered_{project_id}.mp4")
-            
-            # Update DB
-            conn = psycopg2.connect(Config.DB_DSN)
-            try:
-                with conn:
-                    with conn.cursor() as cursor:
-                        update_query = """
-                            UPDATE projects 
-                            SET final_video_url = %s,
-                                status = 'COMPLETED'
-                            WHERE id = %s
-                        """
-                        cursor.execute(update_query, (final_video_url, project_id))
-            finally:
-                conn.close()
-                
-            if os.path.exists(preview_path): os.remove(preview_path)
-            if os.path.exists(output_path): os.remove(output_path)
-            if bgm_path and os.path.exists(bgm_path) and not (bgm_url or "").startswith("file://"):
-                os.remove(bgm_path)
-            
-        return {
+        result = {
             "project_id": project_id,
             "audio_url": audio_url,
             "video_url": final_video_url
         }
+        flight.complete(result)
+        return result
 
     except Exception as e:
-        if isinstance(e, Retry): raise
-        retries = int(getattr(self.request, "retries", 0) or 0)
-        max_retries = int(getattr(self, "max_retries", 0) or 0)
-        if retries >= max_retries:
-            headers = getattr(self.request, "headers", {}) or {}
-            _set_project_failed(
-                project_id,
-                task_name="render_pipeline_task",
-                step="render_pipeline",
-                task_id=getattr(self.request, "id", None),
-                request_id=headers.get("request_id"),
-                exc=e,
+        return _fail_or_retry(
+            self, e, project_id=project_id, task_name="render_pipeline_task", step="render_pipeline",
+            on_final=flight.abandon if flight is not None and not isinstance(e, singleflight.Superseded) else None,
+        )
+    finally:
+        if lease is not None:
+            lease.release()
+        if flight is not None:
+            # A dispatched render keeps its flight: the child tasks renew it while they run
+            flight.stop()
+
+# ---------------------------------------------------------------------------
+# Distributed render (RENDER_DAG_ENABLED): render_pipeline_task fans out one
+# render_segment_task per timeline asset (TTS + download + normalize into an S3
+# part) and a chord joins them in render_finalize_task (concat, intro/outro,
+# subtitles, mix, encode, upload). Parts live under
+# RENDER_DAG_S3_PREFIX/<project_id>/<render_id>/ and are deleted afterwards.
+# The single-flight of render_pipeline_task is held until finalize (or the error
+# callback) ends it; ``flight_ref`` carries it to the child tasks.
+# ---------------------------------------------------------------------------
+
+def _pipeline_flight(project_id: str, flight_ref: dict | None) -> "singleflight.Flight | None":
+    if not flight_ref:
+        return None
+    return singleflight.Flight("render_pipeline_task", project_id, flight_ref.get("input_hash"), flight_ref.get("owner"))
+
+def _render_parts_prefix(project_id: str, render_id: str) -> str:
+    return f"{Config.RENDER_DAG_S3_PREFIX.strip('/')}/{project_id}/{render_id}"
+
+def _child_task_options(task) -> dict:
+    headers = _get_task_headers(getattr(task, "request", None))
+    return {"headers": {k: str(headers[k]) for k in ("request_id", "user_id", "project_id") if headers.get(k) is not None}}
+
+@span("download")
+def _download_render_part(object_key: str, dest_path: str) -> str:
+    get_s3().download_file(Config.S3_STORAGE_BUCKET, object_key, dest_path)
+    size = os.path.getsize(dest_path)
+    current_span().add_bytes_in(size)
+    metrics.TRANSFER_BYTES.inc(size, direction="download", target="s3")
+    return dest_path
+
+def _delete_render_parts(project_id: str, render_id: str):
+    prefix = _render_parts_prefix(project_id, render_id) + "/"
+    try:
+        client = get_s3()
+        listing = client.list_objects_v2(Bucket=Config.S3_STORAGE_BUCKET, Prefix=prefix)
+        keys = [{"Key": o["Key"]} for o in listing.get("Contents", [])]
+        if keys:
+            client.delete_objects(Bucket=Config.S3_STORAGE_BUCKET, Delete={"Objects": keys, "Quiet": True})
+    except Exception as e:
+        _log_warning("render.dag.cleanup_failed", project_id=project_id, object_key=prefix, reason=str(e)[:256])
+
+def _dispatch_render_dag(task, project_id: str, segments: list, timeline_assets: list, *, house_info: dict,
+                         intro_text: str, intro_card: dict, bgm_url: str, bgm_metadata: dict,
+                         flight: "singleflight.Flight" = None) -> dict:
+    from celery import chord
+
+    render_id = uuid.uuid4().hex[:12]
+    options = _child_task_options(task)
+    flight_ref = {"input_hash": flight.input_hash, "owner": flight.owner} if flight is not None else None
+    segments_by_asset = {}
+    for seg in segments:
+        segments_by_asset.setdefault(seg.get('asset_id'), []).append(seg)
+
+    header = [
+        render_segment_task.s(
+            project_id, render_id, idx, len(timeline_assets), asset, segments_by_asset.get(asset.get('id'), []), house_info,
+            flight_ref,
+        ).set(**options)
+        for idx, asset in enumerate(timeline_assets)
+    ]
+    body = render_finalize_task.s(
+        project_id, render_id, segments, house_info, intro_text, intro_card, bgm_url, bgm_metadata, flight_ref
+    ).set(**options)
+    # Called when a segment fails for good (the chord body then never runs); ignores finalize failures
+    body.link_error(render_dag_failed_task.s(project_id, render_id, flight_ref))
+    chord(header)(body)
+
+    _log_info("render.dag.dispatch", project_id=project_id, segments_count=len(header), operation=render_id)
+    return {"project_id": project_id, "status": "dispatched", "render_id": render_id, "segments": len(header)}
+
+@celery_app.task(bind=True, max_retries=3)
+def render_segment_task(self, project_id: str, render_id: str, index: int, total: int, asset: dict, segments: list,
+                        house_info: dict = None, flight_ref: dict = None):
+    """Distributed render, fan-out: voice-over, download and normalize one timeline asset into an S3 part."""
+    asset_id = asset.get('id')
+    flight = _pipeline_flight(project_id, flight_ref)
+    lease = None
+    try:
+        if flight is not None:
+            flight.ensure_current("render_segment_task")
+            flight.hold()
+        lease = _admit_render(self, project_id, [asset], audio_sec=sum(float(s.get('duration') or 0.0) for s in segments))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            audio_path = None
+            if segments:
+                audio_map = resources.audio_generator().generate_aligned_audio_segments(segments, temp_dir)
+                audio_path = audio_map.get(asset_id)
+
+            part_path = os.path.join(temp_dir, f"part_{index:03d}.mp4")
+            info = resources.video_renderer().render_segment(
+                asset, audio_path, part_path, index=index, total=total, house_info=house_info
             )
+            result = {"index": index, "asset_id": asset_id, "video_key": None, "audio_key": None}
+            if info is None:
+                return result
+
+            if flight is not None:
+                flight.ensure_current("render_segment_task")
+            prefix = _render_parts_prefix(project_id, render_id)
+            result["video_key"] = f"{prefix}/{index:03d}.mp4"
+            upload_to_s3(part_path, result["video_key"])
+            if audio_path and os.path.exists(audio_path):
+                ext = os.path.splitext(audio_path)[1] or ".wav"
+                result["audio_key"] = f"{prefix}/{index:03d}{ext}"
+                upload_to_s3(audio_path, result["audio_key"], content_type="audio/mpeg" if ext == ".mp3" else "audio/wav")
+            result.update(info)
+            return result
+    except Exception as e:
+        if isinstance(e, (Retry, singleflight.Superseded)): raise
+        retries = _task_retries(self)
+        if retries >= int(getattr(self, "max_retries", 0) or 0):
+            # The chord error callback (render_dag_failed_task) marks the project failed
             raise
         raise _retry_with_headers(self, exc=e, countdown=2 ** retries)
+    finally:
+        if lease is not None:
+            lease.release()
+        if flight is not None:
+            flight.stop()
+
+@celery_app.task(bind=True, max_retries=3)
+def render_finalize_task(self, parts: list, project_id: str, render_id: str, segments: list, house_info: dict = None,
+                         intro_text: str = None, intro_card: dict = None, bgm_url: str = None, bgm_metadata: dict = None,
+                         flight_ref: dict = None):
+    """Distributed render, fan-in: concatenate the normalized parts, add intro/outro and subtitles, mix, encode, upload."""
+    flight = _pipeline_flight(project_id, flight_ref)
+    lease = None
+    try:
+        if flight is not None:
+            flight.ensure_current("render_finalize_task")
+            flight.hold()
+        parts = sorted((p for p in (parts or []) if p and p.get("video_key")), key=lambda p: int(p.get("index") or 0))
+        if not parts:
+            raise ValueError("No video clips to render")
+        lease = _admit_render(self, project_id, [
+            {"id": p.get("asset_id"), "width": p.get("width"), "height": p.get("height"), "duration": p.get("duration")}
+            for p in parts
+        ])
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            timeline_assets, audio_map = [], {}
+            for part in parts:
+                local_video = _download_render_part(part["video_key"], os.path.join(temp_dir, os.path.basename(part["video_key"])))
+                timeline_assets.append({
+                    "id": part.get("asset_id"),
+                    "storage_type": "LOCAL_FILE",
+                    "local_path": local_video,
+                    "duration": float(part.get("duration") or 0.0),
+                    "normalized": True,
+                })
+                if part.get("audio_key"):
+                    audio_map[part.get("asset_id")] = _download_render_part(
+                        part["audio_key"], os.path.join(temp_dir, os.path.basename(part["audio_key"]))
+                    )
+
+            bgm_path, bgm_metadata = _fetch_bgm(project_id, bgm_url, bgm_metadata)
+            audio_url, final_video_url = _render_and_publish(
+                project_id, segments, timeline_assets, audio_map,
+                bgm_path=bgm_path, bgm_metadata=bgm_metadata, house_info=house_info,
+                intro_text=intro_text, intro_card=intro_card, flight=flight, task_name="render_finalize_task",
+            )
+            _remove_bgm(bgm_path, bgm_url)
+
+        _delete_render_parts(project_id, render_id)
+        result = {
+            "project_id": project_id,
+            "audio_url": audio_url,
+            "video_url": final_video_url
+        }
+        if flight is not None:
+            flight.complete(result)
+        return result
+    except Exception as e:
+        superseded = isinstance(e, singleflight.Superseded)
+
+        def on_final():
+            _delete_render_parts(project_id, render_id)
+            if flight is not None and not superseded:
+                flight.abandon()
+
+        return _fail_or_retry(
+            self, e, project_id=project_id, task_name="render_finalize_task", step="render_finalize",
+            on_final=on_final,
+        )
+    finally:
+        if lease is not None:
+            lease.release()
+        if flight is not None:
+            flight.stop()
+
+@celery_app.task
+def render_dag_failed_task(request, exc, tb, project_id: str, render_id: str, flight_ref: dict = None):
+    """Chord error callback: a segment of the distributed render failed after its retries, or was superseded."""
+    if (getattr(request, "task", None) or "").endswith("render_finalize_task"):
+        # render_finalize_task already marked the project failed and removed the parts
+        return
+    flight = _pipeline_flight(project_id, flight_ref)
+    if flight is not None and not flight.is_current():
+        # A newer submission owns the project now; nothing to report
+        _delete_render_parts(project_id, render_id)
+        return
+    headers = getattr(request, "headers", None) or {}
+    _set_project_failed(
+        project_id,
+        task_name="render_segment_task",
+        step="render_segment",
+        task_id=getattr(request, "id", None),
+        request_id=headers.get("request_id") if isinstance(headers, dict) else None,
+        exc=exc if isinstance(exc, BaseException) else RuntimeError(str(exc)),
+    )
+    _delete_render_parts(project_id, render_id)
+    if flight is not None:
+        flight.abandon()
 
 @celery_app.task(bind=True)
 def enhance_video_task(self, project_id: str, asset_id: str, prompt: str):
@@ -1511,7 +2085,8 @@ def enhance_video_task(self, project_id: str, asset_id: str, prompt: str):
          
     try:
         # Use Aliyun Client
-        new_video_url = aliyun_client.video_repainting(video_url, prompt)
+        with span("enhance", asset_id=asset_id):
+            new_video_url = resources.aliyun_client().video_repainting(video_url, prompt)
         enhanced_local = _download_to_temp(new_video_url, suffix=".mp4")
         try:
             object_key = f"enhanced/{project_id}/{asset_id}/{uuid.uuid4()}.mp4"
@@ -1520,16 +2095,17 @@ def enhance_video_task(self, project_id: str, asset_id: str, prompt: str):
             if os.path.exists(enhanced_local):
                 os.remove(enhanced_local)
 
-        conn = psycopg2.connect(Config.DB_DSN)
-        try:
-            with conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        "UPDATE assets SET oss_url = %s WHERE id = %s",
-                        (enhanced_public_url, asset_id),
-                    )
-        finally:
-            conn.close()
+        with span("db.update_asset_url"):
+            conn = psycopg2.connect(Config.DB_DSN)
+            try:
+                with conn:
+                    with conn.cursor() as cursor:
+                        cursor.execute(
+                            "UPDATE assets SET oss_url = %s WHERE id = %s",
+                            (enhanced_public_url, asset_id),
+                        )
+            finally:
+                conn.close()
 
         return {"project_id": project_id, "asset_id": asset_id, "new_url": enhanced_public_url}
         
@@ -0,0 +1,98 @@
+"""
+Engine unit tests. Run from the engine directory:
+
+    python -m pytest -q tests
+
+Redis-backed modules use fakeredis (``pip install fakeredis[lua]``) and are
+skipped without it; the TTS resilience tests talk to bench/mock_services.py,
+started on a free port for the session.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENGINE_DIR)
+
+
+@pytest.fixture
+def celery_memory_broker():
+    """Publish retries to an in-memory transport instead of Redis."""
+    from worker import celery_app
+
+    previous = (celery_app.conf.broker_url, celery_app.conf.result_backend)
+    celery_app.conf.update(broker_url="memory://", result_backend="cache+memory://")
+    celery_app.close()
+    yield celery_app
+    celery_app.conf.update(broker_url=previous[0], result_backend=previous[1])
+    celery_app.close()
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """One fakeredis client behind ``get_redis()`` of the Redis-backed modules."""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    import admission
+    import probe_cache
+    import rate_limit
+    import singleflight
+    import tts_duration
+
+    client = fakeredis.FakeRedis()
+    for module in (admission, probe_cache, rate_limit, singleflight, tts_duration):
+        monkeypatch.setattr(module, "get_redis", lambda: client)
+    return client
+
+
+# TTS requests of this model fail on the mock; everything else is served.
+MOCK_FAILING_MODEL = "cosyvoice-v3-plus"
+
+
+@pytest.fixture(scope="session")
+def mock_services():
+    """bench/mock_services.py on a free port; yields its startup JSON (base URLs)."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    proc = subprocess.Popen(
+        [
+            sys.executable, os.path.join(ENGINE_DIR, "bench", "mock_services.py"),
+            "--port", str(port), "--latency", "tts=300", "--jitter", "0", "--tts-rtf", "0",
+            "--fail-models", MOCK_FAILING_MODEL,
+        ],
+        cwd=ENGINE_DIR,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        line = proc.stdout.readline()
+        if not line:
+            pytest.fail("bench/mock_services.py did not start")
+        yield json.loads(line)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+@pytest.fixture
+def dashscope_mock(mock_services, monkeypatch):
+    """Point the DashScope SDK at the mock services."""
+    import dashscope
+
+    import resources
+    from config import Config
+
+    monkeypatch.setattr(Config, "DASHSCOPE_API_KEY", "mock")
+    monkeypatch.setattr(Config, "DASHSCOPE_HTTP_BASE_URL", mock_services["DASHSCOPE_HTTP_BASE_URL"])
+    monkeypatch.setattr(Config, "DASHSCOPE_WEBSOCKET_BASE_URL", mock_services["DASHSCOPE_WEBSOCKET_BASE_URL"])
+    monkeypatch.setattr(dashscope, "base_http_api_url", dashscope.base_http_api_url)
+    monkeypatch.setattr(dashscope, "base_websocket_api_url", dashscope.base_websocket_api_url)
+    monkeypatch.setattr(resources, "_dashscope_pid", None)
+    resources.configure_dashscope()
+    return mock_services
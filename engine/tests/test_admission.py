@@ -0,0 +1,80 @@
+import pytest
+
+import admission
+import probe_cache
+from config import Config
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setattr(Config, "RENDER_ADMISSION_ENABLED", True)
+    monkeypatch.setattr(Config, "RENDER_ADMISSION_NODE", "test-node")
+    monkeypatch.setattr(admission, "_budget", {"mem_mb": 2000.0, "cpu": 8.0})
+    return admission._budget
+
+
+def test_cost_uses_probed_frame_sizes(fake_redis, budget, monkeypatch):
+    monkeypatch.setattr(Config, "RENDER_MAX_OPEN_READERS", 1)
+    probe_cache.remember("big", width=3840, height=2160, duration=10.0)
+    unknown = admission.estimate_render_cost([{"id": "a", "duration": 10.0}, {"id": "b", "duration": 10.0}])
+    probed = admission.estimate_render_cost([{"id": "big"}, {"id": "b", "duration": 10.0}])
+    assert unknown["readers"] == probed["readers"] == 1
+    assert unknown["video_sec"] == probed["video_sec"] == 20.0
+    # One live 4K reader costs four times the frame buffers of a 1080p one.
+    assert probed["mem_mb"] > unknown["mem_mb"]
+    assert unknown["cpu"] == min(Config.RENDER_THREADS, 8)
+
+
+def test_cost_counts_only_the_largest_live_readers(fake_redis, budget, monkeypatch):
+    assets = [{"id": str(i), "width": 1280, "height": 720, "duration": 5.0} for i in range(6)]
+    monkeypatch.setattr(Config, "RENDER_MAX_OPEN_READERS", 2)
+    two = admission.estimate_render_cost(assets)
+    monkeypatch.setattr(Config, "RENDER_MAX_OPEN_READERS", 0)
+    all_six = admission.estimate_render_cost(assets)
+    assert two["readers"] == 2 and all_six["readers"] == 6
+    assert all_six["mem_mb"] > two["mem_mb"]
+
+
+def test_idle_node_admits_a_render_larger_than_the_budget(fake_redis, budget):
+    lease = admission.try_acquire({"mem_mb": 5000.0, "cpu": 16.0}, lease_id="huge")
+    assert lease is not None and lease.lease_id == "huge"
+    assert admission.try_acquire({"mem_mb": 100.0, "cpu": 1.0}, lease_id="small") is None
+    lease.release()
+
+
+def test_leases_share_the_budget_until_released(fake_redis, budget):
+    first = admission.try_acquire({"mem_mb": 1200.0, "cpu": 4.0}, lease_id="first")
+    assert first is not None
+    assert admission.try_acquire({"mem_mb": 1200.0, "cpu": 4.0}, lease_id="second") is None
+    # Fits beside the first one.
+    third = admission.try_acquire({"mem_mb": 700.0, "cpu": 4.0}, lease_id="third")
+    assert third is not None
+    third.release()
+    first.release()
+    assert fake_redis.hkeys(admission._KEY_PREFIX + "test-node") == []
+    second = admission.try_acquire({"mem_mb": 1200.0, "cpu": 4.0}, lease_id="second")
+    assert second is not None
+    second.release()
+
+
+def test_expired_leases_do_not_count(fake_redis, budget):
+    key = admission._KEY_PREFIX + "test-node"
+    fake_redis.hset(key, "dead-worker", "1900 8 1")  # expired long ago
+    lease = admission.try_acquire({"mem_mb": 1200.0, "cpu": 4.0}, lease_id="live")
+    assert lease is not None
+    assert fake_redis.hkeys(key) == [b"live"]
+    lease.release()
+
+
+def test_without_redis_renders_are_admitted_without_a_lease(budget, monkeypatch):
+    monkeypatch.setattr(admission, "get_redis", lambda: None)
+    lease = admission.try_acquire({"mem_mb": 1e6, "cpu": 1e3})
+    assert lease is not None and lease.key is None
+
+
+def test_defer_countdown_backs_off_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(Config, "RENDER_ADMISSION_RETRY_SEC", 10)
+    monkeypatch.setattr(Config, "RENDER_ADMISSION_RETRY_MAX_SEC", 120)
+    assert 10 <= admission.defer_countdown(0) <= 15
+    assert 40 <= admission.defer_countdown(2) <= 45
+    assert 120 <= admission.defer_countdown(10) <= 125
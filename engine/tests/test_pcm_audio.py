@@ -0,0 +1,45 @@
+import shutil
+
+import numpy as np
+import pytest
+
+import pcm_audio
+
+
+def _tone(seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * pcm_audio.SAMPLE_RATE)) / pcm_audio.SAMPLE_RATE
+    return (np.sin(2 * np.pi * 440 * t) * 8000).astype(np.int16)
+
+
+def test_wav_round_trip(tmp_path):
+    samples = np.concatenate([_tone(0.5), pcm_audio.silence(0.25)])
+    path = pcm_audio.write_wav(str(tmp_path / "a.wav"), samples)
+    assert pcm_audio.wav_duration_sec(path) == pytest.approx(0.75)
+    assert np.array_equal(pcm_audio.read_pcm(path), samples)
+    assert list(tmp_path.iterdir()) == [tmp_path / "a.wav"]
+
+
+def test_pcm_bytes_drop_a_trailing_half_sample(tmp_path):
+    pcm = _tone(0.1).tobytes() + b"\x01"
+    path = pcm_audio.write_pcm_bytes_as_wav(str(tmp_path / "b.wav"), pcm)
+    assert pcm_audio.duration_sec(pcm_audio.read_pcm(path)) == pytest.approx(0.1)
+
+
+def test_concat_to_wav_keeps_every_sample(tmp_path):
+    parts = [pcm_audio.write_wav(str(tmp_path / f"{i}.wav"), _tone(0.2 * (i + 1))) for i in range(3)]
+    out = pcm_audio.concat_to_wav(parts, str(tmp_path / "all.wav"), block_frames=1000)
+    assert pcm_audio.wav_duration_sec(out) == pytest.approx(1.2)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+@pytest.mark.parametrize("tempo", [0.85, 1.0, 1.25])
+def test_time_stretch_changes_duration_by_the_tempo(tempo):
+    stretched = pcm_audio.time_stretch(_tone(2.0), tempo)
+    assert stretched.dtype == np.dtype("<i2")
+    assert pcm_audio.duration_sec(stretched) == pytest.approx(2.0 / tempo, abs=0.05)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_time_stretch_reports_ffmpeg_errors():
+    with pytest.raises(RuntimeError):
+        pcm_audio.time_stretch(_tone(0.2), 1.1, audio_filter="no_such_filter")
@@ -0,0 +1,48 @@
+import time
+
+import pytest
+
+import rate_limit
+from rate_limit import TokenBucket
+
+
+@pytest.fixture
+def no_redis(monkeypatch):
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: None)
+
+
+def test_local_bucket_serves_the_burst_then_waits(no_redis):
+    bucket = TokenBucket("t", rate=20, burst=3)
+    assert all(bucket.acquire() < 0.01 for _ in range(3))
+    waited = bucket.acquire()
+    assert 0.03 <= waited < 0.2
+
+
+def test_local_bucket_raises_past_the_timeout(no_redis):
+    bucket = TokenBucket("t", rate=1, burst=1)
+    bucket.acquire()
+    with pytest.raises(TimeoutError):
+        bucket.acquire(timeout=0.1)
+
+
+def test_redis_bucket_is_shared_between_instances(fake_redis):
+    first = TokenBucket("shared", rate=5, burst=2)
+    second = TokenBucket("shared", rate=5, burst=2)
+    assert first.acquire() < 0.05
+    assert second.acquire() < 0.05
+    # The burst is spent across both instances: the next token takes ~1 / rate.
+    waited = second.acquire()
+    assert 0.1 <= waited < 0.5
+    assert fake_redis.exists(rate_limit._KEY_PREFIX + "shared")
+
+
+def test_redis_errors_fall_back_to_the_local_bucket(monkeypatch):
+    class Broken:
+        def register_script(self, source):
+            raise ConnectionError("redis down")
+
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: Broken())
+    bucket = TokenBucket("t", rate=10, burst=1)
+    started = time.monotonic()
+    assert bucket.acquire() < 0.01
+    assert time.monotonic() - started < 0.05
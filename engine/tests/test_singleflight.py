@@ -0,0 +1,92 @@
+import pytest
+
+import singleflight
+from config import Config
+from singleflight import Flight, Superseded
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(Config, "SINGLEFLIGHT_ENABLED", True)
+
+
+def _flight(owner: str, inputs: str = "v1") -> Flight:
+    return Flight("render", "p1", singleflight.input_hash(script=inputs), owner)
+
+
+def test_duplicate_waits_for_the_leader_and_gets_its_result(fake_redis):
+    leader = _flight("t1")
+    assert leader.acquire() == ("leader", "")
+    duplicate = _flight("t2")
+    assert duplicate.acquire() == ("duplicate", "t1")
+    leader.complete({"final_video_url": "u"})
+    assert _flight("t3").acquire() == ("cached", {"final_video_url": "u"})
+
+
+def test_redelivered_leader_keeps_its_flight(fake_redis):
+    leader = _flight("t1")
+    leader.acquire()
+    leader.stop()
+    assert _flight("t1").acquire() == ("leader", "")
+    leader.abandon()
+
+
+def test_duplicate_takes_over_after_waiting(fake_redis):
+    leader = _flight("t1")
+    leader.acquire()
+    duplicate = _flight("t2")
+    assert duplicate.acquire(takeover=True) == ("takeover", "t1")
+    assert duplicate.is_current()
+    assert not leader.is_current()
+    leader.stop()
+    duplicate.abandon()
+
+
+def test_newer_inputs_supersede_the_running_flight(fake_redis):
+    old = _flight("t1", "v1")
+    old.acquire()
+    new = _flight("t2", "v2")
+    assert new.acquire() == ("superseded", "t1")
+    with pytest.raises(Superseded):
+        old.ensure_current()
+    new.ensure_current()
+    new.complete({"final_video_url": "v2"})
+    # The stale result was never stored.
+    assert _flight("t3", "v1").acquire() == ("leader", "")
+
+
+def test_expired_marker_is_reclaimed_only_by_the_latest_submission(fake_redis):
+    first = _flight("t1", "v1")
+    first.acquire()
+    first.stop()
+    fake_redis.delete(first.key)  # marker expired while the next stage was queued
+    assert first.is_current()
+    assert fake_redis.exists(first.key)
+
+    fake_redis.delete(first.key)
+    second = _flight("t2", "v2")
+    second.acquire()
+    second.stop()
+    fake_redis.delete(second.key)
+    assert not first.is_current()
+    assert second.is_current()
+    second.abandon()
+
+
+def test_abandon_lets_the_next_execution_lead(fake_redis):
+    leader = _flight("t1")
+    leader.acquire()
+    leader.abandon()
+    assert not fake_redis.exists(leader.key)
+    assert not fake_redis.exists(leader.latest_key)
+    nxt = _flight("t2")
+    assert nxt.acquire() == ("leader", "")
+    nxt.abandon()
+
+
+def test_without_redis_every_execution_leads(monkeypatch):
+    monkeypatch.setattr(singleflight, "get_redis", lambda: None)
+    flight = _flight("t1")
+    assert flight.acquire() == ("bypass", None)
+    flight.ensure_current()
+    flight.complete({"final_video_url": "u"})
@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import tasks  # noqa: E402
+
+
+class _RecordingS3:
+    def __init__(self):
+        self.deleted = []
+
+    def delete_objects(self, Bucket, Delete):
+        self.deleted.extend(o["Key"] for o in Delete["Objects"])
+
+
+def test_failed_split_removes_the_uploaded_clips(monkeypatch):
+    s3 = _RecordingS3()
+    uploaded = []
+
+    def encode(local_video, start, end, has_audio):
+        f = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
+        f.close()
+        return f.name
+
+    def upload(temp_path, object_key):
+        os.remove(temp_path)
+        if len(uploaded) == 2:
+            raise RuntimeError("upload failed")
+        uploaded.append(object_key)
+        return f"https://cdn.example/{object_key}"
+
+    monkeypatch.setattr(tasks, "_encode_split_segment", encode)
+    monkeypatch.setattr(tasks, "_upload_split_segment", upload)
+    monkeypatch.setattr(tasks, "get_s3", lambda: s3)
+    monkeypatch.setattr(tasks.Config, "SPLIT_UPLOAD_WORKERS", 1)
+
+    segments = [{"start_sec": i, "end_sec": i + 1} for i in range(4)]
+    source = {"width": 1280, "height": 720, "has_audio": False}
+    with pytest.raises(RuntimeError):
+        tasks._split_and_upload("p1", "a1", "/tmp/source.mp4", segments, source)
+
+    assert len(uploaded) == 2
+    assert sorted(s3.deleted) == sorted(uploaded)
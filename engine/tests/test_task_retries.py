@@ -0,0 +1,78 @@
+import pytest
+from celery.exceptions import Retry
+
+pytest.importorskip("psycopg2")
+
+import routing  # noqa: E402
+import tasks  # noqa: E402
+
+
+def _run_with_request(task, fn, *, retries: int, headers: dict):
+    task.push_request(id="test-task", args=["p1", "{}", []], kwargs={}, retries=retries, headers=headers, called_directly=False)
+    try:
+        return fn()
+    finally:
+        task.pop_request()
+
+
+def test_task_retries_excludes_deferrals_and_waits():
+    task = tasks.render_pipeline_task
+    got = _run_with_request(
+        task, lambda: tasks._task_retries(task), retries=9, headers={"deferrals": "4", "flight_waits": "3"}
+    )
+    assert got == 2
+
+
+def test_deferred_task_retries_a_transient_failure(celery_memory_broker):
+    # max_retries=3, but 5 admission deferrals already went through retry()
+    task = tasks.render_pipeline_task
+    with pytest.raises(Retry):
+        _run_with_request(
+            task,
+            lambda: tasks._fail_or_retry(
+                task, RuntimeError("transient"), project_id="p1", task_name="render_pipeline_task", step="test"
+            ),
+            retries=5,
+            headers={"deferrals": "5"},
+        )
+
+
+def test_waits_deferrals_and_failures_share_one_budget(celery_memory_broker):
+    task = tasks.render_pipeline_task
+    headers = {"deferrals": "3", "flight_waits": "40"}
+    # Two failed attempts so far: the third retry is still allowed
+    with pytest.raises(Retry):
+        _run_with_request(
+            task,
+            lambda: tasks._retry_with_headers(task, exc=RuntimeError("transient"), countdown=0),
+            retries=3 + 40 + 2,
+            headers=headers,
+        )
+    # Three failed attempts: the limit is reached and the error surfaces
+    with pytest.raises(RuntimeError):
+        _run_with_request(
+            task,
+            lambda: tasks._retry_with_headers(task, exc=RuntimeError("transient"), countdown=0),
+            retries=3 + 40 + 3,
+            headers=headers,
+        )
+
+
+def test_retry_keeps_the_counters(celery_memory_broker):
+    task = tasks.render_pipeline_task
+    sent = {}
+    with celery_memory_broker.connection_for_write() as conn:
+        queue = conn.SimpleQueue(routing.celery_task_routes()["tasks.render_pipeline_task"]["queue"])
+        queue.clear()
+        with pytest.raises(Retry):
+            _run_with_request(
+                task,
+                lambda: tasks._retry_with_headers(task, exc=RuntimeError("transient"), countdown=0),
+                retries=2,
+                headers={"deferrals": "1", "flight_waits": "1", "request_id": "r1"},
+            )
+        sent = queue.get(timeout=1).headers
+        queue.close()
+    assert sent["deferrals"] == "1"
+    assert sent["flight_waits"] == "1"
+    assert sent["retries"] == 3
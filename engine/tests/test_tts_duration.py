@@ -0,0 +1,58 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tts_duration import DurationPredictor, pause_seconds
+
+
+def _observe(predictor: DurationPredictor, units_per_sec: float):
+    # 10 s of speech at ``units_per_sec``, no pauses, rate 1.0
+    predictor.observe(
+        units=int(units_per_sec * 10), pause_sec=0.0, model="m", voice="v", ssml=False, rate=1.0, actual_sec=10.0
+    )
+
+
+def test_pause_seconds_reads_breaks_and_punctuation():
+    assert pause_seconds('<speak>a<break time="500ms"/>b<break time="1s"/></speak>', ssml=True) == pytest.approx(1.5)
+    assert pause_seconds("你好，世界。", ssml=False) == pytest.approx(0.18 + 0.32)
+
+
+def test_choose_rate_clamps_to_the_natural_range():
+    p = DurationPredictor(alpha=0.5, default_units_per_sec=8.0)
+    assert p.choose_rate(10.0, 10.2, 0.85, 1.25, 0.5) == 1.0
+    assert p.choose_rate(20.0, 10.0, 0.85, 1.25, 0.5) == 1.25
+    assert p.choose_rate(11.0, 10.0, 0.85, 1.25, 0.5) == pytest.approx(1.1)
+
+
+def test_observe_without_redis_updates_the_local_ewma(monkeypatch):
+    import tts_duration
+
+    monkeypatch.setattr(tts_duration, "get_redis", lambda: None)
+    p = DurationPredictor(alpha=0.5, default_units_per_sec=8.0)
+    _observe(p, 12.0)
+    assert p.units_per_sec("m", "v", False) == pytest.approx(10.0)
+
+
+def test_concurrent_observations_are_not_lost(fake_redis, monkeypatch):
+    import tts_duration
+
+    class SlowReads(type(fake_redis)):
+        """Widens the window between a read and the following write, as a remote Redis does."""
+
+        def hget(self, *args, **kwargs):
+            time.sleep(0.002)
+            return super().hget(*args, **kwargs)
+
+    fake_redis = SlowReads(server=fake_redis.connection_pool.connection_kwargs["server"])
+    monkeypatch.setattr(tts_duration, "get_redis", lambda: fake_redis)
+    alpha, start, observed, n = 0.1, 8.0, 12.0, 16
+    predictors = [DurationPredictor(alpha=alpha, default_units_per_sec=start) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: _observe(predictors[i % 4], observed), range(n)))
+
+    key = DurationPredictor._key("m", "v", False)
+    assert int(fake_redis.hget(key, "samples")) == n
+    # Every update applied in turn: the EWMA of a constant converges geometrically
+    expected = observed + (start - observed) * (1 - alpha) ** n
+    assert predictors[0].units_per_sec("m", "v", False) == pytest.approx(expected, abs=1e-3)
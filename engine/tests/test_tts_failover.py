@@ -0,0 +1,86 @@
+"""AudioGenerator TTS calls against bench/mock_services.py: hedging and the sambert failover."""
+
+import json
+import os
+import urllib.request
+
+import pytest
+
+import audio_gen
+import pcm_audio
+from config import Config
+from tts_resilience import CircuitBreaker, LatencyTracker
+from conftest import MOCK_FAILING_MODEL
+
+pytestmark = pytest.mark.skipif(not audio_gen.TTS_V2_AVAILABLE, reason="dashscope tts_v2 SDK not installed")
+
+
+def _tts_stats(mock_services) -> dict:
+    with urllib.request.urlopen(mock_services["listening"] + "/mock/stats", timeout=5) as resp:
+        return json.loads(resp.read())["tts"]
+
+
+@pytest.fixture
+def generator(dashscope_mock, monkeypatch):
+    monkeypatch.setattr(audio_gen.tts_audio_cache, "enabled", False)
+    monkeypatch.setattr(audio_gen._tts_rate_limiter, "acquire", lambda timeout=None: 0.0)
+    monkeypatch.setattr(Config, "TTS_STREAMING_ENABLED", False)
+    monkeypatch.setattr(Config, "TTS_FALLBACK_MODEL", "sambert-zhigui-v1")
+    monkeypatch.setattr(audio_gen, "tts_latency", LatencyTracker())
+    monkeypatch.setattr(
+        audio_gen, "tts_breaker", CircuitBreaker("test-tts", failure_threshold=2, window_sec=60, reset_sec=60)
+    )
+    return audio_gen.AudioGenerator()
+
+
+def _synthesize(generator, model: str, output_path: str) -> None:
+    generator._run_tts_v2(
+        audio_gen.SpeechSynthesizerV2, audio_gen.AudioFormat, model, "longanyang", "你好，世界。", output_path
+    )
+
+
+def test_primary_synthesis(generator, tmp_path):
+    out = str(tmp_path / "a.wav")
+    _synthesize(generator, "cosyvoice-v3-flash", out)
+    assert pcm_audio.wav_duration_sec(out) > 0.3
+    assert audio_gen.tts_breaker.state == "closed"
+
+
+def test_hedge_fires_when_a_call_runs_past_the_observed_latency(generator, mock_services, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "TTS_HEDGE_ENABLED", True)
+    monkeypatch.setattr(Config, "TTS_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(Config, "TTS_HEDGE_MIN_DELAY_SEC", 0.05)
+    # Earlier calls were fast; the mock answers in ~300 ms, past the p95.
+    for _ in range(5):
+        audio_gen.tts_latency.observe("cosyvoice-v3-flash:longanyang", 0.05)
+    before = _tts_stats(mock_services)["requests"]
+    out = str(tmp_path / "b.wav")
+    _synthesize(generator, "cosyvoice-v3-flash", out)
+    assert _tts_stats(mock_services)["requests"] - before == 2
+    assert pcm_audio.wav_duration_sec(out) > 0.3
+    assert sorted(os.listdir(tmp_path)) == ["b.wav"]
+
+
+def test_open_breaker_fails_over_to_sambert(generator, mock_services, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "TTS_HEDGE_ENABLED", False)
+    before = _tts_stats(mock_services)
+    out = str(tmp_path / "c.wav")
+    _synthesize(generator, MOCK_FAILING_MODEL, out)
+    after = _tts_stats(mock_services)
+    assert audio_gen.tts_breaker.state == "open"
+    # Two primary failures open the breaker; the third attempt goes to sambert.
+    assert after["errors"] - before["errors"] == 2
+    assert after["requests"] - before["requests"] == 3
+    assert pcm_audio.wav_duration_sec(out) > 0.3
+
+    # While open, synthesis goes straight to the fallback.
+    _synthesize(generator, MOCK_FAILING_MODEL, str(tmp_path / "d.wav"))
+    assert _tts_stats(mock_services)["requests"] - after["requests"] == 1
+
+
+def test_without_a_fallback_model_the_failure_surfaces(generator, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "TTS_HEDGE_ENABLED", False)
+    monkeypatch.setattr(Config, "TTS_FALLBACK_MODEL", "")
+    with pytest.raises(Exception):
+        _synthesize(generator, MOCK_FAILING_MODEL, str(tmp_path / "e.wav"))
+    assert not os.path.exists(tmp_path / "e.wav")
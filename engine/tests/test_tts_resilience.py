@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+import tts_resilience
+from tts_resilience import CircuitBreaker, LatencyTracker, hedged_call
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Drive the breaker's monotonic clock by hand."""
+    now = [1000.0]
+    monkeypatch.setattr(tts_resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_latency_percentile_needs_min_samples():
+    tracker = LatencyTracker(window=10)
+    assert tracker.percentile("k", 0.95) is None
+    for sec in range(1, 21):
+        tracker.observe("k", float(sec))
+    # Only the last 10 samples are kept.
+    assert tracker.percentile("k", 0.0) == 11.0
+    assert tracker.percentile("k", 0.95) == 20.0
+    assert tracker.percentile("k", 0.5, min_samples=11) is None
+
+
+def test_breaker_opens_after_threshold_within_window(clock):
+    breaker = CircuitBreaker("t", failure_threshold=3, window_sec=10, reset_sec=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    clock[0] += 11  # both fell out of the window
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_lets_a_single_probe_through(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, window_sec=10, reset_sec=30)
+    breaker.record_failure()
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes_the_breaker(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, window_sec=10, reset_sec=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens_for_another_cool_down(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, window_sec=10, reset_sec=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.allow()
+
+
+def test_failures_while_open_do_not_extend_the_cool_down(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, window_sec=10, reset_sec=30)
+    breaker.record_failure()
+    clock[0] += 20
+    breaker.record_failure()  # a call that started before the breaker opened
+    clock[0] += 10
+    assert breaker.state == "half_open"
+
+
+def test_hedge_does_not_fire_when_the_first_call_is_fast():
+    calls = []
+
+    def fn(idx):
+        calls.append(idx)
+        return "ok"
+
+    assert hedged_call(fn, 0.5) == ("ok", 0)
+    assert calls == [0]
+
+
+def test_hedge_fires_after_the_delay_and_the_faster_call_wins():
+    release = threading.Event()
+    started = {}
+
+    def fn(idx):
+        started[idx] = time.monotonic()
+        if idx == 0:
+            release.wait(5)
+            return "slow"
+        return "hedge"
+
+    t0 = time.monotonic()
+    try:
+        assert hedged_call(fn, 0.1) == ("hedge", 1)
+    finally:
+        release.set()
+    assert started[1] - t0 >= 0.1
+
+
+def test_hedge_returns_the_success_when_one_attempt_fails():
+    def fn(idx):
+        if idx == 0:
+            time.sleep(0.2)
+            raise RuntimeError("primary failed")
+        time.sleep(0.3)
+        return "hedge"
+
+    assert hedged_call(fn, 0.05) == ("hedge", 1)
+
+
+def test_hedge_raises_the_first_error_when_both_fail():
+    def fn(idx):
+        time.sleep(0.1 if idx == 0 else 0.2)
+        raise RuntimeError(f"attempt {idx}")
+
+    with pytest.raises(RuntimeError, match="attempt 0"):
+        hedged_call(fn, 0.05)
@@ -0,0 +1,184 @@
+"""
+TTS Audio Cache
+
+Content-addressed cache of synthesized audio keyed by everything that affects the
+output (engine, model, voice, payload, SSML flag, speech rate, volume, pitch,
+format). Preview (``generate_audio_task``) and final render (``render_video_task``)
+synthesize the same script, as do task retries; with the cache an unchanged script
+re-renders without TTS calls.
+
+Entries live in a local directory trimmed LRU-style (hits refresh the mtime) to
+TTS_CACHE_MAX_MB. The size is tracked as entries are written; the directory is
+scanned on the first write, when the limit is exceeded and every few minutes (other
+worker processes write to it too). Entries are optionally kept in S3 under
+TTS_CACHE_S3_PREFIX so that other workers can reuse them. All failures are treated
+as misses.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import metrics
+from config import Config
+from s3_client import get_s3
+
+logger = logging.getLogger(__name__)
+
+_RESCAN_SEC = 300.0
+
+
+def tts_cache_key(**parts) -> str:
+    """Stable digest of the synthesis inputs; floats are rounded so 1.1 and 1.1000001 agree."""
+    material = {
+        k: (round(v, 3) if isinstance(v, float) else v)
+        for k, v in parts.items()
+    }
+    return hashlib.sha256(json.dumps(material, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class TTSAudioCache:
+    def __init__(self, cache_dir: str | None = None, max_mb: int | None = None, s3_prefix: str | None = None):
+        self.enabled = Config.TTS_CACHE_ENABLED
+        self.cache_dir = cache_dir or Config.TTS_CACHE_DIR
+        self.max_bytes = int(max_mb if max_mb is not None else Config.TTS_CACHE_MAX_MB) * 1024 * 1024
+        prefix = Config.TTS_CACHE_S3_PREFIX if s3_prefix is None else s3_prefix
+        self.s3_prefix = (prefix or "").strip("/")
+        self._evict_lock = threading.Lock()
+        self._size_lock = threading.Lock()
+        self._size = None  # Bytes in cache_dir as of the last scan plus entries written since; None = not scanned
+        self._scanned_at = 0.0
+
+    def _local_path(self, key: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{ext}")
+
+    def _s3_key(self, key: str, ext: str) -> str:
+        return f"{self.s3_prefix}/{key[:2]}/{key}.{ext}"
+
+    @staticmethod
+    def _atomic_copy(src: str, dest: str) -> None:
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def get(self, key: str, dest_path: str, *, ext: str = "mp3", operation: str = "") -> bool:
+        """Copy a cached entry to ``dest_path``; returns False on a miss."""
+        if not self.enabled:
+            return False
+        strategy = None
+        try:
+            local = self._local_path(key, ext)
+            if os.path.exists(local) and os.path.getsize(local) > 0:
+                self._atomic_copy(local, dest_path)
+                os.utime(local, None)
+                strategy = "local"
+            elif self.s3_prefix:
+                os.makedirs(os.path.dirname(local), exist_ok=True)
+                tmp = f"{local}.{uuid.uuid4().hex}.tmp"
+                try:
+                    get_s3().download_file(Config.S3_STORAGE_BUCKET, self._s3_key(key, ext), tmp)
+                    os.replace(tmp, local)
+                except Exception:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                    raise
+                self._track(os.path.getsize(local))
+                self._atomic_copy(local, dest_path)
+                strategy = "s3"
+        except Exception as e:
+            if self.s3_prefix and "404" not in str(e) and "Not Found" not in str(e):
+                logger.warning(
+                    "TTS cache read failed",
+                    extra={"event": "tts.cache.error", "operation": operation, "reason": str(e)[:256]},
+                )
+            strategy = None
+        metrics.CACHE_LOOKUPS.inc(cache="tts", outcome="hit" if strategy else "miss")
+        logger.info(
+            "TTS cache lookup",
+            extra={
+                "event": "tts.cache.hit" if strategy else "tts.cache.miss",
+                "operation": operation,
+                "strategy": strategy,
+            },
+        )
+        return strategy is not None
+
+    def put(self, key: str, src_path: str, *, ext: str = "mp3", operation: str = "") -> None:
+        if not self.enabled:
+            return
+        try:
+            if not os.path.exists(src_path) or os.path.getsize(src_path) <= 0:
+                return
+            local = self._local_path(key, ext)
+            replaced = os.path.getsize(local) if os.path.exists(local) else 0
+            self._atomic_copy(src_path, local)
+            if self.s3_prefix:
+                get_s3().upload_file(src_path, Config.S3_STORAGE_BUCKET, self._s3_key(key, ext))
+            self._track(os.path.getsize(local) - replaced)
+        except Exception as e:
+            logger.warning(
+                "TTS cache write failed",
+                extra={"event": "tts.cache.error", "operation": operation, "reason": str(e)[:256]},
+            )
+
+    def _track(self, added_bytes: int) -> None:
+        """Account for a written entry; scan and evict only when the limit or the rescan interval is reached."""
+        if self.max_bytes <= 0:
+            return
+        with self._size_lock:
+            if self._size is not None:
+                self._size += added_bytes
+            due = (
+                self._size is None
+                or self._size > self.max_bytes
+                or time.monotonic() - self._scanned_at >= _RESCAN_SEC
+            )
+        if due:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used files until the directory fits in ``max_bytes``."""
+        if self.max_bytes <= 0 or not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+                    total += st.st_size
+            if total > self.max_bytes:
+                entries.sort()
+                for _, size, path in entries:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    total -= size
+                    if total <= self.max_bytes * 0.9:
+                        break
+            with self._size_lock:
+                self._size = total
+                self._scanned_at = time.monotonic()
+        finally:
+            self._evict_lock.release()
+
+
+tts_audio_cache = TTSAudioCache()
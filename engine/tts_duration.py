@@ -0,0 +1,173 @@
+"""
+TTS Duration Predictor
+
+Predicts how long a TTS synthesis will be so ``generate_aligned_audio_segments``
+can choose the speech rate before the first call instead of synthesizing at 1.0,
+measuring, and synthesizing again.
+
+Model: ``duration(rate) = (units / units_per_sec + pause_sec) / rate`` where
+``units`` is the CosyVoice billing length (``_cosyvoice_char_len``: Han characters
+count 2), ``pause_sec`` comes from SSML ``<break>`` tags or, for plain text, from
+punctuation. ``units_per_sec`` is learned online per (model, voice, ssml) with an
+EWMA over observed syntheses and shared across workers through a Redis hash (each
+update is one Lua script, so concurrent segments do not lose updates), with an
+in-process fallback when Redis is unavailable. Prediction hit-rate counters are
+kept alongside.
+"""
+
+import logging
+import re
+import threading
+
+from config import Config
+from redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "ai-video:tts-duration:"
+_STATS_KEY = "ai-video:tts-duration:stats"
+
+# KEYS[1] = model hash; ARGV = alpha, observed units/sec, value to start from when the hash is empty.
+# Returns the updated units/sec.
+_OBSERVE_LUA = """
+local current = tonumber(redis.call('HGET', KEYS[1], 'units_per_sec')) or tonumber(ARGV[3])
+local alpha = tonumber(ARGV[1])
+local updated = string.format('%.4f', (1 - alpha) * current + alpha * tonumber(ARGV[2]))
+redis.call('HSET', KEYS[1], 'units_per_sec', updated)
+redis.call('HINCRBY', KEYS[1], 'samples', 1)
+return updated
+"""
+
+_scripts = {}
+
+_BREAK_RE = re.compile(r'<break\s+time="(\d+(?:\.\d+)?)(ms|s)"\s*/?>')
+# Pause the engine inserts on its own at plain-text punctuation (seconds).
+_PUNCT_PAUSE_SEC = {
+    "，": 0.18, ",": 0.18, "、": 0.12, "：": 0.18, ":": 0.18,
+    "。": 0.32, ".": 0.32, "？": 0.28, "?": 0.28, "！": 0.26, "!": 0.26,
+    "；": 0.24, ";": 0.24, "…": 0.45,
+}
+
+
+def pause_seconds(payload: str, *, ssml: bool) -> float:
+    """Silence implied by the payload: explicit SSML breaks, else punctuation pauses."""
+    if ssml:
+        total = 0.0
+        for value, unit in _BREAK_RE.findall(payload or ""):
+            total += float(value) / (1000.0 if unit == "ms" else 1.0)
+        return total
+    return sum(_PUNCT_PAUSE_SEC.get(ch, 0.0) for ch in (payload or ""))
+
+
+def _script(client, name: str, source: str):
+    script = _scripts.get(name)
+    if script is None or script.registered_client is not client:
+        script = client.register_script(source)
+        _scripts[name] = script
+    return script
+
+
+class DurationPredictor:
+    """Online-learned speech duration model keyed by (model, voice, ssml)."""
+
+    def __init__(self, alpha: float | None = None, default_units_per_sec: float | None = None):
+        self.alpha = float(Config.TTS_PREDICTOR_ALPHA if alpha is None else alpha)
+        self.default_units_per_sec = float(
+            Config.TTS_PREDICTOR_DEFAULT_UNITS_PER_SEC if default_units_per_sec is None else default_units_per_sec
+        )
+        self._lock = threading.Lock()
+        self._local: dict[str, float] = {}
+        self._local_stats: dict[str, int] = {}
+
+    @staticmethod
+    def _key(model: str, voice: str, ssml: bool) -> str:
+        return f"{_KEY_PREFIX}{model}:{voice}:{'ssml' if ssml else 'text'}"
+
+    def units_per_sec(self, model: str, voice: str, ssml: bool) -> float:
+        key = self._key(model, voice, ssml)
+        try:
+            client = get_redis()
+            if client is not None:
+                value = client.hget(key, "units_per_sec")
+                if value is not None:
+                    return float(value)
+        except Exception:
+            pass
+        with self._lock:
+            return self._local.get(key, self.default_units_per_sec)
+
+    def predict(self, *, units: int, pause_sec: float, model: str, voice: str, ssml: bool, rate: float = 1.0) -> float:
+        ups = max(0.5, self.units_per_sec(model, voice, ssml))
+        return (float(units) / ups + float(pause_sec)) / max(0.1, float(rate))
+
+    def choose_rate(self, predicted_at_1: float, target_sec: float, min_rate: float, max_rate: float, tolerance_sec: float) -> float:
+        """Rate that lands ``predicted_at_1`` on ``target_sec``, clamped to the natural-speech range."""
+        if target_sec <= 0 or abs(predicted_at_1 - target_sec) < tolerance_sec:
+            return 1.0
+        return max(min_rate, min(max_rate, predicted_at_1 / target_sec))
+
+    def observe(self, *, units: int, pause_sec: float, model: str, voice: str, ssml: bool, rate: float, actual_sec: float) -> None:
+        """Fold one observed synthesis into the EWMA of speaking speed."""
+        speech_sec = float(actual_sec) * float(rate) - float(pause_sec)
+        if units <= 0 or speech_sec <= 0.2:
+            return
+        observed = float(units) / speech_sec
+        if not 1.0 <= observed <= 40.0:
+            return
+        key = self._key(model, voice, ssml)
+        with self._lock:
+            current = self._local.get(key, self.default_units_per_sec)
+            self._local[key] = (1.0 - self.alpha) * current + self.alpha * observed
+        try:
+            client = get_redis()
+            if client is not None:
+                updated = _script(client, "observe", _OBSERVE_LUA)(keys=[key], args=[self.alpha, observed, current])
+                with self._lock:
+                    self._local[key] = float(updated)
+        except Exception:
+            pass
+
+    def record(self, *, hit: bool, syntheses: int) -> None:
+        """Count a segment outcome: ``hit`` means the first synthesis landed within tolerance."""
+        fields = {"segments": 1, "hits": 1 if hit else 0, "syntheses": int(syntheses)}
+        with self._lock:
+            for k, v in fields.items():
+                self._local_stats[k] = self._local_stats.get(k, 0) + v
+        try:
+            client = get_redis()
+            if client is not None:
+                pipe = client.pipeline()
+                for k, v in fields.items():
+                    pipe.hincrby(_STATS_KEY, k, v)
+                pipe.execute()
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        """Hit-rate counters (shared via Redis when available, else this process)."""
+        raw = None
+        try:
+            client = get_redis()
+            if client is not None:
+                raw = {
+                    (k.decode() if isinstance(k, bytes) else k): int(v)
+                    for k, v in (client.hgetall(_STATS_KEY) or {}).items()
+                }
+        except Exception:
+            raw = None
+        if not raw:
+            with self._lock:
+                raw = dict(self._local_stats)
+        segments = int(raw.get("segments", 0))
+        hits = int(raw.get("hits", 0))
+        syntheses = int(raw.get("syntheses", 0))
+        return {
+            "segments": segments,
+            "hits": hits,
+            "syntheses": syntheses,
+            "hit_rate": round(hits / segments, 4) if segments else None,
+            "syntheses_per_segment": round(syntheses / segments, 3) if segments else None,
+        }
+
+
+duration_predictor = DurationPredictor()
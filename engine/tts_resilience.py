@@ -0,0 +1,153 @@
+"""
+TTS Resilience
+
+Tail-latency and outage handling around DashScope TTS calls:
+
+- ``LatencyTracker`` keeps a rolling window of call latencies per (model, voice)
+  and answers percentile queries.
+- ``hedged_call`` starts a duplicate request once the first one has run longer
+  than the observed p95, and returns whichever finishes first.
+- ``CircuitBreaker`` opens after repeated failures within a window; while open,
+  ``AudioGenerator`` routes synthesis to the fallback engine (sambert v1) and
+  lets a single probe through after the cool-down.
+
+State is per worker process: each process observes its own calls.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self.window = int(window)
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque] = {}
+
+    def observe(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(float(seconds))
+
+    def percentile(self, key: str, q: float, min_samples: int = 1) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples.get(key) or ())
+        if len(samples) < max(1, int(min_samples)):
+            return None
+        idx = min(len(samples) - 1, max(0, int(round(q * (len(samples) - 1)))))
+        return samples[idx]
+
+
+class CircuitBreaker:
+    """closed -> open after ``failure_threshold`` failures within ``window_sec``;
+    open -> half-open after ``reset_sec`` (one probe call); the probe closes or re-opens it."""
+
+    def __init__(self, name: str, failure_threshold: int, window_sec: float, reset_sec: float):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.window_sec = float(window_sec)
+        self.reset_sec = float(reset_sec)
+        self._lock = threading.Lock()
+        self._failures: deque = deque()
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state_locked(time.monotonic())
+
+    def _state_locked(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self.reset_sec:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state_locked(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            was_open = self._opened_at is not None
+            self._failures.clear()
+            self._opened_at = None
+            self._probing = False
+        if was_open:
+            logger.info("Circuit closed", extra={"event": "tts.circuit.close", "breaker": self.name, "breaker_state": "closed"})
+
+    def record_failure(self) -> None:
+        now = time.monotonic()
+        opened = False
+        with self._lock:
+            if self._opened_at is not None:
+                # A failed half-open probe re-opens the breaker for another cool-down.
+                if self._probing:
+                    self._opened_at = now
+                    self._probing = False
+                    opened = True
+            else:
+                self._failures.append(now)
+                while self._failures and now - self._failures[0] > self.window_sec:
+                    self._failures.popleft()
+                if len(self._failures) >= self.failure_threshold:
+                    self._opened_at = now
+                    self._failures.clear()
+                    opened = True
+        if opened:
+            logger.warning("Circuit opened", extra={"event": "tts.circuit.open", "breaker": self.name, "breaker_state": "open"})
+
+
+def hedged_call(fn, hedge_after_sec: float | None):
+    """Call ``fn(attempt_index)``; after ``hedge_after_sec`` start ``fn(1)`` and return the first success.
+
+    Returns ``(result, attempt_index)``. The losing call is not interrupted (blocking
+    SDK calls cannot be); it finishes in the background and its result is dropped.
+    """
+    if not hedge_after_sec or hedge_after_sec <= 0:
+        return fn(0), 0
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tts-hedge")
+    try:
+        futures = {pool.submit(contextvars.copy_context().run, fn, 0): 0}
+        done, _ = wait(list(futures), timeout=hedge_after_sec)
+        if not done:
+            logger.info(
+                "Hedged TTS request",
+                extra={"event": "tts.hedge.fire", "hedge_delay_sec": round(hedge_after_sec, 3)},
+            )
+            futures[pool.submit(contextvars.copy_context().run, fn, 1)] = 1
+        pending = set(futures)
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    return fut.result(), futures[fut]
+                if first_error is None:
+                    first_error = fut.exception()
+        raise first_error
+    finally:
+        pool.shutdown(wait=False)
+
+
+tts_latency = LatencyTracker()
+tts_breaker = CircuitBreaker(
+    "dashscope-tts",
+    failure_threshold=Config.TTS_BREAKER_FAILURE_THRESHOLD,
+    window_sec=Config.TTS_BREAKER_WINDOW_SEC,
+    reset_sec=Config.TTS_BREAKER_RESET_SEC,
+)
@@ -1,16 +1,21 @@
 from moviepy.editor import VideoFileClip, AudioFileClip, concatenate_videoclips, vfx, ColorClip, afx, TextClip, CompositeVideoClip, CompositeAudioClip, ImageClip
+from moviepy.audio.AudioClip import AudioArrayClip
 from config import Config
+import media_probe
+import pcm_audio
+from s3_client import get_s3
+from spans import current_span, span
+import metrics
 from typing import List
-import boto3
 import dashscope
 import numpy as np
 from dashscope import Generation
 from http import HTTPStatus
-import json
 import logging
 import os
 import re
 import unicodedata
+from collections import OrderedDict
 import subprocess
 import tempfile
 import time
@@ -35,15 +40,65 @@ INTRO_BG_COLOR = (20, 20, 30)  # Dark blue-gray
 # Intro voice script templates (开场白模板) - Fallback only
 INTRO_VOICE_FALLBACK = "大家好，今天带大家看一套温馨的房子，跟我一起来感受一下吧！"
 
+class _NormalizeState:
+    """Clips and temp files collected by the _normalize_asset calls of one render."""
+
+    def __init__(self):
+        self.clips = []
+        self.temp_files = []
+        self.output_size = None
+        self.pending_placeholders = []
+        self.attached_audio_count = 0
+        self.readers = _ReaderWindow(Config.RENDER_MAX_OPEN_READERS)
+
+class _ReaderWindow:
+    """
+    Keeps at most ``max_open`` source ffmpeg readers running during one render.
+
+    FFMPEG_VideoReader re-initializes itself (seeking to t) on the first get_frame()
+    after close(), so a tracked reader is closed right after it is opened and
+    restarted lazily when its clip's time range is composed; the least recently
+    used reader is closed when the window is full. Composition reads the clips in
+    timeline order and a restarted reader seeks exactly as a rewound one does, so
+    the output does not change. ``max_open <= 0`` leaves readers untouched.
+    """
+
+    def __init__(self, max_open: int):
+        self.max_open = int(max_open or 0)
+        self._open = OrderedDict()  # id(reader) -> reader, least recently used first
+        self.peak_open = 0
+        self.restarts = 0
+
+    def track(self, clip):
+        reader = getattr(clip, "reader", None)
+        if self.max_open <= 0 or reader is None or getattr(reader, "_windowed", False):
+            return clip
+        get_frame = reader.get_frame
+
+        def windowed_get_frame(t):
+            if not reader.proc:
+                self._make_room()
+                self.restarts += 1
+            self._open[id(reader)] = reader
+            self._open.move_to_end(id(reader))
+            self.peak_open = max(self.peak_open, len(self._open))
+            return get_frame(t)
+
+        reader.get_frame = windowed_get_frame
+        reader._windowed = True
+        reader.close()
+        return clip
+
+    def _make_room(self):
+        while self._open and len(self._open) >= self.max_open:
+            _, oldest = self._open.popitem(last=False)
+            try:
+                oldest.close()
+            except Exception:
+                pass
+
 class VideoRenderer:
     def __init__(self, aliyun_client=None, sfx_library=None):
-        self._s3_client = boto3.client(
-            "s3",
-            endpoint_url=Config.S3_STORAGE_ENDPOINT,
-            aws_access_key_id=Config.S3_STORAGE_ACCESS_KEY,
-            aws_secret_access_key=Config.S3_STORAGE_SECRET_KEY,
-            region_name=Config.S3_STORAGE_REGION,
-        )
         # Inject AliyunClient for AI enhancement
         self._aliyun_client = aliyun_client
         # Inject SFX Library for sound effects
@@ -108,44 +163,10 @@ class VideoRenderer:
             return False
 
     def _ffprobe_stream_info(self, file_path: str) -> dict | None:
-        cmd = [
-            "ffprobe",
-            "-v",
-            "error",
-            "-select_streams",
-            "v:0",
-            "-show_entries",
-            "stream=width,height,duration",
-            "-of",
-            "json",
-            file_path,
-        ]
-        proc = subprocess.run(cmd, capture_output=True, text=True)
-        if proc.returncode != 0:
-            return None
-        try:
-            return json.loads(proc.stdout or "{}")
-        except Exception:
-            return None
+        return media_probe.stream_info(file_path)
 
     def _ffprobe_has_audio_stream(self, file_path: str) -> bool:
-        cmd = [
-            "ffprobe",
-            "-v",
-            "error",
-            "-select_streams",
-            "a",
-            "-show_entries",
-            "stream=codec_type",
-            "-of",
-            "csv=p=0",
-            file_path,
-        ]
-        proc = subprocess.run(cmd, capture_output=True, text=True)
-        if proc.returncode != 0:
-            return False
-        out = (proc.stdout or "").strip()
-        return bool(out)
+        return media_probe.has_audio_stream(file_path)
 
     def _probe_video_size(self, file_path: str) -> tuple[int, int] | None:
         info = self._ffprobe_stream_info(file_path)
@@ -171,7 +192,7 @@ class VideoRenderer:
         if not object_key:
             return False
         try:
-            self._s3_client.download_file(Config.S3_STORAGE_BUCKET, object_key, dest_path)
+            get_s3().download_file(Config.S3_STORAGE_BUCKET, object_key, dest_path)
             return True
         except Exception:
             return False
@@ -202,10 +223,16 @@ class VideoRenderer:
             return None
         return temp.name
 
-    def _open_video_clip(self, path: str):
+    def _open_voice_clip(self, path: str):
+        """Voice segments in the PCM pipeline are loaded straight into memory (no decoder process)."""
+        if pcm_audio.is_wav(path):
+            return AudioArrayClip(pcm_audio.to_stereo_float(pcm_audio.read_pcm(path)), fps=pcm_audio.SAMPLE_RATE)
+        return AudioFileClip(path)
+
+    def _open_video_clip(self, path: str, audio: bool = True):
         clip = None
         try:
-            clip = VideoFileClip(path)
+            clip = VideoFileClip(path, audio=audio)
             if not getattr(clip, "duration", None) or clip.duration <= 0:
                 raise OSError("video duration is 0")
             # Validate start
@@ -1132,6 +1159,7 @@ class VideoRenderer:
         
         return False
 
+    @span("render.enhance")
     def _enhance_video_with_ai(self, video_url: str, prompt: str) -> str:
         """
         Apply Aliyun Video Repainting to enhance visual style.
@@ -1523,6 +1551,267 @@ class VideoRenderer:
         
         return result
     
+    def _mix_audio_tracks(self, final_video, script_segments: list = None, bgm_path: str = None, bgm_metadata: dict = None):
+        """
+        Mix the clip's voice track with SFX and BGM (dynamic volume curve, auto-ducking).
+        Returns ``final_video`` with the mixed audio set.
+        """
+        audio_tracks = []
+        if final_video.audio:
+            audio_tracks.append(final_video.audio)
+
+        # --- SFX Integration (P1 Feature) ---
+        if Config.SFX_ENABLED and script_segments:
+            try:
+                sfx_clips = self._generate_sfx_tracks(script_segments, final_video.duration)
+                if sfx_clips:
+                    logger.info(f"Adding {len(sfx_clips)} sound effects to audio mix")
+                    audio_tracks.extend(sfx_clips)
+            except Exception as e:
+                logger.warning(f"SFX generation failed: {e}")
+        # ------------------------------------
+
+        if bgm_path and os.path.exists(bgm_path):
+            try:
+                bgm_clip = AudioFileClip(bgm_path)
+                # Loop BGM if shorter
+                if bgm_clip.duration < final_video.duration:
+                    bgm_clip = bgm_clip.fx(afx.audio_loop, duration=final_video.duration)
+                else:
+                    bgm_clip = bgm_clip.subclip(0, final_video.duration)
+
+                # --- Phase 2-2: Dynamic Volume Curve ---
+                if bgm_metadata and Config.BGM_DYNAMIC_VOLUME_ENABLED:
+                    # Use BGM metadata intensity curve if available
+                    intensity_curve = bgm_metadata.get('intensity_curve', [0.15, 0.2, 0.25, 0.2, 0.15])
+                    bgm_clip = self._apply_dynamic_volume_curve(bgm_clip, final_video.duration, intensity_curve)
+                    logger.info(f"Applied dynamic volume curve from BGM metadata")
+                else:
+                    # Fallback: Static volume control
+                    bgm_clip = bgm_clip.volumex(Config.BGM_VOLUME)
+                # ----------------------------------------
+
+                # --- Auto-ducking (P1 Feature) ---
+                if Config.AUTO_DUCKING_ENABLED and script_segments:
+                    # Build TTS segment timing info
+                    tts_timing = []
+                    current_time = 0.0
+                    for seg in script_segments:
+                        duration = float(seg.get('duration', 0.0))
+                        if seg.get('text', '').strip():  # Only segments with text
+                            tts_timing.append({'start': current_time, 'duration': duration})
+                        current_time += duration
+
+                    bgm_clip = self._apply_auto_ducking(final_video.audio, bgm_clip, tts_timing)
+                # ------------------------------------
+
+                audio_tracks.append(bgm_clip)
+            except Exception as e:
+                logger.warning(f"Failed to load BGM: {e}")
+
+        if len(audio_tracks) > 1:
+            final_audio = CompositeAudioClip(audio_tracks)
+            final_video = final_video.set_audio(final_audio)
+        return final_video
+
+    @span("render.asset")
+    def _normalize_asset(self, idx: int, asset: dict, total: int, audio_map: dict, house_info: dict, state: "_NormalizeState") -> None:
+        """
+        Step 1 of render_video for one timeline asset: enhance, download, filter, resize,
+        retime to its voice-over and attach it. Appends the clip to state.clips.
+        Assets marked ``normalized`` (parts from render_segment) skip enhancement and filters.
+        """
+        url = asset.get('oss_url')
+        asset_id = asset.get('id')
+        asset_duration = float(asset.get("duration") or 0.0)
+        normalized = bool(asset.get("normalized"))
+        visual_prompt = asset.get('visual_prompt', '').strip()
+
+        # --- AI Visual Enhancement (P0 Feature) ---
+        if not normalized and self._should_enhance_asset(asset, idx, total):
+            # Build intelligent prompt based on scene and house features
+            enhance_prompt = self._build_enhancement_prompt(asset, house_info)
+
+            try:
+                enhanced_url = self._enhance_video_with_ai(url, enhance_prompt)
+                # Replace URL with enhanced version
+                asset = {**asset, 'oss_url': enhanced_url}
+                url = enhanced_url
+                logger.info(f"Asset {asset_id} enhanced with AI (index={idx}, prompt={enhance_prompt[:50]}...)")
+            except Exception as e:
+                logger.warning(f"AI enhancement failed for asset {asset_id}, using original: {e}")
+        # ------------------------------------------
+
+        if not url and not asset.get("storage_key") and not asset.get("local_path"):
+            return
+
+        # Download Video
+        local_video_path = self._download_temp(asset)
+        state.temp_files.append(local_video_path)
+
+        # Get Audio
+        audio_path = audio_map.get(asset_id) if audio_map else None
+        has_voice = bool(audio_path and os.path.exists(audio_path))
+
+        try:
+            # The voice-over replaces the source audio: no audio reader for it
+            clip = state.readers.track(self._open_video_clip(local_video_path, audio=not has_voice))
+            if not normalized:
+                # Apply Warm Filter (Global for "Warm Life Style")
+                clip = self._apply_warm_filter(clip)
+
+                # --- Phase 2-1: Dynamic Speed Control (Emotion-based) ---
+                clip = self._apply_dynamic_speed_control(clip, asset, asset_id)
+                # ---------------------------------------------------------
+        except Exception as video_error:
+            logger.error(
+                f"Failed to open video clip for asset {asset_id}",
+                extra={
+                    "event": "video.clip.open_failed",
+                    "asset_id": asset_id,
+                    "error_type": type(video_error).__name__,
+                    "error_message": str(video_error)[:200]
+                }
+            )
+            clip = None
+
+        # Basic resize to 720p height
+        # Note: If mixed aspect ratios, this might be weird. 
+        # Assuming all are vertical or we just fit height.
+        target_height = min(720, Config.MAX_VIDEO_RESOLUTION)
+        if clip is not None and clip.h != target_height:
+            clip = clip.resize(height=target_height)
+        if clip is not None and state.output_size is None:
+            try:
+                state.output_size = tuple(clip.size)
+            except Exception:
+                state.output_size = None
+            if state.output_size is not None and state.pending_placeholders:
+                resized = []
+                for ph in state.pending_placeholders:
+                    try:
+                        resized.append(ph.resize(newsize=state.output_size))
+                    except Exception:
+                        resized.append(ph)
+                state.pending_placeholders.clear()
+                for i, c in enumerate(state.clips):
+                    if getattr(c, "__placeholder__", False):
+                        state.clips[i] = resized.pop(0) if resized else c
+
+        if has_voice:
+            audio_clip = self._open_voice_clip(audio_path)
+
+            # 3. Sync Logic (Elastic)
+            # Audio is the Master.
+            audio_dur = audio_clip.duration
+            if clip is None:
+                repaired = self._transcode_to_mp4(local_video_path)
+                if repaired:
+                    state.temp_files.append(repaired)
+                    try:
+                        clip = state.readers.track(self._open_video_clip(repaired, audio=False))
+                    except Exception:
+                        clip = None
+
+            if clip is None:
+                ph_size = state.output_size
+                if ph_size is None:
+                    probed = self._probe_video_size(local_video_path)
+                    if probed:
+                        w, h = probed
+                        if h > 0:
+                            ph_size = (max(1, int(round(w * 720.0 / float(h)))), 720)
+                clip = self._placeholder_clip(audio_dur or asset_duration or 5.0, size=ph_size)
+                setattr(clip, "__placeholder__", True)
+                if state.output_size is None:
+                    state.pending_placeholders.append(clip)
+            video_dur = clip.duration
+
+            # Elastic Match
+            if video_dur >= audio_dur:
+                # Video is longer -> Cut video
+                clip = clip.subclip(0, audio_dur)
+            else:
+                # Video is shorter -> Use slow motion + last frame freeze
+                # This is more natural than boomerang (forward-backward looping)
+
+                gap = audio_dur - video_dur
+
+                # Strategy: 
+                # 1. If gap is small (<30% of video), use gentle slow motion
+                # 2. If gap is larger, use slow motion + last frame freeze
+
+                if gap <= video_dur * 0.3:
+                    # Small gap: gentle slow motion (0.77x - 1.0x)
+                    speed_factor = video_dur / audio_dur
+                    speed_factor = max(0.77, speed_factor)  # Don't go slower than 0.77x
+
+                    try:
+                        clip = clip.fx(vfx.speedx, speed_factor)
+                        # Trim to exact duration
+                        if clip.duration > audio_dur:
+                            clip = clip.subclip(0, audio_dur)
+                        logger.info(
+                            f"Applied slow motion to extend video",
+                            extra={
+                                "event": "video.extend.slowmo",
+                                "asset_id": asset_id,
+                                "speed_factor": speed_factor,
+                                "original_duration": video_dur,
+                                "target_duration": audio_dur
+                            }
+                        )
+                    except Exception as e:
+                        logger.warning(f"Slow motion failed, using last frame freeze: {e}")
+                        clip = self._extend_with_last_frame(clip, audio_dur)
+                else:
+                    # Larger gap: slow motion (0.85x) + last frame freeze for remainder
+                    try:
+                        # Apply moderate slow motion first
+                        slow_factor = 0.85
+                        slowed_clip = clip.fx(vfx.speedx, slow_factor)
+                        slowed_dur = slowed_clip.duration
+
+                        if slowed_dur >= audio_dur:
+                            # Slow motion alone is enough
+                            clip = slowed_clip.subclip(0, audio_dur)
+                        else:
+                            # Need last frame freeze for the rest
+                            remaining = audio_dur - slowed_dur
+                            clip = self._extend_with_last_frame(slowed_clip, audio_dur)
+
+                        logger.info(
+                            f"Applied slow motion + freeze to extend video",
+                            extra={
+                                "event": "video.extend.slowmo_freeze",
+                                "asset_id": asset_id,
+                                "slow_factor": slow_factor,
+                                "original_duration": video_dur,
+                                "target_duration": audio_dur
+                            }
+                        )
+                    except Exception as e:
+                        logger.warning(f"Slow motion + freeze failed, using simple freeze: {e}")
+                        clip = self._extend_with_last_frame(clip, audio_dur)
+
+            # Attach Audio
+            clip = clip.set_audio(audio_clip)
+            state.attached_audio_count += 1
+        else:
+            # No audio for this clip? 
+            # Keep original video duration or silence?
+            # Let's keep original video but without audio?
+            # Or maybe skip?
+            # Better to keep it to avoid missing visuals.
+            if clip is None:
+                clip = self._placeholder_clip(asset_duration or 5.0, size=state.output_size)
+                setattr(clip, "__placeholder__", True)
+                if state.output_size is None:
+                    state.pending_placeholders.append(clip)
+
+        state.clips.append(clip)
+
+    @span("render")
     def render_video(self, timeline_assets: list, audio_map: dict, output_path: str, bgm_path: str = None, script_segments: list = None, house_info: dict = None, audio_gen=None, intro_text: str = None, intro_card: dict = None, bgm_metadata: dict = None) -> str:
         """
         Concatenate video clips based on timeline and add audio track.
@@ -1535,417 +1824,192 @@ class VideoRenderer:
         intro_card: optional structured intro card data with headline, specs, highlights
         bgm_metadata: optional BGM metadata dict with intensity_curve (Phase 2-2 new feature)
         """
-        final_clips = []
-        temp_files_to_clean = []
-        attached_audio_count = 0
-        
-        output_size = None
-        pending_placeholders = []
+        state = _NormalizeState()
+        final_clips = state.clips
+        temp_files_to_clean = state.temp_files
 
         try:
-            # 1. Process each asset
-            for idx, asset in enumerate(timeline_assets):
-                url = asset.get('oss_url')
-                asset_id = asset.get('id')
-                asset_duration = float(asset.get("duration") or 0.0)
-                visual_prompt = asset.get('visual_prompt', '').strip()
-                
-                # --- AI Visual Enhancement (P0 Feature) ---
-                if self._should_enhance_asset(asset, idx, len(timeline_assets)):
-                    # Build intelligent prompt based on scene and house features
-                    enhance_prompt = self._build_enhancement_prompt(asset, house_info)
-                    
-                    try:
-                        enhanced_url = self._enhance_video_with_ai(url, enhance_prompt)
-                        # Replace URL with enhanced version
-                        asset = {**asset, 'oss_url': enhanced_url}
-                        url = enhanced_url
-                        logger.info(f"Asset {asset_id} enhanced with AI (index={idx}, prompt={enhance_prompt[:50]}...)")
-                    except Exception as e:
-                        logger.warning(f"AI enhancement failed for asset {asset_id}, using original: {e}")
-                # ------------------------------------------
-                
-                if not url and not asset.get("storage_key"):
-                    continue
-                    
-                # Download Video
-                local_video_path = self._download_temp(asset)
-                temp_files_to_clean.append(local_video_path)
-                
-                try:
-                    clip = self._open_video_clip(local_video_path)
-                    # Apply Warm Filter (Global for "Warm Life Style")
-                    clip = self._apply_warm_filter(clip)
-                    
-                    # --- Phase 2-1: Dynamic Speed Control (Emotion-based) ---
-                    clip = self._apply_dynamic_speed_control(clip, asset, asset_id)
-                    # ---------------------------------------------------------
-                except Exception as video_error:
-                    logger.error(
-                        f"Failed to open video clip for asset {asset_id}",
-                        extra={
-                            "event": "video.clip.open_failed",
-                            "asset_id": asset_id,
-                            "error_type": type(video_error).__name__,
-                            "error_message": str(video_error)[:200]
-                        }
-                    )
-                    clip = None
-                    
-                # Basic resize to 720p height
-                # Note: If mixed aspect ratios, this might be weird. 
-                # Assuming all are vertical or we just fit height.
-                target_height = min(720, Config.MAX_VIDEO_RESOLUTION)
-                if clip is not None and clip.h != target_height:
-                    clip = clip.resize(height=target_height)
-                if clip is not None and output_size is None:
-                    try:
-                        output_size = tuple(clip.size)
-                    except Exception:
-                        output_size = None
-                    if output_size is not None and pending_placeholders:
-                        resized = []
-                        for ph in pending_placeholders:
-                            try:
-                                resized.append(ph.resize(newsize=output_size))
-                            except Exception:
-                                resized.append(ph)
-                        pending_placeholders.clear()
-                        for i, c in enumerate(final_clips):
-                            if getattr(c, "__placeholder__", False):
-                                final_clips[i] = resized.pop(0) if resized else c
-                
-                # Get Audio
-                audio_path = audio_map.get(asset_id) if audio_map else None
-                
-                if audio_path and os.path.exists(audio_path):
-                    audio_clip = AudioFileClip(audio_path)
-                    
-                    # 3. Sync Logic (Elastic)
-                    # Audio is the Master.
-                    audio_dur = audio_clip.duration
-                    if clip is None:
-                        repaired = self._transcode_to_mp4(local_video_path)
-                        if repaired:
-                            temp_files_to_clean.append(repaired)
-                            try:
-                                clip = self._open_video_clip(repaired)
-                            except Exception:
-                                clip = None
-
-                    if clip is None:
-                        ph_size = output_size
-                        if ph_size is None:
-                            probed = self._probe_video_size(local_video_path)
-                            if probed:
-                                w, h = probed
-                                if h > 0:
-                                    ph_size = (max(1, int(round(w * 720.0 / float(h)))), 720)
-                        clip = self._placeholder_clip(audio_dur or asset_duration or 5.0, size=ph_size)
-                        setattr(clip, "__placeholder__", True)
-                        if output_size is None:
-                            pending_placeholders.append(clip)
-                    video_dur = clip.duration
-                    
-                    # Elastic Match
-                    if video_dur >= audio_dur:
-                        # Video is longer -> Cut video
-                        clip = clip.subclip(0, audio_dur)
-                    else:
-                        # Video is shorter -> Use slow motion + last frame freeze
-                        # This is more natural than boomerang (forward-backward looping)
-                        
-                        gap = audio_dur - video_dur
-                        
-                        # Strategy: 
-                        # 1. If gap is small (<30% of video), use gentle slow motion
-                        # 2. If gap is larger, use slow motion + last frame freeze
-                        
-                        if gap <= video_dur * 0.3:
-                            # Small gap: gentle slow motion (0.77x - 1.0x)
-                            speed_factor = video_dur / audio_dur
-                            speed_factor = max(0.77, speed_factor)  # Don't go slower than 0.77x
-                            
-                            try:
-                                clip = clip.fx(vfx.speedx, speed_factor)
-                                # Trim to exact duration
-                                if clip.duration > audio_dur:
-                                    clip = clip.subclip(0, audio_dur)
-                                logger.info(
-                                    f"Applied slow motion to extend video",
-                                    extra={
-                                        "event": "video.extend.slowmo",
-                                        "asset_id": asset_id,
-                                        "speed_factor": speed_factor,
-                                        "original_duration": video_dur,
-                                        "target_duration": audio_dur
-                                    }
-                                )
-                            except Exception as e:
-                                logger.warning(f"Slow motion failed, using last frame freeze: {e}")
-                                clip = self._extend_with_last_frame(clip, audio_dur)
-                        else:
-                            # Larger gap: slow motion (0.85x) + last frame freeze for remainder
-                            try:
-                                # Apply moderate slow motion first
-                                slow_factor = 0.85
-                                slowed_clip = clip.fx(vfx.speedx, slow_factor)
-                                slowed_dur = slowed_clip.duration
-                                
-                                if slowed_dur >= audio_dur:
-                                    # Slow motion alone is enough
-                                    clip = slowed_clip.subclip(0, audio_dur)
-                                else:
-                                    # Need last frame freeze for the rest
-                                    remaining = audio_dur - slowed_dur
-                                    clip = self._extend_with_last_frame(slowed_clip, audio_dur)
-                                
-                                logger.info(
-                                    f"Applied slow motion + freeze to extend video",
-                                    extra={
-                                        "event": "video.extend.slowmo_freeze",
-                                        "asset_id": asset_id,
-                                        "slow_factor": slow_factor,
-                                        "original_duration": video_dur,
-                                        "target_duration": audio_dur
-                                    }
-                                )
-                            except Exception as e:
-                                logger.warning(f"Slow motion + freeze failed, using simple freeze: {e}")
-                                clip = self._extend_with_last_frame(clip, audio_dur)
-                    
-                    # Attach Audio
-                    clip = clip.set_audio(audio_clip)
-                    attached_audio_count += 1
-                else:
-                    # No audio for this clip? 
-                    # Keep original video duration or silence?
-                    # Let's keep original video but without audio?
-                    # Or maybe skip?
-                    # Better to keep it to avoid missing visuals.
-                    if clip is None:
-                        clip = self._placeholder_clip(asset_duration or 5.0, size=output_size)
-                        setattr(clip, "__placeholder__", True)
-                        if output_size is None:
-                            pending_placeholders.append(clip)
-                
-                final_clips.append(clip)
+            with span("render.normalize", assets=len(timeline_assets)):
+                # 1. Process each asset
+                for idx, asset in enumerate(timeline_assets):
+                    self._normalize_asset(idx, asset, len(timeline_assets), audio_map, house_info, state)
 
+            attached_audio_count = state.attached_audio_count
             if not final_clips:
                 raise ValueError("No video clips to render")
 
-            # 4. Concatenate All Video Clips
-            main_video = concatenate_videoclips(final_clips, method="compose")
-            
-            # Determine video size for intro/outro
-            video_size = tuple(main_video.size) if hasattr(main_video, 'size') else (1280, 720)
-            
-            # 5. Add Intro and Outro Cards
-            all_video_parts = []
-            intro_card = None
-            outro_card = None
-            intro_audio_path = None  # Track for cleanup
-            first_video_clip = None  # For intro background
-            
-            # Get first video clip for intro background (before it's modified)
-            if Config.INTRO_ENABLED and Config.INTRO_USE_FIRST_VIDEO and final_clips:
-                try:
-                    # Clone first clip for intro background
-                    first_clip = final_clips[0]
-                    if first_clip is not None and not getattr(first_clip, "__placeholder__", False):
-                        first_video_clip = first_clip.copy()
-                        logger.info("Prepared first video clip for intro background")
-                except Exception as e:
-                    logger.warning(f"Failed to prepare first video clip for intro: {e}")
-                    first_video_clip = None
+            with span("render.compose"):
+                # 4. Concatenate All Video Clips
+                main_video = concatenate_videoclips(final_clips, method="compose")
+            
+                # Determine video size for intro/outro
+                video_size = tuple(main_video.size) if hasattr(main_video, 'size') else (1280, 720)
+            
+                # 5. Add Intro and Outro Cards
+                all_video_parts = []
+                intro_card = None
+                outro_card = None
+                intro_audio_path = None  # Track for cleanup
+                first_video_clip = None  # For intro background
+            
+                # Get first video clip for intro background (before it's modified)
+                if Config.INTRO_ENABLED and Config.INTRO_USE_FIRST_VIDEO and final_clips:
+                    try:
+                        # Clone first clip for intro background
+                        first_clip = final_clips[0]
+                        if first_clip is not None and not getattr(first_clip, "__placeholder__", False):
+                            first_video_clip = first_clip.copy()
+                            logger.info("Prepared first video clip for intro background")
+                    except Exception as e:
+                        logger.warning(f"Failed to prepare first video clip for intro: {e}")
+                        first_video_clip = None
             
-            # Intro Card (with optional voice-over)
-            if Config.INTRO_ENABLED:
-                try:
-                    intro_duration = Config.INTRO_DURATION
-                    intro_audio_clip = None
+                # Intro Card (with optional voice-over)
+                if Config.INTRO_ENABLED:
+                    try:
+                        intro_duration = Config.INTRO_DURATION
+                        intro_audio_clip = None
                     
-                    # Generate intro voice-over if enabled
-                    if Config.INTRO_VOICE_ENABLED and audio_gen is not None:
-                        try:
-                            # Use user-edited intro text if provided, otherwise generate
-                            if intro_text and intro_text.strip():
-                                intro_script = intro_text.strip()
-                                logger.info(f"Using user-provided intro text: '{intro_script[:50]}...'")
-                            else:
-                                # Generate intro voice script via LLM
-                                intro_script = self._generate_intro_voice_script(house_info or {}, script_segments or [])
+                        # Generate intro voice-over if enabled
+                        if Config.INTRO_VOICE_ENABLED and audio_gen is not None:
+                            try:
+                                # Use user-edited intro text if provided, otherwise generate
+                                if intro_text and intro_text.strip():
+                                    intro_script = intro_text.strip()
+                                    logger.info(f"Using user-provided intro text: '{intro_script[:50]}...'")
+                                else:
+                                    # Generate intro voice script via LLM
+                                    intro_script = self._generate_intro_voice_script(house_info or {}, script_segments or [])
                             
-                            if intro_script:
-                                # Generate TTS audio for intro
-                                intro_audio_path = os.path.join(
-                                    tempfile.gettempdir(), 
-                                    f"intro_voice_{int(time.time())}.mp3"
-                                )
-                                audio_gen.generate_audio(intro_script, intro_audio_path)
-                                
-                                if os.path.exists(intro_audio_path):
-                                    intro_audio_clip = AudioFileClip(intro_audio_path)
-                                    # Intro duration is based on voice duration + small buffer
-                                    intro_duration = intro_audio_clip.duration + 0.5
-                                    logger.info(
-                                        f"Generated intro voice: duration={intro_audio_clip.duration:.2f}s, script='{intro_script[:50]}...'"
+                                if intro_script:
+                                    # Generate TTS audio for intro
+                                    intro_audio_path = os.path.join(
+                                        tempfile.gettempdir(), 
+                                        f"intro_voice_{int(time.time())}.mp3"
                                     )
-                        except Exception as e:
-                            logger.warning(f"Failed to generate intro voice, using static intro: {e}")
-                            intro_audio_clip = None
+                                    audio_gen.generate_audio(intro_script, intro_audio_path)
+                                
+                                    if os.path.exists(intro_audio_path):
+                                        intro_audio_clip = AudioFileClip(intro_audio_path)
+                                        # Intro duration is based on voice duration + small buffer
+                                        intro_duration = intro_audio_clip.duration + 0.5
+                                        logger.info(
+                                            f"Generated intro voice: duration={intro_audio_clip.duration:.2f}s, script='{intro_script[:50]}...'"
+                                        )
+                            except Exception as e:
+                                logger.warning(f"Failed to generate intro voice, using static intro: {e}")
+                                intro_audio_clip = None
                     
-                    intro_clip = self._create_intro_card(
-                        house_info or {}, 
-                        script_segments or [], 
-                        video_size, 
-                        duration=intro_duration,
-                        audio_clip=intro_audio_clip,
-                        background_video=first_video_clip,
-                        intro_card=intro_card  # Pass structured intro card data
-                    )
-                    all_video_parts.append(intro_clip)
-                    logger.info(f"Intro card added successfully ({intro_duration:.2f}s, voice={intro_audio_clip is not None})")
-                except Exception as e:
-                    logger.warning(f"Failed to add intro card: {e}")
-                    intro_clip = None
+                        intro_clip = self._create_intro_card(
+                            house_info or {}, 
+                            script_segments or [], 
+                            video_size, 
+                            duration=intro_duration,
+                            audio_clip=intro_audio_clip,
+                            background_video=first_video_clip,
+                            intro_card=intro_card  # Pass structured intro card data
+                        )
+                        all_video_parts.append(intro_clip)
+                        logger.info(f"Intro card added successfully ({intro_duration:.2f}s, voice={intro_audio_clip is not None})")
+                    except Exception as e:
+                        logger.warning(f"Failed to add intro card: {e}")
+                        intro_clip = None
             
-            # Main video content
-            all_video_parts.append(main_video)
+                # Main video content
+                all_video_parts.append(main_video)
             
-            # Outro Card (configurable duration)
-            if Config.OUTRO_ENABLED:
-                try:
-                    outro_duration = Config.OUTRO_DURATION
-                    outro_card = self._create_outro_card(
-                        house_info or {}, 
-                        script_segments or [], 
-                        video_size, 
-                        duration=outro_duration
-                    )
-                    all_video_parts.append(outro_card)
-                    logger.info(f"Outro card added successfully ({outro_duration}s)")
-                except Exception as e:
-                    logger.warning(f"Failed to add outro card: {e}")
-                    outro_card = None
+                # Outro Card (configurable duration)
+                if Config.OUTRO_ENABLED:
+                    try:
+                        outro_duration = Config.OUTRO_DURATION
+                        outro_card = self._create_outro_card(
+                            house_info or {}, 
+                            script_segments or [], 
+                            video_size, 
+                            duration=outro_duration
+                        )
+                        all_video_parts.append(outro_card)
+                        logger.info(f"Outro card added successfully ({outro_duration}s)")
+                    except Exception as e:
+                        logger.warning(f"Failed to add outro card: {e}")
+                        outro_card = None
             
-            # Concatenate all parts (intro + main + outro)
-            final_video = concatenate_videoclips(all_video_parts, method="compose")
+                # Concatenate all parts (intro + main + outro)
+                final_video = concatenate_videoclips(all_video_parts, method="compose")
             
-            # Calculate actual intro duration for subtitle offset
-            actual_intro_duration = 0.0
-            if intro_clip is not None:
-                try:
-                    actual_intro_duration = intro_clip.duration
-                except Exception:
-                    actual_intro_duration = Config.INTRO_DURATION if Config.INTRO_ENABLED else 0.0
+                # Calculate actual intro duration for subtitle offset
+                actual_intro_duration = 0.0
+                if intro_clip is not None:
+                    try:
+                        actual_intro_duration = intro_clip.duration
+                    except Exception:
+                        actual_intro_duration = Config.INTRO_DURATION if Config.INTRO_ENABLED else 0.0
 
-            # --- Subtitle Integration (P0 Feature) ---
-            if script_segments and Config.SUBTITLE_ENABLED:
-                try:
-                    # Calculate time offset for subtitles (after intro)
-                    subtitle_offset = actual_intro_duration
-                    
-                    logger.info(
-                        "Starting subtitle generation",
-                        extra={
-                            "event": "subtitle.generation.start",
-                            "segment_count": len(script_segments),
-                            "video_duration": float(final_video.duration),
-                            "time_offset": subtitle_offset
-                        }
-                    )
-                    video_size = tuple(final_video.size) if hasattr(final_video, 'size') else (1280, 720)
-                    subtitle_clips = self._generate_subtitle_clips(script_segments, video_size, time_offset=subtitle_offset)
+                # --- Subtitle Integration (P0 Feature) ---
+                if script_segments and Config.SUBTITLE_ENABLED:
+                    try:
+                        # Calculate time offset for subtitles (after intro)
+                        subtitle_offset = actual_intro_duration
                     
-                    if subtitle_clips:
                         logger.info(
-                            f"Adding {len(subtitle_clips)} subtitle clips to video",
+                            "Starting subtitle generation",
                             extra={
-                                "event": "subtitle.integration.success",
-                                "subtitle_count": len(subtitle_clips)
+                                "event": "subtitle.generation.start",
+                                "segment_count": len(script_segments),
+                                "video_duration": float(final_video.duration),
+                                "time_offset": subtitle_offset
                             }
                         )
-                        final_video = CompositeVideoClip([final_video] + subtitle_clips)
-                except Exception as e:
-                    logger.warning(
-                        f"Subtitle rendering failed, continuing without subtitles",
-                        extra={
-                            "event": "subtitle.rendering.failed",
-                            "error_type": type(e).__name__,
-                            "error_message": str(e)[:200]
-                        }
-                    )
-            # ------------------------------------------
-
-            # --- Audio Mixing (TTS + BGM + SFX) ---
-            audio_tracks = []
-            if final_video.audio:
-                audio_tracks.append(final_video.audio)
-            
-            # --- SFX Integration (P1 Feature) ---
-            if Config.SFX_ENABLED and script_segments:
-                try:
-                    sfx_clips = self._generate_sfx_tracks(script_segments, final_video.duration)
-                    if sfx_clips:
-                        logger.info(f"Adding {len(sfx_clips)} sound effects to audio mix")
-                        audio_tracks.extend(sfx_clips)
-                except Exception as e:
-                    logger.warning(f"SFX generation failed: {e}")
-            # ------------------------------------
-            
-            if bgm_path and os.path.exists(bgm_path):
-                try:
-                    bgm_clip = AudioFileClip(bgm_path)
-                    # Loop BGM if shorter
-                    if bgm_clip.duration < final_video.duration:
-                        bgm_clip = bgm_clip.fx(afx.audio_loop, duration=final_video.duration)
-                    else:
-                        bgm_clip = bgm_clip.subclip(0, final_video.duration)
-                    
-                    # --- Phase 2-2: Dynamic Volume Curve ---
-                    if bgm_metadata and Config.BGM_DYNAMIC_VOLUME_ENABLED:
-                        # Use BGM metadata intensity curve if available
-                        intensity_curve = bgm_metadata.get('intensity_curve', [0.15, 0.2, 0.25, 0.2, 0.15])
-                        bgm_clip = self._apply_dynamic_volume_curve(bgm_clip, final_video.duration, intensity_curve)
-                        logger.info(f"Applied dynamic volume curve from BGM metadata")
-                    else:
-                        # Fallback: Static volume control
-                        bgm_clip = bgm_clip.volumex(Config.BGM_VOLUME)
-                    # ----------------------------------------
+                        video_size = tuple(final_video.size) if hasattr(final_video, 'size') else (1280, 720)
+                        subtitle_clips = self._generate_subtitle_clips(script_segments, video_size, time_offset=subtitle_offset)
                     
-                    # --- Auto-ducking (P1 Feature) ---
-                    if Config.AUTO_DUCKING_ENABLED and script_segments:
-                        # Build TTS segment timing info
-                        tts_timing = []
-                        current_time = 0.0
-                        for seg in script_segments:
-                            duration = float(seg.get('duration', 0.0))
-                            if seg.get('text', '').strip():  # Only segments with text
-                                tts_timing.append({'start': current_time, 'duration': duration})
-                            current_time += duration
-                        
-                        bgm_clip = self._apply_auto_ducking(final_video.audio, bgm_clip, tts_timing)
-                    # ------------------------------------
-                    
-                    audio_tracks.append(bgm_clip)
-                except Exception as e:
-                    logger.warning(f"Failed to load BGM: {e}")
+                        if subtitle_clips:
+                            logger.info(
+                                f"Adding {len(subtitle_clips)} subtitle clips to video",
+                                extra={
+                                    "event": "subtitle.integration.success",
+                                    "subtitle_count": len(subtitle_clips)
+                                }
+                            )
+                            final_video = CompositeVideoClip([final_video] + subtitle_clips)
+                    except Exception as e:
+                        logger.warning(
+                            f"Subtitle rendering failed, continuing without subtitles",
+                            extra={
+                                "event": "subtitle.rendering.failed",
+                                "error_type": type(e).__name__,
+                                "error_message": str(e)[:200]
+                            }
+                        )
+                # ------------------------------------------
 
-            if len(audio_tracks) > 1:
-                final_audio = CompositeAudioClip(audio_tracks)
-                final_video = final_video.set_audio(final_audio)
+            # --- Audio Mixing (TTS + BGM + SFX) ---
+            with span("render.mix"):
+                final_video = self._mix_audio_tracks(final_video, script_segments, bgm_path, bgm_metadata)
             # --------------------------------
 
             # 5. Write Output
-            final_video.write_videofile(
-                output_path, 
-                codec='libx264', 
-                audio_codec='aac', 
-                fps=24,
-                preset='veryfast',
-                threads=Config.RENDER_THREADS,  # Configurable thread count
-                logger=None 
+            with span("render.encode", video_duration=float(final_video.duration or 0.0)) as encode_span:
+                final_video.write_videofile(
+                    output_path, 
+                    codec='libx264', 
+                    audio_codec='aac', 
+                    fps=24,
+                    preset='veryfast',
+                    threads=Config.RENDER_THREADS,  # Configurable thread count
+                    logger=None 
+                )
+                encode_span.add_bytes_out(os.path.getsize(output_path))
+                metrics.RENDERED_VIDEO_SECONDS.inc(float(final_video.duration or 0.0))
+            logger.info(
+                "Render readers",
+                extra={
+                    "event": "render.readers",
+                    "segments_count": len(final_clips),
+                    "max_open": state.readers.max_open,
+                    "peak_open": state.readers.peak_open,
+                    "restarts": state.readers.restarts,
+                },
             )
             if attached_audio_count <= 0:
                 raise RuntimeError("render produced no audio-attached clips")
@@ -1994,6 +2058,50 @@ class VideoRenderer:
                 
         return output_path
 
+    def render_segment(self, asset: dict, audio_path: str | None, output_path: str, index: int = 0, total: int = 1, house_info: dict = None) -> dict | None:
+        """
+        Normalize one timeline asset into a silent mp4 (distributed render: render_segment_task, RENDER_DAG_ENABLED).
+        The part is already enhanced, filtered, resized and retimed to ``audio_path``;
+        render_video() takes it back as an asset with ``normalized=True``.
+        Returns {"duration", "width", "height"}, or None when the asset has no source.
+        """
+        state = _NormalizeState()
+        audio_map = {asset.get("id"): audio_path} if audio_path else {}
+        try:
+            with span("render.segment", index=index) as s:
+                self._normalize_asset(index, asset, total, audio_map, house_info, state)
+                if not state.clips:
+                    return None
+                clip = state.clips[0].without_audio()
+                clip.write_videofile(
+                    output_path,
+                    codec='libx264',
+                    audio=False,
+                    fps=24,
+                    preset='veryfast',
+                    threads=Config.RENDER_THREADS,
+                    ffmpeg_params=['-crf', str(Config.RENDER_DAG_PART_CRF)],  # Intermediate: keep generation loss low
+                    logger=None
+                )
+                s.add_bytes_out(os.path.getsize(output_path))
+                width, height = clip.size
+                return {"duration": float(clip.duration or 0.0), "width": int(width), "height": int(height)}
+        finally:
+            for clip in state.clips:
+                try:
+                    clip.close()
+                    if clip.audio:
+                        clip.audio.close()
+                except Exception:
+                    pass
+            for p in state.temp_files:
+                if os.path.exists(p):
+                    try:
+                        os.remove(p)
+                    except Exception:
+                        pass
+
+    @span("download")
     def _download_temp(self, asset) -> str:
         if isinstance(asset, str):
             url = asset
@@ -2013,11 +2121,13 @@ class VideoRenderer:
             temp = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
             temp.close()
             try:
-                self._s3_client.download_file(storage_bucket, storage_key, temp.name)
+                get_s3().download_file(storage_bucket, storage_key, temp.name)
                 if not self._is_probably_mp4(temp.name):
                     raise OSError("downloaded file does not look like mp4")
                 if not self._ffprobe_stream_info(temp.name):
                     raise OSError("downloaded mp4 failed ffprobe validation")
+                current_span().add_bytes_in(os.path.getsize(temp.name))
+                metrics.TRANSFER_BYTES.inc(os.path.getsize(temp.name), direction="download", target="s3")
                 return temp.name
             except Exception:
                 if os.path.exists(temp.name):
@@ -2037,6 +2147,8 @@ class VideoRenderer:
                     raise OSError("downloaded file does not look like mp4")
                 if not self._ffprobe_stream_info(temp.name):
                     raise OSError("downloaded mp4 failed ffprobe validation")
+                current_span().add_bytes_in(os.path.getsize(temp.name))
+                metrics.TRANSFER_BYTES.inc(os.path.getsize(temp.name), direction="download", target="s3")
                 return temp.name
 
             for attempt in range(1, 4):
@@ -2070,4 +2182,6 @@ class VideoRenderer:
             if os.path.exists(temp.name):
                 os.remove(temp.name)
             raise
+        current_span().add_bytes_in(os.path.getsize(temp.name))
+        metrics.TRANSFER_BYTES.inc(os.path.getsize(temp.name), direction="download", target="http")
         return temp.name
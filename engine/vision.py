@@ -3,24 +3,52 @@ import numpy as np
 from dashscope import MultiModalConversation
 from http import HTTPStatus
 from config import Config
-import tempfile
-import os
+import metrics
+from shot_detect import FastShotDetector
+from frame_payload import FramePayloadBuilder
+from vision_cache import VisionResultCache, build_cache_key
+from shot_grouping import make_windows, merge_window_results, ownership_ranges
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import json
+import logging
+import time
 try:
     from scenedetect import SceneManager, open_video, ContentDetector
 except ImportError:
     SceneManager = None
 
+logger = logging.getLogger(__name__)
+
 class SceneDetector:
     def __init__(self):
         # Ensure API Key is set
         if not Config.DASHSCOPE_API_KEY:
             raise ValueError("DASHSCOPE_API_KEY is not set")
+        self._cache = VisionResultCache()
         
     def detect_video_shots(self, video_path: str, threshold: float = 27.0) -> list[tuple[float, float]]:
         """
-        Detect shot boundaries (cuts) in a video using PySceneDetect.
+        Detect shot boundaries (cuts) in a video.
+        Uses the downscaled fast detector when SHOT_DETECTOR=fast, otherwise PySceneDetect
+        (``threshold`` only applies to PySceneDetect).
         Returns a list of (start_time, end_time) tuples in seconds.
         """
+        if Config.SHOT_DETECTOR == "fast":
+            return FastShotDetector().detect(video_path)
+        return self.detect_video_shots_pyscenedetect(video_path, threshold=threshold)
+
+    def analyze_video_pass(self, video_path: str, num_frames: int = 5, probe: dict | None = None) -> dict:
+        """
+        Decode the video once and return duration, shots, one JPEG per shot and
+        ``num_frames`` evenly spaced JPEG key frames (see FastShotDetector.analyze).
+        """
+        return FastShotDetector().analyze(video_path, num_key_frames=num_frames, probe=probe)
+
+    def detect_video_shots_pyscenedetect(self, video_path: str, threshold: float = 27.0) -> list[tuple[float, float]]:
+        """
+        Detect shot boundaries with PySceneDetect ContentDetector at native resolution.
+        """
         if SceneManager is None:
             raise ImportError("scenedetect not installed. Please install scenedetect[opencv]")
 
@@ -46,7 +74,8 @@ class SceneDetector:
     def analyze_shot_grouping(self, shot_frames: list[dict]) -> str:
         """
         Group shots into semantic scenes using Qwen-VL.
-        shot_frames: List of {"start": float, "end": float, "image": "path/to/img"}
+        shot_frames: List of {"start": float, "end": float, "image": frame}, where frame is
+        encoded image bytes, a BGR ndarray or a local path (frames are encoded in memory).
         
         Enhanced with shock_score and emotion tags for viral video optimization.
         """
@@ -102,32 +131,119 @@ class SceneDetector:
         - potential_hook=true的片段不超过2个
         """
         
+        window_size = Config.SHOT_GROUPING_WINDOW
+        if Config.SHOT_GROUPING_CHUNKED and len(shot_frames) > window_size:
+            return self._analyze_shot_grouping_chunked(prompt, shot_frames)
+
+        labels = [f"镜头时间: {shot['start']:.1f}s - {shot['end']:.1f}s" for shot in shot_frames]
+        # Use Qwen-VL-Plus/Max for better multi-image reasoning
+        return self._run_vision(
+            prompt,
+            [shot["image"] for shot in shot_frames],
+            labels=labels,
+            operation="shot_grouping",
+        )
+
+    def _analyze_shot_grouping_chunked(self, prompt: str, shot_frames: list[dict]) -> str:
+        """
+        Map-reduce grouping: overlapping shot windows are grouped concurrently (bounded by
+        SHOT_GROUPING_CONCURRENCY) and merged deterministically in window order.
+        """
+        started = time.monotonic()
+        windows = make_windows(len(shot_frames), Config.SHOT_GROUPING_WINDOW, Config.SHOT_GROUPING_OVERLAP)
+        ranges = ownership_ranges(shot_frames, windows)
+
+        def _group_window(bounds: tuple[int, int]) -> str:
+            chunk = shot_frames[bounds[0]:bounds[1]]
+            return self._run_vision(
+                prompt,
+                [shot["image"] for shot in chunk],
+                labels=[f"镜头时间: {shot['start']:.1f}s - {shot['end']:.1f}s" for shot in chunk],
+                operation="shot_grouping_window",
+            )
+
+        workers = max(1, min(Config.SHOT_GROUPING_CONCURRENCY, len(windows)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shot-grouping") as pool:
+            futures = [pool.submit(contextvars.copy_context().run, _group_window, w) for w in windows]
+            texts = [f.result() for f in futures]
+
+        merged = merge_window_results(texts, ranges)
+        logger.info(
+            "Chunked shot grouping finished",
+            extra={
+                "event": "vision.shot_grouping.chunked",
+                "shots": len(shot_frames),
+                "windows": len(windows),
+                "segments_count": len(merged.get("segments") or []),
+                "duration_ms": int((time.monotonic() - started) * 1000),
+            },
+        )
+        return json.dumps(merged, ensure_ascii=False)
+
+    def _run_vision(self, prompt: str, images: list, *, labels: list[str] | None = None, operation: str) -> str:
+        """
+        Send frames (each optionally followed by a text label) plus the prompt to Qwen-VL.
+        Results that parse as JSON are cached by model, prompt version and frame fingerprints.
+        """
+        cache_key = None
+        try:
+            cache_key = build_cache_key(Config.QWEN_IMAGE_MODEL, prompt, images, labels)
+        except Exception:
+            logger.warning("Vision cache key failed", extra={"event": "vision.cache.error", "operation": operation})
+        if cache_key:
+            cached = self._cache.get(cache_key, operation=operation)
+            if cached is not None:
+                return cached
+
+        image_urls, payload_stats = FramePayloadBuilder().build(images)
         content = []
-        for shot in shot_frames:
-            content.append({
-                "image": f"file://{shot['image']}"
-            })
-            content.append({
-                "text": f"镜头时间: {shot['start']:.1f}s - {shot['end']:.1f}s"
-            })
-            
+        for i, image_url in enumerate(image_urls):
+            content.append({"image": image_url})
+            if labels:
+                content.append({"text": labels[i]})
         content.append({"text": prompt})
-        
-        messages = [{"role": "user", "content": content}]
-        
-        try:
-            # Use Qwen-VL-Plus/Max for better multi-image reasoning
-            response = MultiModalConversation.call(model=Config.QWEN_IMAGE_MODEL, messages=messages)
-        finally:
-            # Cleanup is handled by caller or we can do it here if we want to be safe, 
-            # but caller might want to keep images for debugging. 
-            # Let's assume caller cleans up.
-            pass
 
-        if response.status_code == HTTPStatus.OK:
-            return self._content_to_text(response.output.choices[0].message.content)
-        else:
+        response = self._call_vision_model(content, operation=operation, payload_stats=payload_stats)
+        if response.status_code != HTTPStatus.OK:
             raise Exception(f"Model call failed: {response.message}")
+        text = self._content_to_text(response.output.choices[0].message.content)
+
+        if cache_key:
+            try:
+                json.loads(text.replace("```json", "").replace("```", "").strip())
+            except Exception:
+                # Do not pin an unparseable answer: the caller's retry should ask the model again.
+                return text
+            self._cache.set(cache_key, text, operation=operation)
+        return text
+
+    def _call_vision_model(self, content: list[dict], *, operation: str, payload_stats: dict):
+        """Call Qwen-VL with in-memory image payloads and log request size and latency."""
+        started = time.monotonic()
+        messages = [{"role": "user", "content": content}]
+        with metrics.VISION_REQUEST_DURATION.time(operation=operation, model=Config.QWEN_IMAGE_MODEL) as timer:
+            response = MultiModalConversation.call(model=Config.QWEN_IMAGE_MODEL, messages=messages)
+            timer.labels["outcome"] = "ok" if getattr(response, "status_code", None) == HTTPStatus.OK else "error"
+        usage = getattr(response, "usage", None) or {}
+        try:
+            input_tokens = usage.get("input_tokens")
+            output_tokens = usage.get("output_tokens")
+        except Exception:
+            input_tokens, output_tokens = None, None
+        logger.info(
+            "Vision model call finished",
+            extra={
+                "event": "vision.call.finish",
+                "operation": operation,
+                "model": Config.QWEN_IMAGE_MODEL,
+                "status_code": getattr(response, "status_code", None),
+                "duration_ms": int((time.monotonic() - started) * 1000),
+                **payload_stats,
+                **({"input_tokens": input_tokens} if input_tokens is not None else {}),
+                **({"output_tokens": output_tokens} if output_tokens is not None else {}),
+            },
+        )
+        return response
 
     def _content_to_text(self, content) -> str:
         if content is None:
@@ -148,10 +264,9 @@ class SceneDetector:
                 return content["text"]
         return str(content)
         
-    def extract_key_frame(self, video_url: str) -> str:
+    def extract_key_frame(self, video_url: str) -> np.ndarray:
         """
-        Download video from URL (or read local), extract the middle frame, 
-        save as temp file, and return path.
+        Read the video (URL or local path) and return its middle frame as a BGR ndarray.
         """
         # OpenCV can read directly from URL usually, but it's safer to download if needed.
         # For now, let's try reading directly.
@@ -173,19 +288,10 @@ class SceneDetector:
         if not ret:
             raise Exception("Failed to read frame")
 
-        # Resize to reduce upload size (e.g. max 1024px width)
-        height, width = frame.shape[:2]
-        max_dim = 1024
-        if width > max_dim or height > max_dim:
-            scaling_factor = max_dim / float(max(width, height))
-            frame = cv2.resize(frame, None, fx=scaling_factor, fy=scaling_factor, interpolation=cv2.INTER_AREA)
-
-        # Save to temp file
-        temp_file = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
-        cv2.imwrite(temp_file.name, frame)
-        return temp_file.name
+        # Resizing and encoding happen in FramePayloadBuilder when the frame is sent.
+        return frame
 
-    def extract_key_frames(self, video_url: str, num_frames: int = 5) -> list[str]:
+    def extract_key_frames(self, video_url: str, num_frames: int = 5) -> list[np.ndarray]:
         cap = cv2.VideoCapture(video_url)
         if not cap.isOpened():
             raise Exception(f"Could not open video: {video_url}")
@@ -205,7 +311,7 @@ class SceneDetector:
                 start, end = 0, total_frames - 1
             indices = np.linspace(start, end, num_frames).astype(int).tolist()
 
-        paths: list[str] = []
+        frames: list[np.ndarray] = []
         max_dim = 1024
         try:
             for idx in indices:
@@ -217,19 +323,17 @@ class SceneDetector:
                 if width > max_dim or height > max_dim:
                     scaling_factor = max_dim / float(max(width, height))
                     frame = cv2.resize(frame, None, fx=scaling_factor, fy=scaling_factor, interpolation=cv2.INTER_AREA)
-                temp_file = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
-                cv2.imwrite(temp_file.name, frame)
-                paths.append(temp_file.name)
+                frames.append(frame)
         finally:
             cap.release()
 
-        if not paths:
+        if not frames:
             raise Exception("Failed to extract any key frames")
-        return paths
+        return frames
 
-    def analyze_scene(self, image_path: str):
+    def analyze_scene(self, image):
         """
-        Call Qwen-VL-Plus to analyze the image.
+        Call Qwen-VL-Plus to analyze one frame (encoded bytes, BGR ndarray or local path).
         """
         # Qwen-VL prompt engineering
         prompt = """
@@ -246,27 +350,9 @@ class SceneDetector:
         }
         """
 
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"image": f"file://{image_path}"},
-                    {"text": prompt}
-                ]
-            }
-        ]
+        return self._run_vision(prompt, [image], operation="scene")
 
-        response = MultiModalConversation.call(model=Config.QWEN_IMAGE_MODEL, messages=messages)
-
-        # Clean up temp file
-        os.remove(image_path)
-
-        if response.status_code == HTTPStatus.OK:
-            return self._content_to_text(response.output.choices[0].message.content)
-        else:
-            raise Exception(f"Model call failed: {response.message}")
-
-    def analyze_scene_from_frames(self, image_paths: list[str]) -> str:
+    def analyze_scene_from_frames(self, images: list) -> str:
         prompt = """
         你将看到同一段房产视频的不同时刻截图（多张）。
         1. 识别该片段的主场景类型（仅限以下选项：小区门头, 小区环境, 客厅, 餐厅, 厨房, 卧室, 卫生间, 阳台, 走廊）。
@@ -281,22 +367,7 @@ class SceneDetector:
         }
         """
 
-        content = [{"image": f"file://{p}"} for p in image_paths]
-        content.append({"text": prompt})
-        messages = [{"role": "user", "content": content}]
-
-        try:
-            response = MultiModalConversation.call(model=Config.QWEN_IMAGE_MODEL, messages=messages)
-        finally:
-            for p in image_paths:
-                try:
-                    os.remove(p)
-                except Exception:
-                    pass
-
-        if response.status_code == HTTPStatus.OK:
-            return self._content_to_text(response.output.choices[0].message.content)
-        raise Exception(f"Model call failed: {response.message}")
+        return self._run_vision(prompt, list(images), operation="scene_from_frames")
 
     def analyze_video_segments(self, video_url: str, max_segments: int = 12) -> str:
         """
@@ -428,7 +499,9 @@ class SceneDetector:
             }
         ]
     
-        response = MultiModalConversation.call(model=Config.QWEN_VIDEO_MODEL, messages=messages)
+        with metrics.VISION_REQUEST_DURATION.time(operation="video_segments", model=Config.QWEN_VIDEO_MODEL) as timer:
+            response = MultiModalConversation.call(model=Config.QWEN_VIDEO_MODEL, messages=messages)
+            timer.labels["outcome"] = "ok" if response.status_code == HTTPStatus.OK else "error"
         if response.status_code == HTTPStatus.OK:
             return self._content_to_text(response.output.choices[0].message.content)
         raise Exception(f"Model call failed: {response.message}")
@@ -0,0 +1,138 @@
+"""
+Vision Result Cache
+
+Caches Qwen-VL text results keyed by (model, prompt version, ordered perceptual
+frame fingerprints, per-frame labels). Retries, re-uploads of the same footage and
+cloned projects then return without a model call. Backed by Redis when available,
+otherwise by a local SQLite file; entries expire after VISION_CACHE_TTL_SEC.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+from config import Config
+from frame_hash import dhash
+from redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "ai-video:vision-cache:"
+
+
+def prompt_version(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def frame_fingerprint(image) -> str:
+    """256-bit dHash: stable across re-encodes of the same footage, unlike byte hashes."""
+    return f"{dhash(image, hash_size=16):064x}"
+
+
+def build_cache_key(model: str, prompt: str, images: list, labels: list[str] | None = None) -> str:
+    material = {
+        "model": model,
+        "prompt": prompt_version(prompt),
+        "frames": [frame_fingerprint(image) for image in images],
+        "labels": list(labels or []),
+    }
+    digest = hashlib.sha256(json.dumps(material, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+    return digest
+
+
+class _SQLiteBackend:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and getattr(self._local, "pid", None) == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS vision_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> str | None:
+        row = self._conn().execute(
+            "SELECT value FROM vision_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl_sec: int) -> None:
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO vision_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl_sec),
+            )
+            conn.execute("DELETE FROM vision_cache WHERE expires_at <= ?", (now,))
+
+
+class _RedisBackend:
+    def get(self, key: str) -> str | None:
+        value = get_redis().get(_KEY_PREFIX + key)
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str, ttl_sec: int) -> None:
+        get_redis().set(_KEY_PREFIX + key, value.encode("utf-8"), ex=int(ttl_sec))
+
+
+class VisionResultCache:
+    """Best-effort cache: backend errors are logged and treated as misses."""
+
+    def __init__(self, backend: str | None = None, ttl_sec: int | None = None):
+        self.enabled = Config.VISION_CACHE_ENABLED
+        self.ttl_sec = int(ttl_sec or Config.VISION_CACHE_TTL_SEC)
+        name = (backend or Config.VISION_CACHE_BACKEND or "").lower()
+        if not name:
+            name = "redis" if Config.REDIS_URL else "sqlite"
+        if name == "redis" and not Config.REDIS_URL:
+            name = "sqlite"
+        self.backend_name = name
+        self._backend = _RedisBackend() if name == "redis" else _SQLiteBackend(Config.VISION_CACHE_SQLITE_PATH)
+
+    def get(self, key: str, *, operation: str) -> str | None:
+        if not self.enabled:
+            return None
+        try:
+            value = self._backend.get(key)
+        except Exception as e:
+            logger.warning(
+                "Vision cache read failed",
+                extra={"event": "vision.cache.error", "operation": operation, "reason": str(e)},
+            )
+            return None
+        metrics.CACHE_LOOKUPS.inc(cache="vision", outcome="hit" if value is not None else "miss")
+        logger.info(
+            "Vision cache lookup",
+            extra={
+                "event": "vision.cache.hit" if value is not None else "vision.cache.miss",
+                "operation": operation,
+                "strategy": self.backend_name,
+            },
+        )
+        return value
+
+    def set(self, key: str, value: str, *, operation: str) -> None:
+        if not self.enabled:
+            return
+        try:
+            self._backend.set(key, value, self.ttl_sec)
+        except Exception as e:
+            logger.warning(
+                "Vision cache write failed",
+                extra={"event": "vision.cache.error", "operation": operation, "reason": str(e)},
+            )
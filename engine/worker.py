@@ -1,15 +1,16 @@
 from celery import Celery, signals
 from config import Config
 from kombu import Queue
+import log_pipeline
+import metrics
+import routing
+import spans
 import logging
-import contextvars
-import json
+import os
 from datetime import datetime, timezone
 
-# Context Var to hold Request ID and User ID
-request_id_var = contextvars.ContextVar("request_id", default="-")
-user_id_var = contextvars.ContextVar("user_id", default="-")
-task_id_var = contextvars.ContextVar("task_id", default="-")
+# Context Vars holding Request ID, User ID and Task ID (see request_context.py)
+from request_context import request_id_var, task_id_var, user_id_var
 
 class RequestIdFilter(logging.Filter):
     def filter(self, record):
@@ -76,14 +77,60 @@ class JsonFormatter(logging.Formatter):
             "audio_path",
             "countdown_sec",
             "remaining_assets",
+            "operation",
+            "status_code",
+            "input_tokens",
+            "output_tokens",
+            "frames",
+            "frame_dim",
+            "frame_format",
+            "payload_bytes",
+            "payload_budget_bytes",
+            "shots",
+            "shots_after",
+            "shots_removed",
+            "windows",
+            "speech_rate",
+            "predicted_duration",
+            "audio_duration",
+            "video_duration",
+            "hit",
+            "hits",
+            "hit_rate",
+            "syntheses",
+            "syntheses_per_segment",
+            "encode_workers",
+            "upload_workers",
+            "tts_workers",
+            "tts_qps",
+            "tempo",
+            "ttfa_ms",
+            "hedge_delay_sec",
+            "breaker",
+            "breaker_state",
+            "cpu_ms",
+            "rss_delta_mb",
+            "bytes_in",
+            "bytes_out",
+            "content_length",
+            "estimated_mem_mb",
+            "estimated_cpu",
+            "mem_in_use_mb",
+            "cpu_in_use",
+            "active_leases",
+            "max_open",
+            "peak_open",
+            "restarts",
+            "keyframe_candidates",
+            "keyframe_buffer_bytes",
         ):
             if hasattr(record, k):
-                payload[k] = getattr(record, k)
+                payload[k] = log_pipeline.truncate(getattr(record, k))
 
         if record.exc_info:
             payload["stacktrace"] = self.formatException(record.exc_info)
 
-        return json.dumps(payload, ensure_ascii=False)
+        return log_pipeline.dumps(payload)
 
 celery_app = Celery(
     'ai_engine',
@@ -99,7 +146,8 @@ celery_app.conf.update(
     timezone='Asia/Shanghai',
     enable_utc=True,
     task_default_queue=Config.CELERY_QUEUE_NAME,
-    task_queues=(Queue(Config.CELERY_QUEUE_NAME),),
+    task_queues=tuple(Queue(name) for name in routing.queue_names()),
+    task_routes=routing.celery_task_routes(),
     task_create_missing_queues=True,
     broker_connection_retry_on_startup=True,
 )
@@ -125,18 +173,83 @@ def on_task_prerun(sender=None, task_id=None, task=None, args=None, kwargs=None,
     request_id_var.set(request_id)
     user_id_var.set(user_id)
     task_id_var.set(task_id or getattr(req, "id", "-") or "-")
+    task_name = (getattr(t, "name", None) or "task").rsplit(".", 1)[-1]
+    metrics.task_started(task_id or getattr(req, "id", None), task_name)
+    spans.start_task_span(task_id or getattr(req, "id", None), task_name)
 
-@signals.after_setup_logger.connect
-def setup_loggers(logger, *args, **kwargs):
+@signals.task_postrun.connect
+def on_task_postrun(sender=None, task_id=None, state=None, **extras):
+    spans.finish_task_span(task_id, state)
+    metrics.task_finished(task_id, state)
+
+@signals.worker_init.connect
+def on_worker_init(**kwargs):
+    metrics.reset_textfile_dir()
+
+def _log_startup_diagnostics():
+    # Print version info on startup
+    image_tag = os.getenv('IMAGE_TAG', 'unknown')
+    git_commit = os.getenv('GIT_COMMIT', 'unknown')
+    build_time = os.getenv('BUILD_TIME', 'unknown')
+    logging.info("=== Engine Version Info ===")
+    logging.info(f"Image Tag: {image_tag}")
+    logging.info(f"Git Commit: {git_commit}")
+    logging.info(f"Build Time: {build_time}")
+    logging.info("===========================")
+
+    # Log font status (runs fc-list)
+    try:
+        from font_manager import FontManager
+        FontManager.log_font_status()
+    except Exception as e:
+        logging.warning(f"Failed to log font status: {e}")
+
+@signals.worker_ready.connect
+def on_worker_ready(sender=None, **kwargs):
+    # Runs once in the main process after the pool is up, so neither import time
+    # nor the forked children pay for it.
+    if Config.STARTUP_DIAGNOSTICS_ENABLED:
+        _log_startup_diagnostics()
+    # With split io/cpu workers only the io worker relays backend messages and
+    # polls queue depth; the cpu worker's pool just consumes its own queue.
+    app = getattr(sender, "app", None) or celery_app
+    if not routing.is_front_worker(app):
+        return
+    routing.start_relay()
+    try:
+        metrics.start_queue_depth_monitor(routing.queue_names())
+    except Exception as e:
+        logging.warning(f"Queue depth monitor failed to start: {e}")
+    try:
+        metrics.serve()
+    except Exception as e:
+        logging.warning(f"Metrics endpoint failed to start: {e}")
+
+@signals.worker_process_init.connect
+def on_worker_process_init(**kwargs):
+    metrics.reset_after_fork()
+    spans.reset_after_fork()
+
+def _configure_json_logging(logger):
     for handler in logger.handlers:
         handler.addFilter(_request_id_filter)
         handler.setFormatter(JsonFormatter("ai-scene-engine"))
+    if Config.LOG_ASYNC_ENABLED:
+        # Formatting and writes move to a listener thread; the id filter stays in the caller.
+        log_pipeline.install(logger, filters=(_request_id_filter,))
+
+@signals.after_setup_logger.connect
+def setup_loggers(logger, *args, **kwargs):
+    _configure_json_logging(logger)
 
 @signals.after_setup_task_logger.connect
 def setup_task_loggers(logger, *args, **kwargs):
-    for handler in logger.handlers:
-        handler.addFilter(_request_id_filter)
-        handler.setFormatter(JsonFormatter("ai-scene-engine"))
+    _configure_json_logging(logger)
+
+@signals.worker_process_shutdown.connect
+def on_worker_process_shutdown(**kwargs):
+    # Pool children exit via os._exit (no atexit): drain the log queue first.
+    log_pipeline.stop()
 
 # Validate configuration on startup
 try:
@@ -146,49 +259,5 @@ except Exception as e:
     import logging
     logging.error(f"Configuration validation failed: {e}")
 
-# Configure MoviePy to use ImageMagick for TextClip rendering
-try:
-    from moviepy.config import change_settings
-    import subprocess
-    import os
-    
-    # Try to find ImageMagick binary
-    imagemagick_binary = None
-    for cmd in ['magick', 'convert']:
-        try:
-            result = subprocess.run(['which', cmd], capture_output=True, text=True)
-            if result.returncode == 0:
-                imagemagick_binary = result.stdout.strip()
-                break
-        except Exception:
-            pass
-    
-    if imagemagick_binary:
-        change_settings({"IMAGEMAGICK_BINARY": imagemagick_binary})
-        logging.info(f"MoviePy ImageMagick configured: {imagemagick_binary}")
-    else:
-        logging.warning("ImageMagick not found - subtitle rendering may fail")
-except Exception as e:
-    import logging
-    logging.warning(f"Failed to configure MoviePy ImageMagick: {e}")
-
-# Print version info on startup
-import os
-image_tag = os.getenv('IMAGE_TAG', 'unknown')
-git_commit = os.getenv('GIT_COMMIT', 'unknown')
-build_time = os.getenv('BUILD_TIME', 'unknown')
-logging.info("=== Engine Version Info ===")
-logging.info(f"Image Tag: {image_tag}")
-logging.info(f"Git Commit: {git_commit}")
-logging.info(f"Build Time: {build_time}")
-logging.info("===========================")
-
-# Log font status on startup
-try:
-    from font_manager import FontManager
-    FontManager.log_font_status()
-except Exception as e:
-    logging.warning(f"Failed to log font status: {e}")
-
 if __name__ == '__main__':
     celery_app.start()